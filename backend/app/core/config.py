@@ -50,6 +50,12 @@ class Settings(BaseSettings):
         "redis://localhost:6379/0"
     )
     
+    # Dashboard cache warm-up, off until the dashboard endpoints read through get_or_load
+    CACHE_WARMUP_ENABLED: bool = os.getenv("CACHE_WARMUP_ENABLED", "false").lower() == "true"
+    CACHE_WARMUP_MAX_CONCURRENCY: int = int(os.getenv("CACHE_WARMUP_MAX_CONCURRENCY", "4"))  # loaders at once
+    CACHE_WARMUP_MARKET_OPEN_UTC: str = os.getenv("CACHE_WARMUP_MARKET_OPEN_UTC", "13:00")  # HH:MM
+    CACHE_WARMUP_LEAD_MINUTES: int = int(os.getenv("CACHE_WARMUP_LEAD_MINUTES", "15"))  # warm this long before open
+    
     # JWT
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", SECRET_KEY)
     JWT_ALGORITHM: str = "HS256"
@@ -112,12 +118,41 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     SENTRY_DSN: Optional[str] = os.getenv("SENTRY_DSN")
     
+    # Distributed Tracing
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")  # otlp_file, database or none
+    # On by default only when spans have somewhere to go
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", str(TRACING_EXPORTER != "none")).lower() == "true"
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "optibid-api")
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.05"))  # fraction of traces recorded
+    TRACING_OTLP_FILE: str = os.getenv("TRACING_OTLP_FILE", "./logs/traces.otlp.jsonl")
+    TRACING_OTLP_FILE_MAX_BYTES: int = int(os.getenv("TRACING_OTLP_FILE_MAX_BYTES", str(100 * 1024 * 1024)))  # rotated to .1 beyond this
+    TRACING_EXPORT_INTERVAL_MS: int = int(os.getenv("TRACING_EXPORT_INTERVAL_MS", "5000"))
+    
     # Kafka Configuration (for streaming)
     KAFKA_BOOTSTRAP_SERVERS: str = os.getenv(
         "KAFKA_BOOTSTRAP_SERVERS",
         "localhost:9092"
     )
     KAFKA_TOPIC_PREFIX: str = "optibid"
+    KAFKA_CONSUMER_BATCH_SIZE: int = int(os.getenv("KAFKA_CONSUMER_BATCH_SIZE", "500"))  # messages per DB write
+    KAFKA_CONSUMER_BATCH_WINDOW_MS: int = int(os.getenv("KAFKA_CONSUMER_BATCH_WINDOW_MS", "200"))
+    KAFKA_CONSUMER_MAX_BATCH_ATTEMPTS: int = int(os.getenv("KAFKA_CONSUMER_MAX_BATCH_ATTEMPTS", "5"))  # then written row by row, skipping rejected rows
+    MARKET_DATA_DEDUP_WINDOW_SECONDS: int = int(os.getenv("MARKET_DATA_DEDUP_WINDOW_SECONDS", "3600"))
+    MARKET_DATA_DEDUP_MAX_MEMORY_MB: int = int(os.getenv("MARKET_DATA_DEDUP_MAX_MEMORY_MB", "64"))
+    MARKET_DATA_DEDUP_USE_REDIS: bool = os.getenv("MARKET_DATA_DEDUP_USE_REDIS", "false").lower() == "true"
+    
+    # TimescaleDB storage for streamed market data
+    TIMESCALE_CHUNK_INTERVAL: str = os.getenv("TIMESCALE_CHUNK_INTERVAL", "1 day")
+    TIMESCALE_COMPRESS_AFTER: str = os.getenv("TIMESCALE_COMPRESS_AFTER", "7 days")
+    TIMESCALE_RETENTION_PERIOD: str = os.getenv("TIMESCALE_RETENTION_PERIOD", "365 days")
+    
+    # WebSocket Broadcasting
+    WEBSOCKET_SEND_QUEUE_SIZE: int = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "256"))  # per connection
+    WEBSOCKET_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", "0.5"))
+    WEBSOCKET_SLOW_CONSUMER_THRESHOLD: int = int(os.getenv("WEBSOCKET_SLOW_CONSUMER_THRESHOLD", "3"))  # consecutive timeouts
+    WEBSOCKET_SLOW_CONSUMER_MAX_TIMEOUTS: int = int(os.getenv("WEBSOCKET_SLOW_CONSUMER_MAX_TIMEOUTS", "20"))  # then disconnect
+    WEBSOCKET_RELAY_BATCH_INTERVAL_MS: int = int(os.getenv("WEBSOCKET_RELAY_BATCH_INTERVAL_MS", "20"))
+    WEBSOCKET_RELAY_MAX_BATCH_SIZE: int = int(os.getenv("WEBSOCKET_RELAY_MAX_BATCH_SIZE", "500"))
     
     # ClickHouse (for OLAP analytics)
     CLICKHOUSE_URL: str = os.getenv(
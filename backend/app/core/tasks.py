@@ -0,0 +1,28 @@
+"""
+OptiBid Energy Platform - Background Tasks
+Tracking for tasks started without awaiting them, so they are neither
+garbage collected mid-flight nor abandoned on shutdown
+"""
+
+import asyncio
+from typing import Awaitable, Set
+
+
+class TaskSet:
+    """Holds a reference to each spawned task until it finishes"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro: Awaitable) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def wait(self):
+        """Wait for every task still running; their errors are theirs to log"""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,634 @@
+"""
+OptiBid Energy Platform - Distributed Tracing
+W3C trace context propagation with sampled, batch-exported spans, so a tick
+can be followed from the HTTP request that produced it through Kafka to the
+WebSocket broadcast
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import JSON, Column, DateTime, Float, MetaData, String, Table, Text, insert
+
+from app.core.config import settings
+from app.core.tasks import TaskSet
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identity of a span as carried across process boundaries"""
+    trace_id: str
+    span_id: str
+    sampled: bool
+    remote: bool = False
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Any) -> Optional["SpanContext"]:
+        """Parse a W3C ``traceparent`` header; None if absent or malformed"""
+        if isinstance(header, bytes):
+            header = header.decode("latin-1")
+        if not header:
+            return None
+
+        parts = header.strip().split("-")
+        if len(parts) < 4 or parts[0] == "ff" or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16)
+            int(parts[2], 16)
+            flags = int(parts[3][:2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+
+        return cls(parts[1], parts[2], bool(flags & 1), remote=True)
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace"""
+    context: SpanContext
+    name: str
+    service_name: str
+    kind: str = "internal"
+    span_type: str = "internal"  # http, kafka, websocket, database, cache
+    parent_span_id: Optional[str] = None
+    # First span of this trace in this process; its subtree is exported together
+    local_root_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    status: str = "OK"
+    error_message: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled
+
+    @property
+    def is_local_root(self) -> bool:
+        return self.local_root_id == self.context.span_id
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        if self.recording:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = "ERROR"
+        self.error_message = f"{type(exc).__name__}: {exc}"
+
+
+# Stand-in while tracing is disabled: propagates nothing and records nothing
+_NOOP_SPAN = Span(SpanContext("0" * 32, "0" * 16, False), "noop", "noop")
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def extract_context(headers: Any) -> Optional[SpanContext]:
+    """
+    Trace context from message headers
+
+    Accepts Kafka-style ``[(name, bytes), ...]`` lists, ASGI header lists and
+    plain mappings.
+    """
+    if not headers:
+        return None
+    items = headers.items() if isinstance(headers, dict) else headers
+    for name, value in items:
+        if isinstance(name, bytes):
+            name = name.decode("latin-1")
+        if name.lower() == TRACEPARENT:
+            return SpanContext.from_traceparent(value)
+    return None
+
+
+def kafka_record_attributes(record: Any) -> Dict[str, Any]:
+    """Span attributes for a consumed Kafka record, including how long it sat in the topic"""
+    attributes = {
+        "messaging.destination": record.topic,
+        "messaging.kafka.partition": record.partition,
+        "messaging.kafka.offset": record.offset
+    }
+    timestamp = getattr(record, "timestamp", None)
+    if timestamp:
+        attributes["messaging.kafka.record_age_ms"] = time.time() * 1000 - timestamp
+    return attributes
+
+
+class SpanExporter(ABC):
+    """Destination for finished spans"""
+
+    @abstractmethod
+    async def export(self, spans: Sequence[Span]):
+        """Write one batch of finished spans"""
+
+    async def shutdown(self):
+        pass
+
+
+class OTLPFileExporter(SpanExporter):
+    """
+    Appends each batch as one OTLP/JSON ``ExportTraceServiceRequest`` line
+
+    The format read by the OpenTelemetry collector's file receiver and
+    accepted verbatim by OTLP/HTTP endpoints. Once the file reaches
+    ``max_bytes`` it is rotated to ``<path>.1`` (replacing the previous
+    one), so at most twice that is kept on disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 100 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def export(self, spans: Sequence[Span]):
+        line = json.dumps(self.to_otlp(spans), default=str, separators=(",", ":"))
+        await asyncio.get_running_loop().run_in_executor(None, self._append, line)
+
+    def _append(self, line: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+
+    @staticmethod
+    def to_otlp(spans: Sequence[Span]) -> Dict[str, Any]:
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            otlp_span = {
+                "traceId": span.context.trace_id,
+                "spanId": span.context.span_id,
+                "name": span.name,
+                "kind": SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    _otlp_attribute(key, value)
+                    for key, value in {**span.attributes, "span.type": span.span_type}.items()
+                ],
+                "status": {"code": 2 if span.status == "ERROR" else 1}
+            }
+            if span.parent_span_id:
+                otlp_span["parentSpanId"] = span.parent_span_id
+            if span.error_message:
+                otlp_span["status"]["message"] = span.error_message
+            by_service.setdefault(span.service_name, []).append(otlp_span)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", service)]},
+                    "scopeSpans": [{"scope": {"name": "optibid.tracing"}, "spans": service_spans}]
+                }
+                for service, service_spans in by_service.items()
+            ]
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class DatabaseSpanExporter(SpanExporter):
+    """
+    Writes spans to the monitoring ``distributed_traces`` and ``trace_spans`` tables
+
+    A trace's root span, the one without a parent, becomes its single
+    ``distributed_traces`` row and every span a ``trace_spans`` row. Entry
+    spans continuing a trace from another process are spans of that trace,
+    not new traces, so they write no trace row of their own.
+    """
+
+    def __init__(self, sessionmaker):
+        self.sessionmaker = sessionmaker
+
+    async def export(self, spans: Sequence[Span]):
+        traces = [self._trace_row(span) for span in spans if span.parent_span_id is None]
+        span_rows = [self._span_row(span) for span in spans]
+
+        async with self.sessionmaker() as session:
+            if traces:
+                await session.execute(insert(distributed_traces), traces)
+            await session.execute(insert(trace_spans), span_rows)
+            await session.commit()
+
+    @staticmethod
+    def _times(span: Span) -> Dict[str, Any]:
+        return {
+            "start_time": datetime.fromtimestamp(span.start_ns / 1e9, tz=timezone.utc),
+            "end_time": datetime.fromtimestamp(span.end_ns / 1e9, tz=timezone.utc),
+            "duration_ms": span.duration_ms,
+            "status_code": span.status,
+            "error_message": span.error_message
+        }
+
+    def _trace_row(self, span: Span) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "trace_id": span.context.trace_id,
+            "span_id": span.context.span_id,
+            "parent_span_id": span.parent_span_id,
+            "service_name": span.service_name,
+            "operation_name": span.name,
+            "tags": span.attributes,
+            **self._times(span)
+        }
+
+    def _span_row(self, span: Span) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "trace_id": span.context.trace_id,
+            "span_id": span.context.span_id,
+            "parent_span_id": span.parent_span_id,
+            "service_name": span.service_name,
+            "operation_name": span.name,
+            "span_type": span.span_type,
+            "resource_attributes": span.attributes,
+            **self._times(span)
+        }
+
+
+def _trace_columns() -> List[Column]:
+    return [
+        Column("id", String, primary_key=True),
+        Column("trace_id", String(32), nullable=False),
+        Column("span_id", String(16), nullable=False),
+        Column("parent_span_id", String(16)),
+        Column("service_name", String(100), nullable=False),
+        Column("operation_name", String(200), nullable=False),
+        Column("start_time", DateTime(timezone=True), nullable=False),
+        Column("end_time", DateTime(timezone=True)),
+        Column("duration_ms", Float),
+        Column("status_code", String(20)),
+        Column("error_message", Text)
+    ]
+
+
+# The monitoring schema's tracing tables; created by its migrations, not by this app
+_tracing_metadata = MetaData()
+distributed_traces = Table("distributed_traces", _tracing_metadata, *_trace_columns(), Column("tags", JSON))
+trace_spans = Table(
+    "trace_spans", _tracing_metadata, *_trace_columns(),
+    Column("span_type", String(50)),
+    Column("resource_attributes", JSON)
+)
+
+
+class Tracer:
+    """
+    Creates spans, decides sampling and batches finished spans for export
+
+    Sampling is decided once per trace from its id, and a sampled flag
+    received from upstream is always honoured, so a trace is either recorded
+    by every service or by none. Unsampled spans still propagate context but
+    are never buffered. Finished spans are exported every
+    ``export_interval`` seconds, each local subtree in one piece.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        sample_rate: float = 1.0,
+        exporter: Optional[SpanExporter] = None,
+        export_interval: float = 5.0,
+        max_queue_size: int = 2048,
+        max_batch_size: int = 512,
+        enabled: bool = True
+    ):
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.enabled = enabled
+        self.is_running = False
+
+        self._queue: List[Span] = []
+        # Local root span id -> its finished descendants, exported when the root ends
+        self._open: Dict[str, List[Span]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Exports started early because the queue reached a full batch
+        self._early_flushes = TaskSet()
+        self.stats = {
+            'spans_started': 0,
+            'spans_exported': 0,
+            'spans_dropped': 0,
+            'export_failures': 0
+        }
+
+    def _should_sample(self, trace_id: str) -> bool:
+        return int(trace_id[16:], 16) < self.sample_rate * 2 ** 64
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        span_type: str = "internal",
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        """
+        Run a block inside a new span, the current one's child by default
+
+        Pass ``parent`` to continue a trace received from another process.
+        Exceptions escaping the block mark the span as failed.
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        span = self._new_span(name, kind, span_type, parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record_span(
+        self,
+        name: str,
+        start_ns: int,
+        kind: str = "internal",
+        span_type: str = "internal",
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        end_ns: Optional[int] = None,
+        error_message: Optional[str] = None
+    ) -> Optional[Span]:
+        """Record an already finished span, e.g. one per message of a processed batch"""
+        if not self.enabled:
+            return None
+        span = self._new_span(name, kind, span_type, parent, attributes)
+        span.start_ns = start_ns
+        span.end_ns = end_ns
+        if error_message:
+            span.status = "ERROR"
+            span.error_message = error_message
+        self._finish(span)
+        return span
+
+    def _new_span(
+        self,
+        name: str,
+        kind: str,
+        span_type: str,
+        parent: Optional[SpanContext],
+        attributes: Optional[Dict[str, Any]]
+    ) -> Span:
+        parent_span = None
+        if parent is None:
+            parent_span = _current_span.get()
+            if parent_span is not None and parent_span is not _NOOP_SPAN:
+                parent = parent_span.context
+            else:
+                parent_span = None
+
+        if parent is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            sampled = self._should_sample(trace_id)
+        else:
+            trace_id, sampled = parent.trace_id, parent.sampled
+
+        context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled)
+        span = Span(
+            context=context,
+            name=name,
+            service_name=self.service_name,
+            kind=kind,
+            span_type=span_type,
+            parent_span_id=parent.span_id if parent else None,
+            local_root_id=parent_span.local_root_id if parent_span else context.span_id,
+            attributes=dict(attributes or {}) if sampled else {}
+        )
+
+        self.stats['spans_started'] += 1
+        if sampled and span.is_local_root:
+            self._open[context.span_id] = []
+        return span
+
+    def _finish(self, span: Span):
+        if span.end_ns is None:
+            span.end_ns = time.time_ns()
+        if not span.recording:
+            return
+
+        if span.is_local_root:
+            self._enqueue(self._open.pop(span.context.span_id, []) + [span])
+            return
+
+        pending = self._open.get(span.local_root_id)
+        if pending is None:
+            # Outlived its root (e.g. a background task); the root is already queued
+            self._enqueue([span])
+        elif len(pending) < self.max_batch_size:
+            pending.append(span)
+        else:
+            self.stats['spans_dropped'] += 1
+
+    def _enqueue(self, spans: List[Span]):
+        if self.exporter is None or len(self._queue) + len(spans) > self.max_queue_size:
+            self.stats['spans_dropped'] += len(spans)
+            return
+
+        self._queue.extend(spans)
+        if self.is_running and len(self._queue) >= self.max_batch_size:
+            self._early_flushes.spawn(self.flush())
+
+    def current_context(self) -> Optional[SpanContext]:
+        span = _current_span.get()
+        if span is None or span is _NOOP_SPAN:
+            return None
+        return span.context
+
+    def traceparent(self) -> Optional[str]:
+        context = self.current_context()
+        return context.to_traceparent() if context else None
+
+    def inject_headers(self) -> List[Tuple[str, bytes]]:
+        """Kafka record headers carrying the current trace context"""
+        header = self.traceparent()
+        return [(TRACEPARENT, header.encode("latin-1"))] if header else []
+
+    async def start(self):
+        if self.is_running or not self.enabled or self.exporter is None:
+            return
+        self.is_running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+        await self._early_flushes.wait()
+        await self.flush()
+        await self.exporter.shutdown()
+
+    async def flush(self):
+        """Export everything queued as one batch"""
+        if not self._queue or self.exporter is None:
+            return
+
+        spans, self._queue = self._queue, []
+        try:
+            await self.exporter.export(spans)
+            self.stats['spans_exported'] += len(spans)
+        except Exception as e:
+            self.stats['export_failures'] += 1
+            logger.error(f"Failed to export {len(spans)} trace spans: {e}")
+
+    async def _flush_loop(self):
+        while self.is_running:
+            await asyncio.sleep(self.export_interval)
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'queued_spans': len(self._queue),
+            'open_traces': len(self._open)
+        }
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request"""
+
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self._tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        active_tracer = self._tracer or tracer
+        if scope["type"] != "http" or not active_tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        with active_tracer.start_span(
+            f"{method} {scope.get('path', '')}",
+            kind="server",
+            span_type="http",
+            parent=extract_context(scope.get("headers")),
+            attributes={"http.method": method, "http.target": scope.get("path", "")}
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "ERROR"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Name by route template once routing has matched, to keep names low-cardinality
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+
+
+# Global tracer, exported to the backend chosen by TRACING_EXPORTER
+tracer = Tracer(
+    service_name=settings.TRACING_SERVICE_NAME,
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    export_interval=settings.TRACING_EXPORT_INTERVAL_MS / 1000,
+    enabled=settings.TRACING_ENABLED
+)
+
+
+async def start_tracing():
+    """Attach the configured exporter and start exporting spans"""
+    if not tracer.enabled:
+        return
+
+    if settings.TRACING_EXPORTER == "database":
+        from app.core.database import AsyncSessionLocal
+        tracer.exporter = DatabaseSpanExporter(AsyncSessionLocal)
+    elif settings.TRACING_EXPORTER == "otlp_file":
+        tracer.exporter = OTLPFileExporter(settings.TRACING_OTLP_FILE, settings.TRACING_OTLP_FILE_MAX_BYTES)
+    else:
+        logger.info("Tracing exporter disabled, spans only propagate context")
+        return
+
+    await tracer.start()
+    logger.info(f"Tracing started ({settings.TRACING_EXPORTER}, sample rate {tracer.sample_rate})")
+
+
+async def stop_tracing():
+    """Export remaining spans"""
+    await tracer.stop()
+
+
+# Export public API
+__all__ = [
+    "SpanContext",
+    "Span",
+    "Tracer",
+    "SpanExporter",
+    "OTLPFileExporter",
+    "DatabaseSpanExporter",
+    "TracingMiddleware",
+    "tracer",
+    "current_span",
+    "extract_context",
+    "kafka_record_attributes",
+    "start_tracing",
+    "stop_tracing",
+]
@@ -3,11 +3,15 @@ OptiBid Energy Platform - Base CRUD Operations
 Base CRUD class with common database operations
 """
 
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
-from datetime import datetime
+import base64
+import json
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+from datetime import date, datetime
+from decimal import Decimal
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func, and_, or_, desc, asc
+from sqlalchemy import Column, select, update, delete, func, and_, or_, desc, asc, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
 
@@ -18,6 +22,19 @@ ModelType = TypeVar("ModelType", bound=BaseModel)
 CreateSchemaType = TypeVar("CreateSchemaType")
 UpdateSchemaType = TypeVar("UpdateSchemaType")
 
+# PostgreSQL accepts at most 32767 bind parameters in one statement
+MAX_BIND_PARAMS = 32767
+
+# ON CONFLICT DO UPDATE merge rules: (current value, proposed value) -> new value.
+# "keep" leaves the column untouched and so has no expression.
+MERGE_RULES: Dict[str, Callable[[Any, Any], Any]] = {
+    "replace": lambda current, new: new,
+    "coalesce": lambda current, new: func.coalesce(new, current),
+    "add": lambda current, new: func.coalesce(current, 0) + new,
+    "max": lambda current, new: func.greatest(current, new),
+    "min": lambda current, new: func.least(current, new),
+}
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Base CRUD class with common operations"""
     
@@ -77,8 +94,63 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         result = await db.execute(query)
         return result.scalars().all()
     
-    async def count(self, db: AsyncSession, filters: Optional[Dict[str, Any]] = None) -> int:
-        """Count records with optional filtering"""
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        desc_order: bool = True
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Get a page of records by keyset (cursor) pagination
+        
+        Each page seeks past the last ``(order_by, id)`` of the previous one
+        instead of skipping rows with OFFSET, so with an index on those
+        columns every page costs the same however deep it is. Returns the
+        records and the cursor for the next page (None after the last page).
+        """
+        query = select(self.model)
+        
+        # Apply filters
+        if filters:
+            conditions = []
+            for key, value in filters.items():
+                if hasattr(self.model, key):
+                    if isinstance(value, list):
+                        conditions.append(getattr(self.model, key).in_(value))
+                    else:
+                        conditions.append(getattr(self.model, key) == value)
+            
+            if conditions:
+                query = query.where(and_(*conditions))
+        
+        # Sort column plus the primary key as a unique tiebreaker
+        if order_by == "id":
+            columns = [self.model.id]
+        elif order_by and hasattr(self.model, order_by):
+            columns = [getattr(self.model, order_by), self.model.id]
+        else:
+            columns = [self.model.created_at, self.model.id]
+        
+        return await paginate_keyset(
+            db, query, columns=columns, cursor=cursor, limit=limit, descending=desc_order
+        )
+    
+    async def count(
+        self,
+        db: AsyncSession,
+        filters: Optional[Dict[str, Any]] = None,
+        approximate: bool = False
+    ) -> int:
+        """
+        Count records with optional filtering
+        
+        With ``approximate`` the planner's row estimate is returned instead,
+        which reads table statistics rather than scanning the table.
+        """
         query = select(func.count(self.model.id))
         
         # Apply filters
@@ -94,6 +166,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if conditions:
                 query = query.where(and_(*conditions))
         
+        if approximate:
+            estimate_query = select(self.model.id)
+            if query.whereclause is not None:
+                estimate_query = estimate_query.where(query.whereclause)
+            return await estimate_rows(db, estimate_query)
+        
         result = await db.execute(query)
         return result.scalar()
     
@@ -267,25 +345,192 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         user_id: Optional[str] = None
     ) -> List[ModelType]:
         """Create multiple records in bulk"""
-        db_obj_list = []
-        
-        for obj_in in obj_in_list:
-            obj_in_data = obj_in.dict() if hasattr(obj_in, 'dict') else obj_in.__dict__
-            
-            # Set audit fields if user_id provided
-            if user_id:
-                obj_in_data['created_by'] = user_id
-            
-            db_obj = self.model(**obj_in_data)
-            db_obj_list.append(db_obj)
-        
-        db.add_all(db_obj_list)
+        db_obj_list = await self.bulk_insert(db, rows=obj_in_list, user_id=user_id)
         await db.commit()
+        return db_obj_list
+    
+    async def bulk_insert(
+        self,
+        db: AsyncSession,
+        *,
+        rows: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        user_id: Optional[str] = None,
+        on_conflict: Optional[str] = None,
+        conflict_fields: Optional[List[str]] = None,
+        update_fields: Optional[List[str]] = None,
+        merge: Optional[Dict[str, Union[str, Callable[[Any, Any], Any]]]] = None,
+        returning: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Union[List[ModelType], int]:
+        """
+        Insert records with multi-row ``INSERT ... VALUES`` statements
+        
+        Rows are chunked to stay under PostgreSQL's bind parameter limit (and
+        ``batch_size``, if given); rows with different keys go in separate
+        statements. With ``returning`` the new records come back through
+        ``RETURNING`` as model instances, otherwise the inserted row count is
+        returned. ``on_conflict`` is ``"nothing"`` or ``"update"``, the latter
+        merging ``update_fields`` (default: every inserted field except
+        ``conflict_fields`` and the identity/audit ones) into the existing
+        row by their ``merge`` rule (see ``upsert_many``; default replace).
+        The commit is left to the caller.
+        """
+        if on_conflict not in (None, "nothing", "update"):
+            raise ValueError(f"Unsupported on_conflict action: {on_conflict}")
+        if on_conflict == "update" and not conflict_fields:
+            raise ValueError("conflict_fields are required for on_conflict='update'")
+        for rule in (merge or {}).values():
+            if not callable(rule) and rule != "keep" and rule not in MERGE_RULES:
+                raise ValueError(f"Unsupported merge rule: {rule}")
+        
+        # Group rows by key set, keeping insertion order within each group
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            row_data = self._insert_data(row, user_id)
+            groups.setdefault(tuple(row_data), []).append(row_data)
+        
+        inserted: List[ModelType] = []
+        count = 0
+        for keys, group in groups.items():
+            # Python-side defaults (the UUID primary key) add a parameter per row
+            defaulted = sum(
+                1 for column in self.model.__table__.c
+                if column.default is not None and column.key not in keys
+            )
+            chunk_size = max(1, MAX_BIND_PARAMS // (len(keys) + defaulted))
+            if batch_size:
+                chunk_size = min(chunk_size, batch_size)
+            
+            for start in range(0, len(group), chunk_size):
+                stmt = self._insert_statement(
+                    group[start:start + chunk_size], on_conflict, conflict_fields, update_fields, merge
+                )
+                if returning:
+                    result = await db.scalars(
+                        stmt.returning(self.model),
+                        execution_options={"populate_existing": True}
+                    )
+                    inserted.extend(result.all())
+                else:
+                    result = await db.execute(stmt)
+                    count += result.rowcount
+        
+        return inserted if returning else count
+    
+    async def copy_insert(
+        self,
+        db: AsyncSession,
+        *,
+        rows: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        user_id: Optional[str] = None
+    ) -> int:
+        """
+        Append records with PostgreSQL ``COPY``
+        
+        For append-only tables such as market prices: asyncpg streams the
+        rows in binary COPY format, which is much cheaper than INSERT for
+        backfills, but nothing is returned and any conflict fails the whole
+        call. COPY only applies server defaults, so Python-side column
+        defaults are filled in here; fields missing from a row are NULL
+        otherwise. Runs on the session's connection inside its transaction;
+        with other drivers it falls back to ``bulk_insert``.
+        """
+        data = [self._insert_data(row, user_id) for row in rows]
+        if not data:
+            return 0
+        
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        if not hasattr(driver_connection, 'copy_records_to_table'):
+            return await self.bulk_insert(db, rows=data, returning=False)
+        
+        keys = list(dict.fromkeys(key for row in data for key in row))
+        columns = [self._column(key) for key in keys]
+        given = {column.name for column in columns}
+        defaulted = [
+            column for column in self.model.__table__.c
+            if column.default is not None and column.name not in given
+        ]
+        fallbacks = {key: column for key, column in zip(keys, columns) if column.default is not None}
+        
+        records = [
+            tuple(
+                row[key] if key in row else (
+                    self._default_value(fallbacks[key]) if key in fallbacks else None
+                )
+                for key in keys
+            ) + tuple(self._default_value(column) for column in defaulted)
+            for row in data
+        ]
+        await driver_connection.copy_records_to_table(
+            self.model.__table__.name,
+            records=records,
+            columns=[column.name for column in columns + defaulted],
+            schema_name=self.model.__table__.schema
+        )
+        return len(records)
+    
+    def _insert_data(
+        self,
+        obj_in: Union[CreateSchemaType, Dict[str, Any]],
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Column values for a new record, with audit fields set"""
+        if isinstance(obj_in, dict):
+            obj_in_data = dict(obj_in)
+        else:
+            obj_in_data = obj_in.dict() if hasattr(obj_in, 'dict') else dict(obj_in.__dict__)
         
-        for db_obj in db_obj_list:
-            await db.refresh(db_obj)
+        # Set audit fields if user_id provided
+        if user_id:
+            obj_in_data['created_by'] = user_id
         
-        return db_obj_list
+        return obj_in_data
+    
+    def _column(self, field: str) -> Column:
+        """Table column behind a model attribute (names differ for renamed columns)"""
+        column = self.model.__table__.c.get(field)
+        return column if column is not None else getattr(self.model, field).expression
+    
+    @staticmethod
+    def _default_value(column: Column) -> Any:
+        default = column.default
+        return default.arg(None) if default.is_callable else default.arg
+    
+    def _insert_statement(
+        self,
+        rows: List[Dict[str, Any]],
+        on_conflict: Optional[str],
+        conflict_fields: Optional[List[str]],
+        update_fields: Optional[List[str]],
+        merge: Optional[Dict[str, Union[str, Callable[[Any, Any], Any]]]] = None
+    ):
+        """Multi-row INSERT for one chunk of rows, with its ON CONFLICT clause"""
+        stmt = pg_insert(self.model).values(rows)
+        index_elements = [self._column(field) for field in conflict_fields] if conflict_fields else None
+        
+        if on_conflict == "nothing":
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        elif on_conflict == "update":
+            fields = update_fields or [
+                field for field in rows[0]
+                if field not in conflict_fields and field not in ('id', 'created_at', 'created_by')
+            ]
+            merge = merge or {}
+            set_ = {}
+            for field in fields:
+                rule = merge.get(field, "replace")
+                if rule == "keep":
+                    continue
+                column = self._column(field)
+                rule = rule if callable(rule) else MERGE_RULES[rule]
+                set_[column] = rule(column, stmt.excluded[column.key])
+            if 'updated_at' in self.model.__table__.c and 'updated_at' not in fields:
+                set_[self.model.__table__.c.updated_at] = func.now()
+            stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        
+        return stmt
     
     async def bulk_update(
         self,
@@ -364,34 +609,81 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         unique_fields: List[str],
         update_data: Union[UpdateSchemaType, Dict[str, Any]],
         defaults: Optional[Dict[str, Any]] = None,
+        merge: Optional[Dict[str, Union[str, Callable[[Any, Any], Any]]]] = None,
         user_id: Optional[str] = None
     ) -> ModelType:
-        """Upsert record based on unique fields"""
-        # Build query for existing record
-        conditions = []
-        for field in unique_fields:
-            if field in update_data:
-                conditions.append(getattr(self.model, field) == update_data[field])
+        """
+        Upsert record based on unique fields (see ``upsert_many``)
         
-        if not conditions:
+        Only fields set on an update schema are written, so an existing
+        record keeps the values of the fields left out.
+        """
+        if isinstance(update_data, dict):
+            record = dict(update_data)
+        else:
+            record = update_data.dict(exclude_unset=True)
+        
+        if not unique_fields or any(field not in record for field in unique_fields):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="At least one unique field must be provided"
+                detail="Every unique field must be provided"
             )
         
-        query = select(self.model).where(and_(*conditions))
-        result = await db.execute(query)
-        db_obj = result.scalar_one_or_none()
-        
-        if db_obj:
-            # Update existing record
-            return await self.update(db, db_obj=db_obj, obj_in=update_data, user_id=user_id)
-        else:
-            # Create new record
-            create_data = update_data.dict() if hasattr(update_data, 'dict') else update_data
-            if defaults:
-                create_data.update(defaults)
-            return await self.create(db, obj_in=create_data, user_id=user_id)
+        db_obj_list = await self.upsert_many(
+            db,
+            records=[record],
+            conflict_fields=unique_fields,
+            insert_only=defaults,
+            merge=merge,
+            user_id=user_id
+        )
+        return db_obj_list[0]
+    
+    async def upsert_many(
+        self,
+        db: AsyncSession,
+        *,
+        records: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        conflict_fields: List[str],
+        insert_only: Optional[Dict[str, Any]] = None,
+        merge: Optional[Dict[str, Union[str, Callable[[Any, Any], Any]]]] = None,
+        user_id: Optional[str] = None
+    ) -> List[ModelType]:
+        """
+        Insert records or update the existing ones, in one statement
+        
+        Uses ``INSERT ... ON CONFLICT (conflict_fields) DO UPDATE``, so the
+        conflict fields must match a unique constraint or index. ``merge``
+        maps a field to how the proposed value combines with the stored one:
+        ``"replace"`` (default), ``"keep"``, ``"coalesce"`` (replace unless
+        NULL), ``"add"``, ``"max"``, ``"min"``, or a callable taking the
+        current column and the proposed value and returning a SQL
+        expression. ``insert_only`` values are written only when a record is
+        created. Records repeating a conflict key are collapsed to the last
+        one, since one statement cannot update a row twice.
+        """
+        rows: Dict[tuple, Dict[str, Any]] = {}
+        for record in records:
+            row = self._insert_data(record, user_id)
+            if insert_only:
+                row.update(insert_only)
+            if user_id and 'updated_by' in self.model.__table__.c:
+                row['updated_by'] = user_id
+            rows[tuple(row.get(field) for field in conflict_fields)] = row
+        
+        if not rows:
+            return []
+        
+        merge = {**(merge or {}), **{field: "keep" for field in insert_only or {}}}
+        db_obj_list = await self.bulk_insert(
+            db,
+            rows=list(rows.values()),
+            on_conflict="update",
+            conflict_fields=conflict_fields,
+            merge=merge
+        )
+        await db.commit()
+        return db_obj_list
 
 # Utility functions for common database operations
 async def paginate_results(
@@ -399,18 +691,28 @@ async def paginate_results(
     query,
     page: int = 1,
     per_page: int = 20,
-    max_per_page: int = 100
+    max_per_page: int = 100,
+    approximate_count: bool = False
 ) -> tuple[List[Any], Dict[str, int]]:
-    """Paginate query results"""
+    """
+    Paginate query results
+    
+    OFFSET pages get slower the deeper they go; use ``paginate_keyset`` for
+    large tables. ``approximate_count`` takes the total from the planner's
+    estimate instead of a full COUNT(*).
+    """
     # Validate pagination parameters
     page = max(1, page)
     per_page = max(1, min(per_page, max_per_page))
     offset = (page - 1) * per_page
     
     # Get total count
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    if approximate_count:
+        total = await estimate_rows(db, query)
+    else:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
     
     # Get paginated results
     paginated_query = query.offset(offset).limit(per_page)
@@ -429,6 +731,94 @@ async def paginate_results(
         "has_prev": page > 1
     }
 
+async def paginate_keyset(
+    db: AsyncSession,
+    query,
+    *,
+    columns: Sequence[Any],
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    max_limit: int = 1000,
+    descending: bool = True
+) -> tuple[List[Any], Optional[str]]:
+    """
+    Paginate query results by seeking past a cursor
+    
+    ``columns`` are the model attributes to sort by, ending with a unique
+    tiebreaker such as the primary key; they should be NOT NULL and covered
+    by one index in that order. The query's own ordering is replaced.
+    Returns the page and the cursor for the next one, None on the last page.
+    """
+    limit = max(1, min(limit, max_limit))
+    
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        key = tuple_(*columns)
+        position = tuple_(*[literal(value, column.type) for value, column in zip(values, columns)])
+        query = query.where(key < position if descending else key > position)
+    
+    order = [desc(column) if descending else asc(column) for column in columns]
+    result = await db.execute(query.order_by(None).order_by(*order).limit(limit + 1))
+    rows = result.scalars().all()
+    
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    
+    return items, next_cursor
+
+async def estimate_rows(db: AsyncSession, query) -> int:
+    """Planner's row estimate for a query, from table statistics instead of a scan"""
+    connection = await db.connection()
+    sql = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+# Cursor value encodings: tag -> (type, decoder); values of other types are stored as-is
+_CURSOR_TYPES = {
+    "dt": (datetime, datetime.fromisoformat),
+    "d": (date, date.fromisoformat),
+    "uuid": (UUID, UUID),
+    "dec": (Decimal, Decimal),
+}
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque, URL-safe cursor holding a row's sort key"""
+    encoded = []
+    for value in values:
+        for tag, (value_type, _) in _CURSOR_TYPES.items():
+            if isinstance(value, value_type):
+                encoded.append([tag, value.isoformat() if tag in ("dt", "d") else str(value)])
+                break
+        else:
+            encoded.append(["v", value])
+    
+    payload = json.dumps(encoded, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Sort key from a cursor made by ``encode_cursor``"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return [
+            value if tag == "v" else _CURSOR_TYPES[tag][1](value)
+            for tag, value in json.loads(payload)
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
 async def apply_filters(
     query,
     model,
@@ -455,5 +845,9 @@ async def apply_filters(
 __all__ = [
     "CRUDBase",
     "paginate_results", 
+    "paginate_keyset",
+    "estimate_rows",
+    "encode_cursor",
+    "decode_cursor",
     "apply_filters"
 ]
\ No newline at end of file
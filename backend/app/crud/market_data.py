@@ -1,17 +1,30 @@
 """
 CRUD operations for Market Data
 Handles database operations for real-time market price data
+
+Price ticks are written to and read from the ``market_data`` hypertable
+that the ingest pipeline fills, and price series from its OHLCV rollups,
+with zones normalised to their stored form by ``normalize_zone``.
 """
 
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Union
 from uuid import UUID
 
-from sqlalchemy import and_, desc, func, select
+from sqlalchemy import and_, delete, desc, func, insert, literal_column, select, union_all
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from .base import CRUDBase
+from .base import MAX_BIND_PARAMS, CRUDBase
+from .market_rollups import (
+    MARKET_DATA,
+    floor_time,
+    normalize_zone,
+    plan_granularity,
+    plan_resolution,
+    plan_window,
+)
 from ..models import MarketPrice
 from ..schemas import MarketDataCreate, MarketDataUpdate, MarketDataResponse
 
@@ -19,9 +32,15 @@ from ..schemas import MarketDataCreate, MarketDataUpdate, MarketDataResponse
 class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
     """CRUD operations for Market Data"""
     
-    async def create_market_data(self, db: AsyncSession, *, obj_in: MarketDataCreate, organization_id: Optional[UUID] = None) -> MarketPrice:
+    async def create_market_data(self, db: AsyncSession, *, obj_in: MarketDataCreate, organization_id: Optional[UUID] = None) -> Row:
         """Create new market data record"""
-        return await self.create(db, obj_in=obj_in)
+        
+        result = await db.execute(
+            insert(MARKET_DATA).values(self._market_data_values(obj_in)).returning(*MARKET_DATA.c)
+        )
+        record = result.first()
+        await db.commit()
+        return record
     
     async def get_by_market_zone_and_timestamp(
         self, 
@@ -30,33 +49,33 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
         limit: int = 100
-    ) -> List[MarketPrice]:
-        """Get market data by market zone and time range"""
+    ) -> List[Row]:
+        """Get raw market data ticks by market zone and time range, newest first"""
         
-        query = select(MarketPrice).where(
-            MarketPrice.market_zone == market_zone.lower()
+        query = select(MARKET_DATA).where(
+            MARKET_DATA.c.market_zone == normalize_zone(market_zone)
         )
         
         if start_time:
-            query = query.where(MarketPrice.timestamp >= start_time)
+            query = query.where(MARKET_DATA.c.timestamp >= start_time)
         
         if end_time:
-            query = query.where(MarketPrice.timestamp <= end_time)
+            query = query.where(MARKET_DATA.c.timestamp <= end_time)
         
-        query = query.order_by(desc(MarketPrice.timestamp)).limit(limit)
+        query = query.order_by(desc(MARKET_DATA.c.timestamp)).limit(limit)
         
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.all()
     
-    async def get_latest_by_market_zone(self, db: AsyncSession, market_zone: str) -> Optional[MarketPrice]:
+    async def get_latest_by_market_zone(self, db: AsyncSession, market_zone: str) -> Optional[Row]:
         """Get the most recent market data for a market zone"""
         
-        query = select(MarketPrice).where(
-            MarketPrice.market_zone == market_zone.lower()
-        ).order_by(desc(MarketPrice.timestamp)).limit(1)
+        query = select(MARKET_DATA).where(
+            MARKET_DATA.c.market_zone == normalize_zone(market_zone)
+        ).order_by(desc(MARKET_DATA.c.timestamp)).limit(1)
         
         result = await db.execute(query)
-        return result.scalar_one_or_none()
+        return result.first()
     
     async def get_price_history(
         self,
@@ -64,7 +83,7 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         market_zone: str,
         hours: int = 24,
         limit: int = 1000
-    ) -> List[MarketPrice]:
+    ) -> List[Row]:
         """Get price history for a market zone over specified hours"""
         
         end_time = datetime.utcnow()
@@ -81,14 +100,52 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         start_time: datetime,
         end_time: datetime
     ) -> Optional[float]:
-        """Get average price for a market zone over time period"""
-        
-        query = select(func.avg(MarketPrice.price)).where(
-            and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time
-            )
+        """
+        Get average price for a market zone over time period
+        
+        The window is planned into rollup segments (daily for the aligned
+        middle, finer levels and raw ticks for the edges) whose price sums
+        and counts are combined in one statement, so the result is exact.
+        """
+        
+        zone = normalize_zone(market_zone)
+        parts = []
+        # Timestamps are microsecond precision, so this keeps end_time inclusive
+        for rollup, start, end in plan_window(start_time, end_time + timedelta(microseconds=1)):
+            if rollup is None:
+                parts.append(
+                    select(
+                        func.sum(MARKET_DATA.c.price).label('price_sum'),
+                        func.count(MARKET_DATA.c.price).label('price_count')
+                    ).where(
+                        and_(
+                            MARKET_DATA.c.market_zone == zone,
+                            MARKET_DATA.c.timestamp >= start,
+                            MARKET_DATA.c.timestamp < end
+                        )
+                    )
+                )
+            else:
+                rollup_table = rollup.table
+                parts.append(
+                    select(
+                        func.sum(rollup_table.c.price_sum).label('price_sum'),
+                        func.sum(rollup_table.c.price_count).label('price_count')
+                    ).where(
+                        and_(
+                            rollup_table.c.market_zone == zone,
+                            rollup_table.c.bucket >= start,
+                            rollup_table.c.bucket < end
+                        )
+                    )
+                )
+        
+        if not parts:
+            return None
+        
+        segments = union_all(*parts).subquery()
+        query = select(
+            func.sum(segments.c.price_sum) / func.nullif(func.sum(segments.c.price_count), 0)
         )
         
         result = await db.execute(query)
@@ -96,53 +153,193 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         
         return float(avg_price) if avg_price else None
     
-    async def get_price_statistics(
+    async def get_price_candles(
         self,
         db: AsyncSession,
         market_zone: str,
+        start_time: datetime,
+        end_time: datetime,
+        granularity: timedelta = timedelta(hours=1),
+        location: Optional[str] = None,
+        price_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        OHLCV candles of ``granularity`` for a market zone, oldest first
+        
+        Candles are re-aggregated from the coarsest rollup whose buckets tile
+        the granularity (raw ticks below 5 minutes), so a month of hourly
+        candles reads about 720 rows per series. Without ``location`` and
+        ``price_type`` the zone's series are combined.
+        """
+        
+        rollup = plan_granularity(granularity)
+        if rollup is None:
+            source = MARKET_DATA
+            time_column = MARKET_DATA.c.timestamp
+            aggregates = [
+                func.first(source.c.price, time_column).label('open'),
+                func.max(source.c.price).label('high'),
+                func.min(source.c.price).label('low'),
+                func.last(source.c.price, time_column).label('close'),
+                func.sum(source.c.volume).label('volume'),
+                func.avg(source.c.price).label('average'),
+                func.count().label('record_count')
+            ]
+        else:
+            source = rollup.table
+            time_column = source.c.bucket
+            aggregates = [
+                func.first(source.c.open, time_column).label('open'),
+                func.max(source.c.high).label('high'),
+                func.min(source.c.low).label('low'),
+                func.last(source.c.close, time_column).label('close'),
+                func.sum(source.c.volume).label('volume'),
+                (func.sum(source.c.price_sum) / func.nullif(func.sum(source.c.price_count), 0)).label('average'),
+                func.sum(source.c.record_count).label('record_count')
+            ]
+        
+        # Inline interval so the select and GROUP BY render the same expression
+        interval = literal_column(f"INTERVAL '{int(granularity.total_seconds())} seconds'")
+        bucket = func.time_bucket(interval, time_column)
+        conditions = [
+            source.c.market_zone == normalize_zone(market_zone),
+            time_column >= floor_time(start_time, granularity),
+            time_column < end_time
+        ]
+        if location:
+            conditions.append(source.c.location == location)
+        if price_type:
+            conditions.append(source.c.price_type == price_type)
+        
+        query = select(bucket.label('bucket'), *aggregates).where(
+            and_(*conditions)
+        ).group_by(bucket).order_by(bucket)
+        
+        result = await db.execute(query)
+        
+        return [
+            {
+                'timestamp': row.bucket,
+                'open': float(row.open) if row.open is not None else None,
+                'high': float(row.high) if row.high is not None else None,
+                'low': float(row.low) if row.low is not None else None,
+                'close': float(row.close) if row.close is not None else None,
+                'volume': float(row.volume) if row.volume is not None else 0.0,
+                'average': float(row.average) if row.average is not None else None,
+                'count': int(row.record_count)
+            }
+            for row in result.all()
+        ]
+    
+    async def get_zone_statistics(
+        self,
+        db: AsyncSession,
+        market_zones: Optional[Sequence[str]] = None,
         hours: int = 24
-    ) -> Dict[str, float]:
-        """Get price statistics for a market zone"""
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Price, volume and data quality statistics per market zone
+        
+        One grouped scan of the time window covers every requested zone (all
+        zones with data if none are given); the negative price count rides
+        along as a FILTER aggregate instead of a query of its own. Requested
+        zones without data in the window get zeroed statistics.
+        """
         
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=hours)
         
         query = select(
-            func.avg(MarketPrice.price),
-            func.min(MarketPrice.price),
-            func.max(MarketPrice.price),
-            func.stddev(MarketPrice.price),
-            func.count(MarketPrice.id)
+            MARKET_DATA.c.market_zone.label('market_zone'),
+            func.count().label('record_count'),
+            func.count(MARKET_DATA.c.price).label('price_count'),
+            func.avg(MARKET_DATA.c.price).label('avg_price'),
+            func.min(MARKET_DATA.c.price).label('min_price'),
+            func.max(MARKET_DATA.c.price).label('max_price'),
+            func.stddev(MARKET_DATA.c.price).label('stddev_price'),
+            func.count().filter(MARKET_DATA.c.price < 0).label('negative_count'),
+            func.sum(MARKET_DATA.c.volume).label('total_volume'),
+            func.avg(MARKET_DATA.c.volume).label('avg_volume'),
+            func.min(MARKET_DATA.c.volume).label('min_volume'),
+            func.max(MARKET_DATA.c.volume).label('max_volume')
         ).where(
             and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time
+                MARKET_DATA.c.timestamp >= start_time,
+                MARKET_DATA.c.timestamp <= end_time
             )
-        )
+        ).group_by(MARKET_DATA.c.market_zone)
+        
+        zones = [normalize_zone(zone) for zone in market_zones] if market_zones is not None else None
+        if zones is not None:
+            if not zones:
+                return {}
+            query = query.where(MARKET_DATA.c.market_zone.in_(zones))
         
         result = await db.execute(query)
-        row = result.first()
-        
-        if row and row[0] is not None:
-            return {
-                'average': float(row[0]),
-                'minimum': float(row[1]),
-                'maximum': float(row[2]),
-                'stddev': float(row[3]) if row[3] else 0.0,
-                'count': int(row[4]),
-                'time_period_hours': hours,
-                'market_zone': market_zone.lower()
+        rows = {row.market_zone: row for row in result.all()}
+        
+        return {
+            zone: self._zone_statistics(zone, rows.get(zone), hours)
+            for zone in (zones if zones is not None else rows)
+        }
+    
+    @staticmethod
+    def _zone_statistics(market_zone: str, row: Optional[Any], hours: int) -> Dict[str, Any]:
+        """Shape one get_zone_statistics row; ``row`` is None for a zone without data"""
+        
+        def number(name: str) -> float:
+            value = getattr(row, name, None)
+            return float(value) if value is not None else 0.0
+        
+        # Assuming 5-minute intervals = 12 records per hour
+        expected_records = int(hours * 12)
+        record_count = getattr(row, 'record_count', 0)
+        negative_count = getattr(row, 'negative_count', 0)
+        
+        return {
+            'market_zone': market_zone,
+            'time_period_hours': hours,
+            'prices': {
+                'average': number('avg_price'),
+                'minimum': number('min_price'),
+                'maximum': number('max_price'),
+                'stddev': number('stddev_price'),
+                'count': getattr(row, 'price_count', 0)
+            },
+            'volumes': {
+                'total_volume': number('total_volume'),
+                'average_volume': number('avg_volume'),
+                'min_volume': number('min_volume'),
+                'max_volume': number('max_volume')
+            },
+            'data_quality': {
+                'expected_records': expected_records,
+                'actual_records': record_count,
+                'completeness_percent': round(record_count / expected_records * 100, 2) if expected_records > 0 else 0,
+                'negative_price_count': negative_count,
+                'anomaly_rate_percent': round((negative_count / record_count * 100) if record_count > 0 else 0, 2)
             }
+        }
+    
+    async def get_price_statistics(
+        self,
+        db: AsyncSession,
+        market_zone: str,
+        hours: int = 24
+    ) -> Dict[str, float]:
+        """Get price statistics for a market zone"""
+        
+        statistics = (await self.get_zone_statistics(db, [market_zone], hours))[normalize_zone(market_zone)]
+        prices = statistics['prices']
         
         return {
-            'average': 0.0,
-            'minimum': 0.0,
-            'maximum': 0.0,
-            'stddev': 0.0,
-            'count': 0,
+            'average': prices['average'],
+            'minimum': prices['minimum'],
+            'maximum': prices['maximum'],
+            'stddev': prices['stddev'],
+            'count': statistics['data_quality']['actual_records'] if prices['count'] else 0,
             'time_period_hours': hours,
-            'market_zone': market_zone.lower()
+            'market_zone': normalize_zone(market_zone)
         }
     
     async def get_volume_statistics(
@@ -153,42 +350,12 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
     ) -> Dict[str, float]:
         """Get volume statistics for a market zone"""
         
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=hours)
-        
-        query = select(
-            func.sum(MarketPrice.volume),
-            func.avg(MarketPrice.volume),
-            func.min(MarketPrice.volume),
-            func.max(MarketPrice.volume)
-        ).where(
-            and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time
-            )
-        )
-        
-        result = await db.execute(query)
-        row = result.first()
-        
-        if row and row[0] is not None:
-            return {
-                'total_volume': float(row[0]),
-                'average_volume': float(row[1]),
-                'min_volume': float(row[2]),
-                'max_volume': float(row[3]),
-                'time_period_hours': hours,
-                'market_zone': market_zone.lower()
-            }
+        statistics = (await self.get_zone_statistics(db, [market_zone], hours))[normalize_zone(market_zone)]
         
         return {
-            'total_volume': 0.0,
-            'average_volume': 0.0,
-            'min_volume': 0.0,
-            'max_volume': 0.0,
+            **statistics['volumes'],
             'time_period_hours': hours,
-            'market_zone': market_zone.lower()
+            'market_zone': normalize_zone(market_zone)
         }
     
     async def get_recent_price_changes(
@@ -196,33 +363,45 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         db: AsyncSession,
         market_zone: str,
         hours: int = 1,
-        change_threshold: float = 5.0
+        change_threshold: float = 5.0,
+        granularity: Optional[timedelta] = None
     ) -> List[Dict[str, Any]]:
-        """Get recent significant price changes"""
+        """
+        Get recent significant price changes
         
-        # Get data for the specified time period
-        market_data = await self.get_price_history(db, market_zone, hours)
+        Compares consecutive candle closes from ``get_price_candles``. Unless
+        ``granularity`` is given, the finest rollup keeping the window within
+        1000 candles is used: 5 minutes for a day, hourly for a month.
+        """
         
-        if len(market_data) < 2:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=hours)
+        if granularity is None:
+            granularity = plan_resolution(start_time, end_time, 1000)
+        
+        candles = await self.get_price_candles(db, market_zone, start_time, end_time, granularity)
+        points = [
+            (candle['timestamp'], candle['close'], candle['volume'])
+            for candle in candles if candle['close'] is not None
+        ]
+        
+        if len(points) < 2:
             return []
         
         significant_changes = []
         
-        for i in range(1, len(market_data)):
-            current = market_data[i]
-            previous = market_data[i - 1]
-            
-            if previous.price > 0:
-                change_percent = ((current.price - previous.price) / previous.price) * 100
+        for (_, previous_price, _), (timestamp, price, volume) in zip(points, points[1:]):
+            if previous_price > 0:
+                change_percent = ((price - previous_price) / previous_price) * 100
                 
                 if abs(change_percent) >= change_threshold:
                     significant_changes.append({
-                        'timestamp': current.timestamp.isoformat(),
-                        'previous_price': previous.price,
-                        'current_price': current.price,
+                        'timestamp': timestamp.isoformat(),
+                        'previous_price': previous_price,
+                        'current_price': price,
                         'change_percent': round(change_percent, 2),
-                        'change_absolute': current.price - previous.price,
-                        'volume': current.volume,
+                        'change_absolute': price - previous_price,
+                        'volume': volume,
                         'change_type': 'increase' if change_percent > 0 else 'decrease'
                     })
         
@@ -233,28 +412,72 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         
         cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
         
-        query = MarketPrice.timestamp < cutoff_date
-        deleted_count = await self.delete_where(db, query)
+        result = await db.execute(delete(MARKET_DATA).where(MARKET_DATA.c.timestamp < cutoff_date))
+        await db.commit()
         
-        return deleted_count
+        return result.rowcount
     
-    async def bulk_create_market_data(self, db: AsyncSession, data_list: List[MarketDataCreate]) -> List[MarketPrice]:
+    async def bulk_create_market_data(self, db: AsyncSession, data_list: List[MarketDataCreate]) -> List[Row]:
         """Create multiple market data records in bulk"""
         
-        created_records = []
+        values = [self._market_data_values(data) for data in data_list]
+        chunk_size = MAX_BIND_PARAMS // len(MARKET_DATA.c)
         
-        for data in data_list:
-            record = await self.create(db, obj_in=data)
-            created_records.append(record)
+        created_records = []
+        for start in range(0, len(values), chunk_size):
+            result = await db.execute(
+                insert(MARKET_DATA).values(values[start:start + chunk_size]).returning(*MARKET_DATA.c)
+            )
+            created_records.extend(result.all())
         
         await db.commit()
         return created_records
 
+    async def bulk_insert_market_data(
+        self,
+        db: AsyncSession,
+        rows: Sequence[Union[MarketDataCreate, Dict[str, Any]]]
+    ) -> int:
+        """
+        Append many market data rows with COPY
+        
+        Unlike bulk_create_market_data this does not load the new records
+        back and leaves the commit to the caller, so ingest can decide when a
+        batch is durable. Falls back to an executemany INSERT on drivers
+        without COPY support.
+        """
+        
+        values = [self._market_data_values(row) for row in rows]
+        if not values:
+            return 0
+        
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        if hasattr(driver_connection, 'copy_records_to_table'):
+            await driver_connection.copy_records_to_table(
+                MARKET_DATA.name,
+                records=[tuple(row.values()) for row in values],
+                columns=[column.name for column in MARKET_DATA.c]
+            )
+        else:
+            await db.execute(insert(MARKET_DATA), values)
+        return len(values)
+
+    @staticmethod
+    def _market_data_values(obj_in: Union[MarketDataCreate, Dict[str, Any]]) -> Dict[str, Any]:
+        """``market_data`` columns of a record, in table order, with the zone in stored form"""
+        
+        data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        values = {column.name: data.get(column.name) for column in MARKET_DATA.c}
+        values['market_zone'] = normalize_zone(values['market_zone'])
+        return values
+
     async def get_market_zones_summary(self, db: AsyncSession) -> List[Dict[str, Any]]:
         """Get summary for all market zones"""
         
-        query = select(MarketPrice.market_zone, func.max(MarketPrice.timestamp), func.count(MarketPrice.id))
-        query = query.group_by(MarketPrice.market_zone)
+        query = select(MARKET_DATA.c.market_zone, func.max(MARKET_DATA.c.timestamp), func.count())
+        query = query.group_by(MARKET_DATA.c.market_zone)
         
         result = await db.execute(query)
         rows = result.all()
@@ -281,107 +504,53 @@ class CRUDMarketData(CRUDBase[MarketPrice, MarketDataCreate, MarketDataUpdate]):
         limit: int = 1000,
         sort_by: str = "timestamp",
         sort_order: str = "desc"
-    ) -> List[MarketPrice]:
-        """Get market data with comprehensive filters"""
+    ) -> List[Row]:
+        """Get raw market data ticks with comprehensive filters"""
         
-        query = select(MarketPrice)
+        query = select(MARKET_DATA)
         
         if market_zone:
-            query = query.where(MarketPrice.market_zone == market_zone.lower())
+            query = query.where(MARKET_DATA.c.market_zone == normalize_zone(market_zone))
         
         if price_type:
-            query = query.where(MarketPrice.price_type == price_type)
+            query = query.where(MARKET_DATA.c.price_type == price_type)
         
         if location:
-            query = query.where(MarketPrice.location.ilike(f"%{location}%"))
+            query = query.where(MARKET_DATA.c.location.ilike(f"%{location}%"))
         
         if start_time:
-            query = query.where(MarketPrice.timestamp >= start_time)
+            query = query.where(MARKET_DATA.c.timestamp >= start_time)
         
         if end_time:
-            query = query.where(MarketPrice.timestamp <= end_time)
+            query = query.where(MARKET_DATA.c.timestamp <= end_time)
         
         # Apply sorting
+        sort_column = MARKET_DATA.c[sort_by]
         if sort_order.lower() == "asc":
-            query = query.order_by(getattr(MarketPrice, sort_by).asc())
+            query = query.order_by(sort_column.asc())
         else:
-            query = query.order_by(getattr(MarketPrice, sort_by).desc())
+            query = query.order_by(sort_column.desc())
         
         query = query.limit(limit)
         
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.all()
 
     async def get_data_quality_metrics(self, db: AsyncSession, market_zone: str, hours: int = 24) -> Dict[str, Any]:
         """Get data quality metrics for a market zone"""
         
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=hours)
-        
-        # Get total expected records (assuming 5-minute intervals = 288 records per day)
-        expected_records = int(hours * 12)  # 12 records per hour (every 5 minutes)
-        
-        # Get actual records
-        actual_query = select(func.count(MarketPrice.id)).where(
-            and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time
-            )
-        )
-        
-        result = await db.execute(actual_query)
-        actual_records = result.scalar() or 0
-        
-        # Calculate completeness
-        completeness = (actual_records / expected_records * 100) if expected_records > 0 else 0
-        
-        # Get price range and validation
-        price_query = select(
-            func.min(MarketPrice.price),
-            func.max(MarketPrice.price),
-            func.avg(MarketPrice.price),
-            func.stddev(MarketPrice.price)
-        ).where(
-            and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time,
-                MarketPrice.price.isnot(None)
-            )
-        )
-        
-        price_result = await db.execute(price_query)
-        price_stats = price_result.first()
-        
-        # Check for negative prices (anomaly)
-        negative_query = select(func.count(MarketPrice.id)).where(
-            and_(
-                MarketPrice.market_zone == market_zone.lower(),
-                MarketPrice.timestamp >= start_time,
-                MarketPrice.timestamp <= end_time,
-                MarketPrice.price < 0
-            )
-        )
-        
-        negative_result = await db.execute(negative_query)
-        negative_count = negative_result.scalar() or 0
+        statistics = (await self.get_zone_statistics(db, [market_zone], hours))[normalize_zone(market_zone)]
+        prices = statistics['prices']
         
         return {
-            "market_zone": market_zone.lower(),
+            "market_zone": normalize_zone(market_zone),
             "time_period_hours": hours,
-            "data_quality": {
-                "expected_records": expected_records,
-                "actual_records": actual_records,
-                "completeness_percent": round(completeness, 2),
-                "negative_price_count": negative_count,
-                "anomaly_rate_percent": round((negative_count / actual_records * 100) if actual_records > 0 else 0, 2)
-            },
+            "data_quality": statistics['data_quality'],
             "price_statistics": {
-                "min_price": float(price_stats[0]) if price_stats[0] is not None else 0.0,
-                "max_price": float(price_stats[1]) if price_stats[1] is not None else 0.0,
-                "avg_price": float(price_stats[2]) if price_stats[2] is not None else 0.0,
-                "price_volatility": float(price_stats[3]) if price_stats[3] is not None else 0.0
+                "min_price": prices['minimum'],
+                "max_price": prices['maximum'],
+                "avg_price": prices['average'],
+                "price_volatility": prices['stddev']
             }
         }
 
@@ -0,0 +1,163 @@
+"""
+OptiBid Energy Platform - Market Price Rollups
+Rollup catalogue and query planning for market price history
+
+Prices land in the ``market_data`` hypertable; 5-minute, hourly and daily
+OHLCV rollups per zone, location and price type are kept as TimescaleDB
+continuous aggregates (see TimescaleMarketDataStore). The planner here picks
+the coarsest source that answers a query exactly, so long windows read a few
+hundred rollup rows instead of every tick.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import column, table
+
+# Raw ticks, as written by the ingest pipeline; zones are MarketZone values (e.g. "PJM")
+MARKET_DATA = table(
+    "market_data",
+    column("timestamp"),
+    column("market_zone"),
+    column("price_type"),
+    column("location"),
+    column("price"),
+    column("volume"),
+    column("congestion_cost"),
+    column("loss_cost"),
+    column("renewable_percentage"),
+    column("load_forecast"),
+)
+
+
+@dataclass(frozen=True)
+class PriceRollup:
+    """One rollup level: a continuous aggregate with ``bucket``-wide rows"""
+    name: str
+    bucket: timedelta
+    source: str
+    # Refresh policy: buckets between now - start offset and now - end offset
+    # are re-materialized every interval; rows older than that need an
+    # explicit refresh (see TimescaleMarketDataStore.refresh_rollups)
+    refresh_start_offset: timedelta
+    refresh_end_offset: timedelta
+    refresh_interval: timedelta
+
+    @property
+    def table(self):
+        return table(
+            self.name,
+            column("bucket"),
+            column("market_zone"),
+            column("price_type"),
+            column("location"),
+            column("open"),
+            column("high"),
+            column("low"),
+            column("close"),
+            column("price_sum"),
+            column("price_count"),
+            column("volume"),
+            column("record_count"),
+        )
+
+
+# Finest first; each level is aggregated from the one before it
+PRICE_ROLLUPS: Tuple[PriceRollup, ...] = (
+    PriceRollup(
+        "market_data_5m", timedelta(minutes=5), "market_data",
+        timedelta(hours=1), timedelta(minutes=5), timedelta(minutes=1)
+    ),
+    PriceRollup(
+        "market_data_1h", timedelta(hours=1), "market_data_5m",
+        timedelta(hours=6), timedelta(hours=1), timedelta(minutes=15)
+    ),
+    PriceRollup(
+        "market_data_1d", timedelta(days=1), "market_data_1h",
+        timedelta(days=3), timedelta(days=1), timedelta(hours=1)
+    ),
+)
+
+# A window segment read from one source; ``rollup`` is None for raw ticks
+Segment = Tuple[Optional[PriceRollup], datetime, datetime]
+
+
+def normalize_zone(market_zone: Union[str, Enum]) -> str:
+    """Market zone as stored in ``market_data`` and its rollups ("pjm" -> "PJM")"""
+    if isinstance(market_zone, Enum):
+        market_zone = market_zone.value
+    return str(market_zone).upper()
+
+
+def floor_time(value: datetime, bucket: timedelta) -> datetime:
+    """Start of the UTC-aligned bucket holding ``value``"""
+    epoch = datetime(1970, 1, 1, tzinfo=value.tzinfo)
+    return value - (value - epoch) % bucket
+
+
+def ceil_time(value: datetime, bucket: timedelta) -> datetime:
+    floored = floor_time(value, bucket)
+    return floored if floored == value else floored + bucket
+
+
+def plan_granularity(granularity: timedelta) -> Optional[PriceRollup]:
+    """Coarsest rollup whose buckets tile ``granularity``; None means raw ticks"""
+    for rollup in reversed(PRICE_ROLLUPS):
+        if rollup.bucket <= granularity and granularity % rollup.bucket == timedelta(0):
+            return rollup
+    return None
+
+
+def plan_resolution(start: datetime, end: datetime, max_points: int) -> timedelta:
+    """
+    Finest rollup bucket giving at most ``max_points`` buckets over
+    ``[start, end)``; windows too long even for daily buckets get a multiple
+    of a day
+    """
+    span = max(end - start, timedelta(0))
+    for rollup in PRICE_ROLLUPS:
+        if span <= rollup.bucket * max_points:
+            return rollup.bucket
+    day = PRICE_ROLLUPS[-1].bucket
+    return day * -(-span // (day * max_points))
+
+
+def plan_window(start: datetime, end: datetime) -> List[Segment]:
+    """
+    Split ``[start, end)`` into segments answerable exactly, coarsest first
+
+    The coarsest level covers the longest aligned stretch in the middle and
+    the partial buckets at either edge fall through to finer levels, down to
+    raw ticks for the sub-5-minute remainders. A month reads about 30 daily
+    rows plus at most a couple of hundred finer ones.
+    """
+    def split(low: datetime, high: datetime, levels: Tuple[PriceRollup, ...]) -> List[Segment]:
+        if low >= high:
+            return []
+        for index, rollup in enumerate(levels):
+            aligned_start, aligned_end = ceil_time(low, rollup.bucket), floor_time(high, rollup.bucket)
+            if aligned_start < aligned_end:
+                finer = levels[index + 1:]
+                return (
+                    split(low, aligned_start, finer)
+                    + [(rollup, aligned_start, aligned_end)]
+                    + split(aligned_end, high, finer)
+                )
+        return [(None, low, high)]
+
+    return split(start, end, tuple(reversed(PRICE_ROLLUPS)))
+
+
+__all__ = [
+    "MARKET_DATA",
+    "PriceRollup",
+    "PRICE_ROLLUPS",
+    "normalize_zone",
+    "floor_time",
+    "ceil_time",
+    "plan_granularity",
+    "plan_resolution",
+    "plan_window",
+]
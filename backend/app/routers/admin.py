@@ -15,6 +15,7 @@ from ..services.rbac_service import RBACService, RoleType, PermissionType
 from ..services.admin_service import AdminService, FeatureFlag, FeatureFlagStatus, SystemHealth, AuditLog, AdminConfig, ThemeConfig
 from ..services.billing_service import BillingService, BillingPlan, Subscription, Invoice, UsageRecord
 from ..services.usage_tracking_service import UsageTrackingService, QuotaStatus
+from ..services.redis_cache import redis_cache
 
 # Initialize router
 admin_router = APIRouter(prefix="/admin", tags=["Admin Panel"])
@@ -100,12 +101,7 @@ async def get_services(
     admin_service = AdminService(db, rbac_service, billing_service)
     await admin_service.initialize()
     
-    # Note: Redis pool would be injected in real implementation
-    # For now, we'll mock it
-    from unittest.mock import MagicMock
-    redis_pool = MagicMock()
-    
-    usage_tracking_service = UsageTrackingService(db, redis_pool, billing_service)
+    usage_tracking_service = UsageTrackingService(db, redis_cache, billing_service)
     await usage_tracking_service.initialize()
     
     return {
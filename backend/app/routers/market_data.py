@@ -4,6 +4,8 @@ Provides RESTful APIs for market data access, queries, and analytics
 """
 
 import asyncio
+import base64
+import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from uuid import UUID
@@ -14,6 +16,7 @@ from pydantic import BaseModel, Field
 
 from ..services.market_data_integration import market_data_service, MarketPrice, MarketZone
 from ..services.kafka_consumer_service import market_data_stream_manager
+from ..services.wire_format import MarketDataWireCodec, WireEncoding, negotiate_encoding
 from ..core.database import get_db
 from ..crud.market_data import market_data_crud
 
@@ -34,6 +37,17 @@ class MarketPriceResponse(BaseModel):
     load_forecast: Optional[float] = None
 
 
+class PriceCandleResponse(BaseModel):
+    timestamp: datetime
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    close: Optional[float] = None
+    average: Optional[float] = None
+    volume: float
+    count: int
+
+
 class MarketMetricsResponse(BaseModel):
     market_zone: str
     current_price: float
@@ -94,7 +108,7 @@ async def get_market_data_health():
     """Health check for market data services"""
     try:
         # Check Kafka connection
-        consumer_stats = await market_data_stream_manager.consumers.get("market_data_processor-0", {}).get_processing_stats() if market_data_stream_manager.consumers else {}
+        consumer_stats = market_data_stream_manager.get_consumer_group_stats()
         
         return {
             "status": "healthy",
@@ -248,6 +262,39 @@ async def query_price_data(
         raise HTTPException(status_code=500, detail=f"Error querying price data: {str(e)}")
 
 
+GRANULARITY_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+MAX_CANDLES = 10000
+
+
+@router.get("/prices/candles", response_model=List[PriceCandleResponse])
+async def get_price_candles(
+    market_zone: MarketZone,
+    start_time: datetime = Query(..., description="Start of the window"),
+    end_time: Optional[datetime] = Query(None, description="End of the window (default now)"),
+    granularity: str = Query("1h", pattern="^[1-9][0-9]*[mhd]$", description="Candle width, e.g. 5m, 1h, 1d"),
+    location: Optional[str] = Query(None, description="Filter by location/node"),
+    price_type: Optional[str] = Query(None, description="Filter by price type (RT_LMP, DA_LMP)"),
+    db = Depends(get_db)
+):
+    """OHLCV price candles, read from the 5-minute, hourly or daily rollups"""
+    width = timedelta(**{GRANULARITY_UNITS[granularity[-1]]: int(granularity[:-1])})
+    end_time = end_time or datetime.utcnow()
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if (end_time - start_time) / width > MAX_CANDLES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CANDLES} candles per request")
+    
+    try:
+        candles = await market_data_crud.get_price_candles(
+            db, market_zone.value, start_time, end_time, width,
+            location=location, price_type=price_type
+        )
+        return [PriceCandleResponse(**candle) for candle in candles]
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting price candles: {str(e)}")
+
+
 @router.get("/metrics/current", response_model=Dict[str, MarketMetricsResponse])
 async def get_current_metrics(
     market_zone: Optional[MarketZone] = Query(None, description="Filter by market zone")
@@ -419,25 +466,54 @@ async def get_backfill_status(job_id: str):
 
 
 @router.get("/stream/real-time")
-async def stream_real_time_data(market_zone: Optional[MarketZone] = Query(None)):
-    """Stream real-time market data via Server-Sent Events"""
+async def stream_real_time_data(
+    market_zone: Optional[MarketZone] = Query(None),
+    encoding: Optional[str] = Query(None, description="Wire encoding: json (default), msgpack or columnar")
+):
+    """
+    Stream real-time market data via Server-Sent Events
+    
+    JSON events are unchanged. Binary encodings are sent base64-encoded as
+    ``msgpack`` or ``columnar`` events. Each stream has its own columnar
+    symbol table, so zone/location ids arrive in the first frame using them.
+    """
+    wire_encoding, _ = negotiate_encoding(requested=encoding)
+    
     try:
         async def generate_stream():
+            codec = MarketDataWireCodec()
+            
             async for price_data in market_data_service.stream_real_time_data():
                 # Filter by market zone if specified
                 if market_zone and price_data.market_zone != market_zone:
                     continue
                 
-                # Format as SSE
-                data_dict = {
-                    'timestamp': price_data.timestamp.isoformat(),
+                if wire_encoding == WireEncoding.JSON:
+                    # Format as SSE
+                    data_dict = {
+                        'timestamp': price_data.timestamp.isoformat(),
+                        'market_zone': price_data.market_zone.value,
+                        'price_type': price_data.price_type,
+                        'location': price_data.location,
+                        'price': price_data.price,
+                        'volume': price_data.volume
+                    }
+                    yield f"data: {json.dumps(data_dict)}\n\n"
+                    continue
+                
+                frame = codec.encode({
+                    'type': 'price_update',
+                    'timestamp': price_data.timestamp,
                     'market_zone': price_data.market_zone.value,
                     'price_type': price_data.price_type,
                     'location': price_data.location,
                     'price': price_data.price,
                     'volume': price_data.volume
-                }
-                yield f"data: {json.dumps(data_dict)}\n\n"
+                }, wire_encoding)
+                if isinstance(frame, str):
+                    yield f"data: {frame}\n\n"
+                else:
+                    yield f"event: {wire_encoding.value}\ndata: {base64.b64encode(frame).decode('ascii')}\n\n"
         
         return StreamingResponse(
             generate_stream(),
@@ -96,16 +96,25 @@ async def get_cache_health(
 
 @router.post("/cache/invalidate")
 async def invalidate_cache_pattern(
-    pattern: str,
+    pattern: Optional[str] = None,
+    tags: Optional[List[str]] = Query(None),
     cache_service: PerformanceCacheService = Depends(get_cache_service)
 ):
-    """Invalidate cache entries matching pattern"""
+    """Invalidate cache entries by tag (e.g. zone:PJM) or, more slowly, by key pattern"""
+    if not pattern and not tags:
+        raise HTTPException(status_code=400, detail="Provide a pattern or at least one tag")
+    
     try:
-        count = await cache_service.invalidate_pattern(pattern)
+        count = 0
+        if tags:
+            count += await cache_service.invalidate_tags(tags)
+        if pattern:
+            count += await cache_service.invalidate_pattern(pattern)
         return JSONResponse({
             "status": "success",
             "data": {
                 "pattern": pattern,
+                "tags": tags,
                 "invalidated_count": count
             },
             "timestamp": datetime.utcnow().isoformat()
@@ -16,6 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..core.database import get_db
 from ..services.websocket_manager import WebSocketHandler, manager, WebSocketBroadcaster
 from ..services.redis_cache import redis_cache
+from ..services.wire_format import negotiate_encoding
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -27,6 +28,7 @@ async def market_data_websocket(
     websocket: WebSocket, 
     market_zone: str,
     token: Optional[str] = Query(default=None, description="JWT token for authentication"),
+    encoding: Optional[str] = Query(default=None, description="Wire encoding: json (default), msgpack or columnar"),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -35,6 +37,7 @@ async def market_data_websocket(
     Args:
         market_zone: Target market zone (e.g., 'pjm', 'caiso', 'ercot')
         token: Optional JWT token for user authentication
+        encoding: Optional wire encoding; an ``optibid.v1.*`` subprotocol takes precedence
     """
     
     # Validate market zone
@@ -52,9 +55,14 @@ async def market_data_websocket(
         except Exception as e:
             logger.warning(f"WebSocket authentication failed: {e}")
     
+    # Negotiate the wire encoding
+    wire_encoding, subprotocol = negotiate_encoding(websocket.scope.get('subprotocols', []), encoding)
+    
     # Handle WebSocket connection
     try:
-        await WebSocketHandler.handle_market_data_connection(websocket, market_zone.lower(), user_id)
+        await WebSocketHandler.handle_market_data_connection(
+            websocket, market_zone.lower(), user_id, encoding=wire_encoding, subprotocol=subprotocol
+        )
         
     except WebSocketDisconnect:
         logger.info(f"WebSocket client disconnected from {market_zone}")
@@ -55,6 +55,17 @@ class PaginatedResponse(BaseModel):
     items: List[Any] = Field(..., description="List of items")
     pagination: PaginationResponse = Field(..., description="Pagination information")
 
+class CursorPaginationResponse(BaseModel):
+    """Cursor pagination response schema"""
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, absent on the last page")
+    limit: int = Field(..., description="Items per page")
+    estimated_total: Optional[int] = Field(None, description="Planner estimate of the total number of items")
+
+class CursorPaginatedResponse(BaseModel):
+    """Generic cursor paginated response"""
+    items: List[Any] = Field(..., description="List of items")
+    pagination: CursorPaginationResponse = Field(..., description="Pagination information")
+
 # Authentication schemas
 class Token(BaseModel):
     """Token response schema"""
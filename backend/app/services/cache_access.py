@@ -0,0 +1,169 @@
+"""
+Cache Access Statistics
+
+Sampled, in-memory hit counters for the performance cache. Hits are counted
+locally without touching Redis and flushed periodically as one pipelined
+batch into shared sorted sets, so hot-key reporting covers every node.
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AccessStats:
+    """
+    Sampled per-key hit counts plus exact per-tier totals
+
+    Each hit is sampled with probability ``sample_rate``, so recording costs a
+    random draw and, for sampled hits, a dict increment; estimates are the
+    sampled count scaled back up. At most ``max_keys`` keys are tracked: past
+    that the least-hit half is dropped, which keeps the popular keys (the
+    only ones hot-key reporting needs). Local counts are halved after each
+    flush so popularity ages out.
+
+    The shared counts age the same way: flushes add to a sorted set per
+    ``decay_interval`` that expires after ``decay_windows`` intervals, and
+    the ranking in ``HOT_KEYS`` is rebuilt with ZUNIONSTORE weighting each
+    older interval by half, so yesterday's hot keys fall off the top.
+    """
+
+    # Hash tag keeps the ranking and its interval sets in one cluster slot
+    HOT_KEYS = "cache:access:{hot}"
+
+    def __init__(
+        self,
+        sample_rate: float = 0.1,
+        max_keys: int = 10000,
+        flush_interval: float = 30.0,
+        decay_interval: float = 300.0,
+        decay_windows: int = 6
+    ):
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        self.sample_rate = sample_rate
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self.decay_interval = decay_interval
+        self.decay_windows = decay_windows
+        self.is_running = False
+
+        self._counts: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self._tier_hits: Dict[str, int] = {}
+        self._client = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {
+            'sampled_hits': 0,
+            'flushes': 0,
+            'flush_failures': 0
+        }
+
+    def record(self, key: str, tier: str):
+        """Count a cache hit served from ``tier``"""
+        self._tier_hits[tier] = self._tier_hits.get(tier, 0) + 1
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        self.stats['sampled_hits'] += 1
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._pending[key] = self._pending.get(key, 0) + 1
+        if len(self._counts) > self.max_keys:
+            self._prune()
+
+    def estimate(self, key: str) -> int:
+        """Estimated recent hits for a key"""
+        return round(self._counts.get(key, 0) / self.sample_rate)
+
+    def hot_keys(self, prefix: str = "", limit: int = 100) -> List[str]:
+        """Most hit keys starting with ``prefix``, hottest first"""
+        counts = ((key, count) for key, count in self._counts.items() if key.startswith(prefix))
+        return [key for key, _ in heapq.nlargest(limit, counts, key=lambda item: item[1])]
+
+    def _prune(self):
+        keep = heapq.nlargest(self.max_keys // 2, self._counts.items(), key=lambda item: item[1])
+        self._counts = dict(keep)
+        self._pending = {key: count for key, count in self._pending.items() if key in self._counts}
+
+    async def start(self, client=None):
+        """Flush to ``client`` (a Redis client, if any) every ``flush_interval`` seconds"""
+        if self.is_running:
+            return
+        self._client = client
+        self.is_running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        self._client = None
+
+    async def flush(self, now: Optional[float] = None):
+        """Add the hits sampled since the last flush to the shared sorted sets, then age local counts"""
+        pending, self._pending = self._pending, {}
+        if self._client is not None and pending:
+            interval = int((time.time() if now is None else now) // self.decay_interval)
+            current = self._interval_key(interval)
+            try:
+                pipe = self._client.pipeline(transaction=False)
+                for key, count in pending.items():
+                    pipe.zincrby(current, round(count / self.sample_rate), key)
+                pipe.zremrangebyrank(current, 0, -(self.max_keys + 1))
+                pipe.expire(current, int(self.decay_interval * self.decay_windows))
+                # Re-rank over the live intervals, each older one at half weight;
+                # expired intervals are missing and count as empty
+                pipe.zunionstore(self.HOT_KEYS, {
+                    self._interval_key(interval - age): 0.5 ** age
+                    for age in range(self.decay_windows)
+                })
+                pipe.zremrangebyrank(self.HOT_KEYS, 0, -(self.max_keys + 1))
+                pipe.expire(self.HOT_KEYS, int(self.decay_interval * self.decay_windows))
+                await pipe.execute()
+                self.stats['flushes'] += 1
+            except Exception as e:
+                self.stats['flush_failures'] += 1
+                logger.warning(f"Failed to flush cache access stats for {len(pending)} keys: {e}")
+
+        self._counts = {key: count >> 1 for key, count in self._counts.items() if count > 1}
+
+    def _interval_key(self, interval: int) -> str:
+        return f"{self.HOT_KEYS}:{interval}"
+
+    async def shared_hot_keys(self, limit: int = 100) -> List[str]:
+        """Most hit keys across every node, recent intervals weighted highest"""
+        if self._client is None:
+            return self.hot_keys(limit=limit)
+        try:
+            return list(await self._client.zrevrange(self.HOT_KEYS, 0, limit - 1))
+        except Exception as e:
+            logger.warning(f"Failed to read shared cache access stats: {e}")
+            return self.hot_keys(limit=limit)
+
+    async def _flush_loop(self):
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'sample_rate': self.sample_rate,
+            'tracked_keys': len(self._counts),
+            'pending_keys': len(self._pending),
+            'tier_hits': dict(self._tier_hits),
+            'hot_keys': [
+                {'key': key, 'estimated_hits': self.estimate(key)}
+                for key in self.hot_keys(limit=top)
+            ]
+        }
@@ -0,0 +1,265 @@
+"""
+Cache Value Codecs
+
+Serialization and compression for cached values. Every encoded value starts
+with a small header naming its serializer and compression, so any codec can
+decode a value written by any other and the codec for a key namespace can be
+changed without flushing the cache.
+"""
+
+import json
+import pickle
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+
+class Serializer(IntEnum):
+    """Serializer recorded in the value header"""
+    PICKLE = 1
+    JSON = 2
+    ORJSON = 3
+    MSGPACK = 4
+
+
+class Compression(IntEnum):
+    """Compression recorded in the value header"""
+    NONE = 0
+    ZLIB = 1
+    ZSTD = 2
+    LZ4 = 3
+
+
+# b"OC", format version, serializer, compression
+HEADER = struct.Struct("!2sBBB")
+MAGIC = b"OC"
+FORMAT_VERSION = 1
+
+
+class CodecError(ValueError):
+    """Raised when a cached value cannot be decoded"""
+
+
+def serializer_available(serializer: Serializer) -> bool:
+    if serializer == Serializer.MSGPACK:
+        return msgpack is not None
+    if serializer == Serializer.ORJSON:
+        return orjson is not None
+    return True
+
+
+def compression_available(compression: Compression) -> bool:
+    if compression == Compression.ZSTD:
+        return zstandard is not None
+    if compression == Compression.LZ4:
+        return lz4_frame is not None
+    return True
+
+
+def _dumps(serializer: Serializer, value: Any) -> bytes:
+    if serializer == Serializer.MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    if serializer == Serializer.ORJSON:
+        return orjson.dumps(value)
+    if serializer == Serializer.JSON:
+        return json.dumps(value, separators=(",", ":"), allow_nan=True).encode()
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(serializer: Serializer, payload: bytes) -> Any:
+    if serializer == Serializer.MSGPACK:
+        if msgpack is None:
+            raise CodecError("msgpack is required to decode this cache value")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    if serializer == Serializer.ORJSON:
+        # orjson output is plain JSON
+        return orjson.loads(payload) if orjson is not None else json.loads(payload)
+    if serializer == Serializer.JSON:
+        return json.loads(payload)
+    return pickle.loads(payload)
+
+
+def _compress(compression: Compression, payload: bytes, level: Optional[int]) -> bytes:
+    if compression == Compression.ZSTD:
+        return zstandard.ZstdCompressor(level=level or 3).compress(payload)
+    if compression == Compression.LZ4:
+        return lz4_frame.compress(payload, compression_level=level or 0)
+    return zlib.compress(payload, level or 6)
+
+
+def _decompress(compression: Compression, payload: bytes) -> bytes:
+    if compression == Compression.NONE:
+        return payload
+    if compression == Compression.ZLIB:
+        return zlib.decompress(payload)
+    if compression == Compression.ZSTD:
+        if zstandard is None:
+            raise CodecError("zstandard is required to decode this cache value")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+    if compression == Compression.LZ4:
+        if lz4_frame is None:
+            raise CodecError("lz4 is required to decode this cache value")
+        return lz4_frame.decompress(payload)
+    raise CodecError(f"Unknown cache compression {compression}")
+
+
+class CacheCodec:
+    """
+    Serializer plus optional compression for one kind of cached value
+
+    Payloads larger than ``compression_threshold`` are compressed, and the
+    compressed form is kept only if it is actually smaller. Values the
+    structured serializers cannot represent (datetimes, models, tuples as map
+    keys) fall back to pickle; as with JSON, tuples come back as lists.
+    Unavailable optional libraries fall back to msgpack/json and zlib.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer = Serializer.MSGPACK,
+        compression: Compression = Compression.ZSTD,
+        compression_threshold: int = 1024,
+        compression_level: Optional[int] = None
+    ):
+        if not serializer_available(serializer):
+            serializer = Serializer.MSGPACK if msgpack is not None else Serializer.JSON
+        if compression != Compression.NONE and not compression_available(compression):
+            compression = Compression.LZ4 if compression_available(Compression.LZ4) else Compression.ZLIB
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+
+    def encode(self, value: Any) -> bytes:
+        """Header plus serialized (and possibly compressed) value"""
+        serializer = self.serializer
+        try:
+            payload = _dumps(serializer, value)
+        except (TypeError, ValueError, OverflowError):
+            serializer = Serializer.PICKLE
+            payload = _dumps(serializer, value)
+
+        compression = Compression.NONE
+        if self.compression != Compression.NONE and len(payload) > self.compression_threshold:
+            compressed = _compress(self.compression, payload, self.compression_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                compression = self.compression
+
+        return HEADER.pack(MAGIC, FORMAT_VERSION, serializer, compression) + payload
+
+    @staticmethod
+    def decode(data: bytes) -> Any:
+        """Decode a value written by any ``CacheCodec``"""
+        return decode_value(data)
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheCodec({self.serializer.name.lower()}, {self.compression.name.lower()}, "
+            f"threshold={self.compression_threshold})"
+        )
+
+
+def decode_value(data: bytes) -> Any:
+    """Read the header and undo the compression and serialization it names"""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if len(data) < HEADER.size or data[:2] != MAGIC:
+        raise CodecError("Cache value has no codec header")
+
+    _, version, serializer, compression = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise CodecError(f"Unsupported cache value format version {version}")
+
+    try:
+        serializer = Serializer(serializer)
+        compression = Compression(compression)
+    except ValueError as e:
+        raise CodecError(str(e)) from e
+
+    return _loads(serializer, _decompress(compression, data[HEADER.size:]))
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Rough in-memory footprint of a value, for L1 byte budgets
+
+    Walks containers iteratively and sums ``sys.getsizeof``; shared objects
+    are counted once. Much cheaper than serializing just to measure.
+    """
+    total = 0
+    seen = set()
+    stack: List[Any] = [value]
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+
+    return total
+
+
+@dataclass(frozen=True)
+class CodecPolicy:
+    """How values in one key namespace are cached"""
+    codec: CacheCodec
+    # Keep the Python object itself in L1 instead of its encoded bytes
+    store_live: bool = True
+
+
+class CodecRegistry:
+    """
+    Codec selection by key namespace
+
+    A key uses the policy of the longest registered prefix it starts with,
+    falling back to the default policy.
+    """
+
+    def __init__(self, default: Optional[CodecPolicy] = None):
+        self.default = default or CodecPolicy(CacheCodec())
+        self._prefixes: List[Tuple[str, CodecPolicy]] = []
+
+    def register(self, prefix: str, codec: CacheCodec, store_live: bool = True):
+        self._prefixes = [(p, policy) for p, policy in self._prefixes if p != prefix]
+        self._prefixes.append((prefix, CodecPolicy(codec, store_live)))
+        self._prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def policy_for(self, key: str) -> CodecPolicy:
+        for prefix, policy in self._prefixes:
+            if key.startswith(prefix):
+                return policy
+        return self.default
@@ -0,0 +1,285 @@
+"""
+Cache Invalidation Bus
+
+Broadcasts L1 invalidations between API instances so each node's in-memory
+cache drops entries that another node has overwritten or invalidated.
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from ..core.tasks import TaskSet
+
+logger = logging.getLogger(__name__)
+
+# Receives the events from one batch published by another node
+InvalidationHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class InvalidationBus(ABC):
+    """
+    Batched fan-out of invalidation events to every subscribed node
+
+    ``publish`` queues an event; every ``batch_interval`` seconds the queue is
+    sent as one message tagged with this node's id, and events for the same
+    key collapse into the newest one. Events are dicts with a ``version`` and
+    one of ``key``, ``tag`` or ``pattern``.
+
+    Versions come from a counter shared by every node on the bus rather than
+    from node clocks, so they order writes and invalidations across nodes
+    regardless of clock skew: writes and invalidations take a new version
+    (``next_version``), cache fills the current one when their load starts
+    (``current_version``), and an invalidation drops only entries stamped
+    with an older version. Subclasses implement the transport and counter.
+    """
+
+    def __init__(self, batch_interval: float = 0.05, max_batch_size: int = 500):
+        self.batch_interval = batch_interval
+        self.max_batch_size = max_batch_size
+        self.node_id = uuid4().hex
+        self.is_running = False
+
+        self._handlers: List[InvalidationHandler] = []
+        self._outbox: Dict[tuple, Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Flushes started early because the outbox filled up
+        self._early_flushes = TaskSet()
+        # Newest version seen; stands in for the shared counter while it is unreachable
+        self._last_version = 0
+        self.stats = {
+            'events_published': 0,
+            'batches_published': 0,
+            'events_received': 0,
+            'batches_received': 0
+        }
+
+    def subscribe(self, handler: InvalidationHandler):
+        self._handlers.append(handler)
+
+    async def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        if not await self._open():
+            self.is_running = False
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+        await self._early_flushes.wait()
+        await self.flush()
+        await self._close()
+
+    async def next_version(self) -> int:
+        """Version for a write or invalidation, newer than any handed out before"""
+        try:
+            version = await self._next_version()
+        except Exception as e:
+            logger.warning(f"Cache version counter unavailable, using local versions: {e}")
+            version = self._last_version + 1
+        self._observe(version)
+        return version
+
+    async def current_version(self) -> int:
+        """Newest version handed out so far, for stamping a cache fill as its load starts"""
+        try:
+            version = await self._current_version()
+        except Exception as e:
+            logger.warning(f"Cache version counter unavailable, using local versions: {e}")
+            version = self._last_version
+        self._observe(version)
+        return version
+
+    def _observe(self, version: int):
+        if version > self._last_version:
+            self._last_version = version
+
+    def publish(self, event: Dict[str, Any]):
+        """Queue an event for the next batch"""
+        if not self.is_running:
+            return
+
+        kind = 'key' if 'key' in event else 'tag' if 'tag' in event else 'pattern'
+        slot = (kind, event[kind])
+        queued = self._outbox.get(slot)
+        if queued is None or queued['version'] < event['version']:
+            self._outbox[slot] = event
+
+        if len(self._outbox) >= self.max_batch_size:
+            self._early_flushes.spawn(self.flush())
+
+    async def flush(self):
+        """Send everything queued as one message"""
+        if not self._outbox:
+            return
+
+        events, self._outbox = list(self._outbox.values()), {}
+        try:
+            await self._send({'origin': self.node_id, 'events': events})
+            self.stats['batches_published'] += 1
+            self.stats['events_published'] += len(events)
+        except Exception as e:
+            # Other nodes fall back to TTL expiry for these keys
+            logger.error(f"Failed to publish {len(events)} cache invalidations: {e}")
+
+    async def _deliver(self, envelope: Dict[str, Any]):
+        """Hand a batch from another node to the subscribed handlers"""
+        if envelope.get('origin') == self.node_id:
+            return
+
+        events = envelope.get('events', [])
+        for event in events:
+            self._observe(event.get('version', 0))
+        self.stats['batches_received'] += 1
+        self.stats['events_received'] += len(events)
+        for handler in self._handlers:
+            try:
+                await handler(events)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler failed: {e}")
+
+    async def _flush_loop(self):
+        while self.is_running:
+            await asyncio.sleep(self.batch_interval)
+            await self.flush()
+
+    @abstractmethod
+    async def _open(self) -> bool:
+        """Connect the transport; False leaves the bus disabled"""
+
+    @abstractmethod
+    async def _close(self):
+        """Disconnect the transport"""
+
+    @abstractmethod
+    async def _send(self, envelope: Dict[str, Any]):
+        """Deliver one batch to every other node"""
+
+    @abstractmethod
+    async def _next_version(self) -> int:
+        """Increment the shared version counter and return the new value"""
+
+    @abstractmethod
+    async def _current_version(self) -> int:
+        """Current value of the shared version counter"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'is_running': self.is_running,
+            'node_id': self.node_id,
+            'pending_events': len(self._outbox)
+        }
+
+
+class LocalInvalidationHub:
+    """In-process stand-in for a broker, shared by LocalInvalidationBus instances"""
+
+    def __init__(self):
+        self.buses: List["LocalInvalidationBus"] = []
+        self.version = 0
+
+    async def send(self, envelope: Dict[str, Any]):
+        for bus in list(self.buses):
+            await bus._deliver(envelope)
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """Bus whose nodes all live in this process, for tests and single-process runs"""
+
+    def __init__(self, hub: LocalInvalidationHub, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub
+
+    async def _open(self) -> bool:
+        self.hub.buses.append(self)
+        return True
+
+    async def _close(self):
+        if self in self.hub.buses:
+            self.hub.buses.remove(self)
+
+    async def _send(self, envelope: Dict[str, Any]):
+        await self.hub.send(envelope)
+
+    async def _next_version(self) -> int:
+        self.hub.version += 1
+        return self.hub.version
+
+    async def _current_version(self) -> int:
+        return self.hub.version
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Bus over a Redis pub/sub channel via RedisCacheService"""
+
+    CHANNEL = "cache:invalidate"
+    # One counter for the whole cluster; INCR is atomic, so versions never repeat
+    VERSION_KEY = "cache:invalidate:version"
+
+    def __init__(self, cache, poll_interval: float = 0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self._pubsub = None
+        self._listen_task: Optional[asyncio.Task] = None
+
+    async def _open(self) -> bool:
+        self._pubsub = self.cache.pubsub()
+        if self._pubsub is None:
+            logger.warning("Redis not connected, L1 cache invalidations stay local to this node")
+            return False
+
+        await self._pubsub.subscribe(self.CHANNEL)
+        self._listen_task = asyncio.create_task(self._listen_loop())
+        return True
+
+    async def _close(self):
+        if self._listen_task:
+            self._listen_task.cancel()
+            await asyncio.gather(self._listen_task, return_exceptions=True)
+            self._listen_task = None
+
+        try:
+            await self._pubsub.unsubscribe()
+            await self._pubsub.close()
+        except Exception as e:
+            logger.debug(f"Error closing cache invalidation subscription: {e}")
+        self._pubsub = None
+
+    async def _send(self, envelope: Dict[str, Any]):
+        await self.cache.publish(self.CHANNEL, envelope)
+
+    async def _next_version(self) -> int:
+        return int(await self.cache.redis_client.incr(self.VERSION_KEY))
+
+    async def _current_version(self) -> int:
+        return int(await self.cache.redis_client.get(self.VERSION_KEY) or 0)
+
+    async def _listen_loop(self):
+        while self.is_running:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=self.poll_interval
+                )
+                if message and message.get('type') == 'message':
+                    await self._deliver(json.loads(message['data']))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                await asyncio.sleep(1)
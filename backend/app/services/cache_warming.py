@@ -0,0 +1,454 @@
+"""
+Cache Warm-up Scheduler
+
+Pre-loads dashboard cache keys from their real data sources on cron-like
+schedules (including just before market open), choosing which keys to warm
+from access statistics and bounding its own load on the databases.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Loads the value for one cache key of a family
+KeyLoader = Callable[[str], Awaitable[Any]]
+
+
+def _parse_cron_field(spec: str, low: int, high: int) -> Set[int]:
+    """Values matched by one cron field: *, */n, a, a-b, a-b/n, and comma lists"""
+    values: Set[int] = set()
+    for part in spec.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = end = int(part)
+
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{spec}' (allowed {low}-{high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week), in UTC
+
+    Day of week runs 0-6 from Sunday. As in cron, when both day fields are
+    restricted a day matching either one is due.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_cron_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @classmethod
+    def before_market_open(cls, open_utc: str, lead_minutes: int = 15, weekdays: str = "1-5") -> "CronSchedule":
+        """Daily schedule lead_minutes ahead of an HH:MM UTC market open"""
+        hour, minute = (int(value) for value in open_utc.split(":"))
+        at = datetime(2000, 1, 1, hour, minute) - timedelta(minutes=lead_minutes)
+        return cls(f"{at.minute} {at.hour} * * {weekdays}")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First due minute strictly after ``after``"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+
+        while moment <= limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+    def __repr__(self) -> str:
+        return f"CronSchedule('{self.expression}')"
+
+
+@dataclass
+class WarmupFamily:
+    """A family of cache keys sharing a prefix, loader and TTL"""
+    name: str
+    key_prefix: str
+    loader: KeyLoader
+    ttl: int
+    # Keys to warm even without access history (e.g. every zone x timeframe)
+    candidate_keys: Callable[[], Iterable[str]] = lambda: ()
+    tags_for: Optional[Callable[[str], Iterable[str]]] = None
+    stale_ttl: int = 0
+    # Most keys warmed per run, hottest first
+    max_keys: int = 100
+    # Keys staying fresh longer than this are left alone
+    refresh_within: int = 60
+
+
+@dataclass
+class WarmupSchedule:
+    family: str
+    schedule: CronSchedule
+    next_run: datetime = field(default_factory=datetime.utcnow)
+
+
+class CacheWarmer:
+    """
+    Runs warm-up loaders for registered key families on schedules
+
+    Each run reloads the family's candidate keys plus its most accessed keys
+    (per the cache's access statistics) unless they stay fresh for a while
+    yet. Loads go through the cache's single-flight path, so warm-up shares
+    them with concurrent user requests, and a semaphore caps how many loaders
+    run at once across all families.
+    """
+
+    def __init__(self, cache_service, max_concurrency: Optional[int] = None):
+        self.cache_service = cache_service
+        self.max_concurrency = max_concurrency or settings.CACHE_WARMUP_MAX_CONCURRENCY
+        self.families: Dict[str, WarmupFamily] = {}
+        self.schedules: List[WarmupSchedule] = []
+        self.is_running = False
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            'runs': 0,
+            'keys_warmed': 0,
+            'failures': 0,
+            'last_run': None
+        }
+
+    def register_family(self, family: WarmupFamily):
+        self.families[family.name] = family
+
+    def schedule(self, family_name: str, schedule: CronSchedule, now: Optional[datetime] = None):
+        """Run a family's warm-up whenever ``schedule`` fires"""
+        if family_name not in self.families:
+            raise KeyError(f"Unknown warm-up family '{family_name}'")
+        now = now or datetime.utcnow()
+        self.schedules.append(WarmupSchedule(family_name, schedule, schedule.next_after(now)))
+
+    def select_keys(self, family: WarmupFamily) -> List[str]:
+        """Candidate keys, then the family's most accessed keys, up to max_keys"""
+        keys = list(dict.fromkeys(family.candidate_keys()))
+        hot = self.cache_service.get_hot_keys(prefix=family.key_prefix, limit=family.max_keys)
+        for key in hot:
+            if key not in keys:
+                keys.append(key)
+        return keys[:family.max_keys]
+
+    async def warm_family(self, family_name: str) -> int:
+        """Warm one family now; returns the number of keys loaded"""
+        family = self.families[family_name]
+        keys = self.select_keys(family)
+        results = await asyncio.gather(*[self._warm_key(family, key) for key in keys])
+
+        warmed = sum(results)
+        self.stats['runs'] += 1
+        self.stats['keys_warmed'] += warmed
+        self.stats['last_run'] = datetime.utcnow().isoformat()
+        logger.info(f"Cache warm-up '{family_name}' loaded {warmed}/{len(keys)} keys")
+        return warmed
+
+    async def warm_all(self) -> int:
+        warmed = 0
+        for family_name in self.families:
+            warmed += await self.warm_family(family_name)
+        return warmed
+
+    async def _warm_key(self, family: WarmupFamily, key: str) -> bool:
+        # Checked without counting an access, so warm-up does not make keys look hot
+        if self.cache_service.fresh_for(key) > family.refresh_within:
+            return False
+
+        async with self._semaphore:
+            try:
+                value = await self.cache_service.refresh(
+                    key,
+                    lambda: family.loader(key),
+                    ttl=family.ttl,
+                    stale_ttl=family.stale_ttl,
+                    tags=family.tags_for(key) if family.tags_for else None
+                )
+                return value is not None
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.warning(f"Cache warm-up failed for {key}: {e}")
+                return False
+
+    async def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Cache warmer started with {len(self.schedules)} schedules")
+
+    async def stop(self):
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while self.is_running:
+            if not self.schedules:
+                await asyncio.sleep(60)
+                continue
+
+            due = min(self.schedules, key=lambda entry: entry.next_run)
+            delay = (due.next_run - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                # Re-check at least every minute so new schedules are picked up
+                await asyncio.sleep(min(delay, 60))
+                continue
+
+            due.next_run = due.schedule.next_after(datetime.utcnow())
+            try:
+                await self.warm_family(due.family)
+            except Exception as e:
+                logger.error(f"Cache warm-up '{due.family}' failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'is_running': self.is_running,
+            'max_concurrency': self.max_concurrency,
+            'schedules': [
+                {
+                    'family': entry.family,
+                    'cron': entry.schedule.expression,
+                    'next_run': entry.next_run.isoformat()
+                }
+                for entry in self.schedules
+            ]
+        }
+
+
+# Loaders for the dashboard key families
+
+TIMEFRAME_HOURS = {"1h": 1, "4h": 4, "24h": 24, "1d": 24, "7d": 168, "30d": 720}
+
+
+async def load_market_data(key: str) -> Dict[str, Any]:
+    """dashboard:market_data:{zone}:{timeframe} -> price and volume statistics"""
+    from ..core.database import AsyncSessionLocal
+    from ..crud.market_data import market_data_crud
+    from ..crud.market_rollups import normalize_zone
+
+    *_, market_zone, timeframe = key.split(":")
+    hours = TIMEFRAME_HOURS.get(timeframe, 24)
+    async with AsyncSessionLocal() as db:
+        statistics = await market_data_crud.get_zone_statistics(db, [market_zone], hours)
+    zone_statistics = statistics[normalize_zone(market_zone)]
+    return {
+        "market_zone": market_zone,
+        "timeframe": timeframe,
+        "prices": zone_statistics["prices"],
+        "volumes": zone_statistics["volumes"],
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+
+async def load_market_summary(key: str) -> Dict[str, Any]:
+    """market:summary:{timeframe} -> per-zone freshness and statistics"""
+    from ..core.database import AsyncSessionLocal
+    from ..crud.market_data import market_data_crud
+    from ..crud.market_rollups import normalize_zone
+
+    timeframe = key.split(":")[-1]
+    hours = TIMEFRAME_HOURS.get(timeframe, 24)
+    async with AsyncSessionLocal() as db:
+        zones = await market_data_crud.get_market_zones_summary(db)
+        statistics = await market_data_crud.get_zone_statistics(
+            db, [zone["market_zone"] for zone in zones], hours
+        )
+    for zone in zones:
+        zone["prices"] = statistics[normalize_zone(zone["market_zone"])]["prices"]
+    return {"timeframe": timeframe, "zones": zones, "generated_at": datetime.utcnow().isoformat()}
+
+
+async def load_analytics_metrics(key: str) -> Dict[str, Any]:
+    """analytics:metrics:{timeframe}:{granularity} -> dashboard KPIs"""
+    from .advanced_analytics_service import get_analytics_service
+
+    timeframe = key.split(":")[-2]
+    analytics_service = await get_analytics_service()
+    return await analytics_service.get_dashboard_analytics(timeframe)
+
+
+async def load_user_dashboard(key: str) -> Optional[Dict[str, Any]]:
+    """dashboard:user:{user_id}:{dashboard_id} -> dashboard layout and widgets"""
+    from uuid import UUID
+
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from ..core.database import AsyncSessionLocal
+    from ..models import Dashboard
+
+    dashboard_id = UUID(key.split(":")[-1])
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Dashboard)
+            .options(selectinload(Dashboard.widgets))
+            .where(Dashboard.id == dashboard_id)
+        )
+        dashboard = result.scalar_one_or_none()
+
+    if dashboard is None:
+        return None
+    return {
+        "id": str(dashboard.id),
+        "name": dashboard.name,
+        "layout": dashboard.layout_config,
+        "widgets": [
+            {
+                "id": str(widget.id),
+                "name": widget.name,
+                "type": widget.widget_type.strip(),
+                "position": {
+                    "x": widget.position_x,
+                    "y": widget.position_y,
+                    "w": widget.width,
+                    "h": widget.height
+                },
+                "config": widget.configuration
+            }
+            for widget in dashboard.widgets
+        ]
+    }
+
+
+async def load_realtime_kpis(key: str) -> Dict[str, Any]:
+    """analytics:realtime_kpis:{window_minutes} -> ClickHouse KPIs for every zone"""
+    from .clickhouse_service import clickhouse_service
+    from .market_data_integration import MarketZone
+
+    window_minutes = int(key.split(":")[-1])
+    return await clickhouse_service.get_real_time_kpis(
+        [zone.value for zone in MarketZone], window_minutes
+    )
+
+
+def create_dashboard_warmer(cache_service) -> CacheWarmer:
+    """Warmer for the standard dashboard key families and schedules"""
+    from .market_data_integration import MarketZone
+    from .performance_cache_service import CacheTags, DashboardCacheKeys
+
+    zones = [zone.value for zone in MarketZone]
+    warmer = CacheWarmer(cache_service)
+
+    warmer.register_family(WarmupFamily(
+        name="market_data",
+        key_prefix="dashboard:market_data:",
+        loader=load_market_data,
+        ttl=300,
+        stale_ttl=300,
+        candidate_keys=lambda: [
+            DashboardCacheKeys.market_data(zone, timeframe)
+            for zone in zones for timeframe in ("1h", "24h")
+        ],
+        tags_for=lambda key: [CacheTags.zone(key.split(":")[-2])]
+    ))
+    warmer.register_family(WarmupFamily(
+        name="market_summary",
+        key_prefix="market:summary:",
+        loader=load_market_summary,
+        ttl=300,
+        stale_ttl=300,
+        candidate_keys=lambda: [DashboardCacheKeys.market_summary(tf) for tf in ("1h", "24h")]
+    ))
+    warmer.register_family(WarmupFamily(
+        name="analytics_metrics",
+        key_prefix="analytics:metrics:",
+        loader=load_analytics_metrics,
+        ttl=3600,
+        stale_ttl=900,
+        candidate_keys=lambda: [
+            DashboardCacheKeys.analytics_metrics("1d", "1h"),
+            DashboardCacheKeys.analytics_metrics("7d", "1d")
+        ]
+    ))
+    warmer.register_family(WarmupFamily(
+        name="user_dashboards",
+        key_prefix="dashboard:user:",
+        loader=load_user_dashboard,
+        ttl=1800,
+        stale_ttl=600,
+        # Only dashboards users have actually been opening
+        tags_for=lambda key: [CacheTags.dashboard(key.split(":")[-1])],
+        max_keys=200
+    ))
+    warmer.register_family(WarmupFamily(
+        name="realtime_kpis",
+        key_prefix="analytics:realtime_kpis:",
+        loader=load_realtime_kpis,
+        ttl=60,
+        stale_ttl=60,
+        candidate_keys=lambda: [DashboardCacheKeys.realtime_kpis(60)]
+    ))
+
+    pre_open = CronSchedule.before_market_open(
+        settings.CACHE_WARMUP_MARKET_OPEN_UTC, settings.CACHE_WARMUP_LEAD_MINUTES
+    )
+    for family_name in warmer.families:
+        warmer.schedule(family_name, pre_open)
+    warmer.schedule("market_data", CronSchedule("*/5 * * * *"))
+    warmer.schedule("market_summary", CronSchedule("*/5 * * * *"))
+    warmer.schedule("analytics_metrics", CronSchedule("0 * * * *"))
+    warmer.schedule("realtime_kpis", CronSchedule("* * * * *"))
+    return warmer
+
+
+# Global warmer for the dashboard caches
+_cache_warmer: Optional[CacheWarmer] = None
+
+
+async def start_cache_warmer(cache_service) -> Optional[CacheWarmer]:
+    """Warm the dashboard caches on their schedules"""
+    global _cache_warmer
+
+    if not settings.CACHE_WARMUP_ENABLED:
+        return None
+    if _cache_warmer is None:
+        _cache_warmer = create_dashboard_warmer(cache_service)
+        await _cache_warmer.start()
+    return _cache_warmer
+
+
+async def stop_cache_warmer():
+    global _cache_warmer
+
+    if _cache_warmer:
+        await _cache_warmer.stop()
+        _cache_warmer = None
@@ -6,17 +6,21 @@ Handles consuming market data events and processing them
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+from kafka import KafkaConsumer, TopicPartition
+from kafka.errors import CommitFailedError, KafkaError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
+from ..core.config import settings
+from ..core.tracing import SpanContext, extract_context, kafka_record_attributes, tracer
 from ..schemas import MarketDataCreate
-from ..crud import market_data as crud_market_data
+from ..crud.market_data import market_data_crud
 
 logger = logging.getLogger(__name__)
 
@@ -24,11 +28,36 @@ logger = logging.getLogger(__name__)
 class KafkaConsumerService:
     """Kafka consumer for processing real-time market data"""
     
-    def __init__(self, bootstrap_servers: str = "localhost:9092", db_sessionmaker: Optional[sessionmaker] = None):
+    def __init__(
+        self,
+        bootstrap_servers: str = "localhost:9092",
+        db_sessionmaker: Optional[sessionmaker] = None,
+        batch_size: Optional[int] = None,
+        batch_window_ms: Optional[int] = None
+    ):
         self.bootstrap_servers = bootstrap_servers
         self.db_sessionmaker = db_sessionmaker
         self.consumer: Optional[KafkaConsumer] = None
         self.is_running = False
+        
+        # kafka-python blocks and is not thread-safe: its calls run on worker
+        # threads, one at a time, so the event loop keeps serving requests
+        self._consumer_lock = asyncio.Lock()
+        
+        # Micro-batching: flush after batch_size messages or batch_window_ms, whichever comes first
+        self.batch_size = batch_size or settings.KAFKA_CONSUMER_BATCH_SIZE
+        self.batch_window_ms = batch_window_ms or settings.KAFKA_CONSUMER_BATCH_WINDOW_MS
+        self.retry_backoff_seconds = 1.0
+        self.max_batch_attempts = settings.KAFKA_CONSUMER_MAX_BATCH_ATTEMPTS
+        # Consecutive failed writes of the batch at the consumer position
+        self._failed_attempts = 0
+        self.batch_stats = {
+            'batches_written': 0,
+            'rows_written': 0,
+            'messages_rejected': 0,
+            'batch_failures': 0,
+            'rows_skipped': 0
+        }
         self.topics = [
             "market_data.pjm", "market_data.caiso", "market_data.ercot", 
             "market_data.nyiso", "market_data.miso", "market_data.spp"
@@ -44,8 +73,9 @@ class KafkaConsumerService:
                 key_deserializer=lambda k: k.decode('utf-8') if k else None,
                 group_id='optibid_consumer_group',
                 auto_offset_reset='latest',
-                enable_auto_commit=True,
-                auto_commit_interval_ms=1000,
+                # Offsets are committed once a batch is durable in the database
+                enable_auto_commit=False,
+                max_poll_records=self.batch_size,
                 consumer_timeout_ms=1000
             )
             logger.info("Kafka consumer initialized successfully")
@@ -56,59 +86,150 @@ class KafkaConsumerService:
     
     async def process_message(self, message):
         """Process a single Kafka message"""
-        try:
-            topic = message.topic
-            key = message.key
-            value = message.value
-            
-            if not value:
-                logger.warning("Received empty message")
-                return
-            
-            logger.info(f"Processing message from {topic}: {value}")
-            
-            # Extract market zone from topic
-            market_zone = topic.split('.')[1] if '.' in topic else 'unknown'
+        await self.process_batch([message])
+    
+    async def process_batch(self, messages: List[Any], write_separately: bool = False) -> bool:
+        """
+        Process a micro-batch of Kafka messages
+        
+        Price updates are validated together and written with a single COPY
+        in one transaction (one transaction per row with
+        ``write_separately``). Returns False if the batch could not be made
+        durable, in which case its offsets must not be committed.
+        """
+        started_ns = time.time_ns()
+        price_updates: List[Tuple[Dict[str, Any], str]] = []
+        traced: List[Tuple[Any, SpanContext]] = []
+        
+        for message in messages:
+            parent = extract_context(getattr(message, 'headers', None))
+            if parent is not None and parent.sampled:
+                traced.append((message, parent))
             
-            # Process different event types
-            if value.get('event_type') == 'price_update':
-                await self._handle_price_update(value, market_zone)
-            elif value.get('event_type') == 'bid_update':
-                await self._handle_bid_update(value, market_zone)
-            elif value.get('event_type') == 'market_close':
-                await self._handle_market_close(value, market_zone)
-            else:
-                logger.warning(f"Unknown event type: {value.get('event_type')}")
+            try:
+                topic = message.topic
+                value = message.value
                 
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
+                if not value:
+                    logger.warning("Received empty message")
+                    continue
+                
+                # Extract market zone from topic
+                market_zone = topic.split('.')[1] if '.' in topic else 'unknown'
+                
+                # Process different event types
+                if value.get('event_type') == 'price_update':
+                    price_updates.append((value, market_zone))
+                elif value.get('event_type') == 'bid_update':
+                    await self._handle_bid_update(value, market_zone)
+                elif value.get('event_type') == 'market_close':
+                    await self._handle_market_close(value, market_zone)
+                else:
+                    logger.warning(f"Unknown event type: {value.get('event_type')}")
+                    
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
+        
+        durable = await self._handle_price_updates(price_updates, write_separately) if price_updates else True
+        
+        for message, parent in traced:
+            # One span per traced record, covering the batch write it was part of
+            tracer.record_span(
+                f"consume {message.topic}",
+                started_ns,
+                kind="consumer",
+                span_type="kafka",
+                parent=parent,
+                attributes={**kafka_record_attributes(message), "messaging.batch_size": len(messages)},
+                error_message=None if durable else "Batch write failed"
+            )
+        
+        return durable
     
-    async def _handle_price_update(self, data: Dict[str, Any], market_zone: str):
-        """Handle price update events"""
-        try:
-            if not self.db_sessionmaker:
-                logger.warning("No database sessionmaker available, skipping price update")
-                return
-            
-            async with self.db_sessionmaker() as session:
-                # Create market data record
+    def _validate_price_updates(self, price_updates: List[Tuple[Dict[str, Any], str]]) -> List[Dict[str, Any]]:
+        """Validate price update payloads, dropping (and counting) malformed ones"""
+        rows = []
+        
+        for data, market_zone in price_updates:
+            try:
+                timestamp = data['timestamp']
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                
                 market_data_in = MarketDataCreate(
-                    timestamp=datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00')) if isinstance(data['timestamp'], str) else data['timestamp'],
+                    timestamp=timestamp,
                     price=data['price'],
                     volume=data['volume'],
                     market_zone=market_zone,
                     asset_id=data.get('asset_id'),
                     event_type=data['event_type']
                 )
+                rows.append(market_data_in.dict(exclude_none=True))
                 
-                # Save to database
-                await crud_market_data.create(session, obj_in=market_data_in)
+            except (KeyError, TypeError, ValueError, ValidationError) as e:
+                self.batch_stats['messages_rejected'] += 1
+                logger.warning(f"Rejected invalid price update for {market_zone}: {e}")
+        
+        return rows
+    
+    async def _handle_price_updates(
+        self,
+        price_updates: List[Tuple[Dict[str, Any], str]],
+        write_separately: bool = False
+    ) -> bool:
+        """Write a batch of price update events in a single transaction"""
+        if not self.db_sessionmaker:
+            logger.warning("No database sessionmaker available, skipping price updates")
+            return True
+        
+        rows = self._validate_price_updates(price_updates)
+        if not rows:
+            return True
+        if write_separately:
+            return await self._write_rows_separately(rows)
+        
+        try:
+            async with self.db_sessionmaker() as session:
+                await market_data_crud.bulk_insert_market_data(session, rows)
                 await session.commit()
-                
-                logger.info(f"Price update saved for {market_zone}: {data['price']}")
-                
+            
         except Exception as e:
-            logger.error(f"Error handling price update: {e}")
+            self.batch_stats['batch_failures'] += 1
+            logger.error(f"Error writing price update batch of {len(rows)} rows: {e}")
+            return False
+        
+        self.batch_stats['batches_written'] += 1
+        self.batch_stats['rows_written'] += len(rows)
+        logger.info(f"Price update batch saved: {len(rows)} rows")
+        return True
+    
+    async def _write_rows_separately(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Write rows in a transaction each, skipping the ones the database rejects
+        
+        Returns False without skipping anything if no row could be written,
+        since then the database is more likely down than the rows bad.
+        """
+        rejected = []
+        for row in rows:
+            try:
+                async with self.db_sessionmaker() as session:
+                    await market_data_crud.bulk_insert_market_data(session, [row])
+                    await session.commit()
+            except Exception as e:
+                rejected.append((row, e))
+        
+        if len(rejected) == len(rows):
+            self.batch_stats['batch_failures'] += 1
+            logger.error(f"Error writing {len(rows)} price updates one by one: {rejected[0][1]}")
+            return False
+        
+        for row, error in rejected:
+            logger.error(f"Skipping price update rejected by the database: {row}: {error}")
+        self.batch_stats['rows_skipped'] += len(rejected)
+        self.batch_stats['batches_written'] += 1
+        self.batch_stats['rows_written'] += len(rows) - len(rejected)
+        return True
     
     async def _handle_bid_update(self, data: Dict[str, Any], market_zone: str):
         """Handle bid update events"""
@@ -127,7 +248,7 @@ class KafkaConsumerService:
             logger.error(f"Error handling market close: {e}")
     
     async def start_consuming(self):
-        """Start consuming messages from Kafka topics"""
+        """Start consuming messages from Kafka topics in micro-batches"""
         if not self.consumer:
             logger.error("Kafka consumer not initialized")
             return
@@ -135,17 +256,29 @@ class KafkaConsumerService:
         self.is_running = True
         logger.info("Starting Kafka consumer...")
         
+        batch: List[Any] = []
+        batch_deadline = 0.0
+        
         try:
             while self.is_running:
-                # Poll for messages with timeout
-                message_batch = self.consumer.poll(timeout_ms=1000)
+                # Poll only for as long as the open batch may still wait
+                if batch:
+                    timeout_ms = max(0, int((batch_deadline - time.monotonic()) * 1000))
+                else:
+                    timeout_ms = 1000
+                
+                message_batch = await self._call_consumer(
+                    self.consumer.poll, timeout_ms=timeout_ms, max_records=self.batch_size - len(batch)
+                )
                 
                 for topic_partition, messages in message_batch.items():
-                    for message in messages:
-                        await self.process_message(message)
-                        
-                # Small delay to prevent busy waiting
-                await asyncio.sleep(0.1)
+                    if messages and not batch:
+                        batch_deadline = time.monotonic() + self.batch_window_ms / 1000
+                    batch.extend(messages)
+                
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= batch_deadline):
+                    await self._flush_batch(batch)
+                    batch = []
                 
         except KafkaError as e:
             logger.error(f"Kafka consumer error: {e}")
@@ -154,6 +287,48 @@ class KafkaConsumerService:
         finally:
             await self.stop_consuming()
     
+    async def _flush_batch(self, batch: List[Any]):
+        """
+        Process a batch and commit its offsets, or rewind so it is redelivered
+        
+        A failed batch is retried from the same offsets. The last of
+        ``max_batch_attempts`` consecutive attempts writes its rows one by
+        one, skipping any the database rejects, so a bad row cannot hold up
+        its partitions; if even that writes nothing the attempts start over.
+        """
+        final_attempt = self._failed_attempts + 1 >= self.max_batch_attempts
+        if await self.process_batch(batch, write_separately=final_attempt):
+            self._failed_attempts = 0
+            # Everything polled so far is in this batch, so the consumer
+            # position is exactly the end of the batch
+            try:
+                await self._call_consumer(self.consumer.commit)
+            except CommitFailedError as e:
+                # The group rebalanced; the new assignment resumes from the last committed offsets
+                logger.warning(f"Could not commit offsets after a rebalance, batch will be redelivered: {e}")
+            return
+        
+        self._failed_attempts = 0 if final_attempt else self._failed_attempts + 1
+        
+        # Rewind each partition to the first message of the failed batch
+        first_offsets: Dict[TopicPartition, int] = {}
+        for message in batch:
+            topic_partition = TopicPartition(message.topic, message.partition)
+            first_offsets[topic_partition] = min(message.offset, first_offsets.get(topic_partition, message.offset))
+        for topic_partition, offset in first_offsets.items():
+            try:
+                await self._call_consumer(self.consumer.seek, topic_partition, offset)
+            except AssertionError:
+                # Revoked in a rebalance; its new owner resumes from the last committed offset
+                logger.warning(f"Not rewinding {topic_partition}, it is no longer assigned to this consumer")
+        
+        await asyncio.sleep(self.retry_backoff_seconds)
+    
+    async def _call_consumer(self, method, *args, **kwargs):
+        """Run a blocking consumer call off the event loop, never two at once"""
+        async with self._consumer_lock:
+            return await asyncio.to_thread(method, *args, **kwargs)
+    
     async def stop_consuming(self):
         """Stop consuming messages"""
         self.is_running = False
@@ -162,7 +337,8 @@ class KafkaConsumerService:
     async def close(self):
         """Close Kafka consumer connection"""
         if self.consumer:
-            self.consumer.close()
+            # Waits for an in-flight poll, which returns within its timeout
+            await self._call_consumer(self.consumer.close)
             logger.info("Kafka consumer closed")
 
 
@@ -4,18 +4,35 @@ Handles streaming market data processing, validation, and database storage
 """
 
 import asyncio
+import concurrent.futures
 import json
 import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List, Optional, Any, Callable
 from uuid import UUID
 
-from kafka import KafkaConsumer, KafkaProducer
+from kafka import KafkaConsumer, KafkaProducer, TopicPartition
 from kafka.admin import KafkaAdminClient, ConfigResource, ConfigResourceType
 from kafka.errors import KafkaError
+from kafka.structs import OffsetAndMetadata
 from pydantic import ValidationError
 
+from ..core.config import settings
+from ..core.database import async_engine
+from ..core.tracing import extract_context, kafka_record_attributes, tracer
+from .market_data_dedup import DuplicateIndex, dedup_key
 from .market_data_integration import MarketPrice, MarketZone
+from .market_data_metrics import RunningStats, ZoneMetricsAggregator
+from .redis_cache import RedisCacheService
+from .timescale_storage import TimescaleMarketDataStore
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +40,13 @@ logger = logging.getLogger(__name__)
 class MarketDataProcessor:
     """Processes and validates market data streams"""
     
-    def __init__(self):
+    def __init__(self, dedup_index: Optional[DuplicateIndex] = None, metrics_windows: Optional[List[float]] = None):
+        self.dedup_index = dedup_index or DuplicateIndex(
+            window_seconds=settings.MARKET_DATA_DEDUP_WINDOW_SECONDS,
+            max_memory_bytes=settings.MARKET_DATA_DEDUP_MAX_MEMORY_MB * 1024 * 1024
+        )
+        # Live per-zone metrics, updated on every accepted tick
+        self.metrics = ZoneMetricsAggregator(metrics_windows or ZoneMetricsAggregator.DEFAULT_WINDOWS)
         self.processing_stats = {
             'total_processed': 0,
             'validation_errors': 0,
@@ -87,94 +110,303 @@ class MarketDataProcessor:
             self.processing_stats['validation_errors'] += 1
             return None
     
-    def detect_duplicates(self, price_data: MarketPrice, recent_data: List[MarketPrice]) -> bool:
-        """Detect duplicate price records"""
-        for recent_price in recent_data[-10:]:  # Check last 10 records
-            if (recent_price.timestamp == price_data.timestamp and
-                recent_price.market_zone == price_data.market_zone and
-                recent_price.location == price_data.location and
-                abs(recent_price.price - price_data.price) < 0.01):  # Price within 1 cent
-                self.processing_stats['duplicate_records'] += 1
-                return True
+    def detect_duplicates(self, price_data: MarketPrice, recent_data: Optional[List[MarketPrice]] = None) -> bool:
+        """
+        Detect duplicate price records
+        
+        Checks the bounded dedup index keyed on zone, location, price type and
+        timestamp, and records the key. ``recent_data`` is no longer scanned.
+        """
+        if self.dedup_index.seen(dedup_key(price_data)):
+            self.processing_stats['duplicate_records'] += 1
+            return True
         return False
     
-    def calculate_metrics(self, prices: List[MarketPrice]) -> Dict[str, Any]:
-        """Calculate market metrics from price data"""
+    async def filter_duplicates(self, prices: List[MarketPrice]) -> List[MarketPrice]:
+        """Drop already-ingested prices from a batch (consults Redis when configured)"""
+        fresh = await self.dedup_index.filter_new(prices)
+        self.processing_stats['duplicate_records'] += len(prices) - len(fresh)
+        return fresh
+    
+    def record_price(self, price_data: MarketPrice):
+        """Fold an accepted tick into the live zone metrics"""
+        self.metrics.add(price_data)
+    
+    def calculate_metrics(self, prices: Optional[List[MarketPrice]] = None) -> Dict[str, Any]:
+        """
+        Calculate market metrics
+        
+        Without arguments this returns the live sliding-window metrics kept by
+        ``record_price``. Given a list, it computes metrics over exactly those
+        prices in a single pass.
+        """
+        if prices is None:
+            return self.metrics.snapshot()
         if not prices:
             return {}
         
-        # Group by market zone
-        zones = {}
-        for price in prices:
-            zone = price.market_zone.value
-            if zone not in zones:
-                zones[zone] = []
-            zones[zone].append(price)
+        aggregator = ZoneMetricsAggregator(windows=(float('inf'),))
+        aggregator.add_many(prices)
         
         metrics = {}
-        for zone, zone_prices in zones.items():
-            if zone_prices:
-                prices_only = [p.price for p in zone_prices]
-                volumes = [p.volume for p in zone_prices]
-                
-                metrics[zone] = {
-                    'current_price': zone_prices[-1].price if zone_prices else 0,
-                    'avg_price': sum(prices_only) / len(prices_only),
-                    'max_price': max(prices_only),
-                    'min_price': min(prices_only),
-                    'price_volatility': self._calculate_volatility(prices_only),
-                    'total_volume': sum(volumes),
-                    'avg_volume': sum(volumes) / len(volumes),
-                    'renewable_percentage': zone_prices[-1].renewable_percentage if zone_prices[-1].renewable_percentage else 0,
-                    'record_count': len(zone_prices),
-                    'timestamp': max(p.timestamp for p in zone_prices)
-                }
-        
+        for zone, zone_metrics in aggregator.snapshot().items():
+            zone_metrics.pop('windows')
+            metrics[zone] = zone_metrics
         return metrics
     
     def _calculate_volatility(self, prices: List[float]) -> float:
         """Calculate price volatility (standard deviation)"""
-        if len(prices) < 2:
-            return 0.0
+        stats = RunningStats()
+        for price in prices:
+            stats.add(price)
+        return stats.stddev
+
+
+class KafkaPollingThread:
+    """
+    Runs a kafka-python consumer on a dedicated thread
+    
+    kafka-python is blocking and not thread-safe, so the consumer is owned by
+    one thread that polls, commits and closes it. Polled batches are handed to
+    the event loop through a bounded asyncio queue; when the loop falls behind
+    the thread blocks on the hand-off instead of polling further (kafka-python
+    keeps the group session alive from its heartbeat thread meanwhile).
+    Offsets are committed only for batches the async side reports processed.
+    """
+    
+    def __init__(
+        self,
+        consumer: KafkaConsumer,
+        max_pending_batches: int = 8,
+        poll_timeout_ms: int = 1000,
+        max_records: int = 100,
+        handoff_timeout: float = 0.2
+    ):
+        self.consumer = consumer
+        self.max_pending_batches = max_pending_batches
+        self.poll_timeout_ms = poll_timeout_ms
+        self.max_records = max_records
+        self.handoff_timeout = handoff_timeout
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batches: Optional[asyncio.Queue] = None
+        self._commit_requests: "queue.SimpleQueue[Dict[TopicPartition, int]]" = queue.SimpleQueue()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            'batches_polled': 0,
+            'records_polled': 0,
+            'offset_commits': 0,
+            'backpressure_waits': 0
+        }
+        # Per "topic:partition": records polled and lag behind the high watermark
+        self.partition_stats: Dict[str, Dict[str, Any]] = {}
+    
+    @property
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    async def start(self):
+        """Start polling on the background thread"""
+        if self._thread is not None:
+            return
         
-        mean_price = sum(prices) / len(prices)
-        variance = sum((price - mean_price) ** 2 for price in prices) / len(prices)
-        return variance ** 0.5
+        self._loop = asyncio.get_running_loop()
+        self._batches = asyncio.Queue(maxsize=self.max_pending_batches)
+        self._thread = threading.Thread(target=self._run, name="kafka-poller", daemon=True)
+        self._thread.start()
+    
+    async def get_batch(self) -> Optional[Dict[TopicPartition, List[Any]]]:
+        """Next polled batch, or None once the poller has stopped"""
+        return await self._batches.get()
+    
+    def commit(self, message_batch: Dict[TopicPartition, List[Any]]):
+        """Mark a batch processed; its offsets are committed from the polling thread"""
+        offsets = {
+            topic_partition: messages[-1].offset + 1
+            for topic_partition, messages in message_batch.items()
+            if messages
+        }
+        if offsets:
+            self._commit_requests.put(offsets)
+    
+    async def stop(self, timeout: float = 10.0):
+        """Stop polling, commit processed offsets and close the consumer"""
+        self._stop_event.set()
+        
+        if self._thread is None:
+            self.consumer.close()
+            return
+        
+        await asyncio.to_thread(self._thread.join, timeout)
+        if self._thread.is_alive():
+            logger.warning("Kafka polling thread did not stop in time")
+        
+        # Wake a reader still waiting for a batch
+        if self._batches.empty():
+            self._batches.put_nowait(None)
+    
+    def _run(self):
+        """Polling thread body"""
+        try:
+            while not self._stop_event.is_set():
+                self._commit_processed()
+                
+                message_batch = self.consumer.poll(timeout_ms=self.poll_timeout_ms, max_records=self.max_records)
+                if not message_batch:
+                    continue
+                
+                self.stats['batches_polled'] += 1
+                self.stats['records_polled'] += sum(len(messages) for messages in message_batch.values())
+                self._track_partitions(message_batch)
+                self._hand_off(message_batch)
+                
+        except KafkaError as e:
+            logger.error(f"Kafka consumer error: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error in Kafka polling thread: {e}")
+        finally:
+            try:
+                self._commit_processed()
+            finally:
+                self.consumer.close()
+            
+            if not self._stop_event.is_set():
+                # Polling failed on its own; tell the reader the stream ended
+                self._hand_off(None)
+    
+    def get_partition_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of per-partition counters"""
+        return {partition: dict(stats) for partition, stats in list(self.partition_stats.items())}
+    
+    def _track_partitions(self, message_batch: Dict[TopicPartition, List[Any]]):
+        """Update per-partition record counts and lag (polling thread only)"""
+        for topic_partition, messages in message_batch.items():
+            if not messages:
+                continue
+            
+            key = f"{topic_partition.topic}:{topic_partition.partition}"
+            stats = self.partition_stats.get(key)
+            if stats is None:
+                stats = self.partition_stats[key] = {'records': 0, 'lag': None}
+            stats['records'] += len(messages)
+            
+            # High watermark as of the last fetch response for this partition
+            highwater = self.consumer.highwater(topic_partition)
+            if highwater is not None:
+                stats['lag'] = max(0, highwater - (messages[-1].offset + 1))
+    
+    def _hand_off(self, message_batch: Optional[Dict[TopicPartition, List[Any]]]) -> bool:
+        """Queue a batch on the event loop, blocking while the queue is full"""
+        future = asyncio.run_coroutine_threadsafe(self._batches.put(message_batch), self._loop)
+        waited = False
+        
+        while True:
+            try:
+                future.result(timeout=self.handoff_timeout)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._stop_event.is_set():
+                    future.cancel()
+                    return False
+                if not waited:
+                    waited = True
+                    self.stats['backpressure_waits'] += 1
+                # Keep committing what the loop finishes while we wait
+                self._commit_processed()
+    
+    def _commit_processed(self):
+        """Commit the offsets of batches reported processed"""
+        offsets: Dict[TopicPartition, int] = {}
+        while True:
+            try:
+                request = self._commit_requests.get_nowait()
+            except queue.Empty:
+                break
+            for topic_partition, offset in request.items():
+                offsets[topic_partition] = max(offset, offsets.get(topic_partition, 0))
+        
+        if not offsets:
+            return
+        
+        try:
+            self.consumer.commit({
+                topic_partition: OffsetAndMetadata(offset, '')
+                for topic_partition, offset in offsets.items()
+            })
+            self.stats['offset_commits'] += 1
+        except KafkaError as e:
+            # Uncommitted records are redelivered; processing is at-least-once
+            logger.error(f"Failed to commit Kafka offsets: {e}")
 
 
 class MarketDataKafkaConsumer:
     """Kafka consumer for market data streams"""
     
-    def __init__(self, bootstrap_servers: str = "localhost:9092", group_id: str = "market_data_processor"):
+    TOPICS = ('market_data.pjm', 'market_data.caiso', 'market_data.ercot')
+    
+    def __init__(
+        self,
+        bootstrap_servers: str = "localhost:9092",
+        group_id: str = "market_data_processor",
+        max_pending_batches: int = 8,
+        retry_backoff_seconds: float = 1.0,
+        max_retry_backoff_seconds: float = 30.0
+    ):
         self.bootstrap_servers = bootstrap_servers
         self.group_id = group_id
+        self.max_pending_batches = max_pending_batches
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
         self.consumer: Optional[KafkaConsumer] = None
         self.producer: Optional[KafkaProducer] = None
+        self.poller: Optional[KafkaPollingThread] = None
+        self._producer_executor: Optional[ThreadPoolExecutor] = None
         self.processor = MarketDataProcessor()
+        self.storage = TimescaleMarketDataStore(async_engine, on_drop=self._release_dropped)
         self.is_running = False
-        self.topics = ['market_data.pjm', 'market_data.caiso', 'market_data.ercot']
+        # Let stop_consuming interrupt flush retries and wait for process_market_data_stream
+        self._stop_requested = asyncio.Event()
+        self._stream_done: Optional[asyncio.Event] = None
+        self.topics = list(self.TOPICS)
         
-    async def initialize(self):
-        """Initialize Kafka consumer and producer"""
+    async def initialize(self, ensure_schema: bool = True):
+        """Initialize Kafka consumer and producer; ``ensure_schema=False`` skips the table DDL"""
         try:
-            # Initialize consumer
-            self.consumer = KafkaConsumer(
+            # Client construction talks to the brokers, so keep it off the event loop
+            self.consumer = await asyncio.to_thread(
+                KafkaConsumer,
                 *self.topics,
                 bootstrap_servers=self.bootstrap_servers,
                 group_id=self.group_id,
                 auto_offset_reset='latest',
-                enable_auto_commit=True,
-                auto_commit_interval_ms=5000,
+                # Offsets are committed by the poller once batches are processed
+                enable_auto_commit=False,
                 value_deserializer=lambda m: json.loads(m.decode('utf-8')) if m else None,
                 key_deserializer=lambda k: k.decode('utf-8') if k else None
             )
             
             # Initialize producer for processed data
-            self.producer = KafkaProducer(
+            self.producer = await asyncio.to_thread(
+                KafkaProducer,
                 bootstrap_servers=self.bootstrap_servers,
                 value_serializer=lambda v: json.dumps(v, default=str).encode('utf-8')
             )
             
+            self.poller = KafkaPollingThread(self.consumer, max_pending_batches=self.max_pending_batches)
+            
+            if settings.MARKET_DATA_DEDUP_USE_REDIS:
+                await self._connect_dedup_redis()
+            
+            if ensure_schema:
+                try:
+                    await self.storage.ensure_schema()
+                except Exception as e:
+                    logger.warning(f"Timescale schema setup failed, writing to existing table: {e}")
+            # send() can block on metadata and buffer space; give it its own thread
+            self._producer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-producer")
+            
+            self._stop_requested.clear()
             self.is_running = True
             logger.info(f"Kafka consumer initialized for topics: {self.topics}")
             
@@ -182,6 +414,15 @@ class MarketDataKafkaConsumer:
             logger.error(f"Failed to initialize Kafka consumer: {e}")
             raise
     
+    async def _connect_dedup_redis(self):
+        """Back the dedup index with Redis so all group members share one window"""
+        dedup_cache = RedisCacheService(settings.REDIS_URL)
+        try:
+            await dedup_cache.initialize()
+            self.processor.dedup_index.redis_cache = dedup_cache
+        except Exception as e:
+            logger.warning(f"Redis unavailable for dedup, using in-memory index only: {e}")
+    
     async def process_market_data_stream(self):
         """Process real-time market data from Kafka streams"""
         if not self.consumer:
@@ -189,15 +430,15 @@ class MarketDataKafkaConsumer:
             return
         
         logger.info("Starting market data stream processing...")
+        self._stream_done = asyncio.Event()
+        await self.poller.start()
         
         try:
             while self.is_running:
-                # Poll for messages
-                message_batch = self.consumer.poll(timeout_ms=1000, max_records=100)
-                
-                if not message_batch:
-                    await asyncio.sleep(1)
-                    continue
+                # Wait for the polling thread without blocking the event loop
+                message_batch = await self.poller.get_batch()
+                if message_batch is None or not self.is_running:
+                    break
                 
                 # Process each partition
                 for topic_partition, messages in message_batch.items():
@@ -208,13 +449,22 @@ class MarketDataKafkaConsumer:
                     
                     logger.debug(f"Processing {len(messages)} messages from {topic}")
                     
-                    # Process each message
+                    # Validate, then drop replays and redeliveries before any side effects
+                    validated = []
+                    traced_records = {}
                     for message in messages:
+                        price_data = self.processor.validate_price_data(message.value)
+                        if price_data:
+                            validated.append(price_data)
+                            if getattr(message, 'headers', None):
+                                traced_records[id(price_data)] = message
+                    
+                    # Process each message
+                    for price_data in await self.processor.filter_duplicates(validated):
                         try:
-                            # Validate and process the message
-                            price_data = self.processor.validate_price_data(message.value)
-                            
-                            if price_data:
+                            with self._processing_span(traced_records.get(id(price_data))):
+                                self.processor.record_price(price_data)
+                                
                                 # Store in database (implement database storage logic)
                                 await self._store_price_data(price_data)
                                 
@@ -223,32 +473,69 @@ class MarketDataKafkaConsumer:
                                 
                                 # Calculate and publish metrics
                                 await self._update_market_metrics(market_zone)
-                                
+                            
                         except Exception as e:
                             logger.error(f"Error processing message: {e}")
                             continue
                 
-                # Commit offsets
-                self.consumer.commit()
+                # Commit offsets, and mark prices as ingested, only once they are durable
+                if await self._flush_until_durable():
+                    await self.processor.dedup_index.commit()
+                    self.poller.commit(message_batch)
                 
         except KafkaError as e:
             logger.error(f"Kafka consumer error: {e}")
         except Exception as e:
             logger.error(f"Unexpected error in data processing: {e}")
+        finally:
+            self._stream_done.set()
+    
+    async def _flush_until_durable(self) -> bool:
+        """
+        Flush the storage buffer, retrying with backoff until it succeeds
+        
+        The next batch is not taken until then, so failed rows cannot pile
+        up past the buffer cap and no later batch commits offsets over them;
+        the polling thread blocks on its full hand-off queue meanwhile.
+        Returns False if the consumer was stopped first.
+        """
+        delay = self.retry_backoff_seconds
+        while not await self.storage.flush():
+            if not self.is_running:
+                return False
+            logger.warning(f"Market data flush failed, retrying in {delay:.0f}s")
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_retry_backoff_seconds)
+        return True
+    
+    def _release_dropped(self, prices: List[MarketPrice]):
+        """Let redeliveries of prices the store dropped unwritten through the dedup index"""
+        self.processor.dedup_index.release(dedup_key(price_data) for price_data in prices)
+    
+    @staticmethod
+    def _processing_span(message):
+        """Span continuing the producer's trace for one record, if it carried one"""
+        parent = extract_context(message.headers) if message is not None else None
+        if parent is None:
+            return nullcontext()
+        return tracer.start_span(
+            f"process {message.topic}",
+            kind="consumer",
+            span_type="kafka",
+            parent=parent,
+            attributes=kafka_record_attributes(message)
+        )
     
     async def _store_price_data(self, price_data: MarketPrice):
         """Store price data in database"""
         try:
-            # This would typically write to TimescaleDB
-            # For now, we'll just log the operation
+            # Buffered; the batch is written with one COPY when the poll batch completes
+            await self.storage.add(price_data)
             logger.debug(f"Storing price data: {price_data.market_zone.value} - ${price_data.price} at {price_data.location}")
             
-            # In production, implement:
-            # - PostgreSQL/TimescaleDB storage
-            # - Data partitioning by time
-            # - Retention policy management
-            # - Compression for historical data
-            
         except Exception as e:
             logger.error(f"Error storing price data: {e}")
     
@@ -267,7 +554,7 @@ class MarketDataKafkaConsumer:
                 'processing_time': datetime.now().isoformat()
             }
             
-            self.producer.send(topic, value=message)
+            await self._send(topic, message)
             logger.debug(f"Published processed data to {topic}")
             
         except KafkaError as e:
@@ -276,30 +563,47 @@ class MarketDataKafkaConsumer:
     async def _update_market_metrics(self, market_zone: str):
         """Update and publish market metrics"""
         try:
-            # Fetch recent data for metric calculation
-            # This is a simplified implementation
+            zone_metrics = self.processor.metrics.zone_snapshot(market_zone)
+            if zone_metrics is None:
+                return
+            
             metrics = {
+                **zone_metrics,
                 'market_zone': market_zone,
                 'timestamp': datetime.now().isoformat(),
+                'data_timestamp': zone_metrics['timestamp'].isoformat(),
                 'metrics_type': 'realtime_update'
             }
             
             topic = "market_metrics"
-            self.producer.send(topic, value=metrics)
+            await self._send(topic, metrics)
             logger.debug(f"Published metrics update for {market_zone}")
             
         except KafkaError as e:
             logger.error(f"Error publishing metrics: {e}")
     
+    async def _send(self, topic: str, value: Dict[str, Any]):
+        """Hand a record to the producer without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        # Headers are built here, where the current span is visible, not in the executor thread
+        send = partial(self.producer.send, topic, value=value, headers=tracer.inject_headers())
+        await loop.run_in_executor(self._producer_executor, send)
+    
     async def get_processing_stats(self) -> Dict[str, Any]:
         """Get processing statistics"""
         return {
             **self.processor.processing_stats,
             'is_running': self.is_running,
             'consumer_topics': list(self.topics),
-            'kafka_connection': self.consumer is not None
+            'kafka_connection': self.consumer is not None,
+            'poller': dict(self.poller.stats) if self.poller else None,
+            'storage': self.storage.get_stats()
         }
     
+    def get_partition_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Records polled and lag for each assigned partition"""
+        return self.poller.get_partition_stats() if self.poller else {}
+    
     async def start_consuming(self):
         """Start consuming market data"""
         await self.initialize()
@@ -308,19 +612,221 @@ class MarketDataKafkaConsumer:
     async def stop_consuming(self):
         """Stop consuming market data"""
         self.is_running = False
-        if self.consumer:
+        self._stop_requested.set()
+        if self.poller:
+            # Also wakes the processing loop if it is waiting for a batch
+            await self.poller.stop()
+        elif self.consumer:
             self.consumer.close()
+        if self._stream_done is not None:
+            await self._stream_done.wait()
+        
+        if await self.storage.flush():
+            await self.processor.dedup_index.commit()
+        else:
+            # The buffered rows go with the process
+            self.processor.dedup_index.release()
+        await self.storage.refresh_rollups()
         if self.producer:
-            self.producer.close()
+            await asyncio.to_thread(self.producer.close)
+        if self.processor.dedup_index.redis_cache:
+            await self.processor.dedup_index.redis_cache.close()
+        if self._producer_executor:
+            self._producer_executor.shutdown(wait=False)
         logger.info("Market data consumer stopped")
 
 
+def run_consumer_group_worker(
+    bootstrap_servers: str,
+    group_id: str,
+    worker_id: int,
+    reports: "multiprocessing.Queue",
+    stop_event: "multiprocessing.synchronize.Event",
+    report_interval: float
+):
+    """Process entry point for one consumer group member"""
+    try:
+        asyncio.run(_consume_as_group_member(
+            bootstrap_servers, group_id, worker_id, reports, stop_event, report_interval
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _consume_as_group_member(
+    bootstrap_servers: str,
+    group_id: str,
+    worker_id: int,
+    reports: "multiprocessing.Queue",
+    stop_event: "multiprocessing.synchronize.Event",
+    report_interval: float
+):
+    """
+    Run one group member and report per-partition progress to the parent
+    
+    Every member joins the same group, so Kafka assigns each its own share of
+    the partitions; per-zone processing state stays local to the process.
+    """
+    consumer = MarketDataKafkaConsumer(bootstrap_servers=bootstrap_servers, group_id=group_id)
+    # The parent set the schema up before spawning; concurrent DDL from every member would race
+    await consumer.initialize(ensure_schema=False)
+    stream_task = asyncio.create_task(consumer.process_market_data_stream())
+    
+    previous_records: Dict[str, int] = {}
+    last_report = time.monotonic()
+    
+    try:
+        while not stop_event.is_set() and not stream_task.done():
+            await asyncio.sleep(report_interval)
+            
+            now = time.monotonic()
+            elapsed = max(now - last_report, 1e-9)
+            partitions = consumer.get_partition_stats()
+            for partition, stats in partitions.items():
+                stats['records_per_second'] = (stats['records'] - previous_records.get(partition, 0)) / elapsed
+                previous_records[partition] = stats['records']
+            last_report = now
+            
+            try:
+                reports.put_nowait({
+                    'worker_id': worker_id,
+                    'pid': os.getpid(),
+                    'timestamp': datetime.now().isoformat(),
+                    'partitions': partitions,
+                    'processing': await consumer.get_processing_stats()
+                })
+            except queue.Full:
+                pass
+    finally:
+        await consumer.stop_consuming()
+        try:
+            await asyncio.wait_for(stream_task, timeout=5)
+        except Exception:
+            stream_task.cancel()
+
+
+class ConsumerGroupRunner:
+    """
+    Runs the members of a consumer group in separate processes
+    
+    One process per core by default, but no more than ``partition_count``
+    since members beyond it would have no partition to consume. Members share
+    a group id so partitions are spread across them, and each reports
+    per-partition lag and throughput back over a multiprocessing queue. The
+    storage schema is set up once, here, before any member starts.
+    """
+    
+    def __init__(
+        self,
+        bootstrap_servers: str,
+        group_id: str,
+        worker_count: Optional[int] = None,
+        report_interval: float = 5.0,
+        partition_count: Optional[int] = None
+    ):
+        self.bootstrap_servers = bootstrap_servers
+        self.group_id = group_id
+        self.worker_count = worker_count or os.cpu_count() or 1
+        if partition_count:
+            self.worker_count = min(self.worker_count, partition_count)
+        self.report_interval = report_interval
+        
+        # Spawn rather than fork: the parent has an event loop and client threads
+        self._context = multiprocessing.get_context('spawn')
+        self._reports = self._context.Queue(maxsize=self.worker_count * 16)
+        self._stop_event = self._context.Event()
+        self._processes: Dict[int, Any] = {}
+        self._collector: Optional[asyncio.Task] = None
+        self.worker_reports: Dict[int, Dict[str, Any]] = {}
+    
+    @property
+    def is_running(self) -> bool:
+        return any(process.is_alive() for process in self._processes.values())
+    
+    async def start(self):
+        """Set up the storage schema, then start one process per group member"""
+        try:
+            await TimescaleMarketDataStore(async_engine).ensure_schema()
+        except Exception as e:
+            logger.warning(f"Timescale schema setup failed, writing to existing table: {e}")
+        
+        for worker_id in range(self.worker_count):
+            process = self._context.Process(
+                target=run_consumer_group_worker,
+                args=(
+                    self.bootstrap_servers, self.group_id, worker_id,
+                    self._reports, self._stop_event, self.report_interval
+                ),
+                name=f"{self.group_id}-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self._processes[worker_id] = process
+            logger.info(f"Started consumer process {self.group_id}-{worker_id} (pid {process.pid})")
+        
+        self._collector = asyncio.create_task(self._collect_reports())
+    
+    async def stop(self, timeout: float = 15.0):
+        """Ask every member to stop, then reap the processes"""
+        self._stop_event.set()
+        
+        for worker_id, process in self._processes.items():
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Consumer process {self.group_id}-{worker_id} did not stop, terminating")
+                process.terminate()
+        
+        if self._collector:
+            self._collector.cancel()
+            self._collector = None
+        self._drain_reports()
+        self._processes.clear()
+    
+    async def _collect_reports(self):
+        """Keep the latest report from every member"""
+        while True:
+            self._drain_reports()
+            await asyncio.sleep(self.report_interval / 2)
+    
+    def _drain_reports(self):
+        while True:
+            try:
+                report = self._reports.get_nowait()
+            except queue.Empty:
+                return
+            self.worker_reports[report['worker_id']] = report
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Group-wide view of partition lag and throughput"""
+        partitions: Dict[str, Dict[str, Any]] = {}
+        # After a rebalance a partition can appear in several reports; the newest owner wins
+        for report in sorted(self.worker_reports.values(), key=lambda r: r['timestamp']):
+            for partition, stats in report['partitions'].items():
+                partitions[partition] = {**stats, 'worker_id': report['worker_id']}
+        
+        return {
+            'group_id': self.group_id,
+            'workers': {
+                worker_id: {
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'last_report': self.worker_reports.get(worker_id, {}).get('timestamp')
+                }
+                for worker_id, process in self._processes.items()
+            },
+            'partitions': partitions,
+            'total_lag': sum(stats['lag'] or 0 for stats in partitions.values()),
+            'records_per_second': sum(stats.get('records_per_second', 0.0) for stats in partitions.values())
+        }
+
+
 class MarketDataStreamManager:
     """Manager for multiple market data streams"""
     
     def __init__(self, bootstrap_servers: str = "localhost:9092"):
         self.bootstrap_servers = bootstrap_servers
         self.consumers: Dict[str, MarketDataKafkaConsumer] = {}
+        self.consumer_groups: Dict[str, ConsumerGroupRunner] = {}
         self.admin_client: Optional[KafkaAdminClient] = None
         
     async def initialize(self):
@@ -368,32 +874,58 @@ class MarketDataStreamManager:
         except Exception as e:
             logger.error(f"Error creating market data topics: {e}")
     
-    async def start_consumer_group(self, group_id: str, consumer_count: int = 3):
-        """Start multiple consumers for load balancing"""
-        for i in range(consumer_count):
-            consumer_id = f"{group_id}-{i}"
-            consumer = MarketDataKafkaConsumer(
-                bootstrap_servers=self.bootstrap_servers,
-                group_id=f"{group_id}-{i}"
-            )
-            
-            self.consumers[consumer_id] = consumer
-            logger.info(f"Started consumer: {consumer_id}")
+    async def start_consumer_group(self, group_id: str, consumer_count: Optional[int] = None) -> ConsumerGroupRunner:
+        """
+        Start a consumer group with one member process per core
         
-        # Start all consumers
-        consumer_tasks = []
-        for consumer in self.consumers.values():
-            task = asyncio.create_task(consumer.start_consuming())
-            consumer_tasks.append(task)
+        Args:
+            group_id: Kafka consumer group shared by all members
+            consumer_count: Number of member processes (defaults to the CPU
+                count); capped at the partitions of the busiest topic
+        """
+        if group_id in self.consumer_groups:
+            return self.consumer_groups[group_id]
+        
+        runner = ConsumerGroupRunner(
+            self.bootstrap_servers, group_id, worker_count=consumer_count,
+            partition_count=await self._max_topic_partitions(MarketDataKafkaConsumer.TOPICS)
+        )
+        await runner.start()
+        self.consumer_groups[group_id] = runner
+        logger.info(f"Started consumer group {group_id} with {runner.worker_count} processes")
+        return runner
+    
+    async def _max_topic_partitions(self, topics) -> Optional[int]:
+        """
+        Partition count of the topic with the most partitions
+        
+        The range assignor splits each topic's partitions separately, so
+        members beyond this count are assigned nothing. None if unknown.
+        """
+        if not self.admin_client:
+            return None
+        try:
+            descriptions = await asyncio.to_thread(self.admin_client.describe_topics, list(topics))
+        except Exception as e:
+            logger.warning(f"Could not look up partition counts for {list(topics)}: {e}")
+            return None
         
-        # Wait for all consumers
-        await asyncio.gather(*consumer_tasks)
+        counts = [len(description['partitions']) for description in descriptions if not description.get('error_code')]
+        return max(counts) if counts else None
+    
+    def get_consumer_group_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-partition lag and throughput for every running group"""
+        return {group_id: runner.get_stats() for group_id, runner in self.consumer_groups.items()}
     
     async def stop_all_consumers(self):
         """Stop all consumers"""
         for consumer in self.consumers.values():
             await consumer.stop_consuming()
         
+        for runner in self.consumer_groups.values():
+            await runner.stop()
+        self.consumer_groups.clear()
+        
         if self.admin_client:
             self.admin_client.close()
         
@@ -408,7 +940,7 @@ async def start_market_data_streaming():
     """Start the market data streaming service"""
     await market_data_stream_manager.initialize()
     await market_data_stream_manager.create_market_topics()
-    await market_data_stream_manager.start_consumer_group("market_data_processor", 3)
+    await market_data_stream_manager.start_consumer_group("market_data_processor")
 
 
 async def stop_market_data_streaming():
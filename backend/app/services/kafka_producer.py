@@ -14,6 +14,8 @@ from kafka import KafkaProducer
 from kafka.errors import KafkaError
 from pydantic import BaseModel
 
+from ..core.tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 
@@ -66,15 +68,22 @@ class KafkaProducerService:
             topic = f"market_data.{event.market_zone}"
             key = f"{event.market_zone}.{event.timestamp.isoformat()}"
             
-            # Send to Kafka
-            future = self.producer.send(
-                topic, 
-                key=key,
-                value=event.dict()
-            )
-            
-            # Wait for confirmation
-            record_metadata = future.get(timeout=10)
+            with tracer.start_span(
+                f"publish {topic}",
+                kind="producer",
+                span_type="kafka",
+                attributes={"messaging.destination": topic, "event_type": event.event_type}
+            ):
+                # Send to Kafka; the trace context travels in the record headers
+                future = self.producer.send(
+                    topic, 
+                    key=key,
+                    value=event.dict(),
+                    headers=tracer.inject_headers()
+                )
+                
+                # Wait for confirmation
+                record_metadata = future.get(timeout=10)
             
             logger.info(f"Market data published to {record_metadata.topic}:{record_metadata.partition}")
             return True
@@ -0,0 +1,197 @@
+"""
+Market Data Deduplication Index
+Bounded index of recently ingested price keys for idempotent stream ingest
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .market_data_integration import MarketPrice
+
+logger = logging.getLogger(__name__)
+
+# (market zone, location, price type, timestamp) identifies one price point
+DedupKey = Tuple[str, str, str, str]
+
+# Rough per-entry footprint of a key tuple plus its OrderedDict slot, used to
+# turn a memory budget into an entry limit
+APPROX_ENTRY_BYTES = 320
+
+
+def dedup_key(price_data: MarketPrice) -> DedupKey:
+    """Identity of a price point, independent of its value"""
+    timestamp = price_data.timestamp
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    return (price_data.market_zone.value, price_data.location, price_data.price_type, timestamp)
+
+
+class DuplicateIndex:
+    """
+    Recently seen price keys with LRU eviction and a time-to-live
+
+    Lookups and inserts are O(1). Entries older than ``window_seconds`` are
+    treated as unseen; once ``max_entries`` is reached (derived from
+    ``max_memory_bytes`` if not given) the least recently seen key is evicted.
+
+    Keys returned by ``filter_new`` are only pending: they hide repeats while
+    their rows sit in the write buffer, including across failed flushes that
+    keep the rows buffered, and count as ingested once ``commit`` is called
+    after a successful flush. ``release`` forgets the keys of rows dropped
+    from the buffer unwritten, so their redelivery is accepted again rather
+    than discarded for the whole window.
+
+    With a connected ``RedisCacheService`` committed keys are also written to
+    Redis with ``SET EX``, so redeliveries that land on another consumer
+    process or after a restart are still recognised.
+    """
+
+    REDIS_KEY_PREFIX = "dedup:market_price:"
+
+    def __init__(
+        self,
+        window_seconds: float = 3600,
+        max_entries: Optional[int] = None,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        redis_cache: Optional[Any] = None
+    ):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries or max(1, max_memory_bytes // APPROX_ENTRY_BYTES)
+        self.redis_cache = redis_cache
+        self._seen: "OrderedDict[DedupKey, float]" = OrderedDict()
+        self._pending: "OrderedDict[DedupKey, None]" = OrderedDict()
+        self.stats = {
+            'checked': 0,
+            'duplicates': 0,
+            'redis_duplicates': 0,
+            'evicted': 0,
+            'expired': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def seen(self, key: DedupKey, now: Optional[float] = None) -> bool:
+        """Record a key; returns True if it was already in the window"""
+        now = time.monotonic() if now is None else now
+        if self._contains(key, now):
+            return True
+
+        self._remember(key, now)
+        return False
+
+    async def filter_new(self, prices: Iterable[MarketPrice]) -> List[MarketPrice]:
+        """
+        Drop prices already ingested or pending, checking memory first and
+        then Redis in one pipeline; the rest become pending keys
+        """
+        now = time.monotonic()
+        candidates: List[Tuple[DedupKey, MarketPrice]] = []
+
+        for price_data in prices:
+            key = dedup_key(price_data)
+            if not self._contains(key, now):
+                self._pending[key] = None
+                candidates.append((key, price_data))
+
+        if not candidates or not self._redis_available():
+            return [price_data for _, price_data in candidates]
+
+        try:
+            pipe = self.redis_cache.redis_client.pipeline(transaction=False)
+            for key, _ in candidates:
+                pipe.exists(self._redis_key(key))
+            found = await pipe.execute()
+        except Exception as e:
+            # Redis is a second line of defence; fall back to the local window
+            logger.warning(f"Redis dedup check failed, using local index only: {e}")
+            return [price_data for _, price_data in candidates]
+
+        fresh = []
+        for (key, price_data), exists in zip(candidates, found):
+            if exists:
+                # Ingested by another process; remember it without a new claim
+                del self._pending[key]
+                self._remember(key, now)
+                self.stats['redis_duplicates'] += 1
+            else:
+                fresh.append(price_data)
+        return fresh
+
+    async def commit(self):
+        """Record the pending keys as ingested; call once their rows are durable"""
+        if not self._pending:
+            return
+
+        now = time.monotonic()
+        keys = list(self._pending)
+        self._pending.clear()
+        for key in keys:
+            self._remember(key, now)
+
+        if not self._redis_available():
+            return
+        try:
+            pipe = self.redis_cache.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(self._redis_key(key), 1, ex=max(1, int(self.window_seconds)))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record {len(keys)} ingested keys in Redis: {e}")
+
+    def release(self, keys: Optional[Iterable[DedupKey]] = None):
+        """Forget pending keys (all of them by default) whose rows were dropped unwritten"""
+        if keys is None:
+            self._pending.clear()
+            return
+        for key in keys:
+            self._pending.pop(key, None)
+
+    def _contains(self, key: DedupKey, now: float) -> bool:
+        """Whether a key is pending or was ingested within the window"""
+        self.stats['checked'] += 1
+        if key in self._pending:
+            self.stats['duplicates'] += 1
+            return True
+
+        seen_at = self._seen.get(key)
+        if seen_at is not None:
+            if now - seen_at < self.window_seconds:
+                self._seen.move_to_end(key)
+                self.stats['duplicates'] += 1
+                return True
+            self.stats['expired'] += 1
+            del self._seen[key]
+        return False
+
+    def _remember(self, key: DedupKey, now: float):
+        self._seen[key] = now
+        self._seen.move_to_end(key)
+
+        # Expired entries sit at the front; drop those first, then enforce the size budget
+        while self._seen:
+            oldest_key, oldest_at = next(iter(self._seen.items()))
+            if now - oldest_at >= self.window_seconds:
+                self.stats['expired'] += 1
+            elif len(self._seen) > self.max_entries:
+                self.stats['evicted'] += 1
+            else:
+                break
+            del self._seen[oldest_key]
+
+    def _redis_available(self) -> bool:
+        return (
+            self.redis_cache is not None
+            and self.redis_cache.is_connected
+            and self.redis_cache.redis_client is not None
+        )
+
+    def _redis_key(self, key: DedupKey) -> str:
+        return self.REDIS_KEY_PREFIX + "|".join(key)
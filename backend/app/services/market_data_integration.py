@@ -17,6 +17,8 @@ import aiohttp
 import pandas as pd
 import pytz
 
+from ..core.tracing import tracer
+
 # Lazy import for Kafka to prevent startup failures
 KafkaProducer = None
 KafkaError = None
@@ -559,7 +561,14 @@ class MarketDataIntegrationService:
                 'load_forecast': price.load_forecast
             }
             
-            self.kafka_producer.send(topic, value=message)
+            # Each tick starts a (sampled) trace that follows it through the consumers
+            with tracer.start_span(
+                f"publish {topic}",
+                kind="producer",
+                span_type="kafka",
+                attributes={"messaging.destination": topic, "market_zone": market_zone.value}
+            ):
+                self.kafka_producer.send(topic, value=message, headers=tracer.inject_headers())
             logger.debug(f"Published {market_zone} price to {topic}")
             
         except Exception as e:
@@ -0,0 +1,206 @@
+"""
+Streaming Market Metrics
+Incremental per-zone price statistics updated in O(1) per tick
+"""
+
+import math
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence, Tuple
+
+from .market_data_integration import MarketPrice
+
+
+class RunningStats:
+    """Welford running mean and variance, with removal for sliding windows"""
+
+    __slots__ = ('count', 'mean', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self._m2 -= delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Population variance"""
+        if self.count < 2:
+            return 0.0
+        # Removal can leave tiny negative rounding residue
+        return max(self._m2, 0.0) / self.count
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class SlidingWindowStats:
+    """
+    Price and volume statistics over the last ``window_seconds`` of event time
+
+    Mean and variance use Welford add/remove, min and max use monotonic
+    deques, and the volume sum is kept running, so each tick is amortized
+    O(1). A late, out-of-order tick is slotted into time order and the
+    deques are rebuilt, which is O(n) but rare; the window still ends at the
+    newest tick seen.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.prices = RunningStats()
+        self.volume_sum = 0.0
+        self._ticks: Deque[Tuple[float, float, float]] = deque()
+        self._min: Deque[Tuple[float, float]] = deque()
+        self._max: Deque[Tuple[float, float]] = deque()
+
+    def add(self, at: float, price: float, volume: float):
+        self.prices.add(price)
+        self.volume_sum += volume
+
+        if self._ticks and at < self._ticks[-1][0]:
+            # Appending would evict newer entries from the deques that the late tick then outlives
+            index = len(self._ticks)
+            while index and self._ticks[index - 1][0] > at:
+                index -= 1
+            self._ticks.insert(index, (at, price, volume))
+            self._min.clear()
+            self._max.clear()
+            for tick_at, tick_price, _ in self._ticks:
+                self._push_extremes(tick_at, tick_price)
+        else:
+            self._ticks.append((at, price, volume))
+            self._push_extremes(at, price)
+
+        self.expire(self._ticks[-1][0])
+
+    def _push_extremes(self, at: float, price: float):
+        while self._min and self._min[-1][1] >= price:
+            self._min.pop()
+        self._min.append((at, price))
+        while self._max and self._max[-1][1] <= price:
+            self._max.pop()
+        self._max.append((at, price))
+
+    def expire(self, now: float):
+        """Drop ticks that fell out of the window"""
+        cutoff = now - self.window_seconds
+        while self._ticks and self._ticks[0][0] <= cutoff:
+            _, price, volume = self._ticks.popleft()
+            self.prices.remove(price)
+            self.volume_sum -= volume
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    @property
+    def count(self) -> int:
+        return len(self._ticks)
+
+    @property
+    def min_price(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max_price(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = self.count
+        return {
+            'avg_price': self.prices.mean,
+            'max_price': self.max_price,
+            'min_price': self.min_price,
+            'price_volatility': self.prices.stddev,
+            'total_volume': self.volume_sum,
+            'avg_volume': self.volume_sum / count if count else 0.0,
+            'record_count': count
+        }
+
+
+class ZoneMetrics:
+    """Live metrics for one market zone"""
+
+    def __init__(self, windows: Sequence[float]):
+        self.windows = {window: SlidingWindowStats(window) for window in windows}
+        self.current_price: Optional[float] = None
+        self.renewable_percentage: Optional[float] = None
+        self.latest_timestamp: Optional[datetime] = None
+        self._latest_at = float('-inf')
+
+    def add(self, price_data: MarketPrice):
+        at = price_data.timestamp.timestamp()
+        for window in self.windows.values():
+            window.add(at, price_data.price, price_data.volume)
+
+        if at >= self._latest_at:
+            self._latest_at = at
+            self.current_price = price_data.price
+            self.renewable_percentage = price_data.renewable_percentage
+            self.latest_timestamp = price_data.timestamp
+
+
+class ZoneMetricsAggregator:
+    """
+    Per-zone streaming metrics
+
+    The first window is the primary one whose values fill the top-level
+    fields; every window is reported under ``windows`` keyed by its length in
+    seconds.
+    """
+
+    DEFAULT_WINDOWS = (300, 3600)
+
+    def __init__(self, windows: Sequence[float] = DEFAULT_WINDOWS):
+        if not windows:
+            raise ValueError("At least one metrics window is required")
+        self.window_lengths = tuple(windows)
+        self.zones: Dict[str, ZoneMetrics] = {}
+
+    def add(self, price_data: MarketPrice):
+        """Fold one tick into its zone's metrics"""
+        zone = price_data.market_zone.value
+        metrics = self.zones.get(zone)
+        if metrics is None:
+            metrics = self.zones[zone] = ZoneMetrics(self.window_lengths)
+        metrics.add(price_data)
+
+    def add_many(self, prices: Iterable[MarketPrice]):
+        for price_data in prices:
+            self.add(price_data)
+
+    def zone_snapshot(self, zone: str) -> Optional[Dict[str, Any]]:
+        """Current metrics for a zone, or None if it has seen no ticks"""
+        metrics = self.zones.get(zone)
+        if metrics is None:
+            return None
+
+        windows = {window: stats.snapshot() for window, stats in metrics.windows.items()}
+        return {
+            'current_price': metrics.current_price,
+            **windows[self.window_lengths[0]],
+            'renewable_percentage': metrics.renewable_percentage or 0,
+            'timestamp': metrics.latest_timestamp,
+            'windows': windows
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {zone: self.zone_snapshot(zone) for zone in self.zones}
@@ -0,0 +1,231 @@
+"""
+In-Memory (L1) Cache Engine
+
+O(1) LRU cache with a byte budget, lazy expiry and an optional W-TinyLFU
+admission policy, used as the first tier of the performance cache.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from .performance_cache_service import CacheEntry
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent key popularity for TinyLFU admission
+
+    Four rows of small saturating counters. After ``sample_size`` increments
+    every counter is halved so popularity ages out.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+    SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+
+    def __init__(self, expected_entries: int = 10000):
+        width = 1
+        while width < max(16, expected_entries):
+            width <<= 1
+        self._mask = width - 1
+        self._rows: List[List[int]] = [[0] * width for _ in range(self.DEPTH)]
+        self.sample_size = 10 * width
+        self._additions = 0
+
+    def _indexes(self, key: str):
+        h = hash(key)
+        for row, seed in enumerate(self.SEEDS):
+            yield row, ((h ^ seed) * 0x01000193 >> row * 7) & self._mask
+
+    def increment(self, key: str):
+        added = False
+        for row, index in self._indexes(key):
+            counters = self._rows[row]
+            if counters[index] < self.MAX_COUNT:
+                counters[index] += 1
+                added = True
+
+        if added:
+            self._additions += 1
+            if self._additions >= self.sample_size:
+                self._age()
+
+    def frequency(self, key: str) -> int:
+        return min(self._rows[row][index] for row, index in self._indexes(key))
+
+    def _age(self):
+        for counters in self._rows:
+            for i, count in enumerate(counters):
+                counters[i] = count >> 1
+        self._additions //= 2
+
+
+class L1Cache:
+    """
+    Byte-bounded LRU cache of ``CacheEntry`` objects
+
+    Entries live in OrderedDicts kept in recency order, so lookups, inserts,
+    promotions and evictions are all O(1). Expired entries are dropped when
+    they are next touched (or by ``purge_expired``) rather than on a timer.
+
+    With ``admission`` enabled the cache runs W-TinyLFU: new entries land in
+    a small LRU window, and an entry leaving the window only displaces the
+    main segment's LRU victim if the frequency sketch says it is more
+    popular. One-hit wonders then cannot flush the hot set.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: Optional[int] = None,
+        admission: bool = False,
+        window_fraction: float = 0.01
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sketch: Optional[FrequencySketch] = FrequencySketch(max_entries or 10000) if admission else None
+
+        self._window: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._main: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._window_bytes = 0
+        self._main_bytes = 0
+        self.window_max_bytes = int(max_bytes * window_fraction) if admission else 0
+
+        self.stats: Dict[str, int] = {
+            'evictions': 0,
+            'expirations': 0,
+            'rejections': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._main)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._main or key in self._window
+
+    @property
+    def total_bytes(self) -> int:
+        return self._window_bytes + self._main_bytes
+
+    def keys(self) -> List[str]:
+        return list(self._window) + list(self._main)
+
+    def values(self) -> Iterator["CacheEntry"]:
+        yield from self._window.values()
+        yield from self._main.values()
+
+    def peek(self, key: str) -> Optional["CacheEntry"]:
+        """Entry for a key without touching recency, frequency or expiry"""
+        return self._main.get(key) or self._window.get(key)
+
+    def get(self, key: str, now: Optional[datetime] = None) -> Optional["CacheEntry"]:
+        """Live entry for a key, promoting it to most recently used"""
+        if self.sketch is not None:
+            self.sketch.increment(key)
+
+        segment = self._main if key in self._main else self._window
+        entry = segment.get(key)
+        if entry is None:
+            return None
+
+        now = now or datetime.utcnow()
+        if entry.expires_at <= now:
+            self._remove(key)
+            self.stats['expirations'] += 1
+            return None
+
+        segment.move_to_end(key)
+        entry.access_count += 1
+        entry.last_accessed = now
+        return entry
+
+    def set(self, entry: "CacheEntry") -> bool:
+        """Insert or replace an entry; returns False if it could not be cached"""
+        self._remove(entry.key)
+
+        if entry.size_bytes > self.max_bytes:
+            self.stats['rejections'] += 1
+            return False
+
+        if self.sketch is None:
+            self._main[entry.key] = entry
+            self._main_bytes += entry.size_bytes
+            self._evict_main(self.max_bytes)
+            return True
+
+        self.sketch.increment(entry.key)
+        self._window[entry.key] = entry
+        self._window_bytes += entry.size_bytes
+
+        # Entries overflowing the window compete for a place in main
+        while self._window and (
+            self._window_bytes > self.window_max_bytes or self._over_entry_limit()
+        ):
+            _, candidate = self._window.popitem(last=False)
+            self._window_bytes -= candidate.size_bytes
+            self._admit(candidate)
+
+        return entry.key in self
+
+    def delete(self, key: str) -> bool:
+        return self._remove(key) is not None
+
+    def clear(self):
+        self._window.clear()
+        self._main.clear()
+        self._window_bytes = 0
+        self._main_bytes = 0
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """Drop every expired entry; returns how many were removed"""
+        now = now or datetime.utcnow()
+        expired = [entry.key for entry in self.values() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats['expirations'] += len(expired)
+        return len(expired)
+
+    def _admit(self, candidate: "CacheEntry"):
+        """TinyLFU: the candidate replaces main's victims only if it is more popular"""
+        main_budget = self.max_bytes - self.window_max_bytes
+        now = datetime.utcnow()
+
+        while self._main and (
+            self._main_bytes + candidate.size_bytes > main_budget or self._over_entry_limit(extra=1)
+        ):
+            victim_key, victim = next(iter(self._main.items()))
+            if victim.expires_at > now and self.sketch.frequency(candidate.key) <= self.sketch.frequency(victim_key):
+                self.stats['rejections'] += 1
+                return
+            self._evict(victim_key)
+
+        if self._main_bytes + candidate.size_bytes > main_budget:
+            self.stats['rejections'] += 1
+            return
+
+        self._main[candidate.key] = candidate
+        self._main_bytes += candidate.size_bytes
+
+    def _evict_main(self, budget: int):
+        while self._main and (self._main_bytes > budget or self._over_entry_limit()):
+            self._evict(next(iter(self._main)))
+
+    def _evict(self, key: str):
+        self._remove(key)
+        self.stats['evictions'] += 1
+
+    def _over_entry_limit(self, extra: int = 0) -> bool:
+        return self.max_entries is not None and len(self) + extra > self.max_entries
+
+    def _remove(self, key: str) -> Optional["CacheEntry"]:
+        entry = self._main.pop(key, None)
+        if entry is not None:
+            self._main_bytes -= entry.size_bytes
+            return entry
+
+        entry = self._window.pop(key, None)
+        if entry is not None:
+            self._window_bytes -= entry.size_bytes
+        return entry
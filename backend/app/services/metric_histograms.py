@@ -0,0 +1,229 @@
+"""
+Metric Histograms
+Pre-aggregated latency histograms for the performance monitoring store
+
+Samples land in log-linear buckets (HDR histogram layout) kept per metric
+series and per time bucket, so recording is O(1) and percentile queries walk
+a few hundred buckets instead of sorting raw samples.
+"""
+
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Sub-buckets per power of two; bounds the relative error of reported
+# percentiles to under 1% (1 / 2 / SUB_BUCKETS from the bucket midpoint)
+SUB_BUCKETS = 64
+
+# Values at or below zero share one bucket sorted ahead of every other
+_ZERO_BUCKET = -(1 << 30)
+
+
+def bucket_index(value: float) -> int:
+    """Log-linear bucket holding ``value``"""
+    if value <= 0:
+        return _ZERO_BUCKET
+    mantissa, exponent = math.frexp(value)
+    return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def bucket_value(index: int) -> float:
+    """Midpoint of a bucket, the value reported for samples in it"""
+    if index == _ZERO_BUCKET:
+        return 0.0
+    exponent, sub_bucket = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * SUB_BUCKETS), exponent)
+
+
+class LogHistogram:
+    """
+    Sparse HDR-style histogram with exact count, sum, min, max and last value
+
+    Percentiles are read from bucket midpoints clamped to the observed
+    min and max, so they are within 1% of the exact sample percentile.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max', 'last')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = 0.0
+
+    def record(self, value: float):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.last = value
+
+    def merge(self, other: 'LogHistogram') -> 'LogHistogram':
+        """Add ``other`` into this histogram; ``last`` follows the merged-in one"""
+        if not other.count:
+            return self
+        counts = self.counts
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+        return self
+
+    @classmethod
+    def merged(cls, histograms: Iterable['LogHistogram']) -> 'LogHistogram':
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        return self.percentiles(percentile)[0]
+
+    def percentiles(self, *percentiles: float) -> List[float]:
+        """Several percentiles from one pass over the sorted buckets"""
+        if not self.count:
+            return [0.0] * len(percentiles)
+
+        ranks = sorted((p / 100 * (self.count - 1), i) for i, p in enumerate(percentiles))
+        results = [0.0] * len(percentiles)
+        seen = 0
+        pending = iter(ranks)
+        rank, position = next(pending)
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while rank < seen:
+                results[position] = min(max(bucket_value(index), self.min), self.max)
+                try:
+                    rank, position = next(pending)
+                except StopIteration:
+                    return results
+        return results
+
+    def summary(self) -> Dict[str, float]:
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return {
+            "avg": self.mean,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+            "count": self.count
+        }
+
+
+class RollingHistogram:
+    """
+    Histogram over roughly the last ``window_size`` samples
+
+    Two generations are kept: samples go to the current one, which replaces
+    the previous one once it holds ``window_size`` samples. Queries cover
+    both, i.e. between ``window_size`` and twice that many recent samples.
+    """
+
+    __slots__ = ('window_size', '_current', '_previous')
+
+    def __init__(self, window_size: int = 100):
+        self.window_size = window_size
+        self._current = LogHistogram()
+        self._previous = LogHistogram()
+
+    def record(self, value: float):
+        if self._current.count >= self.window_size:
+            self._previous, self._current = self._current, LogHistogram()
+        self._current.record(value)
+
+    def snapshot(self) -> LogHistogram:
+        return LogHistogram.merged((self._previous, self._current))
+
+
+class MetricStore:
+    """
+    Histograms per (metric, labels) series and per ``bucket_seconds`` of time
+
+    Buckets older than the retention window are dropped by ``prune``; queries
+    merge the buckets of a time range, so their resolution is one bucket.
+    """
+
+    def __init__(self, bucket_seconds: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self._series: Dict[Tuple[str, str], Dict[int, LogHistogram]] = {}
+
+    def record(self, metric: str, labels_key: str, value: float, at: float):
+        buckets = self._series.get((metric, labels_key))
+        if buckets is None:
+            buckets = self._series[(metric, labels_key)] = {}
+        bucket = int(at) // self.bucket_seconds
+        histogram = buckets.get(bucket)
+        if histogram is None:
+            histogram = buckets[bucket] = LogHistogram()
+        histogram.record(value)
+
+    def _buckets(
+        self,
+        metric: Optional[str],
+        since: float
+    ) -> Iterator[Tuple[str, int, LogHistogram]]:
+        first = int(since) // self.bucket_seconds
+        for (series_metric, _), buckets in self._series.items():
+            if metric is not None and series_metric != metric:
+                continue
+            for bucket, histogram in buckets.items():
+                if bucket >= first:
+                    yield series_metric, bucket, histogram
+
+    def window(self, metric: str, since: float) -> LogHistogram:
+        """Every sample of ``metric`` since ``since``, across all labels"""
+        return LogHistogram.merged(histogram for _, _, histogram in self._buckets(metric, since))
+
+    def windows_by_metric(self, since: float) -> Dict[str, LogHistogram]:
+        """Per-metric histograms since ``since``, across all labels"""
+        result: Dict[str, LogHistogram] = {}
+        for metric, _, histogram in self._buckets(None, since):
+            result.setdefault(metric, LogHistogram()).merge(histogram)
+        return result
+
+    def timeline(self, metric: str, since: float) -> List[Tuple[int, LogHistogram]]:
+        """Per-bucket histograms of ``metric`` since ``since``, oldest first"""
+        merged: Dict[int, LogHistogram] = {}
+        for _, bucket, histogram in self._buckets(metric, since):
+            merged.setdefault(bucket, LogHistogram()).merge(histogram)
+        return [
+            (bucket * self.bucket_seconds, merged[bucket])
+            for bucket in sorted(merged)
+        ]
+
+    def prune(self, before: float):
+        """Drop buckets that ended before ``before`` and series left empty"""
+        first = int(before) // self.bucket_seconds
+        for key in list(self._series):
+            buckets = self._series[key]
+            for bucket in [bucket for bucket in buckets if bucket < first]:
+                del buckets[bucket]
+            if not buckets:
+                del self._series[key]
+
+    @property
+    def series_count(self) -> int:
+        return len(self._series)
+
+    @property
+    def sample_count(self) -> int:
+        return sum(
+            histogram.count
+            for buckets in self._series.values()
+            for histogram in buckets.values()
+        )
@@ -13,19 +13,34 @@ Features:
 """
 
 import asyncio
+import fnmatch
+import inspect
 import json
+import math
+import random
+import struct
 import time
-from typing import Any, Dict, List, Optional, Union, Tuple
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Union, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 import redis.asyncio as redis
-from redis.cluster import RedisCluster
+from redis.asyncio.cluster import ClusterNode, RedisCluster
 import hashlib
-import pickle
-import gzip
 import logging
 
+from .cache_access import AccessStats
+from .cache_codecs import CacheCodec, CodecPolicy, CodecRegistry, approximate_size, decode_value
+from .cache_invalidation import InvalidationBus, RedisInvalidationBus
+from .cache_warming import (
+    load_analytics_metrics,
+    load_market_data,
+    load_market_summary,
+    load_user_dashboard
+)
+from .memory_cache import L1Cache
+from .redis_cache import ADD_TO_INDEX_SCRIPT, redis_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +70,20 @@ class CacheEntry:
     last_accessed: Optional[datetime] = None
     size_bytes: int = 0
     compression_ratio: float = 1.0
+    # value holds codec bytes rather than the live object
+    encoded: bool = False
+    # Set by get_or_load: epoch seconds after which the value is stale, and
+    # how long the loader took (drives probabilistic early refresh)
+    fresh_until: Optional[float] = None
+    compute_seconds: float = 0.0
+    # Cluster-wide version of the write (see InvalidationBus); remote
+    # invalidations only drop entries with an older version
+    version: int = 0
+
+
+# Redis values written by get_or_load carry their freshness ahead of the codec bytes
+_FRESHNESS = struct.Struct("!2sdd")
+_FRESHNESS_MAGIC = b"FW"
 
 
 @dataclass
@@ -74,51 +103,97 @@ class PerformanceCacheService:
     Advanced multi-tier caching service for dashboard optimization
     """
     
+    TAG_PREFIX = "tag:"
+    # Keys deleted per pipeline round trip during invalidation
+    INVALIDATION_BATCH_SIZE = 500
+    
     def __init__(
         self,
         redis_cluster_nodes: List[Dict[str, str]] = None,
         memory_cache_size: int = 1000,
         default_ttl: int = 3600,
-        compression_threshold: int = 1024
+        compression_threshold: int = 1024,
+        memory_cache_max_bytes: int = 64 * 1024 * 1024,
+        memory_cache_admission: bool = False,
+        codecs: Optional[CodecRegistry] = None,
+        invalidation_bus: Optional[InvalidationBus] = None,
+        access_sample_rate: float = 0.1
     ):
         self.redis_cluster_nodes = redis_cluster_nodes or [
             {"host": "redis-cluster", "port": "7000"}
         ]
         self.memory_cache_size = memory_cache_size
+        self.memory_cache_max_bytes = memory_cache_max_bytes
         self.default_ttl = default_ttl
         self.compression_threshold = compression_threshold
         
-        # L1 Memory cache
-        self._memory_cache: Dict[str, CacheEntry] = {}
-        self._memory_cache_order: List[str] = []
+        # Codec per key namespace; L2 stores the encoded bytes, L1 the live object by default
+        self.codecs = codecs or CodecRegistry(
+            CodecPolicy(CacheCodec(compression_threshold=compression_threshold))
+        )
+        
+        # L1 Memory cache: LRU bounded by bytes (and entry count), optional W-TinyLFU admission
+        self._memory_cache = L1Cache(
+            max_bytes=memory_cache_max_bytes,
+            max_entries=memory_cache_size,
+            admission=memory_cache_admission
+        )
         
         # L2 Redis cluster
         self._redis_cluster = None
         self._redis_client = None
         
+        # L1 side of tag invalidation: tag -> keys; Redis keeps the same sets under TAG_PREFIX
+        self._tag_index: Dict[str, Set[str]] = {}
+        
+        # Writes and invalidations are broadcast so other nodes drop their L1 copies
+        self.invalidation_bus = invalidation_bus
+        if invalidation_bus is not None:
+            invalidation_bus.subscribe(self._apply_remote_invalidations)
+        self._remote_invalidations = 0
+        # Newest version used or seen here; the versions when no bus is running
+        self._version = 0
+        
         # Metrics tracking
         self._metrics = CacheMetrics()
         
-        # Cache warming schedules
-        self._warming_schedules: Dict[str, Dict] = {}
+        # Hit counts for hot-key reporting, kept in memory and flushed to Redis in batches
+        self._access_stats = AccessStats(sample_rate=access_sample_rate)
+        
+        # get_or_load: one loader per key at a time, plus background refreshes
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        # Loads in flight: key -> (version at load start, tags); fills that an
+        # invalidation overtook are not cached
+        self._pending_fills: Dict[str, Tuple[int, FrozenSet[str]]] = {}
+        self._superseded_fills: Set[str] = set()
+        self.load_stats = {
+            'loads': 0,
+            'coalesced': 0,
+            'stale_served': 0,
+            'early_refreshes': 0,
+            'refresh_failures': 0,
+            'superseded_fills': 0
+        }
         
     async def initialize(self):
         """Initialize Redis cluster connection"""
         try:
             # Initialize Redis cluster
             startup_nodes = [
-                {"host": node["host"], "port": int(node["port"])}
+                ClusterNode(node["host"], int(node["port"]))
                 for node in self.redis_cluster_nodes
             ]
             
+            # Values are codec bytes, so the cluster client must not decode responses
             self._redis_cluster = RedisCluster(
                 startup_nodes=startup_nodes,
-                decode_responses=True,
-                skip_full_coverage_check=True,
+                decode_responses=False,
+                require_full_coverage=False,
                 max_connections=20
             )
             
-            # Initialize individual Redis client for metadata
+            # Initialize individual Redis client for access stats and server metrics
             self._redis_client = redis.Redis(
                 host=self.redis_cluster_nodes[0]["host"],
                 port=int(self.redis_cluster_nodes[0]["port"]),
@@ -136,6 +211,14 @@ class PerformanceCacheService:
             # Continue with memory-only cache
             self._redis_cluster = None
             self._redis_client = None
+        
+        await self._access_stats.start(self._redis_client)
+        
+        if self.invalidation_bus is not None:
+            try:
+                await self.invalidation_bus.start()
+            except Exception as e:
+                logger.error(f"Failed to start cache invalidation bus: {e}")
     
     async def get(
         self,
@@ -154,6 +237,68 @@ class PerformanceCacheService:
         Returns:
             Cached value or None if not found
         """
+        hit = await self._lookup(key, tiers)
+        return hit[0] if hit else None
+    
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: Optional[int] = None,
+        stale_ttl: int = 0,
+        tiers: List[CacheTier] = None,
+        beta: float = 1.0,
+        tags: Optional[Iterable[str]] = None
+    ) -> Any:
+        """
+        Get a value, loading it on a miss without stampeding the data source
+        
+        Concurrent misses for a key share a single ``loader`` call. Values
+        stay fresh for ``ttl`` seconds and are then served stale for up to
+        ``stale_ttl`` more while one background task reloads them. Shortly
+        before expiry each read may also trigger that refresh early, with a
+        probability that grows as expiry nears and with the loader's cost
+        (XFetch; ``beta`` > 1 refreshes earlier, 0 disables it).
+        
+        Args:
+            key: Cache key
+            loader: Callable (sync or async) producing the value
+            ttl: Seconds the value is fresh
+            stale_ttl: Further seconds a stale value may be served
+            tiers: Cache tiers to use (default: all tiers)
+            beta: Early expiration aggressiveness
+            tags: Invalidation tags for the loaded value
+        
+        Returns:
+            The cached or freshly loaded value
+        """
+        ttl = ttl or self.default_ttl
+        hit = await self._lookup(key, tiers)
+        
+        if hit is not None:
+            value, fresh_until, compute_seconds = hit
+            if fresh_until is None:
+                return value
+            
+            now = time.time()
+            if now >= fresh_until:
+                self.load_stats['stale_served'] += 1
+                self._refresh_in_background(key, loader, ttl, stale_ttl, tiers, tags)
+            elif beta > 0 and compute_seconds > 0 and (
+                now - compute_seconds * beta * math.log(1.0 - random.random()) >= fresh_until
+            ):
+                self.load_stats['early_refreshes'] += 1
+                self._refresh_in_background(key, loader, ttl, stale_ttl, tiers, tags)
+            return value
+        
+        return await self._load_once(key, loader, ttl, stale_ttl, tiers, tags)
+    
+    async def _lookup(
+        self,
+        key: str,
+        tiers: Optional[List[CacheTier]]
+    ) -> Optional[Tuple[Any, Optional[float], float]]:
+        """First hit across tiers as (value, fresh_until, compute_seconds), with metrics"""
         if tiers is None:
             tiers = [CacheTier.L1_MEMORY, CacheTier.L2_REDIS]
         
@@ -161,8 +306,8 @@ class PerformanceCacheService:
         
         try:
             for tier in tiers:
-                value = await self._get_from_tier(key, tier)
-                if value is not None:
+                hit = await self._get_from_tier(key, tier)
+                if hit is not None:
                     # Update metrics
                     self._metrics.hits += 1
                     if self._metrics.hits + self._metrics.misses > 0:
@@ -170,10 +315,9 @@ class PerformanceCacheService:
                             self._metrics.hits + self._metrics.misses
                         )
                     
-                    # Record access in metadata
-                    await self._record_access(key, tier)
+                    self._access_stats.record(key, tier.value)
                     
-                    return value
+                    return hit
             
             # Cache miss
             self._metrics.misses += 1
@@ -191,7 +335,8 @@ class PerformanceCacheService:
         value: Any,
         ttl: Optional[int] = None,
         strategy: CacheStrategy = CacheStrategy.WRITE_THROUGH,
-        tiers: List[CacheTier] = None
+        tiers: List[CacheTier] = None,
+        tags: Optional[Iterable[str]] = None
     ) -> bool:
         """
         Set value in cache with specified strategy
@@ -202,22 +347,52 @@ class PerformanceCacheService:
             ttl: Time to live in seconds
             strategy: Cache strategy to use
             tiers: Cache tiers to write to (default: all tiers)
+            tags: Tags to invalidate the key by (see CacheTags)
         
         Returns:
             Success status
         """
+        return await self._write(key, value, ttl or self.default_ttl, tiers, tags=tags)
+    
+    async def _write(
+        self,
+        key: str,
+        value: Any,
+        ttl: int,
+        tiers: Optional[List[CacheTier]],
+        fresh_until: Optional[float] = None,
+        compute_seconds: float = 0.0,
+        tags: Optional[Iterable[str]] = None,
+        broadcast: bool = True,
+        version: Optional[int] = None
+    ) -> bool:
+        """Write a value to the tiers; ttl is how long the tiers keep it"""
         if tiers is None:
             tiers = [CacheTier.L1_MEMORY, CacheTier.L2_REDIS]
         
-        ttl = ttl or self.default_ttl
-        
         try:
-            # Compress large values
-            compressed_value = await self._compress_value(value)
+            # Encode at most once, shared by every tier that needs bytes
+            policy = self.codecs.policy_for(key)
+            encoded = None
+            needs_bytes = (
+                (CacheTier.L2_REDIS in tiers and self._redis_cluster is not None)
+                or (CacheTier.L1_MEMORY in tiers and not policy.store_live)
+            )
+            if needs_bytes:
+                encoded = policy.codec.encode(value)
             
             # Write to specified tiers
+            if version is None:
+                version = await self._next_version()
             for tier in tiers:
-                await self._set_in_tier(key, compressed_value, ttl, tier)
+                await self._set_in_tier(
+                    key, value, encoded, ttl, tier, policy, fresh_until, compute_seconds, version
+                )
+            
+            if tags:
+                await self._tag_key(key, tags, ttl, tiers)
+            if broadcast:
+                self._broadcast_invalidation('key', key, version)
             
             return True
             
@@ -225,23 +400,155 @@ class PerformanceCacheService:
             logger.error(f"Failed to set cache key {key}: {e}")
             return False
     
+    async def _load_once(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: int,
+        stale_ttl: int,
+        tiers: Optional[List[CacheTier]],
+        tags: Optional[Iterable[str]] = None
+    ) -> Any:
+        """Run the loader unless a load for this key is already in flight, then cache its result"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.load_stats['coalesced'] += 1
+            # Shield so one cancelled waiter does not cancel the shared load
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        tags = list(tags) if tags else None
+        try:
+            # Versioned as of the load start: a write or invalidation made
+            # while the loader runs is newer than the value it returns
+            version = await self._current_version()
+            self._pending_fills[key] = (version, frozenset(tags or ()))
+            
+            started = time.time()
+            value = loader()
+            if inspect.isawaitable(value):
+                value = await value
+            compute_seconds = time.time() - started
+            self.load_stats['loads'] += 1
+            
+            if key in self._superseded_fills:
+                # An invalidation arrived mid-load; the value may predate it
+                self.load_stats['superseded_fills'] += 1
+            elif value is not None:
+                # A cache fill, not a data change: other nodes keep their copies
+                await self._write(
+                    key, value, ttl + stale_ttl, tiers,
+                    fresh_until=time.time() + ttl,
+                    compute_seconds=compute_seconds,
+                    tags=tags,
+                    broadcast=False,
+                    version=version
+                )
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unawaited future does not warn
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            self._pending_fills.pop(key, None)
+            self._superseded_fills.discard(key)
+    
+    def _refresh_in_background(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: int,
+        stale_ttl: int,
+        tiers: Optional[List[CacheTier]],
+        tags: Optional[Iterable[str]] = None
+    ):
+        """Reload a key in a background task unless a load for it is already running"""
+        if key in self._inflight or key in self._refresh_tasks:
+            return
+        
+        async def refresh():
+            try:
+                await self._load_once(key, loader, ttl, stale_ttl, tiers, tags)
+            except Exception as e:
+                # Keep serving the stale value; the next read retries
+                self.load_stats['refresh_failures'] += 1
+                logger.warning(f"Background refresh failed for cache key {key}: {e}")
+            finally:
+                self._refresh_tasks.pop(key, None)
+        
+        self._refresh_tasks[key] = asyncio.create_task(refresh())
+    
+    def register_codec(self, prefix: str, codec: CacheCodec, store_live: bool = True):
+        """Use a codec for keys starting with prefix (e.g. "dashboard:timeseries:")"""
+        self.codecs.register(prefix, codec, store_live)
+    
     async def delete(self, key: str, tiers: List[CacheTier] = None) -> bool:
         """Delete key from cache tiers"""
         if tiers is None:
             tiers = [CacheTier.L1_MEMORY, CacheTier.L2_REDIS]
         
         try:
+            version = await self._next_version()
             for tier in tiers:
                 await self._delete_from_tier(key, tier)
+            self._broadcast_invalidation('key', key, version)
             return True
         except Exception as e:
             logger.error(f"Failed to delete cache key {key}: {e}")
             return False
     
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Invalidate every key registered under any of the tags
+        
+        Costs O(tagged keys): the tag sets are read and the keys deleted in
+        pipelined batches, with no keyspace scan.
+        
+        Args:
+            tags: Tags such as CacheTags.zone("PJM")
+        
+        Returns:
+            Number of keys invalidated
+        """
+        tags = list(tags)
+        keys: Set[str] = set()
+        
+        version = await self._next_version()
+        for tag in tags:
+            keys.update(self._tag_index.pop(tag, ()))
+            self._broadcast_invalidation('tag', tag, version)
+        for key in keys:
+            self._memory_cache.delete(key)
+        
+        if self._redis_cluster:
+            try:
+                pipe = self._redis_cluster.pipeline()
+                for tag in tags:
+                    pipe.smembers(self.TAG_PREFIX + tag)
+                for members in await pipe.execute():
+                    keys.update(
+                        member.decode() if isinstance(member, bytes) else member
+                        for member in members or ()
+                    )
+                
+                await self._delete_redis_keys(keys, [self.TAG_PREFIX + tag for tag in tags])
+            except Exception as e:
+                logger.error(f"Failed to invalidate tags {tags}: {e}")
+        
+        logger.info(f"Invalidated {len(keys)} keys tagged {tags}")
+        return len(keys)
+    
     async def invalidate_pattern(self, pattern: str) -> int:
         """
         Invalidate cache keys matching pattern
         
+        Prefer invalidate_tags: this walks the keyspace with incremental SCAN
+        (never KEYS), which does not block Redis but still visits every key.
+        
         Args:
             pattern: Redis-style pattern (e.g., "dashboard:*")
         
@@ -249,6 +556,7 @@ class PerformanceCacheService:
             Number of keys invalidated
         """
         invalidated_count = 0
+        self._broadcast_invalidation('pattern', pattern, await self._next_version())
         
         try:
             # Clear L1 memory cache
@@ -263,10 +571,14 @@ class PerformanceCacheService:
             
             # Clear L2 Redis cache
             if self._redis_cluster:
-                redis_keys = await self._redis_cluster.keys(pattern)
-                if redis_keys:
-                    await self._redis_cluster.delete(*redis_keys)
-                    invalidated_count += len(redis_keys)
+                redis_keys = [
+                    key.decode() if isinstance(key, bytes) else key
+                    async for key in self._redis_cluster.scan_iter(
+                        match=pattern, count=self.INVALIDATION_BATCH_SIZE
+                    )
+                ]
+                await self._delete_redis_keys(redis_keys)
+                invalidated_count += len(redis_keys)
             
             logger.info(f"Invalidated {invalidated_count} keys matching pattern {pattern}")
             
@@ -275,13 +587,19 @@ class PerformanceCacheService:
         
         return invalidated_count
     
-    async def warm_cache(self, keys: List[str], load_func: callable):
+    async def warm_cache(
+        self,
+        keys: List[str],
+        load_func: callable,
+        tags_for: Optional[Callable[[str], Iterable[str]]] = None
+    ):
         """
         Pre-warm cache with specified keys
         
         Args:
             keys: List of cache keys to warm
             load_func: Function to load data for each key
+            tags_for: Function giving the invalidation tags for each key
         """
         logger.info(f"Starting cache warming for {len(keys)} keys")
         
@@ -292,7 +610,7 @@ class PerformanceCacheService:
             if cached_value is None:
                 # Schedule for warming
                 task = asyncio.create_task(
-                    self._warm_single_key(key, load_func)
+                    self._warm_single_key(key, load_func, tags_for)
                 )
                 tasks.append(task)
         
@@ -300,6 +618,31 @@ class PerformanceCacheService:
             await asyncio.gather(*tasks, return_exceptions=True)
             logger.info(f"Cache warming completed for {len(tasks)} keys")
     
+    async def refresh(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: Optional[int] = None,
+        stale_ttl: int = 0,
+        tiers: List[CacheTier] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> Any:
+        """Load and cache a value now, sharing the load with concurrent ``get_or_load`` misses"""
+        return await self._load_once(key, loader, ttl or self.default_ttl, stale_ttl, tiers, tags)
+    
+    def fresh_for(self, key: str) -> float:
+        """Seconds the L1 copy of a key stays fresh (0 if absent), without counting an access"""
+        entry = self._memory_cache.peek(key)
+        if entry is None:
+            return 0.0
+        if entry.fresh_until is not None:
+            return max(0.0, entry.fresh_until - time.time())
+        return max(0.0, (entry.expires_at - datetime.utcnow()).total_seconds())
+    
+    def get_hot_keys(self, prefix: str = "", limit: int = 100) -> List[str]:
+        """Most hit keys starting with ``prefix``, hottest first"""
+        return self._access_stats.hot_keys(prefix, limit)
+    
     async def get_metrics(self) -> Dict[str, Any]:
         """Get cache performance metrics"""
         metrics_dict = asdict(self._metrics)
@@ -314,10 +657,16 @@ class PerformanceCacheService:
                 logger.warning(f"Failed to get Redis metrics: {e}")
         
         # Add memory cache metrics
-        metrics_dict['memory_usage_mb'] = sum(
-            entry.size_bytes for entry in self._memory_cache.values()
-        ) / 1024 / 1024
+        metrics_dict['memory_usage_mb'] = self._memory_cache.total_bytes / 1024 / 1024
         metrics_dict['memory_cache_size'] = len(self._memory_cache)
+        metrics_dict['memory_cache_limit_mb'] = self.memory_cache_max_bytes / 1024 / 1024
+        metrics_dict['memory_cache_expirations'] = self._memory_cache.stats['expirations']
+        metrics_dict['memory_cache_rejections'] = self._memory_cache.stats['rejections']
+        metrics_dict['remote_invalidations'] = self._remote_invalidations
+        metrics_dict['access_stats'] = self._access_stats.get_stats()
+        metrics_dict['shared_hot_keys'] = await self._access_stats.shared_hot_keys(limit=10)
+        if self.invalidation_bus is not None:
+            metrics_dict['invalidation_bus'] = self.invalidation_bus.get_stats()
         
         return metrics_dict
     
@@ -351,172 +700,220 @@ class PerformanceCacheService:
         
         return health
     
-    async def _get_from_tier(self, key: str, tier: CacheTier) -> Optional[Any]:
-        """Get value from specific cache tier"""
+    async def _get_from_tier(
+        self,
+        key: str,
+        tier: CacheTier
+    ) -> Optional[Tuple[Any, Optional[float], float]]:
+        """Get (value, fresh_until, compute_seconds) from specific cache tier"""
         if tier == CacheTier.L1_MEMORY:
+            # Expired entries are dropped by the lookup itself
             entry = self._memory_cache.get(key)
-            if entry and entry.expires_at > datetime.utcnow():
-                return await self._decompress_value(entry.value)
-            elif entry:
-                # Expired entry
-                await self._delete_from_tier(key, tier)
+            if entry:
+                value = decode_value(entry.value) if entry.encoded else entry.value
+                return value, entry.fresh_until, entry.compute_seconds
         
         elif tier == CacheTier.L2_REDIS and self._redis_cluster:
             try:
                 value = await self._redis_cluster.get(key)
                 if value:
-                    return await self._decompress_value(json.loads(value))
+                    if value[:2] == _FRESHNESS_MAGIC:
+                        _, fresh_until, compute_seconds = _FRESHNESS.unpack_from(value)
+                        return decode_value(value[_FRESHNESS.size:]), fresh_until, compute_seconds
+                    return decode_value(value), None, 0.0
             except Exception as e:
                 logger.warning(f"Redis get failed for key {key}: {e}")
         
         return None
     
-    async def _set_in_tier(self, key: str, value: Any, ttl: int, tier: CacheTier):
+    async def _set_in_tier(
+        self,
+        key: str,
+        value: Any,
+        encoded: Optional[bytes],
+        ttl: int,
+        tier: CacheTier,
+        policy: CodecPolicy,
+        fresh_until: Optional[float] = None,
+        compute_seconds: float = 0.0,
+        version: int = 0
+    ):
         """Set value in specific cache tier"""
         expires_at = datetime.utcnow() + timedelta(seconds=ttl)
         
         if tier == CacheTier.L1_MEMORY:
-            # LRU eviction if cache is full
-            if len(self._memory_cache) >= self.memory_cache_size:
-                await self._evict_lru()
-            
-            # Compress and store
-            compressed_value = await self._compress_value(value)
-            size_bytes = len(pickle.dumps(compressed_value))
+            # Live objects are shared with callers and must be treated as read-only
+            store_live = policy.store_live or encoded is None
+            size_bytes = approximate_size(value) if store_live else len(encoded)
             
             entry = CacheEntry(
                 key=key,
-                value=compressed_value,
+                value=value if store_live else encoded,
                 created_at=datetime.utcnow(),
                 expires_at=expires_at,
-                size_bytes=size_bytes
+                size_bytes=size_bytes,
+                encoded=not store_live,
+                fresh_until=fresh_until,
+                compute_seconds=compute_seconds,
+                version=version
             )
             
-            self._memory_cache[key] = entry
-            self._memory_cache_order.append(key)
+            # The engine evicts by LRU (or TinyLFU admission) to stay within budget
+            self._memory_cache.set(entry)
+            self._metrics.evictions = self._memory_cache.stats['evictions']
             
         elif tier == CacheTier.L2_REDIS and self._redis_cluster:
             try:
-                value_json = json.dumps(value)
-                await self._redis_cluster.setex(key, ttl, value_json)
-                
-                # Set metadata
-                metadata = {
-                    "created_at": datetime.utcnow().isoformat(),
-                    "size_bytes": len(value_json),
-                    "access_count": 0
-                }
-                await self._redis_client.setex(
-                    f"meta:{key}", ttl, json.dumps(metadata)
-                )
-                
+                if fresh_until is not None:
+                    encoded = _FRESHNESS.pack(_FRESHNESS_MAGIC, fresh_until, compute_seconds) + encoded
+                await self._redis_cluster.setex(key, ttl, encoded)
             except Exception as e:
                 logger.warning(f"Redis set failed for key {key}: {e}")
     
     async def _delete_from_tier(self, key: str, tier: CacheTier):
         """Delete key from specific cache tier"""
         if tier == CacheTier.L1_MEMORY:
-            self._memory_cache.pop(key, None)
-            self._memory_cache_order = [
-                k for k in self._memory_cache_order if k != key
-            ]
+            self._memory_cache.delete(key)
         
         elif tier == CacheTier.L2_REDIS and self._redis_cluster:
             await self._redis_cluster.delete(key)
-            await self._redis_client.delete(f"meta:{key}")
-    
-    async def _evict_lru(self):
-        """Evict least recently used item from memory cache"""
-        if self._memory_cache_order:
-            oldest_key = self._memory_cache_order.pop(0)
-            self._memory_cache.pop(oldest_key, None)
-            self._metrics.evictions += 1
     
-    async def _record_access(self, key: str, tier: CacheTier):
-        """Record cache access for metrics"""
-        if tier == CacheTier.L1_MEMORY:
-            entry = self._memory_cache.get(key)
-            if entry:
-                entry.access_count += 1
-                entry.last_accessed = datetime.utcnow()
-        
-        elif tier == CacheTier.L2_REDIS and self._redis_client:
-            try:
-                metadata_key = f"meta:{key}"
-                metadata = await self._redis_client.get(metadata_key)
-                if metadata:
-                    meta = json.loads(metadata)
-                    meta["access_count"] = meta.get("access_count", 0) + 1
-                    meta["last_accessed"] = datetime.utcnow().isoformat()
-                    await self._redis_client.setex(
-                        metadata_key, self.default_ttl, json.dumps(meta)
-                    )
-            except Exception as e:
-                logger.warning(f"Failed to record access for key {key}: {e}")
-    
-    async def _warm_single_key(self, key: str, load_func: callable):
+    async def _warm_single_key(
+        self,
+        key: str,
+        load_func: callable,
+        tags_for: Optional[Callable[[str], Iterable[str]]] = None
+    ):
         """Warm a single cache key"""
         try:
             value = await load_func(key)
             if value is not None:
-                await self.set(key, value)
+                await self.set(key, value, tags=tags_for(key) if tags_for else None)
         except Exception as e:
             logger.warning(f"Failed to warm cache key {key}: {e}")
     
-    async def _compress_value(self, value: Any) -> Any:
-        """Compress large values for storage"""
-        serialized = pickle.dumps(value)
-        
-        if len(serialized) > self.compression_threshold:
-            compressed = gzip.compress(serialized)
-            return {
-                "data": compressed,
-                "compressed": True,
-                "original_size": len(serialized)
-            }
-        
-        return {
-            "data": serialized,
-            "compressed": False,
-            "original_size": len(serialized)
-        }
-    
-    async def _decompress_value(self, value: Dict[str, Any]) -> Any:
-        """Decompress value from storage"""
-        if isinstance(value, dict) and value.get("compressed"):
-            decompressed = gzip.decompress(value["data"])
-            return pickle.loads(decompressed)
-        elif isinstance(value, dict) and "data" in value:
-            return pickle.loads(value["data"])
+    async def _next_version(self) -> int:
+        """Version for a local write or invalidation"""
+        if self.invalidation_bus is not None and self.invalidation_bus.is_running:
+            self._version = max(self._version, await self.invalidation_bus.next_version())
         else:
-            return value
+            self._version += 1
+        return self._version
+    
+    async def _current_version(self) -> int:
+        """Version for a cache fill, taken as its load starts"""
+        if self.invalidation_bus is not None and self.invalidation_bus.is_running:
+            self._version = max(self._version, await self.invalidation_bus.current_version())
+        return self._version
+    
+    def _supersede_fills(self, kind: str, target: str, version: int):
+        """Keep loads that started before an invalidation from caching their result"""
+        for key, (fill_version, tags) in self._pending_fills.items():
+            if fill_version < version and (
+                (kind == 'key' and key == target)
+                or (kind == 'tag' and target in tags)
+                or (kind == 'pattern' and self._pattern_match(key, target))
+            ):
+                self._superseded_fills.add(key)
+    
+    def _broadcast_invalidation(self, kind: str, target: str, version: int):
+        """Tell other nodes to drop L1 entries for a key, tag or pattern written before version"""
+        self._supersede_fills(kind, target, version)
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.publish({kind: target, 'version': version})
+    
+    async def _apply_remote_invalidations(self, events: List[Dict[str, Any]]):
+        """Drop L1 entries another node invalidated, unless this node wrote them since"""
+        for event in events:
+            version = event['version']
+            kind = 'key' if 'key' in event else 'tag' if 'tag' in event else 'pattern'
+            self._supersede_fills(kind, event[kind], version)
+            if 'key' in event:
+                candidates = [event['key']]
+            elif 'tag' in event:
+                candidates = list(self._tag_index.get(event['tag'], ()))
+            else:
+                candidates = [
+                    key for key in self._memory_cache.keys()
+                    if self._pattern_match(key, event['pattern'])
+                ]
+            
+            for key in candidates:
+                entry = self._memory_cache.peek(key)
+                if entry is not None and entry.version < version:
+                    self._memory_cache.delete(key)
+                    self._remote_invalidations += 1
+            
+            if 'tag' in event:
+                keys = self._tag_index.get(event['tag'])
+                if keys is not None:
+                    keys.difference_update([key for key in keys if key not in self._memory_cache])
+                    if not keys:
+                        del self._tag_index[event['tag']]
+    
+    async def _tag_key(self, key: str, tags: Iterable[str], ttl: int, tiers: List[CacheTier]):
+        """Register a key under its tags in each tier it was written to"""
+        tags = list(tags)
+        if CacheTier.L1_MEMORY in tiers:
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+        
+        if CacheTier.L2_REDIS in tiers and self._redis_cluster:
+            try:
+                pipe = self._redis_cluster.pipeline()
+                for tag in tags:
+                    # The set lives as long as its longest-lived member
+                    pipe.eval(ADD_TO_INDEX_SCRIPT, 1, self.TAG_PREFIX + tag, key, ttl)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to tag cache key {key}: {e}")
+    
+    async def _delete_redis_keys(self, keys: Iterable[str], extra_keys: Iterable[str] = ()):
+        """Unlink keys in pipelined batches"""
+        batch_size = self.INVALIDATION_BATCH_SIZE
+        keys = list(keys)
+        
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            # Single-key commands so the cluster pipeline can route each by slot
+            pipe = self._redis_cluster.pipeline()
+            for key in batch:
+                pipe.unlink(key)
+            await pipe.execute()
+        
+        extra_keys = list(extra_keys)
+        if extra_keys:
+            pipe = self._redis_cluster.pipeline()
+            for key in extra_keys:
+                pipe.unlink(key)
+            await pipe.execute()
     
     def _pattern_match(self, key: str, pattern: str) -> bool:
-        """Simple pattern matching for key invalidation"""
-        # Convert Redis pattern to regex
-        regex_pattern = pattern.replace("*", ".*").replace("?", ".")
-        import re
-        return bool(re.match(regex_pattern, key))
+        """Redis glob-style pattern matching for key invalidation"""
+        return fnmatch.fnmatchcase(key, pattern)
     
     async def cleanup_expired(self):
         """Clean up expired cache entries"""
-        current_time = datetime.utcnow()
-        
         # Clean memory cache
-        expired_keys = [
-            key for key, entry in self._memory_cache.items()
-            if entry.expires_at <= current_time
-        ]
+        expired_count = self._memory_cache.purge_expired()
         
-        for key in expired_keys:
-            await self._delete_from_tier(key, CacheTier.L1_MEMORY)
+        # Drop tag index entries for keys no longer in memory
+        for tag, keys in list(self._tag_index.items()):
+            keys.difference_update([key for key in keys if key not in self._memory_cache])
+            if not keys:
+                del self._tag_index[tag]
         
         # Redis will handle expiration automatically
-        if expired_keys:
-            logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
+        if expired_count:
+            logger.info(f"Cleaned up {expired_count} expired cache entries")
     
     async def close(self):
         """Close cache service connections"""
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        await self._access_stats.stop()
+        if self.invalidation_bus is not None:
+            await self.invalidation_bus.stop()
         if self._redis_cluster:
             await self._redis_cluster.close()
         if self._redis_client:
@@ -552,6 +949,30 @@ class DashboardCacheKeys:
     @staticmethod
     def market_summary(timeframe: str) -> str:
         return f"market:summary:{timeframe}"
+    
+    @staticmethod
+    def realtime_kpis(window_minutes: int) -> str:
+        return f"analytics:realtime_kpis:{window_minutes}"
+
+
+class CacheTags:
+    """Invalidation tags shared by cache writers and invalidators"""
+    
+    @staticmethod
+    def zone(market_zone: str) -> str:
+        return f"zone:{market_zone}"
+    
+    @staticmethod
+    def dashboard(dashboard_id: str) -> str:
+        return f"dashboard:{dashboard_id}"
+    
+    @staticmethod
+    def user(user_id: str) -> str:
+        return f"user:{user_id}"
+    
+    @staticmethod
+    def widget(widget_id: str) -> str:
+        return f"widget:{widget_id}"
 
 
 # Cache warming strategies
@@ -573,23 +994,18 @@ class CacheWarmingStrategies:
             DashboardCacheKeys.analytics_metrics("7d", "1d"),
         ]
         
-        # Load function for each key type
         async def load_dashboard_data(key: str):
-            if ":market_summary:" in key:
-                # Load market summary data
-                timeframe = key.split(":")[-1]
-                # Return mock data - replace with actual data loader
-                return {"market_summary": f"data_for_{timeframe}"}
-            elif ":analytics_metrics:" in key:
-                # Load analytics metrics
-                parts = key.split(":")
-                timeframe, granularity = parts[-2], parts[-1]
-                return {"metrics": f"analytics_{timeframe}_{granularity}"}
-            else:
-                # Load dashboard configuration
-                return {"dashboard_config": f"config_for_{dashboard_id}"}
+            if key.startswith("market:summary:"):
+                return await load_market_summary(key)
+            if key.startswith("analytics:metrics:"):
+                return await load_analytics_metrics(key)
+            return await load_user_dashboard(key)
         
-        await cache_service.warm_cache(keys_to_warm, load_dashboard_data)
+        await cache_service.warm_cache(
+            keys_to_warm,
+            load_dashboard_data,
+            tags_for=lambda key: [CacheTags.dashboard(dashboard_id)] if key.startswith("dashboard:user:") else []
+        )
     
     @staticmethod
     async def warm_market_data(
@@ -608,16 +1024,11 @@ class CacheWarmingStrategies:
                     DashboardCacheKeys.market_data(market, timeframe)
                 )
         
-        async def load_market_data(key: str):
-            parts = key.split(":")
-            market_zone, timeframe = parts[-2], parts[-1]
-            return {
-                "prices": [100.5, 102.3, 98.7],
-                "volume": [1200, 1300, 1100],
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        
-        await cache_service.warm_cache(keys_to_warm, load_market_data)
+        await cache_service.warm_cache(
+            keys_to_warm,
+            load_market_data,
+            tags_for=lambda key: [CacheTags.zone(key.split(":")[-2])]
+        )
 
 
 # Singleton instance
@@ -629,7 +1040,9 @@ async def get_cache_service() -> PerformanceCacheService:
     global _cache_service_instance
     
     if _cache_service_instance is None:
-        _cache_service_instance = PerformanceCacheService()
+        _cache_service_instance = PerformanceCacheService(
+            invalidation_bus=RedisInvalidationBus(redis_cache)
+        )
         await _cache_service_instance.initialize()
     
     return _cache_service_instance
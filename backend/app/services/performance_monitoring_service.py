@@ -14,16 +14,17 @@ Features:
 """
 
 import asyncio
+import random
 import time
 import json
 from typing import Dict, List, Optional, Any, Tuple, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
-from collections import defaultdict, deque
-import statistics
 import logging
 
+from .metric_histograms import LogHistogram, MetricStore, RollingHistogram
+
 logger = logging.getLogger(__name__)
 
 
@@ -114,13 +115,12 @@ class PerformanceMonitoringService:
         self.sample_rate = sample_rate
         self.alert_thresholds = alert_thresholds or self._default_thresholds()
         
-        # Metric storage
-        self._metrics: Dict[str, deque] = defaultdict(
-            lambda: deque(maxlen=10000)
-        )
+        # Metric storage: histograms per (metric, labels, minute)
+        self._metrics = MetricStore(bucket_seconds=60)
         
         # Component performance tracking
         self._component_metrics: Dict[str, ComponentPerformance] = {}
+        self._component_render_times: Dict[str, RollingHistogram] = {}
         
         # Active alerts
         self._active_alerts: Dict[str, PerformanceAlert] = {}
@@ -132,8 +132,8 @@ class PerformanceMonitoringService:
         self._is_monitoring = False
         self._monitoring_task: Optional[asyncio.Task] = None
         
-        # Real-time metrics buffer
-        self._realtime_buffer: deque = deque(maxlen=1000)
+        # Latest recorded value per metric type
+        self._latest_values: Dict[str, float] = {}
         
         # Dashboard performance baselines
         self._performance_baselines: Dict[str, Dict[str, float]] = {}
@@ -176,31 +176,33 @@ class PerformanceMonitoringService:
         labels: Optional[Dict[str, str]] = None,
         metadata: Optional[Dict[str, Any]] = None
     ):
-        """Record a performance metric"""
-        if labels is None:
-            labels = {}
-        
-        metric = PerformanceMetric(
-            metric_type=metric_type,
-            value=value,
-            timestamp=datetime.utcnow(),
-            labels=labels,
-            metadata=metadata
-        )
-        
-        # Store metric
-        metric_key = f"{metric_type.value}:{self._labels_to_string(labels)}"
-        self._metrics[metric_key].append(metric)
-        
-        # Add to real-time buffer
-        self._realtime_buffer.append(metric)
+        """
+        Record a performance metric
+        
+        Every value is compared against the alert thresholds, so sampling
+        never hides a spike; a PerformanceMetric is only built when one is
+        crossed. Unsampled calls then return before anything is allocated,
+        and sampled ones are added to the series histogram in O(1).
+        """
+        metric_name = metric_type.value
+        thresholds = self.alert_thresholds.get(metric_name)
+        if thresholds and any(value > threshold for threshold in thresholds.values()):
+            await self._check_alert_conditions(
+                PerformanceMetric(
+                    metric_type=metric_type,
+                    value=value,
+                    timestamp=datetime.utcnow(),
+                    labels=labels or {},
+                    metadata=metadata
+                )
+            )
         
-        # Check for alerts
-        await self._check_alert_conditions(metric)
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
         
-        # Sample rate handling
-        if self.sample_rate < 1.0 and len(self._realtime_buffer) % int(1/self.sample_rate) != 0:
-            return  # Skip this metric based on sample rate
+        labels_key = self._labels_to_string(labels) if labels else ""
+        self._metrics.record(metric_name, labels_key, value, time.time())
+        self._latest_values[metric_name] = value
     
     async def record_dashboard_render(
         self,
@@ -298,25 +300,12 @@ class PerformanceMonitoringService:
         }
         
         # Aggregate metrics for timeframe
-        for metric_key, metric_queue in self._metrics.items():
-            recent_metrics = [
-                m for m in metric_queue
-                if m.timestamp >= start_time
-            ]
-            
-            if recent_metrics:
-                metric_type = recent_metrics[0].metric_type
-                values = [m.value for m in recent_metrics]
-                
-                summary["metrics"][metric_type.value] = {
-                    "avg": statistics.mean(values),
-                    "p50": statistics.median(values),
-                    "p95": self._percentile(values, 95),
-                    "p99": self._percentile(values, 99),
-                    "min": min(values),
-                    "max": max(values),
-                    "count": len(values)
-                }
+        since = time.time() - (end_time - start_time).total_seconds()
+        for metric_type, histogram in self._metrics.windows_by_metric(since).items():
+            metric_summary = histogram.summary()
+            # Scale sampled counts back up to estimated totals
+            metric_summary["count"] = round(histogram.count / self.sample_rate)
+            summary["metrics"][metric_type] = metric_summary
         
         # Component performance
         for component_id, performance in self._component_metrics.items():
@@ -342,39 +331,24 @@ class PerformanceMonitoringService:
     ) -> Dict[str, Any]:
         """Get real-time performance metrics"""
         current_time = datetime.utcnow()
-        five_minutes_ago = current_time - timedelta(minutes=5)
-        
-        realtime_metrics = {}
-        
-        # Filter metrics from real-time buffer
-        recent_metrics = [
-            m for m in self._realtime_buffer
-            if m.timestamp >= five_minutes_ago
-        ]
-        
-        if metric_types:
-            recent_metrics = [
-                m for m in recent_metrics
-                if m.metric_type in metric_types
-            ]
+        five_minutes_ago = time.time() - 300
         
-        # Group by metric type
-        for metric in recent_metrics:
-            metric_type = metric.metric_type.value
-            if metric_type not in realtime_metrics:
-                realtime_metrics[metric_type] = []
-            realtime_metrics[metric_type].append(metric.value)
+        names = [metric_type.value for metric_type in metric_types] if metric_types else None
         
-        # Calculate aggregates
+        # Calculate aggregates from the last five minute buckets
         result = {}
-        for metric_type, values in realtime_metrics.items():
-            if values:
-                result[metric_type] = {
-                    "current": values[-1] if values else 0,
-                    "avg_5m": statistics.mean(values),
-                    "p95_5m": self._percentile(values, 95),
-                    "trend": "increasing" if len(values) > 1 and values[-1] > values[0] else "decreasing"
-                }
+        for metric_type, histogram in self._metrics.windows_by_metric(five_minutes_ago).items():
+            if names is not None and metric_type not in names:
+                continue
+            # Trend compares the newest minute with the oldest one in the window
+            timeline = self._metrics.timeline(metric_type, five_minutes_ago)
+            first, last = timeline[0][1], timeline[-1][1]
+            result[metric_type] = {
+                "current": self._latest_values.get(metric_type, histogram.last),
+                "avg_5m": histogram.mean,
+                "p95_5m": histogram.percentile(95),
+                "trend": "increasing" if len(timeline) > 1 and last.mean > first.mean else "decreasing"
+            }
         
         return {
             "timestamp": current_time.isoformat(),
@@ -459,11 +433,10 @@ class PerformanceMonitoringService:
                 (1 - alpha) * perf.avg_response_time + alpha * render_time
             )
             
-            # Update P95 with simple moving average of last 100 renders
-            if not hasattr(perf, '_render_times'):
-                perf._render_times = deque(maxlen=100)
-            perf._render_times.append(render_time)
-            perf.p95_response_time = self._percentile(list(perf._render_times), 95)
+            # Update P95 over roughly the last 100 renders
+            render_times = self._component_render_times[component_id]
+            render_times.record(render_time)
+            perf.p95_response_time = render_times.snapshot().percentile(95)
             
             # Update other metrics
             perf.data_load_time = (
@@ -498,9 +471,8 @@ class PerformanceMonitoringService:
                 last_updated=current_time
             )
             
-            if not hasattr(self._component_metrics[component_id], '_render_times'):
-                self._component_metrics[component_id]._render_times = deque(maxlen=100)
-                self._component_metrics[component_id]._render_times.append(render_time)
+            render_times = self._component_render_times[component_id] = RollingHistogram(100)
+            render_times.record(render_time)
     
     async def _check_alert_conditions(self, metric: PerformanceMetric):
         """Check if metric triggers alert conditions"""
@@ -624,8 +596,8 @@ class PerformanceMonitoringService:
         
         # Analyze cache performance
         cache_metrics = self._get_recent_metrics(MetricType.CACHE_HIT_RATIO)
-        if cache_metrics:
-            avg_hit_ratio = statistics.mean(cache_metrics)
+        if cache_metrics.count:
+            avg_hit_ratio = cache_metrics.mean
             if avg_hit_ratio < 0.7:
                 recommendations.append(
                     OptimizationRecommendation(
@@ -643,8 +615,8 @@ class PerformanceMonitoringService:
         
         # Analyze slow queries
         db_metrics = self._get_recent_metrics(MetricType.DATABASE_QUERY_TIME)
-        if db_metrics:
-            avg_query_time = statistics.mean(db_metrics)
+        if db_metrics.count:
+            avg_query_time = db_metrics.mean
             if avg_query_time > 1.0:
                 recommendations.append(
                     OptimizationRecommendation(
@@ -685,16 +657,17 @@ class PerformanceMonitoringService:
     
     async def _analyze_performance_trends(self):
         """Analyze performance trends for proactive alerts"""
-        # Check for increasing response times
-        response_metrics = self._get_recent_metrics(MetricType.RESPONSE_TIME)
-        if len(response_metrics) >= 10:
-            # Check for trend
-            recent_avg = statistics.mean(response_metrics[-10:])
-            older_avg = statistics.mean(response_metrics[-20:-10]) if len(response_metrics) >= 20 else recent_avg
+        # Check for increasing response times: last 10 minutes vs the 10 before
+        now = time.time()
+        recent = self._metrics.window(MetricType.RESPONSE_TIME.value, now - 600)
+        if recent.count >= 10:
+            older = self._metrics.window(MetricType.RESPONSE_TIME.value, now - 1200)
+            older_count = older.count - recent.count
+            recent_avg = recent.mean
+            older_avg = (older.total - recent.total) / older_count if older_count else recent_avg
             
             if recent_avg > older_avg * 1.2:  # 20% increase
                 # Create trend alert
-                alert_id = "performance_trend_increase"
                 await self._create_trend_alert(recent_avg, older_avg)
     
     async def _create_trend_alert(self, current_avg: float, previous_avg: float):
@@ -713,18 +686,9 @@ class PerformanceMonitoringService:
         self._active_alerts[alert_id] = alert
         logger.warning(alert.message)
     
-    def _get_recent_metrics(self, metric_type: MetricType) -> List[float]:
-        """Get recent metric values of specified type"""
-        recent_metrics = []
-        cutoff_time = datetime.utcnow() - timedelta(hours=1)
-        
-        for metric_queue in self._metrics.values():
-            for metric in metric_queue:
-                if (metric.metric_type == metric_type and 
-                    metric.timestamp >= cutoff_time):
-                    recent_metrics.append(metric.value)
-        
-        return recent_metrics
+    def _get_recent_metrics(self, metric_type: MetricType) -> LogHistogram:
+        """Get the last hour of metric values of specified type"""
+        return self._metrics.window(metric_type.value, time.time() - 3600)
     
     def _labels_to_string(self, labels: Dict[str, str]) -> str:
         """Convert labels dict to string for metric key"""
@@ -743,21 +707,6 @@ class PerformanceMonitoringService:
             f"value {metric.value:.2f} exceeds threshold {threshold:.2f}"
         )
     
-    def _percentile(self, data: List[float], percentile: int) -> float:
-        """Calculate percentile"""
-        if not data:
-            return 0.0
-        
-        sorted_data = sorted(data)
-        index = (percentile / 100) * (len(sorted_data) - 1)
-        
-        if index.is_integer():
-            return sorted_data[int(index)]
-        else:
-            lower = sorted_data[int(index)]
-            upper = sorted_data[int(index) + 1]
-            return lower + (upper - lower) * (index - int(index))
-    
     def _get_start_time(self, end_time: datetime, timeframe: str) -> datetime:
         """Get start time based on timeframe string"""
         if timeframe == "5m":
@@ -777,18 +726,7 @@ class PerformanceMonitoringService:
     
     async def _cleanup_old_metrics(self):
         """Clean up old metrics to manage memory"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=self.retention_hours)
-        
-        for metric_key in list(self._metrics.keys()):
-            metric_queue = self._metrics[metric_key]
-            
-            # Remove old metrics
-            while metric_queue and metric_queue[0].timestamp < cutoff_time:
-                metric_queue.popleft()
-            
-            # Remove empty queues
-            if not metric_queue:
-                del self._metrics[metric_key]
+        self._metrics.prune(time.time() - self.retention_hours * 3600)
     
     async def _update_recommendations(self):
         """Update performance recommendations"""
@@ -799,11 +737,12 @@ class PerformanceMonitoringService:
         return {
             "status": "healthy" if self._is_monitoring else "stopped",
             "is_monitoring": self._is_monitoring,
-            "metrics_count": sum(len(queue) for queue in self._metrics.values()),
+            "metrics_count": self._metrics.sample_count,
+            "series_count": self._metrics.series_count,
             "components_count": len(self._component_metrics),
             "active_alerts": len(self._active_alerts),
             "recommendations_count": len(self._recommendations),
-            "buffer_size": len(self._realtime_buffer),
+            "sample_rate": self.sample_rate,
             "uptime": datetime.utcnow().isoformat()
         }
 
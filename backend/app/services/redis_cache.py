@@ -6,7 +6,7 @@ Provides fast caching for frequently accessed data
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from uuid import UUID
 
 import redis.asyncio as redis
@@ -14,15 +14,71 @@ from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+# INCRBY, then EXPIRE only if the key has no TTL yet (i.e. it was just created)
+INCR_WITH_TTL_SCRIPT = """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return value
+"""
+
+# SADD, then make the index set outlive its longest-lived member: EXPIRE
+# when it has no TTL or a shorter one (EXPIRE NX/GT without needing Redis 7),
+# PERSIST when the member itself never expires (ARGV[2] == 0)
+ADD_TO_INDEX_SCRIPT = """
+redis.call('SADD', KEYS[1], ARGV[1])
+local ttl = tonumber(ARGV[2])
+if ttl <= 0 then
+    redis.call('PERSIST', KEYS[1])
+    return 1
+end
+local current = redis.call('TTL', KEYS[1])
+if current == -1 or current < ttl then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# ARGV holds (limit, window seconds) per key. Returns {0, i, count} when
+# counter i is at its limit (nothing incremented), else {1, 0, counts...}
+INCREMENT_WITHIN_LIMITS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('GET', key) or '0')
+    if current >= tonumber(ARGV[2 * i - 1]) then
+        return {0, i, current}
+    end
+end
+local result = {1, 0}
+for i, key in ipairs(KEYS) do
+    local value = redis.call('INCR', key)
+    if redis.call('TTL', key) == -1 then
+        redis.call('EXPIRE', key, ARGV[2 * i])
+    end
+    result[i + 2] = value
+end
+return result
+"""
+
 
 class RedisCacheService:
     """Redis cache service for storing market data and session information"""
     
+    # Redis sets indexing keys by tag, and WebSocket connection ids by market zone
+    TAG_PREFIX = "tag:"
+    ZONE_CONNECTIONS_PREFIX = "websocket:zone:"
+    
     def __init__(self, redis_url: str = "redis://localhost:6379/0"):
         self.redis_url = redis_url
         self.redis_client: Optional[redis.Redis] = None
         self.is_connected = False
         
+        # Lua sources by name, and their loaded Script objects
+        self._script_sources: Dict[str, str] = {}
+        self._scripts: Dict[str, Any] = {}
+        self.register_script('incr_with_ttl', INCR_WITH_TTL_SCRIPT)
+        self.register_script('increment_within_limits', INCREMENT_WITHIN_LIMITS_SCRIPT)
+        
     async def initialize(self):
         """Initialize Redis connection"""
         try:
@@ -35,6 +91,9 @@ class RedisCacheService:
                 retry_on_timeout=True
             )
             
+            # Scripts are bound to a client; reload them for the new one
+            self._scripts.clear()
+            
             # Test connection
             await self.redis_client.ping()
             self.is_connected = True
@@ -44,8 +103,14 @@ class RedisCacheService:
             logger.error(f"Failed to initialize Redis client: {e}")
             raise
     
-    async def set(self, key: str, value: Union[str, int, float, dict, list], expire_seconds: Optional[int] = None) -> bool:
-        """Set a key-value pair in Redis with optional expiration"""
+    async def set(
+        self,
+        key: str,
+        value: Union[str, int, float, dict, list],
+        expire_seconds: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None
+    ) -> bool:
+        """Set a key-value pair in Redis with optional expiration and invalidation tags"""
         if not self.is_connected or not self.redis_client:
             logger.warning("Redis not connected, caching disabled")
             return False
@@ -54,7 +119,16 @@ class RedisCacheService:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value, default=str)
             
-            if expire_seconds:
+            if tags:
+                pipe = self.redis_client.pipeline(transaction=False)
+                if expire_seconds:
+                    pipe.setex(key, expire_seconds, value)
+                else:
+                    pipe.set(key, value)
+                for tag in tags:
+                    self._add_to_index(pipe, self.TAG_PREFIX + tag, key, expire_seconds)
+                await pipe.execute()
+            elif expire_seconds:
                 await self.redis_client.setex(key, expire_seconds, value)
             else:
                 await self.redis_client.set(key, value)
@@ -101,6 +175,35 @@ class RedisCacheService:
             logger.error(f"Failed to delete key {key} from Redis: {e}")
             return False
     
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete every key registered under any of the tags; returns how many were deleted"""
+        if not self.is_connected or not self.redis_client or not tags:
+            return 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.smembers(self.TAG_PREFIX + tag)
+            keys = set().union(*await pipe.execute())
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.unlink(key)
+            for tag in tags:
+                pipe.unlink(self.TAG_PREFIX + tag)
+            await pipe.execute()
+            
+            return len(keys)
+            
+        except Exception as e:
+            logger.error(f"Failed to invalidate tags {tags}: {e}")
+            return 0
+    
+    @staticmethod
+    def _add_to_index(pipe, index_key: str, member: str, expire_seconds: Optional[int]):
+        """Queue adding a member to an index set that outlives its longest-lived member"""
+        pipe.eval(ADD_TO_INDEX_SCRIPT, 1, index_key, member, expire_seconds or 0)
+    
     async def exists(self, key: str) -> bool:
         """Check if a key exists in Redis"""
         if not self.is_connected or not self.redis_client:
@@ -127,6 +230,128 @@ class RedisCacheService:
             logger.error(f"Failed to set expiration for key {key}: {e}")
             return False
     
+    # Batched Operations
+    
+    async def mget(self, keys: Iterable[str], decode_json: bool = True) -> List[Optional[Any]]:
+        """Get several values in one round trip; missing keys come back as None"""
+        keys = list(keys)
+        if not self.is_connected or not self.redis_client:
+            logger.warning("Redis not connected, caching disabled")
+            return [None] * len(keys)
+        if not keys:
+            return []
+        
+        try:
+            values = await self.redis_client.mget(keys)
+            return [self._decode(value) if decode_json else value for value in values]
+            
+        except Exception as e:
+            logger.error(f"Failed to get {len(keys)} keys from Redis: {e}")
+            return [None] * len(keys)
+    
+    async def mset(self, mapping: Dict[str, Any], expire_seconds: Optional[int] = None) -> bool:
+        """Set several key-value pairs in one round trip, optionally all with the same expiration"""
+        if not self.is_connected or not self.redis_client:
+            logger.warning("Redis not connected, caching disabled")
+            return False
+        if not mapping:
+            return True
+        
+        try:
+            encoded = {
+                key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                for key, value in mapping.items()
+            }
+            if expire_seconds:
+                # MSET has no expiry; SETEX each key in one pipeline instead
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value in encoded.items():
+                    pipe.setex(key, expire_seconds, value)
+                await pipe.execute()
+            else:
+                await self.redis_client.mset(encoded)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to set {len(mapping)} keys in Redis: {e}")
+            return False
+    
+    def pipeline(self, transaction: bool = False) -> Optional[Any]:
+        """
+        Command pipeline, or None when Redis is unavailable
+        
+        Commands queued on it are sent in one round trip by ``execute()``;
+        with ``transaction`` they run atomically in MULTI/EXEC. Use it as an
+        async context manager so it is reset afterwards.
+        """
+        if not self.is_connected or not self.redis_client:
+            return None
+        
+        return self.redis_client.pipeline(transaction=transaction)
+    
+    def register_script(self, name: str, source: str):
+        """Register a Lua script to run by name with ``run_script``"""
+        self._script_sources[name] = source
+        self._scripts.pop(name, None)
+    
+    async def run_script(self, name: str, keys: Iterable[str] = (), args: Iterable[Any] = ()) -> Optional[Any]:
+        """Run a registered Lua script (EVALSHA, loading it on first use); None on failure"""
+        if not self.is_connected or not self.redis_client:
+            return None
+        
+        try:
+            script = self._scripts.get(name)
+            if script is None:
+                script = self._scripts[name] = self.redis_client.register_script(self._script_sources[name])
+            return await script(keys=list(keys), args=list(args))
+            
+        except Exception as e:
+            logger.error(f"Failed to run Redis script {name}: {e}")
+            return None
+    
+    async def incr_with_ttl(self, key: str, expire_seconds: int, amount: int = 1) -> Optional[int]:
+        """
+        Increment a counter and give it a TTL if it has none, in one round trip
+        
+        The TTL is only set when the counter is created, so the window is
+        fixed from the first increment rather than pushed back by every hit.
+        """
+        result = await self.run_script('incr_with_ttl', keys=[key], args=[amount, expire_seconds])
+        return int(result) if result is not None else None
+    
+    async def increment_within_limits(
+        self,
+        counters: List[Tuple[str, int, int]]
+    ) -> Optional[Tuple[bool, Optional[int], List[int]]]:
+        """
+        Atomically check and increment several windowed counters
+        
+        ``counters`` is a list of (key, limit, window_seconds). If any counter
+        is already at its limit nothing is incremented. Returns (allowed,
+        index of the exhausted counter or None, counts), where counts are the
+        new values when allowed and the exhausted counter's value otherwise;
+        None if Redis is unavailable. All keys must live on one Redis node.
+        """
+        args = []
+        for _, limit, window_seconds in counters:
+            args.extend([limit, window_seconds])
+        
+        result = await self.run_script('increment_within_limits', keys=[key for key, _, _ in counters], args=args)
+        if result is None:
+            return None
+        
+        allowed, exceeded, *counts = [int(value) for value in result]
+        return bool(allowed), (exceeded - 1 if not allowed else None), counts
+    
+    @staticmethod
+    def _decode(value: Optional[str]) -> Optional[Any]:
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    
     # Market Data Caching Methods
     
     async def cache_market_data(self, market_zone: str, timestamp: datetime, data: Dict[str, Any], expire_seconds: int = 300):
@@ -186,18 +411,37 @@ class RedisCacheService:
             'user_id': str(user_id) if user_id else None,
             'created_at': datetime.utcnow().isoformat()
         }
-        key = f"websocket:{connection_id}"
-        return await self.set(key, connection_data, expire_seconds)
+        if not self.is_connected or not self.redis_client:
+            logger.warning("Redis not connected, caching disabled")
+            return False
+        
+        try:
+            # The per-zone set lets zone lookups skip a keyspace scan
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(f"websocket:{connection_id}", expire_seconds, json.dumps(connection_data))
+            self._add_to_index(pipe, self.ZONE_CONNECTIONS_PREFIX + market_zone, connection_id, expire_seconds)
+            await pipe.execute()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to cache WebSocket connection {connection_id}: {e}")
+            return False
     
     async def get_websocket_connection(self, connection_id: str) -> Optional[Dict[str, Any]]:
         """Get WebSocket connection information"""
         key = f"websocket:{connection_id}"
         return await self.get(key)
     
-    async def invalidate_websocket_connection(self, connection_id: str):
+    async def invalidate_websocket_connection(self, connection_id: str, market_zone: Optional[str] = None):
         """Invalidate WebSocket connection"""
         key = f"websocket:{connection_id}"
         await self.delete(key)
+        
+        if market_zone and self.is_connected and self.redis_client:
+            try:
+                await self.redis_client.srem(self.ZONE_CONNECTIONS_PREFIX + market_zone, connection_id)
+            except Exception as e:
+                logger.error(f"Failed to unindex WebSocket connection {connection_id}: {e}")
     
     async def get_connections_by_market_zone(self, market_zone: str) -> list:
         """Get all active connections for a market zone"""
@@ -205,21 +449,57 @@ class RedisCacheService:
             return []
         
         try:
-            pattern = f"websocket:*"
-            keys = await self.redis_client.keys(pattern)
+            index_key = self.ZONE_CONNECTIONS_PREFIX + market_zone
+            connection_ids = list(await self.redis_client.smembers(index_key))
+            if not connection_ids:
+                return []
+            
+            values = await self.redis_client.mget([f"websocket:{cid}" for cid in connection_ids])
             connections = []
+            expired = []
             
-            for key in keys:
-                connection_data = await self.get(key.replace('websocket:', ''))
-                if connection_data and connection_data.get('market_zone') == market_zone:
+            for connection_id, value in zip(connection_ids, values):
+                if value is None:
+                    expired.append(connection_id)
+                    continue
+                connection_data = json.loads(value)
+                if connection_data.get('market_zone') == market_zone:
                     connections.append(connection_data)
             
+            # Connections whose key expired without an explicit invalidation
+            if expired:
+                await self.redis_client.srem(index_key, *expired)
+            
             return connections
             
         except Exception as e:
             logger.error(f"Failed to get connections for market zone {market_zone}: {e}")
             return []
     
+    # Pub/Sub Methods
+    
+    async def publish(self, channel: str, message: Union[str, dict, list]) -> int:
+        """Publish a message to a channel, returning the number of subscribers that received it"""
+        if not self.is_connected or not self.redis_client:
+            return 0
+        
+        try:
+            if isinstance(message, (dict, list)):
+                message = json.dumps(message, default=str)
+            
+            return await self.redis_client.publish(channel, message)
+            
+        except Exception as e:
+            logger.error(f"Failed to publish to channel {channel}: {e}")
+            return 0
+    
+    def pubsub(self) -> Optional[Any]:
+        """Create a dedicated pub/sub connection, or None when Redis is unavailable"""
+        if not self.is_connected or not self.redis_client:
+            return None
+        
+        return self.redis_client.pubsub(ignore_subscribe_messages=True)
+    
     async def close(self):
         """Close Redis connection"""
         if self.redis_client:
@@ -0,0 +1,362 @@
+"""
+TimescaleDB Storage for Real-time Market Data
+Hypertable management, OHLCV rollups and batched COPY writes for validated market prices
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.config import settings
+from ..crud.market_rollups import PRICE_ROLLUPS, PriceRollup, floor_time
+from .market_data_integration import MarketPrice, MarketZone
+
+logger = logging.getLogger(__name__)
+
+
+class TimescaleMarketDataStore:
+    """
+    Stores validated market prices in the ``market_data`` hypertable
+
+    Prices are buffered and written with a single COPY per flush over the
+    engine's asyncpg connection. A failed flush keeps its rows buffered (up
+    to ``max_buffered_rows``, handing the oldest beyond that to ``on_drop``)
+    for the next attempt, so callers can treat a successful ``flush`` as
+    "everything so far is durable".
+
+    The 5-minute, hourly and daily rollups are real-time continuous
+    aggregates, so committed rows show up in them immediately; refresh
+    policies materialize recent buckets incrementally. Rows older than the
+    5-minute policy window (late data, backfills) are outside every policy,
+    so their range is refreshed explicitly at most every
+    ``rollup_refresh_interval`` seconds.
+    """
+
+    TABLE = "market_data"
+    TIME_COLUMN = "timestamp"
+    COLUMNS = (
+        'timestamp', 'market_zone', 'price_type', 'location', 'price', 'volume',
+        'congestion_cost', 'loss_cost', 'renewable_percentage', 'load_forecast'
+    )
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        chunk_interval: Optional[str] = None,
+        compress_after: Optional[str] = None,
+        retain_for: Optional[str] = None,
+        batch_size: int = 1000,
+        max_buffered_rows: int = 100000,
+        rollup_refresh_interval: float = 60.0,
+        on_drop: Optional[Callable[[List[MarketPrice]], None]] = None
+    ):
+        self.engine = engine
+        self.chunk_interval = chunk_interval or settings.TIMESCALE_CHUNK_INTERVAL
+        self.compress_after = compress_after or settings.TIMESCALE_COMPRESS_AFTER
+        self.retain_for = retain_for or settings.TIMESCALE_RETENTION_PERIOD
+        self.batch_size = batch_size
+        self.max_buffered_rows = max_buffered_rows
+        self.rollup_refresh_interval = rollup_refresh_interval
+        self.on_drop = on_drop
+
+        self._buffer: List[Tuple[Any, ...]] = []
+        self._late_range: Optional[Tuple[datetime, datetime]] = None
+        self._last_rollup_refresh = 0.0
+        self.schema_ready = False
+        self.rollups_ready = False
+        self.stats = {
+            'rows_written': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+            'rows_dropped': 0,
+            'rollup_refreshes': 0,
+            'rollup_refresh_failures': 0
+        }
+
+    async def ensure_schema(self):
+        """Create the hypertable and apply chunking, compression and retention settings"""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "SELECT create_hypertable(:table, :time_column, "
+                    "chunk_time_interval => CAST(:chunk_interval AS INTERVAL), "
+                    "if_not_exists => TRUE, migrate_data => TRUE)"
+                ),
+                {'table': self.TABLE, 'time_column': self.TIME_COLUMN, 'chunk_interval': self.chunk_interval}
+            )
+            # create_hypertable leaves an existing table's interval alone; this applies to new chunks
+            await conn.execute(
+                text("SELECT set_chunk_time_interval(:table, CAST(:chunk_interval AS INTERVAL))"),
+                {'table': self.TABLE, 'chunk_interval': self.chunk_interval}
+            )
+
+        await self._enable_compression()
+        await self.set_compression_policy(self.compress_after)
+        await self.set_retention_policy(self.retain_for)
+        await self._ensure_rollups()
+        self.schema_ready = True
+        logger.info(
+            f"Timescale storage ready: {self.TABLE} chunks {self.chunk_interval}, "
+            f"compress after {self.compress_after}, retain {self.retain_for}"
+        )
+
+    async def _enable_compression(self):
+        """Segment compressed chunks by zone and location so per-series scans stay cheap"""
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(
+                    f"ALTER TABLE {self.TABLE} SET ("
+                    "timescaledb.compress, "
+                    "timescaledb.compress_segmentby = 'market_zone, location, price_type', "
+                    f"timescaledb.compress_orderby = '{self.TIME_COLUMN} DESC')"
+                ))
+        except Exception as e:
+            # Settings cannot change while compressed chunks exist; keep the current ones
+            logger.warning(f"Could not update compression settings for {self.TABLE}: {e}")
+
+    async def set_compression_policy(self, compress_after: str):
+        """Compress chunks once they are older than ``compress_after`` (e.g. '7 days')"""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("SELECT remove_compression_policy(:table, if_exists => TRUE)"),
+                {'table': self.TABLE}
+            )
+            await conn.execute(
+                text("SELECT add_compression_policy(:table, CAST(:compress_after AS INTERVAL))"),
+                {'table': self.TABLE, 'compress_after': compress_after}
+            )
+        self.compress_after = compress_after
+
+    async def set_retention_policy(self, retain_for: str):
+        """Drop chunks once they are older than ``retain_for`` (e.g. '365 days')"""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("SELECT remove_retention_policy(:table, if_exists => TRUE)"),
+                {'table': self.TABLE}
+            )
+            await conn.execute(
+                text("SELECT add_retention_policy(:table, CAST(:retain_for AS INTERVAL))"),
+                {'table': self.TABLE, 'retain_for': retain_for}
+            )
+        self.retain_for = retain_for
+
+    async def _ensure_rollups(self):
+        """Create the OHLCV continuous aggregates, finest first, with their refresh policies"""
+        try:
+            async with self.engine.begin() as conn:
+                for rollup in PRICE_ROLLUPS:
+                    await conn.execute(text(self._rollup_definition(rollup)))
+                    await conn.execute(
+                        text(
+                            "SELECT add_continuous_aggregate_policy(:view, "
+                            "start_offset => CAST(:start_offset AS INTERVAL), "
+                            "end_offset => CAST(:end_offset AS INTERVAL), "
+                            "schedule_interval => CAST(:schedule_interval AS INTERVAL), "
+                            "if_not_exists => TRUE)"
+                        ),
+                        {
+                            'view': rollup.name,
+                            'start_offset': self._interval(rollup.refresh_start_offset),
+                            'end_offset': self._interval(rollup.refresh_end_offset),
+                            'schedule_interval': self._interval(rollup.refresh_interval)
+                        }
+                    )
+            self.rollups_ready = True
+        except Exception as e:
+            # Hierarchical continuous aggregates need TimescaleDB 2.9+; raw queries still work
+            logger.warning(f"Could not set up market price rollups for {self.TABLE}: {e}")
+
+    def _rollup_definition(self, rollup: PriceRollup) -> str:
+        """Continuous aggregate for one rollup level, built on the level below it"""
+        interval = f"INTERVAL '{self._interval(rollup.bucket)}'"
+        if rollup.source == self.TABLE:
+            time_column = self.TIME_COLUMN
+            aggregates = (
+                f"first(price, {time_column}) AS open, max(price) AS high, min(price) AS low, "
+                f"last(price, {time_column}) AS close, sum(price) AS price_sum, "
+                "count(price) AS price_count, sum(volume) AS volume, count(*) AS record_count"
+            )
+        else:
+            time_column = "bucket"
+            aggregates = (
+                "first(open, bucket) AS open, max(high) AS high, min(low) AS low, "
+                "last(close, bucket) AS close, sum(price_sum) AS price_sum, "
+                "sum(price_count) AS price_count, sum(volume) AS volume, sum(record_count) AS record_count"
+            )
+
+        return (
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {rollup.name} "
+            "WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS "
+            f"SELECT time_bucket({interval}, {time_column}) AS bucket, "
+            f"market_zone, location, price_type, {aggregates} "
+            f"FROM {rollup.source} "
+            f"GROUP BY time_bucket({interval}, {time_column}), market_zone, location, price_type "
+            "WITH NO DATA"
+        )
+
+    @staticmethod
+    def _interval(value: timedelta) -> str:
+        return f"{int(value.total_seconds())} seconds"
+
+    async def refresh_rollups(self, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """
+        Re-materialize every rollup level over ``[start, end)``
+
+        Defaults to the range of late rows written since the last refresh.
+        Each level's window is widened to the whole buckets holding ``start``
+        and ``end``, since TimescaleDB only refreshes buckets that lie
+        entirely inside it.
+        """
+        if start is None or end is None:
+            if self._late_range is None:
+                return
+            start, end = self._late_range
+        self._late_range = None
+        self._last_rollup_refresh = time.monotonic()
+
+        try:
+            # refresh_continuous_aggregate cannot run inside a transaction
+            async with self.engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                for rollup in PRICE_ROLLUPS:
+                    await conn.execute(
+                        text(
+                            "CALL refresh_continuous_aggregate(:view, "
+                            "CAST(:window_start AS TIMESTAMPTZ), CAST(:window_end AS TIMESTAMPTZ))"
+                        ),
+                        {
+                            'view': rollup.name,
+                            'window_start': floor_time(start, rollup.bucket),
+                            'window_end': floor_time(end, rollup.bucket) + rollup.bucket
+                        }
+                    )
+            self.stats['rollup_refreshes'] += 1
+        except Exception as e:
+            self.stats['rollup_refresh_failures'] += 1
+            logger.warning(f"Failed to refresh market price rollups for {start} - {end}: {e}")
+
+    def _track_late_rows(self, records: List[Tuple[Any, ...]]):
+        """Widen the pending refresh range by rows older than the 5-minute policy window"""
+        oldest = min(record[0] for record in records)
+        now = datetime.now(timezone.utc) if oldest.tzinfo else datetime.utcnow()
+        if oldest >= now - PRICE_ROLLUPS[0].refresh_start_offset:
+            return
+
+        newest = max(record[0] for record in records)
+        if self._late_range is not None:
+            oldest = min(oldest, self._late_range[0])
+            newest = max(newest, self._late_range[1])
+        self._late_range = (oldest, newest)
+
+    async def get_policies(self) -> List[Dict[str, Any]]:
+        """Background jobs TimescaleDB runs for the table"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    "SELECT job_id, proc_name, schedule_interval, config "
+                    "FROM timescaledb_information.jobs WHERE hypertable_name = :table"
+                ),
+                {'table': self.TABLE}
+            )
+            return [dict(row._mapping) for row in result]
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self._buffer)
+
+    async def add(self, price_data: MarketPrice) -> bool:
+        """Buffer a price; flushes when the batch is full. Returns False if that flush failed"""
+        self._buffer.append(self._to_record(price_data))
+        if len(self._buffer) >= self.batch_size:
+            return await self.flush()
+        return True
+
+    async def flush(self) -> bool:
+        """Write all buffered prices with one COPY; True once they are durable"""
+        if not self._buffer:
+            return True
+
+        records, self._buffer = self._buffer, []
+        try:
+            await self._copy_records(records)
+        except Exception as e:
+            self.stats['flush_failures'] += 1
+            logger.error(f"Failed to write {len(records)} market prices to {self.TABLE}: {e}")
+
+            # Keep the rows for the next flush, shedding the oldest beyond the cap
+            self._buffer = records + self._buffer
+            overflow = len(self._buffer) - self.max_buffered_rows
+            if overflow > 0:
+                dropped = self._buffer[:overflow]
+                del self._buffer[:overflow]
+                self.stats['rows_dropped'] += overflow
+                logger.warning(f"Dropped {overflow} buffered market prices after repeated write failures")
+                if self.on_drop is not None:
+                    self.on_drop([self._from_record(record) for record in dropped])
+            return False
+
+        self.stats['flushes'] += 1
+        self.stats['rows_written'] += len(records)
+
+        if self.rollups_ready:
+            self._track_late_rows(records)
+            if (
+                self._late_range is not None
+                and time.monotonic() - self._last_rollup_refresh >= self.rollup_refresh_interval
+            ):
+                await self.refresh_rollups()
+        return True
+
+    async def _copy_records(self, records: List[Tuple[Any, ...]]):
+        async with self.engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+
+            if hasattr(driver_connection, 'copy_records_to_table'):
+                await driver_connection.copy_records_to_table(self.TABLE, records=records, columns=self.COLUMNS)
+                return
+
+            # Non-asyncpg drivers: fall back to a multi-row INSERT
+            placeholders = ", ".join(f":{column}" for column in self.COLUMNS)
+            await conn.execute(
+                text(f"INSERT INTO {self.TABLE} ({', '.join(self.COLUMNS)}) VALUES ({placeholders})"),
+                [dict(zip(self.COLUMNS, record)) for record in records]
+            )
+            await conn.commit()
+
+    @staticmethod
+    def _to_record(price_data: MarketPrice) -> Tuple[Any, ...]:
+        return (
+            price_data.timestamp,
+            price_data.market_zone.value,
+            price_data.price_type,
+            price_data.location,
+            price_data.price,
+            price_data.volume,
+            price_data.congestion_cost,
+            price_data.loss_cost,
+            price_data.renewable_percentage,
+            price_data.load_forecast
+        )
+
+    @classmethod
+    def _from_record(cls, record: Tuple[Any, ...]) -> MarketPrice:
+        values = dict(zip(cls.COLUMNS, record))
+        values['market_zone'] = MarketZone(values['market_zone'])
+        return MarketPrice(**values)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'pending_rows': self.pending_rows,
+            'schema_ready': self.schema_ready,
+            'rollups_ready': self.rollups_ready,
+            'late_range': [bound.isoformat() for bound in self._late_range] if self._late_range else None,
+            'chunk_interval': self.chunk_interval,
+            'compress_after': self.compress_after,
+            'retain_for': self.retain_for
+        }
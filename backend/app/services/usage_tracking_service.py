@@ -4,17 +4,17 @@ Handles real-time usage tracking, rate limiting, and quota management
 """
 import asyncio
 import json
-import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from uuid import UUID, uuid4
 from collections import defaultdict, deque
 
 import asyncpg
-import redis.asyncio as redis
 from fastapi import HTTPException, status
 from pydantic import BaseModel, Field
 
+from .redis_cache import RedisCacheService
+
 
 class UsageEvent(BaseModel):
     """Usage event for tracking"""
@@ -56,9 +56,9 @@ class QuotaStatus(BaseModel):
 class UsageTrackingService:
     """Comprehensive usage tracking and rate limiting service"""
     
-    def __init__(self, db_pool: asyncpg.Pool, redis_pool: redis.Redis, billing_service):
+    def __init__(self, db_pool: asyncpg.Pool, redis_cache: RedisCacheService, billing_service):
         self.db_pool = db_pool
-        self.redis_pool = redis_pool
+        self.redis_cache = redis_cache
         self.billing_service = billing_service
         self._rate_limit_configs: Dict[str, RateLimitConfig] = {}
         self._quota_cache = {}
@@ -230,14 +230,9 @@ class UsageTrackingService:
         """Update quota status in Redis for real-time tracking"""
         period_key = f"usage:{organization_id}:{event_type}:{period_start.date()}"
         
-        async with self.redis_pool as redis_client:
-            # Increment usage count for today
-            await redis_client.incr(period_key)
-            
-            # Set expiration to end of billing period
-            ttl = int((period_end - datetime.utcnow()).total_seconds())
-            if ttl > 0:
-                await redis_client.expire(period_key, ttl)
+        # Increment and expire at the end of the billing period in one round trip
+        ttl = int((period_end - datetime.utcnow()).total_seconds())
+        await self.redis_cache.incr_with_ttl(period_key, expire_seconds=max(ttl, 0))
     
     async def _update_quota_in_db(
         self,
@@ -290,10 +285,9 @@ class UsageTrackingService:
         
         # Check Redis first for real-time data
         period_key = f"usage:{organization_id}:{event_type}:{period_start.date()}"
-        async with self.redis_pool as redis_client:
-            redis_value = await redis_client.get(period_key)
-            if redis_value:
-                return int(redis_value)
+        redis_value = await self.redis_cache.get(period_key)
+        if redis_value:
+            return int(redis_value)
         
         # Fallback to database
         async with self.db_pool.acquire() as conn:
@@ -323,59 +317,31 @@ class UsageTrackingService:
         if not config or not config.enabled:
             return True, {"allowed": True, "reason": "Rate limiting disabled"}
         
-        # Check burst limit
-        burst_key = f"rate_limit:{organization_id}:{endpoint}:burst"
-        async with self.redis_pool as redis_client:
-            current_burst = await redis_client.get(burst_key)
-            if current_burst and int(current_burst) >= config.burst_limit:
-                return False, {
-                    "allowed": False,
-                    "reason": "Burst limit exceeded",
-                    "current": int(current_burst),
-                    "limit": config.burst_limit
-                }
-            
-            # Increment burst counter
-            await redis_client.incr(burst_key)
-            await redis_client.expire(burst_key, 60)  # 1 minute burst window
-        
-        # Check hourly limit
-        hourly_key = f"rate_limit:{organization_id}:{endpoint}:hourly"
-        current_hour = datetime.utcnow().hour
-        hourly_key += f":{current_hour}"
-        
-        async with self.redis_pool as redis_client:
-            current_hourly = await redis_client.get(hourly_key)
-            if current_hourly and int(current_hourly) >= config.limit_per_hour:
-                return False, {
-                    "allowed": False,
-                    "reason": "Hourly limit exceeded",
-                    "current": int(current_hourly),
-                    "limit": config.limit_per_hour
-                }
-            
-            # Increment hourly counter
-            await redis_client.incr(hourly_key)
-            await redis_client.expire(hourly_key, 3600)  # 1 hour window
-        
-        # Check daily limit
-        daily_key = f"rate_limit:{organization_id}:{endpoint}:daily"
-        current_date = datetime.utcnow().date().isoformat()
-        daily_key += f":{current_date}"
-        
-        async with self.redis_pool as redis_client:
-            current_daily = await redis_client.get(daily_key)
-            if current_daily and int(current_daily) >= config.limit_per_day:
-                return False, {
-                    "allowed": False,
-                    "reason": "Daily limit exceeded",
-                    "current": int(current_daily),
-                    "limit": config.limit_per_day
-                }
-            
-            # Increment daily counter
-            await redis_client.incr(daily_key)
-            await redis_client.expire(daily_key, 86400)  # 24 hour window
+        now = datetime.utcnow()
+        key_prefix = f"rate_limit:{organization_id}:{endpoint}"
+        windows = [
+            ("Burst limit exceeded", f"{key_prefix}:burst", config.burst_limit, 60),
+            ("Hourly limit exceeded", f"{key_prefix}:hourly:{now.hour}", config.limit_per_hour, 3600),
+            ("Daily limit exceeded", f"{key_prefix}:daily:{now.date().isoformat()}", config.limit_per_day, 86400)
+        ]
+        
+        # Check and increment burst, hourly and daily counters in one atomic round trip
+        result = await self.redis_cache.increment_within_limits(
+            [(key, limit, window_seconds) for _, key, limit, window_seconds in windows]
+        )
+        if result is None:
+            # Fail open rather than rejecting traffic while Redis is unavailable
+            return True, {"allowed": True, "reason": "Rate limit store unavailable"}
+        
+        allowed, exceeded, counts = result
+        if not allowed:
+            reason, _, limit, _ = windows[exceeded]
+            return False, {
+                "allowed": False,
+                "reason": reason,
+                "current": counts[0],
+                "limit": limit
+            }
         
         return True, {"allowed": True, "reason": "Within limits"}
     
@@ -604,28 +570,37 @@ class UsageTrackingService:
                 WHERE timestamp < $1
             """, cutoff_date)
         
-        # Also cleanup Redis data
-        pattern = "usage:*"
-        async with self.redis_pool as redis_client:
-            keys = await redis_client.keys(pattern)
-            if keys:
-                # Only delete old keys
-                current_time = time.time()
-                for key in keys:
-                    ttl = await redis_client.ttl(key)
-                    if ttl == -1:  # No expiration set
-                        await redis_client.delete(key)
-                    elif ttl > 0 and (current_time + ttl) < (cutoff_date.timestamp()):
-                        await redis_client.delete(key)
+        # Also cleanup Redis data: usage counters left without an expiration
+        if self.redis_cache.is_connected and self.redis_cache.redis_client:
+            redis_client = self.redis_cache.redis_client
+            batch = []
+            async for key in redis_client.scan_iter(match="usage:*", count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    await self._delete_unexpiring(batch)
+                    batch = []
+            if batch:
+                await self._delete_unexpiring(batch)
         
         return int(result.split()[-1])  # Return number of deleted rows
+    
+    async def _delete_unexpiring(self, keys: List[str]):
+        """Delete the keys that have no TTL, using two pipelined round trips"""
+        pipe = self.redis_cache.pipeline()
+        for key in keys:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+        
+        stale = [key for key, ttl in zip(keys, ttls) if ttl == -1]
+        if stale:
+            await self.redis_cache.redis_client.unlink(*stale)
 
 
 # Dependency injection function
 def get_usage_tracking_service(
     db_pool: asyncpg.Pool, 
-    redis_pool: redis.Redis, 
+    redis_cache: RedisCacheService, 
     billing_service
 ) -> UsageTrackingService:
     """Get usage tracking service instance"""
-    return UsageTrackingService(db_pool, redis_pool, billing_service)
\ No newline at end of file
+    return UsageTrackingService(db_pool, redis_cache, billing_service)
\ No newline at end of file
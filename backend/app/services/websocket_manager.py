@@ -6,8 +6,10 @@ Handles WebSocket connections for live price updates and market data streaming
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 from uuid import UUID, uuid4
 
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
@@ -16,26 +18,170 @@ from jose import jwt, JWTError
 
 from ..core.config import settings
 from ..core.database import AsyncSession
+from ..core.tasks import TaskSet
+from ..core.tracing import SpanContext, tracer
 from ..crud import user as crud_user
 from .redis_cache import redis_cache
+from .wire_format import Frame, WireEncoding, wire_codec
 
 logger = logging.getLogger(__name__)
 
+# Message types whose newer instances supersede older ones for the same key
+CONFLATABLE_MESSAGE_TYPES = {'price_update', 'price_change'}
+
+
+class ConnectionSendQueue:
+    """
+    Bounded outbound queue for a single WebSocket connection
+    
+    Entries may carry a conflation key (market ticks). While there is room
+    every message is kept; once the queue is full a new tick replaces the
+    pending ticks for the same key, or failing that the oldest pending tick
+    of any key. Messages without a key are never shed in favour of ticks, so
+    ``put`` returns False when the queue is full of them.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        # Entries are mutable [conflation_key, payload] pairs; a payload of
+        # None marks a slot that was superseded and is skipped on read
+        self._entries: Deque[List[Any]] = deque()
+        self._keyed: Dict[str, Deque[List[Any]]] = {}
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self.conflated = 0
+        self.dropped = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def put(self, payload: Frame, conflation_key: Optional[str] = None) -> bool:
+        """Queue a payload without blocking; returns False if it had to be rejected"""
+        if self._size >= self.maxsize:
+            if conflation_key is not None and conflation_key in self._keyed:
+                self._conflate(conflation_key, payload)
+                return True
+            if not self._evict_oldest_tick():
+                self.dropped += 1
+                return False
+        
+        entry = [conflation_key, payload]
+        self._entries.append(entry)
+        if conflation_key is not None:
+            self._keyed.setdefault(conflation_key, deque()).append(entry)
+        self._size += 1
+        
+        # Superseded slots are skipped lazily; compact once they pile up
+        if len(self._entries) > 2 * self.maxsize:
+            self._entries = deque(e for e in self._entries if e[1] is not None)
+        
+        self._not_empty.set()
+        return True
+    
+    async def get(self) -> Frame:
+        """Wait for and return the next payload"""
+        while True:
+            while self._entries:
+                key, payload = entry = self._entries.popleft()
+                if payload is None:
+                    continue
+                if key is not None:
+                    self._release_key(key)
+                self._size -= 1
+                return payload
+            
+            self._not_empty.clear()
+            await self._not_empty.wait()
+    
+    def _conflate(self, key: str, payload: Frame):
+        """Collapse all pending ticks for a key into the newest payload"""
+        pending = self._keyed[key]
+        # The oldest slot keeps its place in line and takes the newest payload
+        pending[0][1] = payload
+        self.conflated += 1
+        while len(pending) > 1:
+            stale = pending.pop()
+            stale[1] = None
+            self._size -= 1
+            self.conflated += 1
+    
+    def _evict_oldest_tick(self) -> bool:
+        """Drop the oldest pending tick of any key to make room"""
+        for entry in self._entries:
+            if entry[0] is not None and entry[1] is not None:
+                self._release_key(entry[0])
+                entry[1] = None
+                self._size -= 1
+                self.dropped += 1
+                return True
+        return False
+    
+    def _release_key(self, key: str):
+        """Forget the oldest pending entry for a key"""
+        pending = self._keyed[key]
+        pending.popleft()
+        if not pending:
+            del self._keyed[key]
+
+
 # Connection manager for WebSocket connections
 class ConnectionManager:
     """Manages WebSocket connections and broadcasts"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        send_timeout: Optional[float] = None,
+        slow_consumer_threshold: Optional[int] = None,
+        slow_consumer_max_timeouts: Optional[int] = None,
+        send_queue_size: Optional[int] = None
+    ):
         # Track active connections by market zone
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         # Track connection metadata
         self.connection_metadata: Dict[WebSocket, Dict] = {}
         # Security scheme for token validation
         self.security = HTTPBearer()
+        
+        # Broadcast tuning
+        self.send_timeout = send_timeout if send_timeout is not None else settings.WEBSOCKET_SEND_TIMEOUT_SECONDS
+        self.slow_consumer_threshold = (
+            slow_consumer_threshold if slow_consumer_threshold is not None
+            else settings.WEBSOCKET_SLOW_CONSUMER_THRESHOLD
+        )
+        self.slow_consumer_max_timeouts = (
+            slow_consumer_max_timeouts if slow_consumer_max_timeouts is not None
+            else settings.WEBSOCKET_SLOW_CONSUMER_MAX_TIMEOUTS
+        )
+        self.send_queue_size = send_queue_size or settings.WEBSOCKET_SEND_QUEUE_SIZE
+        
+        # Every connection gets a bounded outbound queue drained by its own
+        # writer task; broadcasts only enqueue and never wait on a socket
+        self._send_queues: Dict[WebSocket, ConnectionSendQueue] = {}
+        self._writer_tasks: Dict[WebSocket, asyncio.Task] = {}
+        
+        # Sockets whose sends keep missing the timeout; their queues are the
+        # ones that fill up and start conflating ticks
+        self.slow_consumers: Set[WebSocket] = set()
+        self._send_timeouts: Dict[WebSocket, int] = {}
+        
+        self.broadcast_stats = {
+            'messages_broadcast': 0,
+            'send_failures': 0,
+            'send_timeouts': 0,
+            'queue_overflows': 0,
+            'slow_consumers_disconnected': 0
+        }
     
-    async def connect(self, websocket: WebSocket, market_zone: str, user_id: Optional[UUID] = None):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        market_zone: str,
+        user_id: Optional[UUID] = None,
+        encoding: WireEncoding = WireEncoding.JSON,
+        subprotocol: Optional[str] = None
+    ):
         """Accept a new WebSocket connection"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
         
         # Add to active connections
         if market_zone not in self.active_connections:
@@ -48,10 +194,15 @@ class ConnectionManager:
             'user_id': user_id,
             'connected_at': datetime.utcnow(),
             'market_zone': market_zone,
-            'connection_id': str(uuid4())
+            'connection_id': str(uuid4()),
+            'encoding': encoding
         }
         self.connection_metadata[websocket] = connection_data
         
+        if encoding == WireEncoding.COLUMNAR:
+            # Columnar ticks reference dictionary ids registered before this client joined
+            self._enqueue(websocket, wire_codec.dictionary_frame())
+        
         # Cache connection in Redis
         await redis_cache.cache_websocket_connection(
             connection_data['connection_id'],
@@ -86,15 +237,21 @@ class ConnectionManager:
             # Invalidate connection in Redis
             connection_id = metadata.get('connection_id')
             if connection_id:
-                asyncio.create_task(redis_cache.invalidate_websocket_connection(connection_id))
+                asyncio.create_task(redis_cache.invalidate_websocket_connection(connection_id, market_zone))
             
             # Remove metadata
             del self.connection_metadata[websocket]
+            self._discard_send_state(websocket)
             
             logger.info(f"WebSocket disconnected: {connection_id} from zone {market_zone}")
     
     async def send_personal_message(self, websocket: WebSocket, message: dict):
         """Send a message to a specific WebSocket connection"""
+        if websocket in self.connection_metadata:
+            # Keep ordering with broadcasts by going through the writer task
+            self._enqueue(websocket, self._encode(message, self._connection_encoding(websocket), {websocket})[0])
+            return
+        
         try:
             await websocket.send_text(json.dumps(message))
         except Exception as e:
@@ -106,37 +263,192 @@ class ConnectionManager:
         if market_zone not in self.active_connections:
             return
         
-        disconnected_connections = []
-        
-        for connection in self.active_connections[market_zone].copy():
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to broadcast to connection: {e}")
-                disconnected_connections.append(connection)
-        
-        # Clean up disconnected connections
-        for connection in disconnected_connections:
-            self.disconnect(connection)
+        await self._fan_out(list(self.active_connections[market_zone]), message)
     
     async def broadcast_to_all_zones(self, message: dict):
         """Broadcast a message to all connected clients"""
-        all_connections = []
+        all_connections: Set[WebSocket] = set()
         for zone_connections in self.active_connections.values():
-            all_connections.extend(zone_connections)
+            all_connections.update(zone_connections)
         
-        disconnected_connections = []
+        await self._fan_out(list(all_connections), message)
+    
+    async def _fan_out(self, connections: List[WebSocket], message: dict):
+        """
+        Serialize a message once per wire encoding and queue it for every connection
         
-        for connection in all_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to broadcast to connection: {e}")
-                disconnected_connections.append(connection)
+        Delivery happens in each connection's writer task, so a slow client
+        only ever backs up its own queue.
+        """
+        if not connections:
+            return
+        
+        payloads: Dict[WireEncoding, Tuple[Frame, Optional[str]]] = {}
+        conflation_key = self._conflation_key(message)
+        self.broadcast_stats['messages_broadcast'] += 1
+        recipients: Optional[Set[WebSocket]] = None
+        
+        for connection in connections:
+            encoding = self._connection_encoding(connection)
+            encoded = payloads.get(encoding)
+            if encoded is None:
+                if recipients is None:
+                    recipients = set(connections)
+                payload, introduces_symbols = self._encode(message, encoding, recipients)
+                # A frame introducing dictionary symbols must not be conflated away
+                key = None if introduces_symbols else conflation_key
+                encoded = payloads[encoding] = (payload, key)
+            self._enqueue(connection, *encoded)
+    
+    def _encode(self, message: dict, encoding: WireEncoding, recipients: Set[WebSocket]) -> Tuple[Frame, bool]:
+        """
+        Encode a message with the shared codec for the given recipients
+        
+        Symbols registered by the frame reach the recipients inside it; every
+        other columnar connection is queued a dictionary delta, so later
+        frames referencing those ids decode everywhere.
+        
+        Returns:
+            The frame and whether it registered new symbols
+        """
+        symbols_before = len(wire_codec.symbols)
+        payload = wire_codec.encode(message, encoding)
+        new_symbols = wire_codec.symbols.since(symbols_before)
+        if new_symbols:
+            delta = wire_codec.dictionary_frame(new_symbols)
+            for connection, metadata in list(self.connection_metadata.items()):
+                if metadata.get('encoding') == WireEncoding.COLUMNAR and connection not in recipients:
+                    self._enqueue(connection, delta)
+        return payload, bool(new_symbols)
+    
+    def _connection_encoding(self, websocket: WebSocket) -> WireEncoding:
+        """Wire encoding negotiated by a connection"""
+        metadata = self.connection_metadata.get(websocket)
+        if metadata is None:
+            return WireEncoding.JSON
+        return metadata.get('encoding', WireEncoding.JSON)
+    
+    @staticmethod
+    def _conflation_key(message: dict) -> Optional[str]:
+        """Key under which newer ticks replace older ones in a full queue"""
+        message_type = message.get('type')
+        if message_type not in CONFLATABLE_MESSAGE_TYPES:
+            return None
+        return f"{message_type}:{message.get('market_zone')}:{message.get('location', '')}"
+    
+    def _enqueue(self, websocket: WebSocket, payload: Frame, conflation_key: Optional[str] = None):
+        """Queue a payload for a connection, starting its writer if needed"""
+        queue = self._send_queues.get(websocket)
+        if queue is None:
+            if websocket not in self.connection_metadata:
+                return
+            queue = self._start_writer(websocket)
+        
+        if not queue.put(payload, conflation_key):
+            logger.warning("WebSocket send queue overflowed with non-conflatable messages, dropping consumer")
+            self.broadcast_stats['queue_overflows'] += 1
+            self._drop_slow_consumer(websocket)
+    
+    def _start_writer(self, websocket: WebSocket) -> ConnectionSendQueue:
+        """Create the outbound queue and writer task for a connection"""
+        queue = ConnectionSendQueue(self.send_queue_size)
+        self._send_queues[websocket] = queue
+        self._writer_tasks[websocket] = asyncio.create_task(self._connection_writer(websocket, queue))
+        return queue
+    
+    async def _connection_writer(self, websocket: WebSocket, queue: ConnectionSendQueue):
+        """Drain a connection's queue one send at a time"""
+        send: Optional[asyncio.Future] = None
+        try:
+            while True:
+                payload = await queue.get()
+                if isinstance(payload, bytes):
+                    send = asyncio.ensure_future(websocket.send_bytes(payload))
+                else:
+                    send = asyncio.ensure_future(websocket.send_text(payload))
+                
+                # A send that misses the timeout is not cancelled (that could
+                # leave a half-written frame); we keep waiting and count it
+                while True:
+                    done, _ = await asyncio.wait({send}, timeout=self.send_timeout)
+                    if done:
+                        break
+                    if not self._record_send_timeout(websocket):
+                        return
+                
+                if send.exception() is not None:
+                    logger.error(f"Failed to send to connection: {send.exception()}")
+                    self.broadcast_stats['send_failures'] += 1
+                    self.disconnect(websocket)
+                    return
+                
+                send = None
+                if websocket in self._send_timeouts:
+                    # The client kept up with this send; clear its slow status
+                    del self._send_timeouts[websocket]
+                    self.slow_consumers.discard(websocket)
+        finally:
+            if send is not None and not send.done():
+                send.cancel()
+    
+    def _record_send_timeout(self, websocket: WebSocket) -> bool:
+        """Count a timed-out send; returns False if the socket was dropped"""
+        self.broadcast_stats['send_timeouts'] += 1
+        timeouts = self._send_timeouts.get(websocket, 0) + 1
+        self._send_timeouts[websocket] = timeouts
+        
+        if timeouts >= self.slow_consumer_max_timeouts:
+            logger.warning(f"Dropping slow WebSocket consumer after {timeouts} consecutive send timeouts")
+            self._drop_slow_consumer(websocket)
+            return False
+        
+        if timeouts >= self.slow_consumer_threshold and websocket not in self.slow_consumers:
+            logger.info(f"WebSocket marked as slow consumer after {timeouts} consecutive send timeouts")
+            self.slow_consumers.add(websocket)
         
-        # Clean up disconnected connections
-        for connection in disconnected_connections:
-            self.disconnect(connection)
+        return True
+    
+    def _drop_slow_consumer(self, websocket: WebSocket):
+        """Disconnect a consumer that cannot keep up and close it with 1013"""
+        self.broadcast_stats['slow_consumers_disconnected'] += 1
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket, code=1013, reason="Consumer too slow"))
+    
+    def _discard_send_state(self, websocket: WebSocket):
+        """Forget broadcast state for a connection that has gone away"""
+        self.slow_consumers.discard(websocket)
+        self._send_timeouts.pop(websocket, None)
+        self._send_queues.pop(websocket, None)
+        
+        task = self._writer_tasks.pop(websocket, None)
+        if task is not None and task is not asyncio.current_task() and not task.done():
+            task.cancel()
+    
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int, reason: str):
+        """Close a socket, ignoring errors from an already-broken transport"""
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception as e:
+            logger.debug(f"Error closing WebSocket: {e}")
+    
+    def get_broadcast_stats(self) -> Dict[str, int]:
+        """Get broadcast delivery counters"""
+        return {
+            **self.broadcast_stats,
+            'messages_conflated': sum(q.conflated for q in self._send_queues.values()),
+            'queued_messages': sum(len(q) for q in self._send_queues.values()),
+            'slow_consumers': len(self.slow_consumers)
+        }
+    
+    async def shutdown(self):
+        """Stop all writer tasks"""
+        tasks = list(self._writer_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._writer_tasks.clear()
+        self._send_queues.clear()
     
     def get_connection_count(self, market_zone: Optional[str] = None) -> int:
         """Get the number of active connections"""
@@ -154,6 +466,258 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+def _tick_age_ms(message: dict) -> Optional[float]:
+    """Milliseconds since the tick carried by a message was stamped"""
+    timestamp = message.get('timestamp')
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        stamped = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if stamped.tzinfo is not None:
+        stamped = stamped.astimezone(timezone.utc).replace(tzinfo=None)
+    return (datetime.utcnow() - stamped).total_seconds() * 1000
+
+
+class WebSocketPubSubRelay:
+    """
+    Relays WebSocket broadcasts between workers over Redis pub/sub
+    
+    A broadcast is delivered to this worker's sockets straight away and
+    buffered per channel; every ``batch_interval`` seconds each buffer is
+    sent as one PUBLISH, so Redis traffic follows the tick rate rather than
+    the number of clients. Each worker subscribes only to the zones it has
+    local connections for and hands what other workers publish to its own
+    ConnectionManager.
+    """
+    
+    CHANNEL_PREFIX = "ws:zone:"
+    ALL_ZONES_CHANNEL = "ws:all"
+    
+    def __init__(
+        self,
+        connection_manager: ConnectionManager,
+        cache,
+        batch_interval: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        poll_interval: float = 0.1
+    ):
+        self.manager = connection_manager
+        self.cache = cache
+        self.batch_interval = batch_interval if batch_interval is not None else settings.WEBSOCKET_RELAY_BATCH_INTERVAL_MS / 1000
+        self.max_batch_size = max_batch_size or settings.WEBSOCKET_RELAY_MAX_BATCH_SIZE
+        self.poll_interval = poll_interval
+        self.worker_id = uuid4().hex
+        self.is_running = False
+        
+        self._pubsub = None
+        self._subscribed_zones: Set[str] = set()
+        # Channel -> (message, traceparent of the broadcasting span)
+        self._outbox: Dict[str, List[Tuple[dict, Optional[str]]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._listen_task: Optional[asyncio.Task] = None
+        # Publishes of batches that filled up before the next interval
+        self._publish_tasks = TaskSet()
+        
+        self.relay_stats = {
+            'messages_published': 0,
+            'batches_published': 0,
+            'messages_relayed': 0,
+            'batches_received': 0
+        }
+    
+    async def start(self):
+        """Subscribe to the broadcast channels and start the relay tasks"""
+        self._pubsub = self.cache.pubsub()
+        if self._pubsub is None:
+            logger.warning("Redis not connected, WebSocket broadcasts stay local to this worker")
+            return
+        
+        await self._pubsub.subscribe(self.ALL_ZONES_CHANNEL)
+        self.is_running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._listen_task = asyncio.create_task(self._listen_loop())
+        logger.info(f"WebSocket pub/sub relay started for worker {self.worker_id}")
+    
+    async def stop(self):
+        """Publish anything still buffered and release the subscription"""
+        if not self.is_running:
+            return
+        
+        self.is_running = False
+        tasks = [task for task in (self._flush_task, self._listen_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        await self._publish_tasks.wait()
+        await self._flush_outbox()
+        
+        try:
+            await self._pubsub.unsubscribe()
+            await self._pubsub.close()
+        except Exception as e:
+            logger.debug(f"Error closing WebSocket relay subscription: {e}")
+        
+        self._pubsub = None
+        self._subscribed_zones.clear()
+        logger.info("WebSocket pub/sub relay stopped")
+    
+    async def broadcast_to_market_zone(self, market_zone: str, message: dict):
+        """Broadcast to a zone on every worker"""
+        with self._broadcast_span(message, market_zone) as span:
+            await self.manager.broadcast_to_market_zone(market_zone, message)
+            self._buffer(f"{self.CHANNEL_PREFIX}{market_zone}", message, span)
+    
+    async def broadcast_to_all_zones(self, message: dict):
+        """Broadcast to every client on every worker"""
+        with self._broadcast_span(message) as span:
+            await self.manager.broadcast_to_all_zones(message)
+            self._buffer(self.ALL_ZONES_CHANNEL, message, span)
+    
+    @contextmanager
+    def _broadcast_span(self, message: dict, market_zone: Optional[str] = None):
+        """Span for one broadcast, recording how old its tick is on the way out"""
+        with tracer.start_span(
+            "websocket.broadcast",
+            kind="producer",
+            span_type="websocket",
+            attributes={"market_zone": market_zone or "all", "message.type": message.get('type')}
+        ) as span:
+            if span.recording:
+                span.set_attribute("websocket.connections", self.manager.get_connection_count(market_zone))
+                tick_age_ms = _tick_age_ms(message)
+                if tick_age_ms is not None:
+                    span.set_attribute("tick.age_ms", tick_age_ms)
+            yield span
+    
+    def _buffer(self, channel: str, message: dict, span=None):
+        """Hold a message for the next batched publish, with its span's context if sampled"""
+        if not self.is_running:
+            return
+        
+        # Unsampled traces are not continued on other workers, so they need not travel
+        traceparent = span.context.to_traceparent() if span is not None and span.recording else None
+        batch = self._outbox.setdefault(channel, [])
+        batch.append((message, traceparent))
+        if len(batch) >= self.max_batch_size:
+            self._publish_tasks.spawn(self._publish_batch(channel, self._outbox.pop(channel)))
+    
+    async def _flush_loop(self):
+        """Publish buffered messages every batch interval"""
+        while self.is_running:
+            await asyncio.sleep(self.batch_interval)
+            await self._flush_outbox()
+    
+    async def _flush_outbox(self):
+        """Publish one batch per channel"""
+        outbox, self._outbox = self._outbox, {}
+        for channel, messages in outbox.items():
+            await self._publish_batch(channel, messages)
+    
+    async def _publish_batch(self, channel: str, batch: List[Tuple[dict, Optional[str]]]):
+        """Publish a batch tagged with this worker's id"""
+        messages = [message for message, _ in batch]
+        envelope = {'origin': self.worker_id, 'messages': messages}
+        traces = [traceparent for _, traceparent in batch]
+        if any(traces):
+            envelope['traces'] = traces
+        
+        await self.cache.publish(channel, envelope)
+        self.relay_stats['batches_published'] += 1
+        self.relay_stats['messages_published'] += len(messages)
+    
+    async def _listen_loop(self):
+        """Receive batches from other workers and deliver them locally"""
+        while self.is_running:
+            try:
+                await self._sync_subscriptions()
+                
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=self.poll_interval
+                )
+                if message and message.get('type') == 'message':
+                    await self._relay(message['channel'], message['data'])
+                    
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket relay listener error: {e}")
+                await asyncio.sleep(1)
+    
+    async def _sync_subscriptions(self):
+        """Follow the set of zones that have local connections"""
+        wanted = set(self.manager.get_market_zones())
+        
+        added = wanted - self._subscribed_zones
+        removed = self._subscribed_zones - wanted
+        
+        if added:
+            await self._pubsub.subscribe(*[f"{self.CHANNEL_PREFIX}{zone}" for zone in added])
+        if removed:
+            await self._pubsub.unsubscribe(*[f"{self.CHANNEL_PREFIX}{zone}" for zone in removed])
+        
+        self._subscribed_zones = wanted
+    
+    async def _relay(self, channel: str, data: str):
+        """Hand a batch published by another worker to local sockets"""
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        
+        envelope = json.loads(data)
+        if envelope.get('origin') == self.worker_id:
+            return
+        
+        messages = envelope.get('messages', [])
+        traces = envelope.get('traces') or [None] * len(messages)
+        self.relay_stats['batches_received'] += 1
+        self.relay_stats['messages_relayed'] += len(messages)
+        
+        all_zones = channel == self.ALL_ZONES_CHANNEL
+        market_zone = None if all_zones else channel[len(self.CHANNEL_PREFIX):]
+        for message, traceparent in zip(messages, traces):
+            # Continue the broadcasting worker's trace, if it was sampled
+            parent = SpanContext.from_traceparent(traceparent)
+            span = tracer.start_span(
+                "websocket.relay",
+                kind="consumer",
+                span_type="websocket",
+                parent=parent,
+                attributes={"market_zone": market_zone or "all", "message.type": message.get('type')}
+            ) if parent is not None and parent.sampled else nullcontext()
+            
+            with span:
+                if all_zones:
+                    await self.manager.broadcast_to_all_zones(message)
+                else:
+                    await self.manager.broadcast_to_market_zone(market_zone, message)
+    
+    def get_relay_stats(self) -> Dict[str, Any]:
+        """Get relay counters"""
+        return {
+            **self.relay_stats,
+            'is_running': self.is_running,
+            'worker_id': self.worker_id,
+            'subscribed_zones': sorted(self._subscribed_zones)
+        }
+
+
+# Global pub/sub relay for cross-worker broadcasts
+websocket_relay = WebSocketPubSubRelay(manager, redis_cache)
+
+
+async def start_websocket_relay():
+    """Start relaying WebSocket broadcasts between workers"""
+    await websocket_relay.start()
+
+
+async def stop_websocket_relay():
+    """Stop relaying WebSocket broadcasts between workers"""
+    await websocket_relay.stop()
+
+
 class WebSocketHandler:
     """Handles WebSocket connections and authentication"""
     
@@ -180,11 +744,17 @@ class WebSocketHandler:
             return None
     
     @staticmethod
-    async def handle_market_data_connection(websocket: WebSocket, market_zone: str, user_id: Optional[UUID] = None):
+    async def handle_market_data_connection(
+        websocket: WebSocket,
+        market_zone: str,
+        user_id: Optional[UUID] = None,
+        encoding: WireEncoding = WireEncoding.JSON,
+        subprotocol: Optional[str] = None
+    ):
         """Handle market data WebSocket connection"""
         try:
             # Add connection to manager
-            await manager.connect(websocket, market_zone, user_id)
+            await manager.connect(websocket, market_zone, user_id, encoding=encoding, subprotocol=subprotocol)
             
             # Send initial market data
             latest_price = await redis_cache.get_latest_price(market_zone)
@@ -256,7 +826,7 @@ class WebSocketHandler:
             'timestamp': timestamp.isoformat()
         }
         
-        await manager.broadcast_to_market_zone(market_zone, message)
+        await websocket_relay.broadcast_to_market_zone(market_zone, message)
         
         # Also cache the latest price
         await redis_cache.cache_latest_price(market_zone, {
@@ -279,7 +849,7 @@ class WebSocketHandler:
             'timestamp': datetime.utcnow().isoformat()
         }
         
-        await manager.broadcast_to_market_zone(market_zone, message)
+        await websocket_relay.broadcast_to_market_zone(market_zone, message)
         
         logger.info(f"Market alert broadcasted for {market_zone}: {alert_type} - {message_text}")
     
@@ -293,6 +863,8 @@ class WebSocketHandler:
                 for zone in manager.get_market_zones()
             },
             'active_zones': manager.get_market_zones(),
+            'broadcast': manager.get_broadcast_stats(),
+            'relay': websocket_relay.get_relay_stats(),
             'timestamp': datetime.utcnow().isoformat()
         }
 
@@ -306,7 +878,7 @@ class WebSocketBroadcaster:
         """Notify all clients of price changes"""
         change_percent = ((new_price - old_price) / old_price) * 100 if old_price > 0 else 0
         
-        await manager.broadcast_to_market_zone(market_zone, {
+        await websocket_relay.broadcast_to_market_zone(market_zone, {
             'type': 'price_change',
             'market_zone': market_zone,
             'old_price': old_price,
@@ -319,7 +891,7 @@ class WebSocketBroadcaster:
     @staticmethod
     async def notify_bid_status(market_zone: str, bid_id: str, status: str, price: float):
         """Notify clients of bid status changes"""
-        await manager.broadcast_to_market_zone(market_zone, {
+        await websocket_relay.broadcast_to_market_zone(market_zone, {
             'type': 'bid_update',
             'market_zone': market_zone,
             'bid_id': bid_id,
@@ -331,7 +903,7 @@ class WebSocketBroadcaster:
     @staticmethod
     async def notify_market_open_close(market_zone: str, status: str):
         """Notify clients of market open/close status"""
-        await manager.broadcast_to_market_zone(market_zone, {
+        await websocket_relay.broadcast_to_market_zone(market_zone, {
             'type': 'market_status',
             'market_zone': market_zone,
             'status': status,  # 'open' or 'closed'
@@ -0,0 +1,338 @@
+"""
+Wire Formats for Market Data Streaming
+Compact encodings for the market data WebSocket and SSE feeds
+"""
+
+import calendar
+import json
+import logging
+import struct
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON and columnar frames still work
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class WireEncoding(str, Enum):
+    """Encodings a streaming client can negotiate"""
+    JSON = "json"
+    MSGPACK = "msgpack"
+    COLUMNAR = "columnar"
+
+
+# WebSocket subprotocols, in server preference order
+SUBPROTOCOLS: Dict[str, WireEncoding] = {
+    "optibid.v1.columnar": WireEncoding.COLUMNAR,
+    "optibid.v1.msgpack": WireEncoding.MSGPACK,
+    "optibid.v1.json": WireEncoding.JSON,
+}
+
+# Columnar frame layout (little-endian):
+#   header   magic "OB", version u8, frame type u8
+#   symbols  count u16, then per entry: kind u8, id u16, length u8, utf-8 name
+#   ticks    row count u16, then columns: timestamp ms i64[n], zone u16[n],
+#            location u16[n], price type u16[n], price f64[n], volume f64[n]
+# Dictionary frames carry only the symbols section; tick frames carry the
+# symbols first seen in that frame followed by the rows.
+FRAME_MAGIC = b"OB"
+FRAME_VERSION = 1
+FRAME_DICTIONARY = 1
+FRAME_PRICE_TICKS = 2
+
+SYMBOL_ZONE = 0
+SYMBOL_LOCATION = 1
+SYMBOL_PRICE_TYPE = 2
+
+# Id 0 of every symbol kind stands for "not set"
+NO_SYMBOL = 0
+MAX_SYMBOL_ID = 0xFFFF
+MAX_FRAME_ROWS = 0xFFFF
+
+_HEADER = struct.Struct("<2sBB")
+_COUNT = struct.Struct("<H")
+_SYMBOL = struct.Struct("<BHB")
+
+_TICK_SYMBOL_FIELDS = (
+    (SYMBOL_ZONE, 'market_zone'),
+    (SYMBOL_LOCATION, 'location'),
+    (SYMBOL_PRICE_TYPE, 'price_type'),
+)
+
+Frame = Union[str, bytes]
+
+
+def negotiate_encoding(
+    subprotocols: Optional[Sequence[str]] = None,
+    requested: Optional[str] = None
+) -> Tuple[WireEncoding, Optional[str]]:
+    """
+    Pick the wire encoding for a streaming client
+
+    A recognised WebSocket subprotocol wins over the ``encoding`` query
+    parameter. Unknown or unavailable encodings fall back to JSON.
+
+    Returns:
+        The encoding and the subprotocol to echo back on accept, if any
+    """
+    for name in subprotocols or ():
+        encoding = SUBPROTOCOLS.get(name)
+        if encoding is not None and encoding_available(encoding):
+            return encoding, name
+
+    if requested:
+        try:
+            encoding = WireEncoding(requested.lower())
+        except ValueError:
+            logger.warning(f"Unknown wire encoding requested: {requested}")
+            return WireEncoding.JSON, None
+        if encoding_available(encoding):
+            return encoding, None
+        logger.warning(f"Wire encoding {encoding.value} is not available, falling back to JSON")
+
+    return WireEncoding.JSON, None
+
+
+def encoding_available(encoding: WireEncoding) -> bool:
+    """Whether the libraries an encoding needs are installed"""
+    return encoding != WireEncoding.MSGPACK or msgpack is not None
+
+
+def to_epoch_millis(value: Any) -> int:
+    """Convert a datetime, ISO-8601 string or epoch number to epoch milliseconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if not isinstance(value, datetime):
+        raise ValueError(f"Unsupported timestamp value: {value!r}")
+
+    # Naive datetimes are UTC throughout the platform
+    return calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+
+
+class SymbolTable:
+    """Append-only dictionary of zone, location and price type names to small ids"""
+
+    def __init__(self):
+        self._ids: Dict[Tuple[int, str], int] = {}
+        self._entries: List[Tuple[int, int, str]] = []
+        self._next_id: Dict[int, int] = {}
+
+    def lookup(self, kind: int, name: Optional[str], new_entries: List[Tuple[int, int, str]]) -> int:
+        """Return the id for a name, registering it (and noting it in new_entries) if unseen"""
+        if not name:
+            return NO_SYMBOL
+
+        name = str(name)
+        symbol_id = self._ids.get((kind, name))
+        if symbol_id is not None:
+            return symbol_id
+
+        symbol_id = self._next_id.get(kind, NO_SYMBOL + 1)
+        if symbol_id > MAX_SYMBOL_ID:
+            raise OverflowError(f"Symbol table for kind {kind} is full")
+        if len(name.encode('utf-8')) > 0xFF:
+            raise ValueError(f"Symbol name too long for the columnar format: {name[:32]}...")
+
+        self._next_id[kind] = symbol_id + 1
+        self._ids[(kind, name)] = symbol_id
+        entry = (kind, symbol_id, name)
+        self._entries.append(entry)
+        new_entries.append(entry)
+        return symbol_id
+
+    def rollback(self, entries: List[Tuple[int, int, str]]):
+        """Forget symbols registered for a frame that was never sent"""
+        for kind, symbol_id, name in reversed(entries):
+            del self._ids[(kind, name)]
+            self._entries.pop()
+            self._next_id[kind] = symbol_id
+
+    def snapshot(self) -> List[Tuple[int, int, str]]:
+        """All registered symbols, in registration order"""
+        return list(self._entries)
+
+    def since(self, count: int) -> List[Tuple[int, int, str]]:
+        """Symbols registered after the table held ``count`` entries"""
+        return self._entries[count:]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MarketDataWireCodec:
+    """
+    Encodes market data messages for streaming clients
+
+    JSON is the default and stays byte-for-byte what the endpoints always
+    sent. msgpack carries the same message with epoch-millisecond timestamps.
+    Columnar frames pack price ticks into fixed-width columns with zones,
+    locations and price types replaced by dictionary ids; messages that are
+    not price ticks go out as JSON text frames.
+
+    New symbols ride along in the first tick frame that uses them, so a
+    codec's frames decode only for clients that received all of them. A
+    codec shared by several clients (the WebSocket fan-out) must forward
+    each new symbol to the clients that did not get that frame, as a
+    ``dictionary_frame(entries)`` delta, and send late joiners the full
+    dictionary on connect; a single stream can use a codec of its own.
+    """
+
+    TICK_MESSAGE_TYPES = {'price_update'}
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+
+    def encode(self, message: Dict[str, Any], encoding: WireEncoding = WireEncoding.JSON) -> Frame:
+        """Encode one message; str results are text frames, bytes are binary frames"""
+        try:
+            if encoding == WireEncoding.MSGPACK and msgpack is not None:
+                return msgpack.packb(self._compact_message(message), use_bin_type=True, default=str)
+            if encoding == WireEncoding.COLUMNAR and self.is_tick(message):
+                return self.encode_ticks([message])
+        except (ValueError, OverflowError, TypeError) as e:
+            logger.warning(f"Falling back to JSON for {encoding.value} message: {e}")
+
+        return json.dumps(message, default=str)
+
+    def is_tick(self, message: Dict[str, Any]) -> bool:
+        """Whether a message can be carried as a columnar price tick row"""
+        return (
+            message.get('type') in self.TICK_MESSAGE_TYPES
+            and message.get('price') is not None
+            and message.get('timestamp') is not None
+        )
+
+    def encode_ticks(self, ticks: Iterable[Dict[str, Any]]) -> bytes:
+        """Pack price ticks into a single columnar frame"""
+        new_symbols: List[Tuple[int, int, str]] = []
+        timestamps: List[int] = []
+        symbol_columns: Tuple[List[int], List[int], List[int]] = ([], [], [])
+        prices: List[float] = []
+        volumes: List[float] = []
+
+        try:
+            for tick in ticks:
+                timestamps.append(to_epoch_millis(tick['timestamp']))
+                for column, (kind, field) in zip(symbol_columns, _TICK_SYMBOL_FIELDS):
+                    column.append(self.symbols.lookup(kind, tick.get(field), new_symbols))
+                prices.append(float(tick['price']))
+                volumes.append(float(tick.get('volume') or 0.0))
+
+            if len(timestamps) > MAX_FRAME_ROWS:
+                raise ValueError(f"Too many rows for one columnar frame: {len(timestamps)}")
+        except Exception:
+            # Symbols only reach clients inside the frame that introduced them
+            self.symbols.rollback(new_symbols)
+            raise
+
+        rows = len(timestamps)
+
+        columns = struct.pack(
+            f"<{rows}q{rows}H{rows}H{rows}H{rows}d{rows}d",
+            *timestamps, *symbol_columns[0], *symbol_columns[1], *symbol_columns[2], *prices, *volumes
+        )
+        return b"".join((
+            _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FRAME_PRICE_TICKS),
+            self._pack_symbols(new_symbols),
+            _COUNT.pack(rows),
+            columns,
+        ))
+
+    def dictionary_frame(self, entries: Optional[List[Tuple[int, int, str]]] = None) -> bytes:
+        """Frame carrying the given symbols, or every symbol registered so far"""
+        if entries is None:
+            entries = self.symbols.snapshot()
+        return _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FRAME_DICTIONARY) + self._pack_symbols(entries)
+
+    @staticmethod
+    def _pack_symbols(entries: List[Tuple[int, int, str]]) -> bytes:
+        parts = [_COUNT.pack(len(entries))]
+        for kind, symbol_id, name in entries:
+            encoded = name.encode('utf-8')
+            parts.append(_SYMBOL.pack(kind, symbol_id, len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    @staticmethod
+    def _compact_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Message with its timestamp as epoch milliseconds"""
+        timestamp = message.get('timestamp')
+        if timestamp is None or isinstance(timestamp, (int, float)):
+            return message
+
+        compact = dict(message)
+        compact['timestamp'] = to_epoch_millis(timestamp)
+        return compact
+
+
+class ColumnarFrameDecoder:
+    """
+    Client-side decoder for columnar frames
+
+    Keeps the symbol dictionary learned from previous frames, mirroring what a
+    browser client does with the stream.
+    """
+
+    def __init__(self):
+        self.symbols: Dict[Tuple[int, int], str] = {}
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        """Decode a frame into ``{'frame_type': ..., 'rows': [...]}``"""
+        magic, version, frame_type = _HEADER.unpack_from(frame, 0)
+        if magic != FRAME_MAGIC or version != FRAME_VERSION:
+            raise ValueError("Not a columnar market data frame")
+
+        offset = self._read_symbols(frame, _HEADER.size)
+        if frame_type == FRAME_DICTIONARY:
+            return {'frame_type': 'dictionary', 'rows': []}
+        if frame_type != FRAME_PRICE_TICKS:
+            raise ValueError(f"Unknown columnar frame type: {frame_type}")
+
+        (rows,) = _COUNT.unpack_from(frame, offset)
+        offset += _COUNT.size
+        values = struct.unpack_from(f"<{rows}q{rows}H{rows}H{rows}H{rows}d{rows}d", frame, offset)
+        timestamps, zones, locations, price_types, prices, volumes = (
+            values[i * rows:(i + 1) * rows] for i in range(6)
+        )
+
+        return {
+            'frame_type': 'price_ticks',
+            'rows': [
+                {
+                    'timestamp': timestamps[i],
+                    'market_zone': self._name(SYMBOL_ZONE, zones[i]),
+                    'location': self._name(SYMBOL_LOCATION, locations[i]),
+                    'price_type': self._name(SYMBOL_PRICE_TYPE, price_types[i]),
+                    'price': prices[i],
+                    'volume': volumes[i],
+                }
+                for i in range(rows)
+            ]
+        }
+
+    def _read_symbols(self, frame: bytes, offset: int) -> int:
+        (count,) = _COUNT.unpack_from(frame, offset)
+        offset += _COUNT.size
+        for _ in range(count):
+            kind, symbol_id, length = _SYMBOL.unpack_from(frame, offset)
+            offset += _SYMBOL.size
+            self.symbols[(kind, symbol_id)] = frame[offset:offset + length].decode('utf-8')
+            offset += length
+        return offset
+
+    def _name(self, kind: int, symbol_id: int) -> Optional[str]:
+        if symbol_id == NO_SYMBOL:
+            return None
+        return self.symbols.get((kind, symbol_id))
+
+
+# Global codec instance for the WebSocket fan-out; every columnar connection
+# is sent the symbols it registers (see ConnectionManager._encode)
+wire_codec = MarketDataWireCodec()
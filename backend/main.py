@@ -18,12 +18,15 @@ from app.routers import websocket, analytics, maps, ml_models, admin, market_dat
 from app.core.database import init_db
 from app.core.config import settings
 from app.core.security import create_access_token, verify_token
+from app.core.tracing import TracingMiddleware, start_tracing, stop_tracing
 from app.utils.logger import setup_logger
 
 # Import real-time services
 from app.services.kafka_producer import start_kafka_producer, stop_kafka_producer
 from app.services.kafka_consumer import start_kafka_consumer, stop_kafka_consumer
 from app.services.redis_cache import start_redis_cache, stop_redis_cache
+from app.services.websocket_manager import manager as websocket_manager
+from app.services.websocket_manager import start_websocket_relay, stop_websocket_relay
 
 # Import Phase 7 services
 from app.services.market_data_integration import start_market_data_integration, stop_market_data_integration
@@ -32,6 +35,7 @@ from app.services.market_data_simulator import start_real_time_simulation, stop_
 
 # Import Phase 8 services (Performance Optimization & Mobile)
 from app.services.performance_cache_service import get_cache_service, shutdown_cache_service
+from app.services.cache_warming import start_cache_warmer, stop_cache_warmer
 from app.services.performance_monitoring_service import get_monitoring_service, shutdown_monitoring_service
 from app.services.cdn_configuration_service import get_cdn_service
 from app.services.pwa_service import get_pwa_service
@@ -55,6 +59,11 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized successfully")
     
+    try:
+        await start_tracing()
+    except Exception as e:
+        logger.warning(f"Tracing exporter initialization failed: {e}")
+    
     # Initialize Redis cache
     try:
         await start_redis_cache()
@@ -62,6 +71,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Redis cache initialization failed: {e}")
     
+    # Initialize cross-worker WebSocket relay (requires Redis)
+    try:
+        await start_websocket_relay()
+        logger.info("WebSocket pub/sub relay started")
+    except Exception as e:
+        logger.warning(f"WebSocket relay initialization failed: {e}")
+    
     # Initialize Kafka producer
     try:
         await start_kafka_producer()
@@ -71,8 +87,8 @@ async def lifespan(app: FastAPI):
     
     # Initialize Kafka consumer (requires database sessionmaker)
     try:
-        from app.core.database import async_session_maker
-        await start_kafka_consumer(async_session_maker)
+        from app.core.database import AsyncSessionLocal
+        await start_kafka_consumer(AsyncSessionLocal)
         logger.info("Kafka consumer service started")
     except Exception as e:
         logger.warning(f"Kafka consumer initialization failed: {e}")
@@ -121,6 +137,7 @@ async def lifespan(app: FastAPI):
         # Initialize cache service
         cache_service = await get_cache_service()
         logger.info("Performance cache service initialized")
+        await start_cache_warmer(cache_service)
     except Exception as e:
         logger.warning(f"Performance cache service initialization failed: {e}")
     
@@ -163,7 +180,8 @@ async def lifespan(app: FastAPI):
     try:
         await stop_kafka_consumer()
         await stop_kafka_producer()
-        await stop_redis_cache()
+        await stop_websocket_relay()
+        await websocket_manager.shutdown()
         logger.info("Real-time services stopped")
     except Exception as e:
         logger.error(f"Error stopping real-time services: {e}")
@@ -179,11 +197,19 @@ async def lifespan(app: FastAPI):
     
     # Stop Performance Optimization Services (Phase 8)
     try:
+        await stop_cache_warmer()
         await shutdown_cache_service()
         logger.info("Performance cache service stopped")
     except Exception as e:
         logger.error(f"Error stopping performance cache service: {e}")
     
+    # Redis goes last: the cache service and its invalidation bus still use it while stopping
+    try:
+        await stop_redis_cache()
+        logger.info("Redis cache stopped")
+    except Exception as e:
+        logger.error(f"Error stopping Redis cache: {e}")
+    
     try:
         await shutdown_monitoring_service()
         logger.info("Performance monitoring service stopped")
@@ -207,6 +233,11 @@ async def lifespan(app: FastAPI):
         logger.info("Advanced analytics service cleaned up")
     except Exception as e:
         logger.error(f"Error cleaning up advanced analytics service: {e}")
+    
+    try:
+        await stop_tracing()
+    except Exception as e:
+        logger.error(f"Error flushing trace spans: {e}")
 
 # Create FastAPI application
 app = FastAPI(
@@ -220,6 +251,7 @@ app = FastAPI(
 )
 
 # Add middleware
+app.add_middleware(TracingMiddleware)
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.add_middleware(
     CORSMiddleware,
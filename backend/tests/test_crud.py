@@ -0,0 +1,462 @@
+"""
+CRUD layer tests
+Tests keyset pagination, planner-estimated counts, bulk writes and market price rollups
+"""
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+from unittest.mock import Mock, AsyncMock, patch
+
+
+def _price_crud():
+    """CRUDBase over a standalone price model, independent of the app's mapper registry"""
+    from uuid import uuid4
+    from sqlalchemy import Column, DateTime, Numeric, String, func
+    from sqlalchemy.dialects.postgresql import UUID as PGUUID
+    from sqlalchemy.orm import declarative_base
+    from app.crud.base import CRUDBase
+
+    class Price(declarative_base()):
+        __tablename__ = "market_prices"
+
+        id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid4)
+        time = Column(DateTime(timezone=True), nullable=False)
+        market_operator_id = Column(PGUUID(as_uuid=True), nullable=False)
+        bid_zone_id = Column(PGUUID(as_uuid=True), nullable=False)
+        market_type = Column(String(20), nullable=False)
+        price_rupees = Column(Numeric(10, 4))
+        volume_mwh = Column(Numeric(12, 4))
+        currency = Column(String(3))
+        created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    return CRUDBase(Price)
+
+
+def _session(rows):
+    """AsyncSession mock whose queries return the given ORM rows"""
+    db = AsyncMock()
+    db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=rows)))))
+    return db
+
+
+def _compiled(statement):
+    from sqlalchemy.dialects import postgresql
+
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def _price_row(minute):
+    """Price row keyed by the standalone model's columns"""
+    return {
+        "time": datetime(2025, 1, 1, 0, minute, tzinfo=timezone.utc),
+        "market_operator_id": UUID(int=1),
+        "bid_zone_id": UUID(int=2),
+        "market_type": "day_ahead",
+        "price_rupees": Decimal("45.5")
+    }
+
+
+class TestCursorEncoding:
+    """Test opaque pagination cursors"""
+
+    def test_cursor_round_trip_keeps_types(self):
+        from app.crud.base import encode_cursor, decode_cursor
+
+        values = [datetime(2025, 1, 1, 6, 30, tzinfo=timezone.utc), UUID(int=7), Decimal("45.50"), 3]
+        cursor = encode_cursor(values)
+
+        assert "=" not in cursor and "/" not in cursor
+        assert decode_cursor(cursor) == values
+
+    def test_tampered_cursor_is_rejected(self):
+        from fastapi import HTTPException
+        from app.crud.base import decode_cursor, encode_cursor
+
+        for cursor in ("not-a-cursor", encode_cursor([1])[:-2] + "!!", "W1siengiLDFdXQ"):
+            with pytest.raises(HTTPException) as exc_info:
+                decode_cursor(cursor)
+            assert exc_info.value.status_code == 400
+
+
+class TestKeysetPagination:
+    """Test seek-based pages on CRUDBase"""
+
+    @pytest.mark.asyncio
+    async def test_first_page_returns_cursor_of_last_row(self):
+        from app.crud.base import decode_cursor
+
+        rows = [Mock(created_at=datetime(2025, 1, 1, hour), id=UUID(int=hour)) for hour in (3, 2, 1)]
+        db = _session(rows)
+
+        items, cursor = await _price_crud().get_page(db, limit=2)
+
+        assert items == rows[:2]
+        assert decode_cursor(cursor) == [datetime(2025, 1, 1, 2), UUID(int=2)]
+        sql = _compiled(db.execute.call_args.args[0])
+        assert "OFFSET" not in sql
+        assert sql.endswith("ORDER BY market_prices.created_at DESC, market_prices.id DESC \n LIMIT %(param_1)s")
+
+    @pytest.mark.asyncio
+    async def test_next_page_seeks_past_cursor(self):
+        from app.crud.base import encode_cursor
+
+        db = _session([Mock(time=datetime(2025, 1, 1), id=UUID(int=1))])
+        cursor = encode_cursor([datetime(2025, 1, 2), UUID(int=2)])
+
+        items, next_cursor = await _price_crud().get_page(
+            db, cursor=cursor, order_by="time", desc_order=False, filters={"market_type": "day_ahead"}
+        )
+
+        assert len(items) == 1 and next_cursor is None
+        sql = _compiled(db.execute.call_args.args[0])
+        assert "(market_prices.time, market_prices.id) > (%(param_1)s, %(param_2)s::UUID)" in sql
+        assert "market_prices.market_type = %(market_type_1)s" in sql
+
+    @pytest.mark.asyncio
+    async def test_cursor_for_other_sort_is_rejected(self):
+        from fastapi import HTTPException
+        from app.crud.base import encode_cursor
+
+        with pytest.raises(HTTPException):
+            await _price_crud().get_page(_session([]), cursor=encode_cursor([UUID(int=1)]))
+
+
+class TestApproximateCount:
+    """Test planner-estimated counts"""
+
+    @pytest.mark.asyncio
+    async def test_count_reads_planner_estimate(self):
+        from sqlalchemy.dialects import postgresql
+
+        connection = AsyncMock(dialect=postgresql.dialect())
+        connection.exec_driver_sql = AsyncMock(return_value=Mock(scalar=Mock(return_value='[{"Plan": {"Plan Rows": 1234567}}]')))
+        db = AsyncMock()
+        db.connection = AsyncMock(return_value=connection)
+
+        assert await _price_crud().count(db, filters={"market_type": "day_ahead"}, approximate=True) == 1234567
+
+        sql, = connection.exec_driver_sql.call_args.args
+        assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT market_prices.id")
+        assert "market_prices.market_type = 'day_ahead'" in sql
+        db.execute.assert_not_called()
+
+
+class TestZoneStatistics:
+    """Test single-scan market zone statistics"""
+
+    def test_row_shaping_and_empty_zones(self):
+        from app.crud.market_data import CRUDMarketData
+
+        row = Mock(
+            record_count=144, price_count=144, avg_price=Decimal("42.5"), min_price=Decimal("-3"),
+            max_price=Decimal("90"), stddev_price=None, negative_count=6,
+            total_volume=Decimal("1000"), avg_volume=Decimal("6.94"), min_volume=Decimal("1"), max_volume=Decimal("20")
+        )
+
+        statistics = CRUDMarketData._zone_statistics("pjm", row, 24)
+        assert statistics["prices"] == {"average": 42.5, "minimum": -3.0, "maximum": 90.0, "stddev": 0.0, "count": 144}
+        assert statistics["data_quality"]["completeness_percent"] == 50.0
+        assert statistics["data_quality"]["anomaly_rate_percent"] == round(6 / 144 * 100, 2)
+
+        empty = CRUDMarketData._zone_statistics("caiso", None, 24)
+        assert empty["volumes"]["total_volume"] == 0.0
+        assert empty["data_quality"]["actual_records"] == 0
+
+    @pytest.mark.asyncio
+    async def test_single_zone_helpers_share_one_query(self):
+        from app.crud.market_data import CRUDMarketData, market_data_crud
+
+        statistics = {"PJM": CRUDMarketData._zone_statistics("PJM", None, 24)}
+        with patch.object(CRUDMarketData, "get_zone_statistics", AsyncMock(return_value=statistics)) as get_zone_statistics:
+            quality = await market_data_crud.get_data_quality_metrics(Mock(), "PJM")
+            prices = await market_data_crud.get_price_statistics(Mock(), "pjm")
+
+        assert get_zone_statistics.await_count == 2
+        assert get_zone_statistics.call_args.args[1:] == (["pjm"], 24)
+        assert quality["data_quality"]["expected_records"] == 288
+        assert prices["count"] == 0 and prices["market_zone"] == "PJM"
+
+
+class TestPriceRollups:
+    """Test rollup selection for market price history"""
+
+    def test_granularity_uses_coarsest_dividing_rollup(self):
+        from datetime import timedelta
+        from app.crud.market_rollups import plan_granularity
+
+        assert plan_granularity(timedelta(days=7)).name == "market_data_1d"
+        assert plan_granularity(timedelta(hours=4)).name == "market_data_1h"
+        assert plan_granularity(timedelta(minutes=15)).name == "market_data_5m"
+        assert plan_granularity(timedelta(minutes=1)) is None
+
+    def test_window_reads_rollups_in_the_middle_and_ticks_at_the_edges(self):
+        from app.crud.market_rollups import plan_window
+
+        start, end = datetime(2025, 1, 1, 22, 58), datetime(2025, 1, 4, 1, 7)
+        segments = [(rollup.name if rollup else None, low, high) for rollup, low, high in plan_window(start, end)]
+
+        assert segments == [
+            (None, start, datetime(2025, 1, 1, 23, 0)),
+            ("market_data_1h", datetime(2025, 1, 1, 23), datetime(2025, 1, 2)),
+            ("market_data_1d", datetime(2025, 1, 2), datetime(2025, 1, 4)),
+            ("market_data_1h", datetime(2025, 1, 4), datetime(2025, 1, 4, 1)),
+            ("market_data_5m", datetime(2025, 1, 4, 1), datetime(2025, 1, 4, 1, 5)),
+            (None, datetime(2025, 1, 4, 1, 5), end),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_average_price_reads_every_segment_in_one_query(self):
+        from app.crud.market_data import market_data_crud
+
+        db = AsyncMock()
+        db.execute = AsyncMock(return_value=Mock(scalar=Mock(return_value=Decimal("24"))))
+
+        average = await market_data_crud.get_average_price(
+            db, "pjm", datetime(2025, 1, 1, 22, 58), datetime(2025, 1, 4, 1, 7)
+        )
+
+        assert average == 24.0
+        db.execute.assert_awaited_once()
+        sql = _compiled(db.execute.call_args.args[0])
+        assert sql.count("UNION ALL") == 5
+        assert "FROM market_data_1d" in sql and "FROM market_data_5m" in sql and "FROM market_data " in sql
+
+
+    def test_resolution_keeps_windows_within_point_budget(self):
+        from datetime import timedelta
+        from app.crud.market_rollups import plan_resolution
+
+        start = datetime(2025, 1, 1)
+        assert plan_resolution(start, start + timedelta(hours=24), 1000) == timedelta(minutes=5)
+        assert plan_resolution(start, start + timedelta(days=30), 1000) == timedelta(hours=1)
+        assert plan_resolution(start, start + timedelta(days=3650), 1000) == timedelta(days=4)
+
+    @pytest.mark.asyncio
+    async def test_price_history_returns_newest_ticks(self):
+        from app.crud.market_data import market_data_crud
+
+        db = AsyncMock()
+        db.execute = AsyncMock(return_value=Mock(all=Mock(return_value=["tick"])))
+
+        assert await market_data_crud.get_price_history(db, "pjm", hours=24, limit=50) == ["tick"]
+
+        statement = db.execute.call_args.args[0]
+        sql = _compiled(statement)
+        assert "FROM market_data " in sql
+        assert "ORDER BY market_data.timestamp DESC" in sql
+        assert statement.compile().params["market_zone_1"] == "PJM"
+        assert statement.compile().params["param_1"] == 50
+
+    @pytest.mark.asyncio
+    async def test_recent_price_changes_compare_candle_closes(self):
+        from app.crud.market_data import market_data_crud
+
+        rows = [
+            Mock(bucket=datetime(2025, 1, 1, 0, minute), open=1, high=1, low=1, close=close,
+                 volume=Decimal("2"), average=close, record_count=3)
+            for minute, close in ((0, Decimal("40")), (5, Decimal("41")), (10, Decimal("50")))
+        ]
+        db = AsyncMock()
+        db.execute = AsyncMock(return_value=Mock(all=Mock(return_value=rows)))
+
+        changes = await market_data_crud.get_recent_price_changes(db, "PJM", hours=1, change_threshold=5.0)
+
+        assert "FROM market_data_5m" in _compiled(db.execute.call_args.args[0])
+        assert [(change["previous_price"], change["current_price"]) for change in changes] == [(41.0, 50.0)]
+
+    @pytest.mark.asyncio
+    async def test_candles_endpoint_validates_the_window(self):
+        from datetime import timedelta
+        from fastapi import HTTPException
+        from app.routers.market_data import get_price_candles
+        from app.services.market_data_integration import MarketZone
+
+        start = datetime(2025, 1, 1)
+        with pytest.raises(HTTPException) as exc_info:
+            await get_price_candles(MarketZone.PJM, start, start + timedelta(days=365), "5m", None, None, db=Mock())
+        assert exc_info.value.status_code == 400
+
+        candle = {"timestamp": start, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5,
+                  "volume": 3.0, "average": 1.2, "count": 4}
+        with patch("app.routers.market_data.market_data_crud.get_price_candles", AsyncMock(return_value=[candle])) as get_candles:
+            candles = await get_price_candles(MarketZone.PJM, start, start + timedelta(days=1), "15m", "COMED", None, db=Mock())
+
+        assert candles[0].close == 1.5
+        assert get_candles.call_args.args[1:] == ("PJM", start, start + timedelta(days=1), timedelta(minutes=15))
+        assert get_candles.call_args.kwargs == {"location": "COMED", "price_type": None}
+
+
+class TestBulkWrites:
+    """Test the CRUDBase bulk write paths used by ingest and backfills"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_chunks_rows_into_multi_row_statements(self):
+        db = AsyncMock()
+        db.execute = AsyncMock(side_effect=[Mock(rowcount=2), Mock(rowcount=1), Mock(rowcount=1)])
+
+        count = await _price_crud().bulk_insert(
+            db,
+            rows=[_price_row(minute) for minute in range(5)],
+            on_conflict="nothing",
+            conflict_fields=["time", "market_operator_id", "bid_zone_id", "market_type"],
+            returning=False,
+            batch_size=2
+        )
+
+        assert count == 4
+        statements = [call.args[0] for call in db.execute.call_args_list]
+        assert len(statements) == 3
+        sql = _compiled(statements[0])
+        assert sql.count("%(time_m") == 2
+        assert sql.endswith("ON CONFLICT (time, market_operator_id, bid_zone_id, market_type) DO NOTHING")
+
+    @pytest.mark.asyncio
+    async def test_upsert_many_merges_in_one_statement(self):
+        replayed = {**_price_row(0), "price_rupees": Decimal("46.0"), "volume_mwh": Decimal("5")}
+        db = AsyncMock()
+        db.scalars = AsyncMock(return_value=Mock(all=Mock(return_value=["upserted"])))
+
+        result = await _price_crud().upsert_many(
+            db,
+            records=[{**_price_row(0), "volume_mwh": Decimal("1")}, replayed],
+            conflict_fields=["time", "market_operator_id", "bid_zone_id", "market_type"],
+            insert_only={"currency": "INR"},
+            merge={"volume_mwh": "add", "price_rupees": "coalesce"}
+        )
+
+        assert result == ["upserted"]
+        db.scalars.assert_awaited_once()
+        db.commit.assert_awaited_once()
+        statement = db.scalars.call_args.args[0]
+        sql = _compiled(statement)
+        assert sql.count("%(time_m") == 1
+        assert "ON CONFLICT (time, market_operator_id, bid_zone_id, market_type) DO UPDATE SET " in sql
+        assert "price_rupees = coalesce(excluded.price_rupees, market_prices.price_rupees)" in sql
+        assert "volume_mwh = (coalesce(market_prices.volume_mwh, %(coalesce_1)s) + excluded.volume_mwh)" in sql
+        assert "currency = " not in sql.split("DO UPDATE SET")[1]
+        assert statement.compile().params["price_rupees_m0"] == Decimal("46.0")
+
+    @pytest.mark.asyncio
+    async def test_upsert_requires_every_unique_field(self):
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException):
+            await _price_crud().upsert(
+                AsyncMock(), unique_fields=["time", "bid_zone_id"], update_data={"time": _price_row(0)["time"]}
+            )
+
+    @pytest.mark.asyncio
+    async def test_upsert_rejects_update_schema_leaving_a_unique_field_unset(self):
+        from typing import Optional
+        from fastapi import HTTPException
+        from pydantic import BaseModel
+
+        class PriceUpdate(BaseModel):
+            time: Optional[datetime] = None
+            bid_zone_id: Optional[UUID] = None
+            price_rupees: Optional[Decimal] = None
+
+        # A partial key used to match (and overwrite) whichever row shared the fields given
+        db = AsyncMock()
+        with pytest.raises(HTTPException) as raised:
+            await _price_crud().upsert(
+                db,
+                unique_fields=["time", "bid_zone_id"],
+                update_data=PriceUpdate(time=_price_row(0)["time"], price_rupees=Decimal("46.0"))
+            )
+
+        assert raised.value.status_code == 400
+        db.execute.assert_not_called()
+        db.scalars.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_partial_upsert_keeps_untouched_columns(self):
+        from typing import Optional
+        from pydantic import BaseModel
+
+        class PriceUpdate(BaseModel):
+            time: Optional[datetime] = None
+            market_operator_id: Optional[UUID] = None
+            bid_zone_id: Optional[UUID] = None
+            market_type: Optional[str] = None
+            price_rupees: Optional[Decimal] = None
+            volume_mwh: Optional[Decimal] = None
+            currency: Optional[str] = None
+
+        db = AsyncMock()
+        db.scalars = AsyncMock(return_value=Mock(all=Mock(return_value=["upserted"])))
+
+        await _price_crud().upsert(
+            db,
+            unique_fields=["time", "market_operator_id", "bid_zone_id", "market_type"],
+            update_data=PriceUpdate(**_price_row(0))
+        )
+
+        sql = _compiled(db.scalars.call_args.args[0])
+        update_clause = sql.split("DO UPDATE SET")[1].split("RETURNING")[0]
+        assert "price_rupees = excluded.price_rupees" in update_clause
+        assert "volume_mwh" not in update_clause and "currency" not in update_clause
+        assert "volume_mwh" not in sql.split("VALUES")[0]
+
+    @pytest.mark.asyncio
+    async def test_conflict_update_requires_a_target(self):
+        with pytest.raises(ValueError):
+            await _price_crud().bulk_insert(AsyncMock(), rows=[_price_row(0)], on_conflict="update")
+
+
+def _copy_session():
+    """AsyncSession mock on an asyncpg-like connection, returning the driver"""
+    driver = Mock(copy_records_to_table=AsyncMock())
+    connection = AsyncMock()
+    connection.get_raw_connection = AsyncMock(return_value=Mock(driver_connection=driver))
+    db = AsyncMock()
+    db.connection = AsyncMock(return_value=connection)
+    return db, driver
+
+
+class TestMarketDataWrites:
+    """Test that market data is written to the table it is read from"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_copies_into_market_data(self):
+        from app.crud.market_data import market_data_crud
+        from app.schemas import MarketDataCreate
+
+        db, driver = _copy_session()
+        tick = MarketDataCreate(
+            timestamp=datetime(2025, 1, 1, tzinfo=timezone.utc), market_zone="pjm", price=45.5, volume=10.0
+        )
+
+        assert await market_data_crud.bulk_insert_market_data(db, [tick, {**tick.dict(), "price": 46.0}]) == 2
+
+        call = driver.copy_records_to_table.call_args
+        assert call.args == ("market_data",)
+        columns = call.kwargs["columns"]
+        assert columns[:6] == ["timestamp", "market_zone", "price_type", "location", "price", "volume"]
+        rows = [dict(zip(columns, record)) for record in call.kwargs["records"]]
+        assert [(row["market_zone"], row["price"]) for row in rows] == [("PJM", 45.5), ("PJM", 46.0)]
+        db.execute.assert_not_called()
+        db.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_created_records_are_read_back_from_market_data(self):
+        from app.crud.market_data import market_data_crud
+        from app.schemas import MarketDataCreate
+
+        db = AsyncMock()
+        db.execute = AsyncMock(return_value=Mock(all=Mock(return_value=["row"]), first=Mock(return_value="row")))
+        tick = MarketDataCreate(timestamp=datetime(2025, 1, 1), market_zone="caiso", price=30.0, volume=5.0)
+
+        assert await market_data_crud.create_market_data(db, obj_in=tick) == "row"
+        assert await market_data_crud.bulk_create_market_data(db, [tick]) == ["row"]
+
+        for call in db.execute.call_args_list:
+            statement = call.args[0]
+            assert _compiled(statement).startswith("INSERT INTO market_data (timestamp, market_zone,")
+            assert "CAISO" in statement.compile().params.values()
+        assert db.commit.await_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
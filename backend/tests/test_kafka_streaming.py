@@ -0,0 +1,898 @@
+"""
+Kafka streaming tests
+Tests micro-batched ingest of market data events from Kafka
+"""
+import pytest
+import asyncio
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, AsyncMock, MagicMock, patch
+
+
+_Record = namedtuple("_Record", ["topic", "partition", "offset", "key", "value"])
+
+
+def _price_record(offset, price=50.0, zone="pjm", partition=0):
+    """Build a Kafka record carrying a price update event"""
+    return _Record(
+        topic=f"market_data.{zone}",
+        partition=partition,
+        offset=offset,
+        key=zone,
+        value={
+            "event_type": "price_update",
+            "timestamp": "2025-01-01T00:00:00Z",
+            "price": price,
+            "volume": 100.0
+        }
+    )
+
+
+def _mock_sessionmaker(session):
+    """Sessionmaker whose sessions are the given mock"""
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=session)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return Mock(return_value=context)
+
+
+class TestMicroBatchedConsumer:
+    """Test KafkaConsumerService micro-batching"""
+
+    @pytest.mark.asyncio
+    async def test_batch_written_with_one_insert_and_commit(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        session = AsyncMock()
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(session), batch_size=10)
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock) as bulk_insert:
+            durable = await service.process_batch([_price_record(i, price=10.0 + i) for i in range(5)])
+
+        assert durable is True
+        bulk_insert.assert_awaited_once()
+        rows = bulk_insert.call_args.args[1]
+        assert [row["price"] for row in rows] == [10.0, 11.0, 12.0, 13.0, 14.0]
+        assert rows[0]["market_zone"] == "pjm"
+        session.commit.assert_awaited_once()
+        assert service.batch_stats["rows_written"] == 5
+
+    @pytest.mark.asyncio
+    async def test_invalid_rows_are_rejected_without_failing_batch(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        session = AsyncMock()
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(session))
+        bad = _price_record(1, price=-5.0)
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock) as bulk_insert:
+            await service.process_batch([_price_record(0), bad])
+
+        assert len(bulk_insert.call_args.args[1]) == 1
+        assert service.batch_stats["messages_rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_offsets_committed_only_after_durable_write(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(AsyncMock()))
+        service.consumer = Mock()
+        service.retry_backoff_seconds = 0
+        batch = [_price_record(7), _price_record(8), _price_record(3, partition=1)]
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock, side_effect=RuntimeError("db down")):
+            await service._flush_batch(batch)
+
+        service.consumer.commit.assert_not_called()
+        seeks = {(call.args[0].partition, call.args[1]) for call in service.consumer.seek.call_args_list}
+        assert seeks == {(0, 7), (1, 3)}
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock):
+            await service._flush_batch(batch)
+
+        service.consumer.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_consume_loop_flushes_on_batch_size(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService(batch_size=3, batch_window_ms=60000)
+        polls = [
+            {("market_data.pjm", 0): [_price_record(0), _price_record(1)]},
+            {("market_data.pjm", 0): [_price_record(2)]},
+        ]
+
+        def poll(timeout_ms, max_records):
+            if polls:
+                return polls.pop(0)
+            service.is_running = False
+            return {}
+
+        service.consumer = Mock()
+        service.consumer.poll = Mock(side_effect=poll)
+        service.process_batch = AsyncMock(return_value=True)
+
+        await asyncio.wait_for(service.start_consuming(), timeout=1)
+
+        service.process_batch.assert_awaited_once()
+        assert [m.offset for m in service.process_batch.call_args.args[0]] == [0, 1, 2]
+        assert service.consumer.poll.call_args_list[1].kwargs["max_records"] == 1
+        service.consumer.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_blocking_poll_runs_off_the_event_loop(self):
+        import threading
+        import time
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService()
+        loop_thread = threading.get_ident()
+        poll_threads = []
+
+        def poll(timeout_ms, max_records):
+            poll_threads.append(threading.get_ident())
+            time.sleep(0.1)
+            service.is_running = False
+            return {}
+
+        service.consumer = Mock()
+        service.consumer.poll = Mock(side_effect=poll)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        await asyncio.wait_for(service.start_consuming(), timeout=1)
+        await service.close()
+        ticker_task.cancel()
+
+        assert poll_threads and loop_thread not in poll_threads
+        assert ticks >= 5
+        service.consumer.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_consumed_tick_is_copied_into_market_data(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        driver = Mock(copy_records_to_table=AsyncMock())
+        connection = AsyncMock()
+        connection.get_raw_connection = AsyncMock(return_value=Mock(driver_connection=driver))
+        session = AsyncMock()
+        session.connection = AsyncMock(return_value=connection)
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(session))
+
+        assert await service.process_batch([_price_record(0, price=42.0)]) is True
+
+        call = driver.copy_records_to_table.call_args
+        assert call.args == ("market_data",)
+        row, = [dict(zip(call.kwargs["columns"], record)) for record in call.kwargs["records"]]
+        assert (row["market_zone"], row["price"], row["volume"]) == ("PJM", 42.0, 100.0)
+        assert row["timestamp"].isoformat() == "2025-01-01T00:00:00+00:00"
+        session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_final_attempt_skips_only_rejected_rows(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(AsyncMock()))
+        service.consumer = Mock()
+        service.retry_backoff_seconds = 0
+        service.max_batch_attempts = 2
+        batch = [_price_record(0, price=10.0), _price_record(1, price=11.0)]
+
+        async def insert(session, rows):
+            if len(rows) > 1 or rows[0]["price"] == 11.0:
+                raise RuntimeError("bad row")
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock, side_effect=insert) as bulk_insert:
+            await service._flush_batch(batch)
+            service.consumer.commit.assert_not_called()
+            await service._flush_batch(batch)
+
+        assert [len(call.args[1]) for call in bulk_insert.call_args_list] == [2, 1, 1]
+        service.consumer.commit.assert_called_once()
+        assert service.batch_stats["rows_skipped"] == 1
+        assert service.batch_stats["rows_written"] == 1
+
+    @pytest.mark.asyncio
+    async def test_nothing_is_skipped_while_the_database_is_down(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(AsyncMock()))
+        service.consumer = Mock()
+        service.retry_backoff_seconds = 0
+        service.max_batch_attempts = 2
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock, side_effect=RuntimeError("db down")):
+            for _ in range(3):
+                await service._flush_batch([_price_record(0), _price_record(1)])
+
+        service.consumer.commit.assert_not_called()
+        assert service.consumer.seek.call_count == 3
+        assert service.batch_stats["rows_skipped"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rebalance_errors_do_not_stop_the_consumer(self):
+        from kafka.errors import CommitFailedError
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        service = KafkaConsumerService(db_sessionmaker=_mock_sessionmaker(AsyncMock()))
+        service.retry_backoff_seconds = 0
+        service.consumer = Mock()
+        service.consumer.commit = Mock(side_effect=CommitFailedError("rebalanced"))
+        service.consumer.seek = Mock(side_effect=AssertionError("Unassigned partition"))
+
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock):
+            await service._flush_batch([_price_record(0)])
+        with patch("app.services.kafka_consumer.market_data_crud.bulk_insert_market_data",
+                   new_callable=AsyncMock, side_effect=RuntimeError("db down")):
+            await service._flush_batch([_price_record(1), _price_record(2, partition=1)])
+
+        service.consumer.commit.assert_called_once()
+        assert service.consumer.seek.call_count == 2
+
+
+class _InMemoryKafkaConsumer:
+    """Blocking kafka-python style consumer fed from an in-memory list of batches"""
+
+    def __init__(self, batches, idle_poll_seconds=0.05, highwater=None):
+        self.batches = list(batches)
+        self.idle_poll_seconds = idle_poll_seconds
+        self.highwaters = highwater or {}
+        self.committed = {}
+        self.closed = False
+
+    def highwater(self, topic_partition):
+        return self.highwaters.get(topic_partition)
+
+    def poll(self, timeout_ms=0, max_records=None):
+        if self.batches:
+            return self.batches.pop(0)
+        # Block like a real poll waiting on the broker
+        time.sleep(self.idle_poll_seconds)
+        return {}
+
+    def commit(self, offsets):
+        for topic_partition, offset_and_metadata in offsets.items():
+            self.committed[topic_partition] = offset_and_metadata.offset
+
+    def close(self):
+        self.closed = True
+
+
+class _InMemoryPriceStore:
+    """Stand-in for the Timescale store that keeps flushed prices in a list"""
+
+    def __init__(self):
+        self.pending = []
+        self.rows = []
+
+    async def add(self, price_data):
+        self.pending.append(price_data)
+        return True
+
+    async def flush(self):
+        self.rows.extend(self.pending)
+        self.pending = []
+        return True
+
+    async def refresh_rollups(self):
+        pass
+
+    def get_stats(self):
+        return {"rows_written": len(self.rows)}
+
+
+def _stream_batch(offsets, partition=0):
+    """One polled batch of valid market data records"""
+    from kafka import TopicPartition
+
+    topic_partition = TopicPartition("market_data.pjm", partition)
+    return {topic_partition: [
+        _Record(topic="market_data.pjm", partition=partition, offset=offset, key="pjm", value={
+            "timestamp": f"2025-01-01T00:{offset:02d}:00Z",
+            "market_zone": "PJM",
+            "price_type": "LMP",
+            "location": "COMED",
+            "price": 40.0 + offset,
+            "volume": 10.0
+        })
+        for offset in offsets
+    ]}
+
+
+class TestNonBlockingStreamConsumer:
+    """Test MarketDataKafkaConsumer polling off the event loop"""
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive_while_polling(self):
+        from app.services.kafka_consumer_service import KafkaPollingThread
+
+        consumer = _InMemoryKafkaConsumer([], idle_poll_seconds=0.5)
+        poller = KafkaPollingThread(consumer)
+        await poller.start()
+        await asyncio.sleep(0.01)
+
+        started = time.monotonic()
+        await asyncio.sleep(0.01)
+        assert time.monotonic() - started < 0.2
+
+        await poller.stop()
+        assert consumer.closed is True
+        assert poller.is_alive is False
+
+    @pytest.mark.asyncio
+    async def test_offsets_committed_after_processing(self):
+        from kafka import TopicPartition
+        from app.services.kafka_consumer_service import KafkaPollingThread, MarketDataKafkaConsumer
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([0, 1]), _stream_batch([2])])
+        stream = MarketDataKafkaConsumer()
+        stream.consumer = consumer
+        stream.producer = Mock()
+        stream.poller = KafkaPollingThread(consumer)
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        stream.storage = _InMemoryPriceStore()
+        stream.is_running = True
+
+        task = asyncio.create_task(stream.process_market_data_stream())
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if stream.processor.processing_stats["total_processed"] == 3:
+                break
+        await stream.stop_consuming()
+        await asyncio.wait_for(task, timeout=1)
+
+        assert stream.processor.processing_stats["total_processed"] == 3
+        assert consumer.committed == {TopicPartition("market_data.pjm", 0): 3}
+        assert stream.producer.send.call_count == 6
+        stream.producer.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_holds_back_later_batches_and_commits(self):
+        from kafka import TopicPartition
+        from app.services.kafka_consumer_service import KafkaPollingThread, MarketDataKafkaConsumer
+
+        class _FlakyStore(_InMemoryPriceStore):
+            def __init__(self):
+                super().__init__()
+                self.failures = 2
+                self.pending_at_flush = []
+
+            async def flush(self):
+                self.pending_at_flush.append(len(self.pending))
+                if self.failures:
+                    self.failures -= 1
+                    return False
+                return await super().flush()
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([0, 1]), _stream_batch([2])])
+        stream = MarketDataKafkaConsumer(retry_backoff_seconds=0.01)
+        stream.consumer = consumer
+        stream.producer = Mock()
+        stream.poller = KafkaPollingThread(consumer)
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        stream.storage = _FlakyStore()
+        stream.is_running = True
+
+        task = asyncio.create_task(stream.process_market_data_stream())
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if len(stream.storage.rows) == 3:
+                break
+        await stream.stop_consuming()
+        await asyncio.wait_for(task, timeout=1)
+
+        # The second batch was only taken once the first one's rows were written
+        assert stream.storage.pending_at_flush[:4] == [2, 2, 2, 1]
+        assert consumer.committed == {TopicPartition("market_data.pjm", 0): 3}
+
+    @pytest.mark.asyncio
+    async def test_stop_interrupts_flush_retries_without_committing(self):
+        from app.services.kafka_consumer_service import KafkaPollingThread, MarketDataKafkaConsumer
+
+        class _DownStore(_InMemoryPriceStore):
+            async def flush(self):
+                return False
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([0, 1])])
+        stream = MarketDataKafkaConsumer(retry_backoff_seconds=30)
+        stream.consumer = consumer
+        stream.producer = Mock()
+        stream.poller = KafkaPollingThread(consumer)
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        stream.storage = _DownStore()
+        stream.is_running = True
+
+        task = asyncio.create_task(stream.process_market_data_stream())
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if stream.storage.pending:
+                break
+        await asyncio.wait_for(stream.stop_consuming(), timeout=2)
+
+        assert task.done()
+        assert consumer.committed == {}
+        assert stream.processor.dedup_index.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_full_hand_off_queue_applies_backpressure(self):
+        from app.services.kafka_consumer_service import KafkaPollingThread
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([i]) for i in range(5)])
+        poller = KafkaPollingThread(consumer, max_pending_batches=1, handoff_timeout=0.01)
+        await poller.start()
+        await asyncio.sleep(0.1)
+
+        # One batch queued, one waiting in the hand-off; the rest stay unpolled
+        assert poller.stats["batches_polled"] == 2
+        assert poller.stats["backpressure_waits"] == 1
+        assert len(consumer.batches) == 3
+
+        await poller.stop()
+        assert poller.is_alive is False
+
+
+class TestPartitionParallelConsumerGroup:
+    """Test the process-per-core consumer group runner"""
+
+    @pytest.mark.asyncio
+    async def test_poller_tracks_lag_per_partition(self):
+        from kafka import TopicPartition
+        from app.services.kafka_consumer_service import KafkaPollingThread
+
+        consumer = _InMemoryKafkaConsumer(
+            [_stream_batch([0, 1]), _stream_batch([5], partition=1)],
+            highwater={TopicPartition("market_data.pjm", 0): 10}
+        )
+        poller = KafkaPollingThread(consumer)
+        await poller.start()
+        for _ in range(2):
+            await poller.get_batch()
+        await poller.stop()
+
+        assert poller.get_partition_stats() == {
+            "market_data.pjm:0": {"records": 2, "lag": 8},
+            "market_data.pjm:1": {"records": 1, "lag": None}
+        }
+
+    @pytest.mark.asyncio
+    async def test_group_members_share_group_id_one_process_each(self):
+        import queue
+        from app.services.kafka_consumer_service import MarketDataStreamManager, run_consumer_group_worker
+
+        context = MagicMock()
+        context.Queue.return_value.get_nowait.side_effect = queue.Empty
+        with patch("app.services.kafka_consumer_service.multiprocessing.get_context", return_value=context), \
+                patch("app.services.kafka_consumer_service.TimescaleMarketDataStore") as store:
+            store.return_value.ensure_schema = AsyncMock()
+            stream_manager = MarketDataStreamManager()
+            runner = await stream_manager.start_consumer_group("ingest", consumer_count=4)
+
+        # Schema DDL runs once in the parent, never in the members
+        store.return_value.ensure_schema.assert_awaited_once()
+        assert context.Process.call_count == 4
+        for worker_id, call in enumerate(context.Process.call_args_list):
+            assert call.kwargs["target"] is run_consumer_group_worker
+            assert call.kwargs["args"][1:3] == ("ingest", worker_id)
+        assert await stream_manager.start_consumer_group("ingest") is runner
+
+        await stream_manager.stop_all_consumers()
+        context.Event.return_value.set.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_group_members_capped_at_partition_count(self):
+        import queue
+        from app.services.kafka_consumer_service import MarketDataStreamManager
+
+        context = MagicMock()
+        context.Queue.return_value.get_nowait.side_effect = queue.Empty
+        stream_manager = MarketDataStreamManager()
+        stream_manager.admin_client = Mock()
+        stream_manager.admin_client.describe_topics.return_value = [
+            {"topic": "market_data.pjm", "error_code": 0, "partitions": [{"partition": p} for p in range(3)]},
+            {"topic": "market_data.caiso", "error_code": 0, "partitions": [{"partition": 0}]},
+            {"topic": "market_data.ercot", "error_code": 3, "partitions": []}
+        ]
+        with patch("app.services.kafka_consumer_service.multiprocessing.get_context", return_value=context), \
+                patch("app.services.kafka_consumer_service.TimescaleMarketDataStore") as store:
+            store.return_value.ensure_schema = AsyncMock()
+            runner = await stream_manager.start_consumer_group("ingest", consumer_count=8)
+
+        assert runner.worker_count == 3
+        assert context.Process.call_count == 3
+
+        stream_manager.admin_client = None
+        await stream_manager.stop_all_consumers()
+
+    @pytest.mark.asyncio
+    async def test_group_member_skips_schema_setup(self):
+        from app.services.kafka_consumer_service import _consume_as_group_member
+
+        stop_event = Mock()
+        stop_event.is_set.return_value = True
+        with patch("app.services.kafka_consumer_service.MarketDataKafkaConsumer") as consumer_cls:
+            consumer = consumer_cls.return_value
+            consumer.initialize = AsyncMock()
+            consumer.stop_consuming = AsyncMock()
+            consumer.process_market_data_stream = AsyncMock()
+            await asyncio.wait_for(
+                _consume_as_group_member("localhost:9092", "ingest", 0, Mock(), stop_event, 0.01), timeout=2
+            )
+
+        consumer.initialize.assert_awaited_once_with(ensure_schema=False)
+
+    def test_group_stats_merge_worker_reports(self):
+        import queue
+        from app.services.kafka_consumer_service import ConsumerGroupRunner
+
+        runner = ConsumerGroupRunner("localhost:9092", "ingest", worker_count=2)
+        runner._reports = queue.Queue()
+        runner._reports.put({"worker_id": 0, "timestamp": "2025-01-01T00:00:00", "partitions": {
+            "market_data.pjm:0": {"records": 100, "lag": 5, "records_per_second": 20.0},
+            "market_data.pjm:1": {"records": 40, "lag": 1, "records_per_second": 8.0}
+        }})
+        # Partition 1 moved to worker 1 after a rebalance
+        runner._reports.put({"worker_id": 1, "timestamp": "2025-01-01T00:00:05", "partitions": {
+            "market_data.pjm:1": {"records": 10, "lag": 0, "records_per_second": 2.0}
+        }})
+        runner._drain_reports()
+
+        stats = runner.get_stats()
+        assert stats["partitions"]["market_data.pjm:1"]["worker_id"] == 1
+        assert stats["total_lag"] == 5
+        assert stats["records_per_second"] == 22.0
+
+
+def _market_price(location="COMED", minute=0, price=40.0):
+    """Validated MarketPrice for dedup tests"""
+    from datetime import datetime
+    from app.services.market_data_integration import MarketPrice, MarketZone
+
+    return MarketPrice(
+        timestamp=datetime(2025, 1, 1, 0, minute),
+        market_zone=MarketZone.PJM,
+        price_type="LMP",
+        location=location,
+        price=price,
+        volume=10.0
+    )
+
+
+class TestDuplicateIndex:
+    """Test the bounded dedup index used for idempotent ingest"""
+
+    def test_duplicates_detected_regardless_of_distance(self):
+        from app.services.kafka_consumer_service import MarketDataProcessor
+
+        processor = MarketDataProcessor()
+        assert processor.detect_duplicates(_market_price(minute=0)) is False
+        for minute in range(1, 50):
+            processor.detect_duplicates(_market_price(minute=minute))
+
+        # Same key with a corrected price is still the same price point
+        assert processor.detect_duplicates(_market_price(minute=0, price=41.0)) is True
+        assert processor.processing_stats["duplicate_records"] == 1
+
+    def test_window_and_size_bounds(self):
+        from app.services.market_data_dedup import DuplicateIndex
+
+        index = DuplicateIndex(window_seconds=10, max_entries=2)
+        assert index.seen(("PJM", "A", "LMP", "t0"), now=0) is False
+        assert index.seen(("PJM", "A", "LMP", "t0"), now=11) is False  # expired
+
+        index.seen(("PJM", "B", "LMP", "t0"), now=12)
+        index.seen(("PJM", "C", "LMP", "t0"), now=13)
+        assert len(index) == 2
+        assert index.seen(("PJM", "A", "LMP", "t0"), now=14) is False  # evicted
+        assert index.stats["evicted"] >= 1
+
+    def test_memory_budget_sets_entry_limit(self):
+        from app.services.market_data_dedup import APPROX_ENTRY_BYTES, DuplicateIndex
+
+        assert DuplicateIndex(max_memory_bytes=APPROX_ENTRY_BYTES * 100).max_entries == 100
+
+    @pytest.mark.asyncio
+    async def test_redis_claims_filter_keys_seen_elsewhere(self):
+        from app.services.market_data_dedup import DuplicateIndex
+
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[0, 1])
+        cache = Mock(is_connected=True)
+        cache.redis_client.pipeline.return_value = pipe
+        index = DuplicateIndex(window_seconds=600, redis_cache=cache)
+
+        batch = [_market_price(location="COMED"), _market_price(location="BGE"), _market_price(location="COMED")]
+        fresh = await index.filter_new(batch)
+
+        assert [p.location for p in fresh] == ["COMED"]
+        assert pipe.exists.call_count == 2
+        assert index.stats == {**index.stats, "duplicates": 1, "redis_duplicates": 1}
+
+        # Keys are only claimed once their rows are durable
+        pipe.set.assert_not_called()
+        await index.commit()
+        pipe.set.assert_called_once()
+        assert pipe.set.call_args.kwargs == {"ex": 600}
+        assert index.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_only_dropped_rows_release_their_pending_keys(self):
+        from app.services.market_data_dedup import DuplicateIndex, dedup_key
+
+        index = DuplicateIndex(window_seconds=600)
+        batch = [_market_price(location="COMED"), _market_price(location="BGE")]
+
+        assert len(await index.filter_new(batch)) == 2
+        assert await index.filter_new(batch) == []  # still buffered
+        index.release([dedup_key(batch[1])])
+
+        # A redelivery of the dropped row is ingested again, the buffered one is not
+        assert await index.filter_new(batch) == [batch[1]]
+        await index.commit()
+        assert await index.filter_new(batch) == []
+        assert len(index) == 2
+
+    @pytest.mark.asyncio
+    async def test_redelivery_during_a_failed_flush_is_not_buffered_twice(self):
+        from app.services.kafka_consumer_service import KafkaPollingThread, MarketDataKafkaConsumer
+
+        class _FlakyStore(_InMemoryPriceStore):
+            def __init__(self):
+                super().__init__()
+                self.failures = 1
+
+            async def flush(self):
+                if self.failures:
+                    self.failures -= 1
+                    return False
+                return await super().flush()
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([0, 1]), _stream_batch([0, 1]), _stream_batch([2])])
+        stream = MarketDataKafkaConsumer()
+        stream.consumer = consumer
+        stream.producer = Mock()
+        stream.poller = KafkaPollingThread(consumer)
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        stream.storage = _FlakyStore()
+        stream.is_running = True
+
+        task = asyncio.create_task(stream.process_market_data_stream())
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if len(stream.storage.rows) == 3:
+                break
+        await stream.stop_consuming()
+        await asyncio.wait_for(task, timeout=1)
+
+        assert [price.price for price in stream.storage.rows] == [40.0, 41.0, 42.0]
+
+    @pytest.mark.asyncio
+    async def test_redelivered_batch_is_a_no_op(self):
+        from app.services.kafka_consumer_service import KafkaPollingThread, MarketDataKafkaConsumer
+
+        consumer = _InMemoryKafkaConsumer([_stream_batch([0, 1]), _stream_batch([0, 1])])
+        stream = MarketDataKafkaConsumer()
+        stream.consumer = consumer
+        stream.producer = Mock()
+        stream.poller = KafkaPollingThread(consumer)
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        stream.storage = _InMemoryPriceStore()
+        stream.is_running = True
+
+        task = asyncio.create_task(stream.process_market_data_stream())
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if stream.processor.processing_stats["duplicate_records"] == 2:
+                break
+        await stream.stop_consuming()
+        await asyncio.wait_for(task, timeout=1)
+
+        assert len(stream.storage.rows) == 2
+        assert stream.processor.processing_stats["duplicate_records"] == 2
+
+
+class TestStreamingMetrics:
+    """Test incremental per-zone market metrics"""
+
+    def test_welford_matches_batch_statistics(self):
+        import statistics
+        from app.services.market_data_metrics import RunningStats
+
+        values = [41.0, 39.5, 44.2, 38.1, 52.7, 40.0]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        assert stats.mean == pytest.approx(statistics.fmean(values))
+        assert stats.stddev == pytest.approx(statistics.pstdev(values))
+
+        stats.remove(values[0])
+        assert stats.mean == pytest.approx(statistics.fmean(values[1:]))
+        assert stats.variance == pytest.approx(statistics.pvariance(values[1:]))
+
+    def test_sliding_window_evicts_old_ticks(self):
+        from app.services.market_data_metrics import SlidingWindowStats
+
+        window = SlidingWindowStats(window_seconds=60)
+        window.add(0, price=100.0, volume=5.0)
+        window.add(30, price=20.0, volume=1.0)
+        window.add(61, price=50.0, volume=2.0)
+
+        snapshot = window.snapshot()
+        assert snapshot["record_count"] == 2
+        assert (snapshot["min_price"], snapshot["max_price"]) == (20.0, 50.0)
+        assert snapshot["total_volume"] == 3.0
+        assert snapshot["avg_price"] == pytest.approx(35.0)
+
+    def test_late_tick_does_not_evict_newer_extremes(self):
+        from app.services.market_data_metrics import SlidingWindowStats
+
+        window = SlidingWindowStats(window_seconds=60)
+        window.add(50, price=40.0, volume=1.0)
+        window.add(100, price=50.0, volume=1.0)
+        # Arrives late but outranks both; once it expires the newer ticks must still count
+        window.add(45, price=60.0, volume=1.0)
+        assert (window.min_price, window.max_price) == (40.0, 60.0)
+
+        window.add(112, price=45.0, volume=1.0)
+        assert (window.min_price, window.max_price) == (45.0, 50.0)
+        assert window.count == 2
+
+        # Older than the whole window: counted and expired straight away
+        window.add(10, price=1.0, volume=1.0)
+        assert window.snapshot()["record_count"] == 2
+        assert window.min_price == 45.0
+        assert window.prices.mean == pytest.approx(47.5)
+
+    def test_calculate_metrics_over_list_keeps_contract(self):
+        from app.services.kafka_consumer_service import MarketDataProcessor
+
+        prices = [_market_price(minute=m, price=p) for m, p in enumerate([10.0, 30.0, 20.0])]
+        metrics = MarketDataProcessor().calculate_metrics(prices)["PJM"]
+
+        assert metrics["current_price"] == 20.0
+        assert metrics["avg_price"] == pytest.approx(20.0)
+        assert (metrics["min_price"], metrics["max_price"]) == (10.0, 30.0)
+        assert metrics["total_volume"] == 30.0
+        assert metrics["record_count"] == 3
+
+    @pytest.mark.asyncio
+    async def test_published_metrics_come_from_live_aggregator(self):
+        from app.services.kafka_consumer_service import MarketDataKafkaConsumer
+
+        stream = MarketDataKafkaConsumer()
+        stream.producer = Mock()
+        stream._producer_executor = ThreadPoolExecutor(max_workers=1)
+        for minute, price in enumerate([40.0, 44.0]):
+            stream.processor.record_price(_market_price(minute=minute, price=price))
+
+        await stream._update_market_metrics("PJM")
+        stream._producer_executor.shutdown()
+
+        topic, = stream.producer.send.call_args.args
+        published = stream.producer.send.call_args.kwargs["value"]
+        assert topic == "market_metrics"
+        assert published["current_price"] == 44.0
+        assert published["avg_price"] == pytest.approx(42.0)
+        assert published["record_count"] == 2
+        assert set(published["windows"]) == {300, 3600}
+
+
+def _mock_engine(driver_connection):
+    """AsyncEngine whose connections expose the given driver connection"""
+    conn = AsyncMock()
+    conn.get_raw_connection = AsyncMock(return_value=Mock(driver_connection=driver_connection))
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=conn)
+    context.__aexit__ = AsyncMock(return_value=False)
+    engine = Mock()
+    engine.connect = Mock(return_value=context)
+    engine.begin = Mock(return_value=context)
+    return engine, conn
+
+
+class TestTimescaleStorage:
+    """Test the Timescale-backed market price store"""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_buffer_with_one_copy(self):
+        from app.services.timescale_storage import TimescaleMarketDataStore
+
+        driver = Mock(copy_records_to_table=AsyncMock())
+        engine, _ = _mock_engine(driver)
+        store = TimescaleMarketDataStore(engine, batch_size=100)
+
+        for minute in range(3):
+            await store.add(_market_price(minute=minute))
+        driver.copy_records_to_table.assert_not_called()
+
+        assert await store.flush() is True
+        driver.copy_records_to_table.assert_awaited_once()
+        call = driver.copy_records_to_table.call_args
+        assert call.args == ("market_data",)
+        assert call.kwargs["columns"][:4] == ("timestamp", "market_zone", "price_type", "location")
+        assert [record[1] for record in call.kwargs["records"]] == ["PJM"] * 3
+        assert store.get_stats()["rows_written"] == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_rows_for_retry(self):
+        from app.services.timescale_storage import TimescaleMarketDataStore
+
+        driver = Mock(copy_records_to_table=AsyncMock(side_effect=[OSError("down"), None]))
+        engine, _ = _mock_engine(driver)
+        dropped = []
+        store = TimescaleMarketDataStore(engine, max_buffered_rows=2, on_drop=dropped.extend)
+
+        for minute in range(3):
+            await store.add(_market_price(minute=minute))
+        assert await store.flush() is False
+        assert store.pending_rows == 2
+        assert store.stats["rows_dropped"] == 1
+        assert dropped == [_market_price(minute=0)]
+
+        assert await store.flush() is True
+        assert store.pending_rows == 0
+
+    @pytest.mark.asyncio
+    async def test_schema_setup_applies_chunk_compression_and_retention(self):
+        from app.services.timescale_storage import TimescaleMarketDataStore
+
+        engine, conn = _mock_engine(Mock())
+        store = TimescaleMarketDataStore(
+            engine, chunk_interval="6 hours", compress_after="3 days", retain_for="90 days"
+        )
+        await store.ensure_schema()
+
+        statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+        params = [call.args[1] if len(call.args) > 1 else {} for call in conn.execute.call_args_list]
+        assert "create_hypertable" in statements[0] and params[0]["chunk_interval"] == "6 hours"
+        assert any("timescaledb.compress" in statement for statement in statements)
+        assert {"table": "market_data", "compress_after": "3 days"} in params
+        assert {"table": "market_data", "retain_for": "90 days"} in params
+        assert store.schema_ready is True
+
+        views = [statement for statement in statements if "CREATE MATERIALIZED VIEW" in statement]
+        assert [view.split()[6] for view in views] == ["market_data_5m", "market_data_1h", "market_data_1d"]
+        assert "FROM market_data_5m GROUP BY time_bucket(INTERVAL '3600 seconds', bucket)" in views[1]
+        assert {"view": "market_data_1d", "start_offset": "259200 seconds",
+                "end_offset": "86400 seconds", "schedule_interval": "3600 seconds"} in params
+        assert store.rollups_ready is True
+
+    @pytest.mark.asyncio
+    async def test_late_rows_refresh_rollups_outside_a_transaction(self):
+        from datetime import datetime
+        from app.services.timescale_storage import TimescaleMarketDataStore
+
+        driver = Mock(copy_records_to_table=AsyncMock())
+        engine, conn = _mock_engine(driver)
+        conn.execution_options = AsyncMock(return_value=conn)
+        store = TimescaleMarketDataStore(engine, rollup_refresh_interval=0)
+        store.rollups_ready = True
+
+        await store.add(_market_price(minute=7))
+        await store.add(_market_price(minute=52))
+        assert await store.flush() is True
+
+        conn.execution_options.assert_awaited_once_with(isolation_level="AUTOCOMMIT")
+        windows = {call.args[1]["view"]: call.args[1] for call in conn.execute.call_args_list}
+        assert windows["market_data_5m"]["window_start"] == datetime(2025, 1, 1, 0, 5)
+        assert windows["market_data_5m"]["window_end"] == datetime(2025, 1, 1, 0, 55)
+        assert windows["market_data_1d"]["window_end"] == datetime(2025, 1, 2)
+        assert store.get_stats()["late_range"] is None
+        assert store.stats["rollup_refreshes"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -699,5 +699,69 @@ class TestEndToEndPerformance:
         print(f"  Steps: Auth + User Creation + Bid Creation")
 
 
+class TestPerformanceMonitoringHistograms:
+    """Test histogram-backed metric recording"""
+    
+    def test_percentiles_within_histogram_precision(self):
+        """Histogram percentiles stay within 1% of exact sample percentiles"""
+        from app.services.metric_histograms import LogHistogram
+        
+        values = [0.001 * (i + 1) for i in range(10000)]
+        histogram = LogHistogram()
+        for value in values:
+            histogram.record(value)
+        
+        p50, p95, p99 = histogram.percentiles(50, 95, 99)
+        for estimate, exact in ((p50, statistics.median(values)), (p95, 9.5), (p99, 9.9)):
+            assert abs(estimate - exact) / exact < 0.01
+        assert histogram.count == 10000
+        assert (histogram.min, histogram.max) == (0.001, 10.0)
+    
+    @pytest.mark.asyncio
+    async def test_summary_merges_label_series(self):
+        """Summaries aggregate every label series of a metric type"""
+        from app.services.performance_monitoring_service import (
+            PerformanceMonitoringService, MetricType
+        )
+        
+        service = PerformanceMonitoringService()
+        for i in range(100):
+            await service.record_api_request("/api/market", "GET", 0.1, 200)
+            await service.record_api_request("/api/bids", "POST", 0.3, 200)
+        
+        summary = await service.get_performance_summary("5m")
+        response_time = summary["metrics"][MetricType.RESPONSE_TIME.value]
+        assert response_time["count"] == 200
+        assert abs(response_time["avg"] - 0.2) < 1e-9
+        assert abs(response_time["p95"] - 0.3) < 0.003
+        assert service._active_alerts == {}
+        
+        realtime = await service.get_real_time_metrics([MetricType.RESPONSE_TIME])
+        assert realtime["metrics"][MetricType.RESPONSE_TIME.value]["current"] == 0.3
+    
+    @pytest.mark.asyncio
+    async def test_sampling_happens_before_recording(self):
+        """Unsampled metrics are not stored but are still checked for alerts"""
+        from app.services.performance_monitoring_service import (
+            PerformanceMonitoringService, MetricType
+        )
+        
+        service = PerformanceMonitoringService(sample_rate=0.5)
+        with patch("app.services.performance_monitoring_service.random.random", return_value=0.9):
+            await service.record_metric(MetricType.RESPONSE_TIME, 0.1)
+            assert service._metrics.sample_count == 0
+            assert service._active_alerts == {}
+            
+            await service.record_metric(MetricType.RESPONSE_TIME, 10.0)
+        assert service._metrics.sample_count == 0
+        assert len(service._active_alerts) == 1
+        
+        with patch("app.services.performance_monitoring_service.random.random", return_value=0.1):
+            await service.record_metric(MetricType.RESPONSE_TIME, 10.0)
+        summary = await service.get_performance_summary("5m")
+        assert summary["metrics"][MetricType.RESPONSE_TIME.value]["count"] == 2
+        assert len(service._active_alerts) == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
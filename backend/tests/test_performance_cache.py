@@ -0,0 +1,669 @@
+"""
+Performance cache tests
+Tests the multi-tier PerformanceCacheService and its in-memory engine
+"""
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import Mock, AsyncMock, MagicMock, patch
+
+
+def _entry(key, size_bytes=100, ttl=60):
+    """CacheEntry with the given size that expires after ttl seconds"""
+    from app.services.performance_cache_service import CacheEntry
+
+    now = datetime.utcnow()
+    return CacheEntry(
+        key=key,
+        value=key,
+        created_at=now,
+        expires_at=now + timedelta(seconds=ttl),
+        size_bytes=size_bytes
+    )
+
+
+class TestL1CacheEngine:
+    """Test the O(1) memory cache engine"""
+
+    def test_hits_promote_keys_so_eviction_is_lru(self):
+        from app.services.memory_cache import L1Cache
+
+        cache = L1Cache(max_bytes=300)
+        for key in ("a", "b", "c"):
+            cache.set(_entry(key))
+
+        assert cache.get("a") is not None
+        cache.set(_entry("d"))
+
+        assert "b" not in cache
+        assert set(cache.keys()) == {"a", "c", "d"}
+        assert cache.stats["evictions"] == 1
+
+    def test_budget_is_in_bytes(self):
+        from app.services.memory_cache import L1Cache
+
+        cache = L1Cache(max_bytes=1000)
+        cache.set(_entry("small-1", size_bytes=200))
+        cache.set(_entry("small-2", size_bytes=200))
+        cache.set(_entry("large", size_bytes=700))
+
+        assert cache.total_bytes == 900
+        assert set(cache.keys()) == {"small-2", "large"}
+        assert cache.set(_entry("too-large", size_bytes=1001)) is False
+
+    def test_replacing_a_key_adjusts_accounting(self):
+        from app.services.memory_cache import L1Cache
+
+        cache = L1Cache(max_bytes=1000)
+        cache.set(_entry("a", size_bytes=300))
+        cache.set(_entry("a", size_bytes=500))
+
+        assert len(cache) == 1
+        assert cache.total_bytes == 500
+
+    def test_expired_entries_dropped_lazily(self):
+        from app.services.memory_cache import L1Cache
+
+        cache = L1Cache(max_bytes=1000)
+        cache.set(_entry("stale", ttl=-1))
+        cache.set(_entry("fresh"))
+
+        assert "stale" in cache
+        assert cache.get("stale") is None
+        assert "stale" not in cache
+        assert cache.total_bytes == 100
+        assert cache.stats["expirations"] == 1
+
+    def test_tinylfu_admission_resists_scans(self):
+        from app.services.memory_cache import L1Cache
+
+        cache = L1Cache(max_bytes=1000, admission=True, window_fraction=0.1)
+        hot = [f"hot-{i}" for i in range(9)]
+        for key in hot:
+            cache.set(_entry(key))
+        for _ in range(5):
+            for key in hot:
+                cache.get(key)
+
+        # A one-off scan should not flush the frequently used keys
+        for i in range(100):
+            cache.get(f"scan-{i}")
+            cache.set(_entry(f"scan-{i}"))
+
+        assert all(key in cache for key in hot)
+        assert cache.total_bytes <= 1000
+        assert cache.stats["rejections"] > 0
+
+
+class TestCacheCodecs:
+    """Test the self-describing cache value codecs"""
+
+    def test_round_trip_with_compression_above_threshold(self):
+        from app.services.cache_codecs import CacheCodec, Compression, HEADER, decode_value
+
+        codec = CacheCodec(compression=Compression.ZLIB, compression_threshold=64)
+        small = {"value": 1}
+        large = {"prices": [100.5] * 500, "zone": "PJM"}
+
+        small_bytes = codec.encode(small)
+        large_bytes = codec.encode(large)
+
+        assert small_bytes[HEADER.size - 1] == Compression.NONE
+        assert large_bytes[HEADER.size - 1] == Compression.ZLIB
+        assert decode_value(small_bytes) == small
+        assert decode_value(large_bytes) == large
+
+    def test_header_lets_any_codec_decode(self):
+        from app.services.cache_codecs import CacheCodec, Compression, Serializer
+
+        value = {"kpi": "revenue", "points": [1, 2, 3]}
+        json_bytes = CacheCodec(Serializer.JSON, Compression.NONE).encode(value)
+
+        assert CacheCodec(Serializer.MSGPACK).decode(json_bytes) == value
+
+    def test_unsupported_values_fall_back_to_pickle(self):
+        from app.services.cache_codecs import CacheCodec, Serializer, decode_value
+
+        value = {"generated_at": datetime(2024, 1, 1, 12, 0)}
+        encoded = CacheCodec(Serializer.MSGPACK).encode(value)
+
+        assert encoded[3] == Serializer.PICKLE
+        assert decode_value(encoded) == value
+
+    def test_rejects_values_without_header(self):
+        from app.services.cache_codecs import CodecError, decode_value
+
+        with pytest.raises(CodecError):
+            decode_value(b'{"value": 1}')
+
+    def test_codec_chosen_by_longest_prefix(self):
+        from app.services.cache_codecs import CacheCodec, CodecRegistry, Serializer
+
+        registry = CodecRegistry()
+        timeseries = CacheCodec(Serializer.MSGPACK)
+        analytics = CacheCodec(Serializer.JSON)
+        registry.register("dashboard:", analytics, store_live=False)
+        registry.register("dashboard:timeseries:", timeseries)
+
+        assert registry.policy_for("dashboard:timeseries:chart:abc").codec is timeseries
+        assert registry.policy_for("dashboard:kpi:w1:abc").store_live is False
+        assert registry.policy_for("market:summary:1h") is registry.default
+
+
+class TestPerformanceCacheService:
+    """Test PerformanceCacheService with the memory tier only"""
+
+    @pytest.mark.asyncio
+    async def test_memory_tier_round_trip_and_eviction(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService(memory_cache_size=2)
+        await cache_service.set("dashboard:a", {"value": 1})
+        await cache_service.set("dashboard:b", {"value": 2})
+        assert await cache_service.get("dashboard:a") == {"value": 1}
+        await cache_service.set("dashboard:c", {"value": 3})
+
+        assert await cache_service.get("dashboard:b") is None
+        assert await cache_service.get("dashboard:a") == {"value": 1}
+
+        metrics = await cache_service.get_metrics()
+        assert metrics["evictions"] == 1
+        assert metrics["memory_cache_size"] == 2
+
+    @pytest.mark.asyncio
+    async def test_values_encoded_once_per_write(self):
+        from app.services.performance_cache_service import CacheTier, PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        store = {}
+        cache_service._redis_cluster = AsyncMock()
+        cache_service._redis_cluster.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+        cache_service._redis_cluster.get.side_effect = lambda key: store.get(key)
+        cache_service._redis_client = AsyncMock()
+        cache_service._redis_client.get.return_value = None
+
+        codec = cache_service.codecs.default.codec
+        value = {"prices": [100.5, 102.3], "zone": "PJM"}
+        with patch.object(codec, "encode", wraps=codec.encode) as encode:
+            await cache_service.set("dashboard:market_data:PJM:1h", value)
+        assert encode.call_count == 1
+
+        # L1 holds the live object; L2 holds the header-tagged bytes
+        assert await cache_service.get("dashboard:market_data:PJM:1h") is value
+        assert isinstance(store["dashboard:market_data:PJM:1h"], bytes)
+        assert await cache_service.get(
+            "dashboard:market_data:PJM:1h", tiers=[CacheTier.L2_REDIS]
+        ) == value
+
+    @pytest.mark.asyncio
+    async def test_namespace_can_keep_encoded_bytes_in_memory(self):
+        from app.services.cache_codecs import CacheCodec
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        cache_service.register_codec("analytics:", CacheCodec(), store_live=False)
+        value = {"metrics": [1, 2, 3]}
+        await cache_service.set("analytics:metrics:1d:1h", value)
+
+        entry = cache_service._memory_cache.peek("analytics:metrics:1d:1h")
+        assert entry.encoded and isinstance(entry.value, bytes)
+        cached = await cache_service.get("analytics:metrics:1d:1h")
+        assert cached == value and cached is not value
+
+
+class TestGetOrLoad:
+    """Test request coalescing and stale-while-revalidate"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"market_summary": "24h"}
+
+        results = await asyncio.gather(*[
+            cache_service.get_or_load("market:summary:24h", loader, ttl=60) for _ in range(20)
+        ])
+
+        assert calls == 1
+        assert all(result == {"market_summary": "24h"} for result in results)
+        assert cache_service.load_stats["coalesced"] == 19
+        assert await cache_service.get_or_load("market:summary:24h", loader, ttl=60) == results[0]
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_loader_errors_reach_every_waiter(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("database unavailable")
+
+        results = await asyncio.gather(*[
+            cache_service.get_or_load("market:summary:1h", loader, ttl=60) for _ in range(3)
+        ], return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert "market:summary:1h" not in cache_service._inflight
+
+    @pytest.mark.asyncio
+    async def test_stale_value_served_while_refreshing(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        versions = iter(["v1", "v2"])
+        refreshed = asyncio.Event()
+
+        async def loader():
+            value = next(versions)
+            if value == "v2":
+                refreshed.set()
+            return value
+
+        with patch("app.services.performance_cache_service.time.time", return_value=1000.0):
+            assert await cache_service.get_or_load("dashboard:kpi:w:1", loader, ttl=10, stale_ttl=30) == "v1"
+
+        with patch("app.services.performance_cache_service.time.time", return_value=1015.0):
+            assert await cache_service.get_or_load("dashboard:kpi:w:1", loader, ttl=10, stale_ttl=30) == "v1"
+            await asyncio.wait_for(refreshed.wait(), 1)
+            await asyncio.sleep(0)
+
+        assert cache_service.load_stats["stale_served"] == 1
+        assert await cache_service.get("dashboard:kpi:w:1") == "v2"
+
+    @pytest.mark.asyncio
+    async def test_expensive_values_refresh_early(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        loader = AsyncMock(return_value="fresh")
+        await cache_service._write(
+            "analytics:metrics:1d:1h", "cached", 60, None,
+            fresh_until=1000.0, compute_seconds=5.0
+        )
+
+        # One second before expiry with a 5s loader, XFetch refreshes for most draws
+        with patch("app.services.performance_cache_service.time.time", return_value=999.0), \
+                patch("app.services.performance_cache_service.random.random", return_value=0.5):
+            value = await cache_service.get_or_load("analytics:metrics:1d:1h", loader, ttl=60)
+            await asyncio.sleep(0)
+
+        assert value == "cached"
+        assert cache_service.load_stats["early_refreshes"] == 1
+        loader.assert_awaited_once()
+
+
+class TestTagInvalidation:
+    """Test tag-based invalidation without keyspace scans"""
+
+    @staticmethod
+    def _pipeline(results):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=results)
+        return pipe
+
+    @pytest.mark.asyncio
+    async def test_memory_tier_invalidated_by_tag(self):
+        from app.services.performance_cache_service import CacheTags, PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        await cache_service.set("dashboard:market_data:PJM:1h", {"p": 1}, tags=[CacheTags.zone("PJM")])
+        await cache_service.set("dashboard:market_data:PJM:24h", {"p": 2}, tags=[CacheTags.zone("PJM")])
+        await cache_service.set("dashboard:market_data:ERCOT:1h", {"p": 3}, tags=[CacheTags.zone("ERCOT")])
+
+        assert await cache_service.invalidate_tags([CacheTags.zone("PJM")]) == 2
+        assert await cache_service.get("dashboard:market_data:PJM:1h") is None
+        assert await cache_service.get("dashboard:market_data:ERCOT:1h") == {"p": 3}
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_invalidated_from_tag_sets(self):
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService()
+        cluster = MagicMock()
+        lookup = self._pipeline([[{b"dashboard:user:u1:d1", b"dashboard:kpi:w1:abc"}]])
+        deletes = self._pipeline([[1, 1], [1]])
+        cluster.pipeline.side_effect = [lookup, deletes, self._pipeline([[1]])]
+        cluster.keys = AsyncMock()
+        cluster.scan_iter = MagicMock()
+        cache_service._redis_cluster = cluster
+        cache_service._redis_client = AsyncMock()
+
+        count = await cache_service.invalidate_tags(["dashboard:d1"])
+
+        assert count == 2
+        lookup.smembers.assert_called_once_with("tag:dashboard:d1")
+        assert {c.args[0] for c in deletes.unlink.call_args_list} == {
+            "dashboard:user:u1:d1", "dashboard:kpi:w1:abc"
+        }
+        cluster.keys.assert_not_called()
+        cluster.scan_iter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_zone_connections_use_index_not_keys(self):
+        import json
+        from app.services.redis_cache import RedisCacheService
+
+        service = RedisCacheService()
+        service.is_connected = True
+        service.redis_client = AsyncMock()
+        service.redis_client.smembers.return_value = {"c1", "c2"}
+        service.redis_client.mget.side_effect = lambda keys: [
+            json.dumps({"connection_id": "c1", "market_zone": "PJM"}) if key == "websocket:c1" else None
+            for key in keys
+        ]
+
+        connections = await service.get_connections_by_market_zone("PJM")
+
+        assert connections == [{"connection_id": "c1", "market_zone": "PJM"}]
+        service.redis_client.smembers.assert_awaited_once_with("websocket:zone:PJM")
+        service.redis_client.srem.assert_awaited_once_with("websocket:zone:PJM", "c2")
+        service.redis_client.keys.assert_not_called()
+
+
+class TestInvalidationBus:
+    """Test cross-node L1 invalidation"""
+
+    @staticmethod
+    async def _nodes(count=2):
+        from app.services.cache_invalidation import LocalInvalidationBus, LocalInvalidationHub
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        hub = LocalInvalidationHub()
+        nodes = []
+        for _ in range(count):
+            node = PerformanceCacheService(
+                invalidation_bus=LocalInvalidationBus(hub, batch_interval=0.01)
+            )
+            await node.invalidation_bus.start()
+            nodes.append(node)
+        return nodes
+
+    @pytest.mark.asyncio
+    async def test_write_on_one_node_evicts_other_nodes_l1(self):
+        node_a, node_b = await self._nodes()
+        await node_b.set("dashboard:user:u1:d1", {"layout": "old"})
+
+        await node_a.set("dashboard:user:u1:d1", {"layout": "new"})
+        await node_a.invalidation_bus.flush()
+
+        assert await node_b.get("dashboard:user:u1:d1") is None
+        assert await node_a.get("dashboard:user:u1:d1") == {"layout": "new"}
+        for node in (node_a, node_b):
+            await node.close()
+
+    @pytest.mark.asyncio
+    async def test_tag_invalidation_reaches_other_nodes(self):
+        node_a, node_b = await self._nodes()
+        await node_b.set("dashboard:market_data:PJM:1h", {"p": 1}, tags=["zone:PJM"])
+        await node_b.set("dashboard:market_data:ERCOT:1h", {"p": 2}, tags=["zone:ERCOT"])
+
+        await node_a.invalidate_tags(["zone:PJM"])
+        await asyncio.sleep(0.05)
+
+        assert await node_b.get("dashboard:market_data:PJM:1h") is None
+        assert await node_b.get("dashboard:market_data:ERCOT:1h") == {"p": 2}
+        for node in (node_a, node_b):
+            await node.close()
+
+    @pytest.mark.asyncio
+    async def test_late_invalidation_keeps_newer_write(self):
+        node_a, node_b = await self._nodes()
+        stale_version = await node_a.invalidation_bus.next_version()
+        await node_b.set("market:summary:24h", {"v": 2})
+
+        await node_b._apply_remote_invalidations([{"key": "market:summary:24h", "version": stale_version}])
+
+        assert await node_b.get("market:summary:24h") == {"v": 2}
+        for node in (node_a, node_b):
+            await node.close()
+
+    @pytest.mark.asyncio
+    async def test_fill_overtaken_by_another_nodes_write_is_not_cached(self):
+        from app.services.performance_cache_service import CacheTier
+
+        node_a, node_b = await self._nodes()
+
+        async def load_before_write():
+            # node_b reads the database, then node_a writes before the fill lands
+            await node_a.set("market:summary:24h", {"v": "new"}, tiers=[CacheTier.L1_MEMORY])
+            await node_a.invalidation_bus.flush()
+            return {"v": "old"}
+
+        assert await node_b.get_or_load("market:summary:24h", load_before_write, tiers=[CacheTier.L1_MEMORY]) == {"v": "old"}
+        assert await node_b.get("market:summary:24h") is None
+        assert node_b.load_stats["superseded_fills"] == 1
+
+        # A fill that started after the invalidation is cached, and survives its late delivery
+        fill_version = await node_b.invalidation_bus.current_version()
+        await node_b.get_or_load("market:summary:24h", lambda: {"v": "new"}, tiers=[CacheTier.L1_MEMORY])
+        await node_b._apply_remote_invalidations([{"key": "market:summary:24h", "version": fill_version}])
+        assert await node_b.get("market:summary:24h") == {"v": "new"}
+        for node in (node_a, node_b):
+            await node.close()
+
+    def test_bus_transport_hooks_are_abstract(self):
+        from app.services.cache_invalidation import InvalidationBus
+
+        with pytest.raises(TypeError):
+            InvalidationBus()
+
+    @pytest.mark.asyncio
+    async def test_events_for_a_key_collapse_into_one(self):
+        from app.services.cache_invalidation import LocalInvalidationBus, LocalInvalidationHub
+
+        bus = LocalInvalidationBus(LocalInvalidationHub(), batch_interval=10)
+        await bus.start()
+        for version in (1, 3, 2):
+            bus.publish({"key": "k", "version": version})
+        bus.publish({"tag": "zone:PJM", "version": 1})
+
+        assert bus.get_stats()["pending_events"] == 2
+        await bus.flush()
+        assert bus.stats["events_published"] == 2
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_early_flushes(self):
+        from app.services.cache_invalidation import LocalInvalidationBus, LocalInvalidationHub
+
+        sent = []
+
+        async def slow_send(envelope):
+            await asyncio.sleep(0.05)
+            sent.append(envelope)
+
+        bus = LocalInvalidationBus(LocalInvalidationHub(), batch_interval=10, max_batch_size=1)
+        await bus.start()
+        bus._send = slow_send
+        bus.publish({"key": "k", "version": 1})
+        await bus.stop()
+
+        assert [event["key"] for envelope in sent for event in envelope["events"]] == ["k"]
+        assert len(bus._early_flushes) == 0
+
+
+class TestCacheWarmer:
+    """Test warm-up schedules and key selection"""
+
+    def test_cron_schedule_next_after(self):
+        from app.services.cache_warming import CronSchedule
+
+        every_five = CronSchedule("*/5 * * * *")
+        assert every_five.next_after(datetime(2024, 3, 1, 10, 2, 30)) == datetime(2024, 3, 1, 10, 5)
+
+        # 2024-03-01 is a Friday: the next weekday run is Monday
+        weekdays = CronSchedule("30 12 * * 1-5")
+        assert weekdays.next_after(datetime(2024, 3, 1, 12, 30)) == datetime(2024, 3, 4, 12, 30)
+
+        with pytest.raises(ValueError):
+            CronSchedule("61 * * * *")
+
+    def test_before_market_open(self):
+        from app.services.cache_warming import CronSchedule
+
+        schedule = CronSchedule.before_market_open("00:10", lead_minutes=15)
+        assert schedule.expression == "55 23 * * 1-5"
+
+    @pytest.mark.asyncio
+    async def test_warmer_is_off_by_default(self):
+        from app.core.config import settings
+        from app.services.cache_warming import start_cache_warmer
+
+        cache_service = MagicMock()
+        assert settings.CACHE_WARMUP_ENABLED is False
+        assert await start_cache_warmer(cache_service) is None
+        cache_service.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_market_summary_matches_zones_case_insensitively(self):
+        from app.services.cache_warming import load_market_summary
+
+        crud = Mock()
+        crud.get_market_zones_summary = AsyncMock(return_value=[{"market_zone": "pjm"}])
+        crud.get_zone_statistics = AsyncMock(return_value={"PJM": {"prices": {"avg": 41.0}, "volumes": {}}})
+        with patch("app.core.database.AsyncSessionLocal", return_value=AsyncMock()), \
+                patch("app.crud.market_data.market_data_crud", crud):
+            summary = await load_market_summary("market:summary:24h")
+
+        assert summary["zones"] == [{"market_zone": "pjm", "prices": {"avg": 41.0}}]
+
+    @pytest.mark.asyncio
+    async def test_warms_candidates_and_hot_keys_but_not_fresh_ones(self):
+        from app.services.cache_warming import CacheWarmer, WarmupFamily
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        cache_service = PerformanceCacheService(access_sample_rate=1.0)
+        await cache_service.set("market:summary:7d", {"v": 0}, ttl=1)
+        for _ in range(3):
+            await cache_service.get("market:summary:7d")
+        await cache_service.get_or_load("market:summary:24h", lambda: {"v": 0}, ttl=3600)
+
+        loader = AsyncMock(side_effect=lambda key: {"key": key})
+        warmer = CacheWarmer(cache_service, max_concurrency=2)
+        warmer.register_family(WarmupFamily(
+            name="market_summary",
+            key_prefix="market:summary:",
+            loader=loader,
+            ttl=300,
+            candidate_keys=lambda: ["market:summary:1h", "market:summary:24h"]
+        ))
+
+        assert await warmer.warm_family("market_summary") == 2
+
+        loaded = sorted(call.args[0] for call in loader.await_args_list)
+        assert loaded == ["market:summary:1h", "market:summary:7d"]
+        assert await cache_service.get("market:summary:7d") == {"key": "market:summary:7d"}
+        await cache_service.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        from app.services.cache_warming import CacheWarmer, WarmupFamily
+        from app.services.performance_cache_service import PerformanceCacheService
+
+        running, peak = 0, 0
+
+        async def loader(key):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"key": key}
+
+        cache_service = PerformanceCacheService()
+        warmer = CacheWarmer(cache_service, max_concurrency=2)
+        warmer.register_family(WarmupFamily(
+            name="market_data",
+            key_prefix="dashboard:market_data:",
+            loader=loader,
+            ttl=300,
+            candidate_keys=lambda: [f"dashboard:market_data:Z{i}:1h" for i in range(6)]
+        ))
+
+        assert await warmer.warm_family("market_data") == 6
+        assert peak == 2
+        await cache_service.close()
+
+
+class TestAccessStats:
+    """Test in-memory access tracking"""
+
+    @pytest.mark.asyncio
+    async def test_hits_are_counted_without_redis_round_trips(self):
+        from app.services.performance_cache_service import CacheTier, PerformanceCacheService
+
+        cache_service = PerformanceCacheService(access_sample_rate=1.0)
+        cache_service._redis_cluster = AsyncMock()
+        cache_service._redis_client = AsyncMock()
+        await cache_service.set("market:summary:1h", {"v": 1}, tiers=[CacheTier.L1_MEMORY])
+        for _ in range(5):
+            await cache_service.get("market:summary:1h")
+
+        assert cache_service._redis_client.method_calls == []
+        stats = cache_service._access_stats.get_stats()
+        assert stats["tier_hits"] == {"l1_memory": 5}
+        assert stats["hot_keys"] == [{"key": "market:summary:1h", "estimated_hits": 5}]
+
+    @pytest.mark.asyncio
+    async def test_flush_batches_pending_counts_and_ages_local_ones(self):
+        from app.services.cache_access import AccessStats
+
+        stats = AccessStats(sample_rate=0.5)
+        with patch("app.services.cache_access.random.random", return_value=0.0):
+            for key in ["a", "a", "a", "b"]:
+                stats.record(key, "l1_memory")
+
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute = AsyncMock(return_value=[])
+        stats._client = client
+        await stats.flush(now=3 * stats.decay_interval + 1)
+
+        pipe.zincrby.assert_any_call("cache:access:{hot}:3", 6, "a")
+        pipe.zincrby.assert_any_call("cache:access:{hot}:3", 2, "b")
+        pipe.execute.assert_awaited_once()
+        assert stats.hot_keys() == ["a"]
+        assert stats.estimate("a") == 2
+
+    @pytest.mark.asyncio
+    async def test_shared_ranking_decays_older_intervals(self):
+        from app.services.cache_access import AccessStats
+
+        stats = AccessStats(sample_rate=1.0, decay_interval=60, decay_windows=3)
+        stats.record("a", "l1_memory")
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute = AsyncMock(return_value=[])
+        stats._client = client
+
+        await stats.flush(now=600)
+
+        pipe.expire.assert_any_call("cache:access:{hot}:10", 180)
+        pipe.zunionstore.assert_called_once_with(AccessStats.HOT_KEYS, {
+            "cache:access:{hot}:10": 1.0, "cache:access:{hot}:9": 0.5, "cache:access:{hot}:8": 0.25
+        })
+
+    def test_tracked_keys_are_bounded(self):
+        from app.services.cache_access import AccessStats
+
+        stats = AccessStats(sample_rate=1.0, max_keys=4)
+        for _ in range(3):
+            stats.record("hot", "l2_redis")
+        for i in range(10):
+            stats.record(f"cold:{i}", "l2_redis")
+
+        assert len(stats._counts) <= 4
+        assert stats.hot_keys(limit=1) == ["hot"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,164 @@
+"""
+Redis cache service tests
+Tests batched Redis operations and the callers that rely on them
+"""
+import pytest
+import json
+from datetime import datetime, timedelta
+from unittest.mock import Mock, AsyncMock, MagicMock
+from uuid import uuid4
+
+
+def _connected_cache():
+    """RedisCacheService with a mocked, connected client"""
+    from app.services.redis_cache import RedisCacheService
+
+    service = RedisCacheService()
+    service.is_connected = True
+    service.redis_client = AsyncMock()
+    return service
+
+
+class TestBatchedOperations:
+    """Test mget/mset, pipelines and Lua scripts"""
+
+    @pytest.mark.asyncio
+    async def test_mget_decodes_json_and_keeps_missing_keys(self):
+        service = _connected_cache()
+        service.redis_client.mget.return_value = [json.dumps({"price": 42.5}), None, "plain"]
+
+        values = await service.mget(["latest_price:PJM", "latest_price:ERCOT", "label"])
+
+        assert values == [{"price": 42.5}, None, "plain"]
+        service.redis_client.mget.assert_awaited_once_with(["latest_price:PJM", "latest_price:ERCOT", "label"])
+
+    @pytest.mark.asyncio
+    async def test_mset_with_expiry_uses_one_pipeline(self):
+        service = _connected_cache()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[True, True])
+        service.redis_client.pipeline = Mock(return_value=pipe)
+
+        assert await service.mset({"a": {"v": 1}, "b": 2}, expire_seconds=60)
+
+        pipe.setex.assert_any_call("a", 60, json.dumps({"v": 1}))
+        pipe.setex.assert_any_call("b", 60, 2)
+        pipe.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_scripts_load_once_and_report_failures(self):
+        service = _connected_cache()
+        script = AsyncMock(return_value=3)
+        service.redis_client.register_script = Mock(return_value=script)
+
+        assert await service.incr_with_ttl("usage:org:api_call", expire_seconds=3600) == 3
+        assert await service.incr_with_ttl("usage:org:api_call", expire_seconds=3600) == 3
+
+        service.redis_client.register_script.assert_called_once()
+        script.assert_awaited_with(keys=["usage:org:api_call"], args=[1, 3600])
+
+        script.side_effect = ConnectionError("down")
+        assert await service.incr_with_ttl("usage:org:api_call", expire_seconds=3600) is None
+
+    @pytest.mark.asyncio
+    async def test_tagged_set_extends_index_ttl_without_expire_flags(self):
+        from app.services.redis_cache import ADD_TO_INDEX_SCRIPT
+
+        service = _connected_cache()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[True, 1, 1])
+        service.redis_client.pipeline = Mock(return_value=pipe)
+
+        assert await service.set("market:PJM", {"v": 1}, expire_seconds=60, tags=["market", "zone:PJM"])
+        assert await service.set("config", {"v": 2}, tags=["market"])
+
+        # EXPIRE NX/GT needs Redis 7; the script does the same comparison on any version
+        pipe.expire.assert_not_called()
+        pipe.eval.assert_any_call(ADD_TO_INDEX_SCRIPT, 1, "tag:zone:PJM", "market:PJM", 60)
+        pipe.eval.assert_any_call(ADD_TO_INDEX_SCRIPT, 1, "tag:market", "config", 0)
+
+    @pytest.mark.asyncio
+    async def test_increment_within_limits_reports_exhausted_counter(self):
+        service = _connected_cache()
+        script = AsyncMock(side_effect=[[1, 0, 5, 40, 900], [0, 2, 1000]])
+        service.redis_client.register_script = Mock(return_value=script)
+        counters = [("burst", 100, 60), ("hourly", 1000, 3600), ("daily", 10000, 86400)]
+
+        assert await service.increment_within_limits(counters) == (True, None, [5, 40, 900])
+        assert await service.increment_within_limits(counters) == (False, 1, [1000])
+        script.assert_awaited_with(
+            keys=["burst", "hourly", "daily"],
+            args=[100, 60, 1000, 3600, 10000, 86400]
+        )
+
+    def test_pipeline_unavailable_when_disconnected(self):
+        from app.services.redis_cache import RedisCacheService
+
+        assert RedisCacheService().pipeline() is None
+
+
+class TestUsageTrackingRedis:
+    """Test UsageTrackingService Redis round trips"""
+
+    @staticmethod
+    def _service(cache):
+        from app.services.usage_tracking_service import RateLimitConfig, UsageTrackingService
+
+        service = UsageTrackingService(MagicMock(), cache, MagicMock())
+        service._get_rate_limit_config = AsyncMock(return_value=RateLimitConfig(
+            organization_id=uuid4(),
+            endpoint_pattern="/api/*",
+            limit_per_hour=1000,
+            limit_per_day=10000,
+            burst_limit=100
+        ))
+        return service
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_check_is_one_script_call(self):
+        cache = _connected_cache()
+        script = AsyncMock(return_value=[1, 0, 1, 1, 1])
+        cache.redis_client.register_script = Mock(return_value=script)
+
+        allowed, details = await self._service(cache).check_rate_limit(uuid4(), "/api/dashboards")
+
+        assert allowed and details["reason"] == "Within limits"
+        assert script.await_count == 1
+        cache.redis_client.get.assert_not_called()
+        cache.redis_client.incr.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_reports_exceeded_window(self):
+        cache = _connected_cache()
+        cache.redis_client.register_script = Mock(return_value=AsyncMock(return_value=[0, 2, 1000]))
+
+        allowed, details = await self._service(cache).check_rate_limit(uuid4(), "/api/dashboards")
+
+        assert not allowed
+        assert details == {
+            "allowed": False,
+            "reason": "Hourly limit exceeded",
+            "current": 1000,
+            "limit": 1000
+        }
+
+    @pytest.mark.asyncio
+    async def test_quota_counter_updated_in_one_call(self):
+        cache = _connected_cache()
+        script = AsyncMock(return_value=1)
+        cache.redis_client.register_script = Mock(return_value=script)
+        organization_id = uuid4()
+        period_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        await self._service(cache)._update_quota_in_redis(
+            organization_id, "api_call", period_start, period_start + timedelta(days=30)
+        )
+
+        key = f"usage:{organization_id}:api_call:{period_start.date()}"
+        script.assert_awaited_once()
+        assert script.await_args.kwargs["keys"] == [key]
+        assert 0 < script.await_args.kwargs["args"][1] <= 30 * 86400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
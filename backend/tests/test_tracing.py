@@ -0,0 +1,252 @@
+"""
+Distributed tracing tests
+Tests trace context propagation and batched span export
+"""
+import pytest
+import asyncio
+import json
+from collections import namedtuple
+from unittest.mock import Mock, AsyncMock, MagicMock, patch
+
+
+_Record = namedtuple("_Record", ["topic", "partition", "offset", "key", "value", "headers", "timestamp"])
+
+
+from app.core.tracing import SpanExporter
+
+
+class _CollectingExporter(SpanExporter):
+    """Exporter keeping every exported batch in memory"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def export(self, spans):
+        self.batches.append(list(spans))
+
+
+def _tracer(sample_rate=1.0):
+    from app.core.tracing import Tracer
+
+    return Tracer("test-service", sample_rate=sample_rate, exporter=_CollectingExporter())
+
+
+class TestTraceContext:
+    """Test W3C trace context handling"""
+
+    def test_traceparent_round_trip(self):
+        from app.core.tracing import SpanContext, extract_context
+
+        context = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+        header = context.to_traceparent()
+
+        assert header == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        parsed = extract_context([("traceparent", header.encode())])
+        assert (parsed.trace_id, parsed.span_id, parsed.sampled, parsed.remote) == (
+            context.trace_id, context.span_id, True, True
+        )
+
+    def test_malformed_headers_are_ignored(self):
+        from app.core.tracing import SpanContext
+
+        assert SpanContext.from_traceparent(None) is None
+        assert SpanContext.from_traceparent("00-xyz-00f067aa0ba902b7-01") is None
+        assert SpanContext.from_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+
+class TestTracer:
+    """Test span creation, sampling and export"""
+
+    @pytest.mark.asyncio
+    async def test_children_are_exported_with_their_local_root(self):
+        tracer = _tracer()
+
+        with tracer.start_span("GET /api/market", kind="server") as root:
+            with tracer.start_span("publish market_data.pjm", kind="producer") as child:
+                headers = tracer.inject_headers()
+            assert tracer._queue == []
+
+        await tracer.flush()
+
+        batch, = tracer.exporter.batches
+        assert [span.name for span in batch] == ["publish market_data.pjm", "GET /api/market"]
+        assert child.parent_span_id == root.context.span_id
+        assert child.context.trace_id == root.context.trace_id
+        assert headers == [("traceparent", child.context.to_traceparent().encode())]
+
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_early_exports(self):
+        from app.core.tracing import Tracer
+
+        class _SlowExporter(_CollectingExporter):
+            async def export(self, spans):
+                await asyncio.sleep(0.05)
+                await super().export(spans)
+
+        tracer = Tracer("test-service", exporter=_SlowExporter(), max_batch_size=1)
+        await tracer.start()
+        with tracer.start_span("GET /api/market"):
+            pass
+        await tracer.stop()
+
+        batch, = tracer.exporter.batches
+        assert [span.name for span in batch] == ["GET /api/market"]
+        assert len(tracer._early_flushes) == 0
+
+    @pytest.mark.asyncio
+    async def test_unsampled_traces_propagate_but_are_not_exported(self):
+        tracer = _tracer(sample_rate=0.0)
+
+        with tracer.start_span("GET /api/market"):
+            header = tracer.traceparent()
+
+        await tracer.flush()
+        assert header.endswith("-00")
+        assert tracer.exporter.batches == []
+
+    @pytest.mark.asyncio
+    async def test_upstream_sampling_decision_is_honoured(self):
+        from app.core.tracing import SpanContext
+
+        tracer = _tracer(sample_rate=0.0)
+        parent = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True, remote=True)
+
+        with pytest.raises(ValueError):
+            with tracer.start_span("process market_data.pjm", parent=parent):
+                raise ValueError("bad tick")
+
+        await tracer.flush()
+        span, = tracer.exporter.batches[0]
+        assert span.parent_span_id == "00f067aa0ba902b7"
+        assert span.status == "ERROR" and span.error_message == "ValueError: bad tick"
+
+    def test_disabled_tracer_injects_nothing(self):
+        from app.core.tracing import Tracer
+
+        tracer = Tracer("test-service", enabled=False)
+        with tracer.start_span("GET /api/market") as span:
+            assert tracer.inject_headers() == []
+        assert span.recording is False
+
+    def test_otlp_json_layout(self):
+        from app.core.tracing import OTLPFileExporter
+
+        tracer = _tracer()
+        with tracer.start_span("GET /api/market", kind="server", attributes={"http.status_code": 200}):
+            pass
+
+        document = OTLPFileExporter.to_otlp(tracer._queue)
+        resource, = document["resourceSpans"]
+        assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "test-service"}
+        span, = resource["scopeSpans"][0]["spans"]
+        assert span["kind"] == 2
+        assert {"key": "http.status_code", "value": {"intValue": "200"}} in span["attributes"]
+
+    def test_otlp_file_is_rotated_past_max_bytes(self, tmp_path):
+        from app.core.tracing import OTLPFileExporter
+
+        path = tmp_path / "traces.otlp.jsonl"
+        exporter = OTLPFileExporter(str(path), max_bytes=10)
+        exporter._append('{"first": true}')
+        exporter._append('{"second": true}')
+
+        assert path.read_text().strip() == '{"second": true}'
+        assert (tmp_path / "traces.otlp.jsonl.1").read_text().strip() == '{"first": true}'
+
+
+    @pytest.mark.asyncio
+    async def test_database_export_writes_one_trace_row_per_trace(self):
+        from app.core.tracing import DatabaseSpanExporter, distributed_traces, trace_spans
+
+        tracer = _tracer()
+        with tracer.start_span("POST /api/market", kind="server") as root:
+            pass
+        # The consumer process continues the trace from the Kafka headers
+        with tracer.start_span("consume market_data.pjm", kind="consumer", parent=root.context):
+            with tracer.start_span("store ticks", span_type="database"):
+                pass
+
+        session = AsyncMock()
+        sessionmaker = MagicMock()
+        sessionmaker.return_value.__aenter__.return_value = session
+        await DatabaseSpanExporter(sessionmaker).export(tracer._queue)
+
+        (trace_insert, trace_rows), (span_insert, span_rows) = [c.args for c in session.execute.call_args_list]
+        assert trace_insert.table is distributed_traces
+        assert [row["span_id"] for row in trace_rows] == [root.context.span_id]
+        assert span_insert.table is trace_spans
+        assert len(span_rows) == 3
+        session.commit.assert_awaited_once()
+
+
+class TestTracePropagation:
+    """Test trace context across Kafka and WebSocket hops"""
+
+    @pytest.mark.asyncio
+    async def test_consumer_continues_producer_trace(self):
+        from app.services.kafka_consumer import KafkaConsumerService
+
+        tracer = _tracer()
+        with tracer.start_span("publish market_data.pjm", kind="producer") as producer_span:
+            headers = tracer.inject_headers()
+
+        record = _Record(
+            topic="market_data.pjm", partition=0, offset=7, key="pjm",
+            value={"event_type": "bid_update", "bid_id": "b1"},
+            headers=headers, timestamp=None
+        )
+        with patch("app.services.kafka_consumer.tracer", tracer):
+            assert await KafkaConsumerService().process_batch([record]) is True
+
+        await tracer.flush()
+        spans = [span for batch in tracer.exporter.batches for span in batch]
+        consume = next(span for span in spans if span.kind == "consumer")
+        assert consume.context.trace_id == producer_span.context.trace_id
+        assert consume.parent_span_id == producer_span.context.span_id
+        assert consume.attributes["messaging.kafka.offset"] == 7
+
+    @pytest.mark.asyncio
+    async def test_relay_carries_trace_to_other_workers(self):
+        from app.services.websocket_manager import WebSocketPubSubRelay
+
+        tracer = _tracer()
+        cache = MagicMock()
+        cache.publish = AsyncMock()
+        relay = WebSocketPubSubRelay(Mock(broadcast_to_market_zone=AsyncMock(), get_connection_count=Mock(return_value=2)), cache)
+        relay.is_running = True
+
+        with patch("app.services.websocket_manager.tracer", tracer):
+            await relay.broadcast_to_market_zone("pjm", {"type": "price_update", "market_zone": "pjm"})
+            await relay._flush_outbox()
+
+            channel, envelope = cache.publish.await_args.args
+            receiver = WebSocketPubSubRelay(Mock(broadcast_to_market_zone=AsyncMock()), cache)
+            await receiver._relay(channel, json.dumps(envelope))
+
+        await tracer.flush()
+        spans = {span.name: span for batch in tracer.exporter.batches for span in batch}
+        broadcast, relayed = spans["websocket.broadcast"], spans["websocket.relay"]
+        assert envelope["traces"] == [broadcast.context.to_traceparent()]
+        assert relayed.parent_span_id == broadcast.context.span_id
+        assert broadcast.attributes["websocket.connections"] == 2
+
+    @pytest.mark.asyncio
+    async def test_unsampled_broadcasts_publish_no_traces(self):
+        from app.services.websocket_manager import WebSocketPubSubRelay
+
+        tracer = _tracer(sample_rate=0.0)
+        cache = MagicMock()
+        cache.publish = AsyncMock()
+        relay = WebSocketPubSubRelay(Mock(broadcast_to_market_zone=AsyncMock(), get_connection_count=Mock(return_value=2)), cache)
+        relay.is_running = True
+
+        with patch("app.services.websocket_manager.tracer", tracer):
+            await relay.broadcast_to_market_zone("pjm", {"type": "price_update", "market_zone": "pjm"})
+            await relay._flush_outbox()
+
+        channel, envelope = cache.publish.await_args.args
+        assert "traces" not in envelope
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
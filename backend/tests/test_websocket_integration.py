@@ -342,5 +342,437 @@ class TestWebSocketStatistics:
         assert new_stats['total_connections'] == initial_connections + 1
 
 
+
+def _register_mock_connection(connection_manager, market_zone, send_text=None, encoding=None):
+    """Attach a mock WebSocket to a ConnectionManager without the handshake"""
+    from app.services.wire_format import WireEncoding
+    
+    websocket = AsyncMock(spec=WebSocket)
+    websocket.send_text = send_text or AsyncMock()
+    websocket.send_bytes = AsyncMock()
+    connection_manager.active_connections.setdefault(market_zone, set()).add(websocket)
+    connection_manager.connection_metadata[websocket] = {
+        'user_id': None,
+        'connected_at': datetime.utcnow(),
+        'market_zone': market_zone,
+        'connection_id': f"mock-{id(websocket)}",
+        'encoding': encoding or WireEncoding.JSON
+    }
+    return websocket
+
+
+class TestConcurrentBroadcast:
+    """Test concurrent fan-out in ConnectionManager broadcasts"""
+    
+    @pytest.mark.asyncio
+    async def test_message_serialized_once_per_broadcast(self):
+        """All sockets receive the same payload, encoded a single time"""
+        import json
+        from app.services.websocket_manager import ConnectionManager
+        
+        connection_manager = ConnectionManager(send_timeout=0.5)
+        sockets = [_register_mock_connection(connection_manager, "pjm") for _ in range(5)]
+        
+        with patch("app.services.websocket_manager.json.dumps", wraps=json.dumps) as dumps:
+            await connection_manager.broadcast_to_market_zone("pjm", {"type": "price_update", "price": 42.0})
+        await asyncio.sleep(0.01)
+        
+        assert dumps.call_count == 1
+        payloads = {ws.send_text.call_args[0][0] for ws in sockets}
+        assert len(payloads) == 1
+        assert json.loads(payloads.pop())["price"] == 42.0
+        await connection_manager.shutdown()
+    
+    def test_explicit_zero_thresholds_are_kept(self):
+        """0 is a setting, not a request for the configured default"""
+        from app.services.websocket_manager import ConnectionManager
+        
+        connection_manager = ConnectionManager(slow_consumer_threshold=0, slow_consumer_max_timeouts=0)
+        assert connection_manager.slow_consumer_threshold == 0
+        assert connection_manager.slow_consumer_max_timeouts == 0
+    
+    @pytest.mark.asyncio
+    async def test_slow_socket_does_not_delay_zone(self):
+        """A hung client is bounded by the per-send timeout"""
+        import time
+        from app.services.websocket_manager import ConnectionManager
+        
+        async def hang(payload):
+            await asyncio.sleep(10)
+        
+        connection_manager = ConnectionManager(send_timeout=0.05, slow_consumer_threshold=1)
+        fast = [_register_mock_connection(connection_manager, "pjm") for _ in range(3)]
+        slow = _register_mock_connection(connection_manager, "pjm", send_text=AsyncMock(side_effect=hang))
+        
+        start = time.perf_counter()
+        await connection_manager.broadcast_to_market_zone("pjm", {"type": "price_update"})
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(0.1)
+        
+        assert elapsed < 0.05
+        for ws in fast:
+            ws.send_text.assert_called_once()
+        assert slow in connection_manager.slow_consumers
+        assert connection_manager.get_broadcast_stats()['send_timeouts'] >= 1
+        await connection_manager.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_conflates_ticks_for_same_location(self):
+        """Ticks queued behind a stuck send collapse to the newest one"""
+        import json
+        from app.services.websocket_manager import ConnectionManager
+        
+        release = asyncio.Event()
+        received = []
+        
+        async def stall_first(payload):
+            received.append(payload)
+            if len(received) == 1:
+                await release.wait()
+        
+        connection_manager = ConnectionManager(send_timeout=0.05, send_queue_size=2, slow_consumer_max_timeouts=100)
+        _register_mock_connection(connection_manager, "caiso", send_text=AsyncMock(side_effect=stall_first))
+        
+        tick = {"type": "price_update", "market_zone": "caiso", "location": "CAISO_HUB"}
+        await connection_manager.broadcast_to_market_zone("caiso", {**tick, "price": 1.0})
+        await asyncio.sleep(0.01)
+        for price in (2.0, 3.0, 4.0):
+            await connection_manager.broadcast_to_market_zone("caiso", {**tick, "price": price})
+        
+        release.set()
+        await asyncio.sleep(0.1)
+        
+        assert [json.loads(p)["price"] for p in received] == [1.0, 4.0]
+        assert connection_manager.get_broadcast_stats()['messages_conflated'] == 2
+        await connection_manager.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_failed_socket_is_disconnected(self):
+        """Sockets that raise on send are removed from the zone"""
+        from app.services.websocket_manager import ConnectionManager
+        
+        connection_manager = ConnectionManager(send_timeout=0.5)
+        healthy = _register_mock_connection(connection_manager, "ercot")
+        broken = _register_mock_connection(
+            connection_manager, "ercot", send_text=AsyncMock(side_effect=Exception("Connection closed"))
+        )
+        
+        with patch("app.services.websocket_manager.redis_cache.invalidate_websocket_connection", new=AsyncMock()):
+            await connection_manager.broadcast_to_all_zones({"type": "market_status"})
+            await asyncio.sleep(0.01)
+        
+        healthy.send_text.assert_called_once()
+        assert broken not in connection_manager.active_connections["ercot"]
+        assert connection_manager.get_connection_count("ercot") == 1
+        await connection_manager.shutdown()
+
+
+
+class TestConnectionSendQueue:
+    """Test the bounded per-connection outbound queue"""
+    
+    @pytest.mark.asyncio
+    async def test_keeps_every_message_while_there_is_room(self):
+        from app.services.websocket_manager import ConnectionSendQueue
+        
+        queue = ConnectionSendQueue(maxsize=4)
+        for payload in ("a1", "a2", "a3"):
+            assert queue.put(payload, "tick:a")
+        
+        assert [await queue.get() for _ in range(3)] == ["a1", "a2", "a3"]
+        assert queue.conflated == 0
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_sheds_oldest_tick_of_other_key(self):
+        from app.services.websocket_manager import ConnectionSendQueue
+        
+        queue = ConnectionSendQueue(maxsize=2)
+        queue.put("alert")
+        queue.put("a1", "tick:a")
+        assert queue.put("b1", "tick:b")
+        
+        assert len(queue) == 2
+        assert [await queue.get() for _ in range(2)] == ["alert", "b1"]
+        assert queue.dropped == 1
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_rejects_control_messages(self):
+        from app.services.websocket_manager import ConnectionSendQueue
+        
+        queue = ConnectionSendQueue(maxsize=2)
+        queue.put("alert-1")
+        queue.put("alert-2")
+        
+        assert queue.put("alert-3") is False
+        assert len(queue) == 2
+    
+    @pytest.mark.asyncio
+    async def test_superseded_slots_are_compacted(self):
+        from app.services.websocket_manager import ConnectionSendQueue
+        
+        queue = ConnectionSendQueue(maxsize=3)
+        for i in range(100):
+            queue.put(f"tick-{i}", f"tick:{i}")
+        
+        assert len(queue) == 3
+        assert len(queue._entries) <= 6
+        assert [await queue.get() for _ in range(3)] == ["tick-97", "tick-98", "tick-99"]
+
+
+
+class _InProcessPubSubBroker:
+    """Minimal stand-in for the Redis pub/sub used by RedisCacheService"""
+    
+    def __init__(self):
+        self.subscriptions = []
+        self.published = []
+    
+    async def publish(self, channel, message):
+        import json
+        payload = message if isinstance(message, str) else json.dumps(message)
+        self.published.append(channel)
+        receivers = [sub for sub in self.subscriptions if channel in sub.channels]
+        for sub in receivers:
+            sub.inbox.put_nowait({'type': 'message', 'channel': channel, 'data': payload})
+        return len(receivers)
+    
+    def pubsub(self):
+        subscription = _InProcessSubscription()
+        self.subscriptions.append(subscription)
+        return subscription
+
+
+class _InProcessSubscription:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+    
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+    
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels or set(self.channels))
+    
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    async def close(self):
+        pass
+
+
+class TestCrossWorkerRelay:
+    """Test WebSocket broadcasts relayed between workers over pub/sub"""
+    
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_sockets_on_other_workers(self):
+        """Each socket gets every tick once and ticks are published in one batch"""
+        import json
+        from app.services.websocket_manager import ConnectionManager, WebSocketPubSubRelay
+        
+        broker = _InProcessPubSubBroker()
+        worker_a, worker_b = ConnectionManager(), ConnectionManager()
+        relay_a = WebSocketPubSubRelay(worker_a, broker, batch_interval=0.01, poll_interval=0.01)
+        relay_b = WebSocketPubSubRelay(worker_b, broker, batch_interval=0.01, poll_interval=0.01)
+        
+        local_socket = _register_mock_connection(worker_a, "pjm")
+        remote_socket = _register_mock_connection(worker_b, "pjm")
+        unrelated_socket = _register_mock_connection(worker_b, "ercot")
+        
+        await relay_a.start()
+        await relay_b.start()
+        await asyncio.sleep(0.05)
+        
+        for price in (10.0, 11.0, 12.0):
+            await relay_a.broadcast_to_market_zone("pjm", {"type": "price_update", "market_zone": "pjm", "price": price})
+        await asyncio.sleep(0.1)
+        
+        for socket in (local_socket, remote_socket):
+            prices = [json.loads(call.args[0])["price"] for call in socket.send_text.call_args_list]
+            assert prices == [10.0, 11.0, 12.0]
+        unrelated_socket.send_text.assert_not_called()
+        assert broker.published.count("ws:zone:pjm") == 1
+        assert relay_b.get_relay_stats()['messages_relayed'] == 3
+        
+        await relay_a.stop()
+        await relay_b.stop()
+        await worker_a.shutdown()
+        await worker_b.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_worker_only_subscribes_to_zones_with_local_connections(self):
+        from app.services.websocket_manager import ConnectionManager, WebSocketPubSubRelay
+        
+        broker = _InProcessPubSubBroker()
+        worker = ConnectionManager()
+        relay = WebSocketPubSubRelay(worker, broker, poll_interval=0.01)
+        _register_mock_connection(worker, "caiso")
+        
+        await relay.start()
+        await asyncio.sleep(0.05)
+        
+        assert broker.subscriptions[0].channels == {"ws:all", "ws:zone:caiso"}
+        
+        await relay.stop()
+        await worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_relay_stays_local_without_redis(self):
+        from app.services.websocket_manager import ConnectionManager, WebSocketPubSubRelay
+        
+        unavailable_cache = MagicMock()
+        unavailable_cache.pubsub.return_value = None
+        worker = ConnectionManager()
+        relay = WebSocketPubSubRelay(worker, unavailable_cache)
+        socket = _register_mock_connection(worker, "pjm")
+        
+        await relay.start()
+        await relay.broadcast_to_market_zone("pjm", {"type": "market_status"})
+        await asyncio.sleep(0.01)
+        
+        assert relay.is_running is False
+        socket.send_text.assert_called_once()
+        unavailable_cache.publish.assert_not_called()
+        await worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_full_batches_in_flight(self):
+        from app.services.websocket_manager import ConnectionManager, WebSocketPubSubRelay
+        
+        published = []
+        
+        async def slow_publish(channel, envelope):
+            await asyncio.sleep(0.05)
+            published.append(channel)
+        
+        cache = MagicMock()
+        cache.publish = slow_publish
+        worker = ConnectionManager()
+        relay = WebSocketPubSubRelay(worker, cache, max_batch_size=1)
+        relay.is_running = True
+        relay._pubsub = AsyncMock()
+        
+        await relay.broadcast_to_market_zone("pjm", {"type": "price_update", "market_zone": "pjm"})
+        await relay.stop()
+        
+        assert published == ["ws:zone:pjm"]
+        assert len(relay._publish_tasks) == 0
+        await worker.shutdown()
+
+
+class TestWireFormats:
+    """Test compact wire format negotiation and encoding"""
+    
+    def test_negotiation_prefers_subprotocol_and_defaults_to_json(self):
+        from app.services.wire_format import WireEncoding, negotiate_encoding
+        
+        assert negotiate_encoding([], None) == (WireEncoding.JSON, None)
+        assert negotiate_encoding(["chat", "optibid.v1.columnar"], "msgpack") == (
+            WireEncoding.COLUMNAR, "optibid.v1.columnar"
+        )
+        assert negotiate_encoding([], "MSGPACK") == (WireEncoding.MSGPACK, None)
+        assert negotiate_encoding([], "protobuf") == (WireEncoding.JSON, None)
+    
+    def test_columnar_frames_round_trip_with_dictionary_ids(self):
+        from app.services.wire_format import ColumnarFrameDecoder, MarketDataWireCodec, WireEncoding
+        
+        codec = MarketDataWireCodec()
+        tick = {
+            "type": "price_update", "market_zone": "pjm", "location": "COMED",
+            "price": 42.5, "volume": 1200.0, "timestamp": "2025-01-01T00:00:00"
+        }
+        first = codec.encode(tick, WireEncoding.COLUMNAR)
+        second = codec.encode({**tick, "price": 43.0}, WireEncoding.COLUMNAR)
+        
+        # Symbols travel only with the first frame that uses them
+        assert isinstance(first, bytes) and len(second) < len(first)
+        assert len(first) < len(codec.encode(tick, WireEncoding.JSON))
+        
+        decoder = ColumnarFrameDecoder()
+        rows = decoder.decode(first)["rows"] + decoder.decode(second)["rows"]
+        assert rows[1] == {
+            "timestamp": 1735689600000, "market_zone": "pjm", "location": "COMED",
+            "price_type": None, "price": 43.0, "volume": 1200.0
+        }
+        
+        # A late joiner learns the symbols from a dictionary frame
+        late_decoder = ColumnarFrameDecoder()
+        late_decoder.decode(codec.dictionary_frame())
+        assert late_decoder.decode(second)["rows"][0]["location"] == "COMED"
+    
+    def test_non_tick_messages_stay_json_in_columnar_mode(self):
+        from app.services.wire_format import MarketDataWireCodec, WireEncoding
+        
+        payload = MarketDataWireCodec().encode({"type": "market_alert", "message": "hi"}, WireEncoding.COLUMNAR)
+        
+        assert payload == '{"type": "market_alert", "message": "hi"}'
+    
+    def test_msgpack_uses_epoch_millis(self):
+        msgpack = pytest.importorskip("msgpack")
+        from app.services.wire_format import MarketDataWireCodec, WireEncoding
+        
+        payload = MarketDataWireCodec().encode(
+            {"type": "price_update", "price": 1.0, "timestamp": datetime(2025, 1, 1)}, WireEncoding.MSGPACK
+        )
+        
+        assert msgpack.unpackb(payload) == {"type": "price_update", "price": 1.0, "timestamp": 1735689600000}
+    
+    @pytest.mark.asyncio
+    async def test_broadcast_encodes_once_per_encoding(self):
+        from app.services.websocket_manager import ConnectionManager
+        from app.services.wire_format import ColumnarFrameDecoder, WireEncoding
+        
+        connection_manager = ConnectionManager()
+        json_sockets = [_register_mock_connection(connection_manager, "ercot") for _ in range(2)]
+        columnar_sockets = [
+            _register_mock_connection(connection_manager, "ercot", encoding=WireEncoding.COLUMNAR) for _ in range(2)
+        ]
+        
+        await connection_manager.broadcast_to_market_zone("ercot", {
+            "type": "price_update", "market_zone": "ercot", "price": 30.0,
+            "volume": 5.0, "timestamp": "2025-01-01T00:00:00"
+        })
+        await asyncio.sleep(0.01)
+        
+        for socket in json_sockets:
+            socket.send_text.assert_called_once()
+            socket.send_bytes.assert_not_called()
+        frames = [socket.send_bytes.call_args.args[0] for socket in columnar_sockets]
+        assert frames[0] is frames[1]
+        assert ColumnarFrameDecoder().decode(frames[0])["rows"][0]["market_zone"] == "ercot"
+        await connection_manager.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_columnar_clients_in_other_zones_learn_new_symbols(self):
+        from app.services.websocket_manager import ConnectionManager
+        from app.services.wire_format import ColumnarFrameDecoder, MarketDataWireCodec, WireEncoding
+        
+        connection_manager = ConnectionManager()
+        pjm_socket = _register_mock_connection(connection_manager, "pjm", encoding=WireEncoding.COLUMNAR)
+        ercot_socket = _register_mock_connection(connection_manager, "ercot", encoding=WireEncoding.COLUMNAR)
+        tick = {
+            "type": "price_update", "market_zone": "pjm", "location": "HUB", "price_type": "LMP",
+            "price": 30.0, "volume": 5.0, "timestamp": "2025-01-01T00:00:00"
+        }
+        
+        with patch("app.services.websocket_manager.wire_codec", MarketDataWireCodec()):
+            await connection_manager.broadcast_to_market_zone("pjm", tick)
+            await connection_manager.broadcast_to_market_zone("ercot", {**tick, "market_zone": "pjm", "price": 31.0})
+            await asyncio.sleep(0.01)
+        
+        decoders = {socket: ColumnarFrameDecoder() for socket in (pjm_socket, ercot_socket)}
+        rows = {
+            socket: [row for call in socket.send_bytes.call_args_list for row in decoders[socket].decode(call.args[0])["rows"]]
+            for socket in decoders
+        }
+        assert rows[pjm_socket][0]["location"] == "HUB"
+        assert [(row["market_zone"], row["location"], row["price_type"], row["price"]) for row in rows[ercot_socket]] == [
+            ("pjm", "HUB", "LMP", 31.0)
+        ]
+        await connection_manager.shutdown()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])